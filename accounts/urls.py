@@ -13,6 +13,8 @@ urlpatterns = [
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
     path('profile/', views.profile, name='profile'),
     path('my-bookings/', views.user_bookings, name='user_bookings'),
+    path('my-bookings/api/', views.user_bookings_api, name='user_bookings_api'),
+    path('my-bookings/export/', views.user_bookings_export, name='user_bookings_export'),
     
     # 驾驶员信息管理
     path('drivers/add/', views.add_driver, name='add_driver'),
@@ -3,11 +3,14 @@ from django.contrib.auth import login, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.decorators.csrf import csrf_exempt
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.urls import reverse
+from django.utils.http import urlencode
 from .forms import UserRegistrationForm, UserUpdateForm, ProfileUpdateForm, ProfileDriverForm
 from .models import Profile
 from bookings.models import Booking, Driver
+from bookings.history import BookingHistory, InvalidCursor, booking_to_dict, stream_csv, stream_json
+from rush_car_rental.db_router import use_replica
 import logging
 
 # Create a logger for formal logging
@@ -212,11 +215,60 @@ def delete_driver(request, driver_id):
 
 @login_required
 @csrf_exempt
+@use_replica
 def user_bookings(request):
     logger.info(
         f"User {request.user.username} is reviewing their booking history.")
-    bookings = Booking.objects.filter(
-        user=request.user).order_by('-booking_date')
-    if not bookings:
+    history = BookingHistory(request.user, request.GET)
+    try:
+        bookings, next_cursor = history.page()
+    except InvalidCursor:
+        return redirect('user_bookings')
+    if not bookings and not history.cursor:
         logger.warning(f"User {request.user.username} has no booking history.")
-    return render(request, 'accounts/bookings.html', {'bookings': bookings})
+    filters = history.filter_params()
+    context = {
+        'bookings': bookings,
+        'history': history,
+        'status_choices': Booking.STATUS_CHOICES,
+        'first_page_url': '?' + urlencode(filters) if history.cursor else None,
+        'next_page_url': '?' + urlencode({**filters, 'cursor': next_cursor}) if next_cursor else None,
+        'export_query': urlencode(filters),
+    }
+    return render(request, 'accounts/bookings.html', context)
+
+
+@login_required
+@use_replica
+def user_bookings_api(request):
+    """
+    预订历史 JSON 接口: ?status=&from=&to=&cursor=&page_size=
+    """
+    history = BookingHistory(request.user, request.GET)
+    try:
+        bookings, next_cursor = history.page()
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    return JsonResponse({
+        'results': [booking_to_dict(booking) for booking in bookings],
+        'next': next_cursor,
+    })
+
+
+@login_required
+@use_replica
+def user_bookings_export(request):
+    """
+    流式导出全部预订 (按当前筛选条件): ?format=csv|json
+    """
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in ('csv', 'json'):
+        return JsonResponse({'error': 'format must be csv or json'}, status=400)
+    logger.info(f"User {request.user.username} is exporting their booking history as {export_format}.")
+    rows = BookingHistory(request.user, request.GET).export_rows()
+    if export_format == 'csv':
+        response = StreamingHttpResponse(stream_csv(rows), content_type='text/csv')
+    else:
+        response = StreamingHttpResponse(stream_json(rows), content_type='application/json')
+    response['Content-Disposition'] = f'attachment; filename="bookings.{export_format}"'
+    return response
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Booking, BookingOption, Driver
+from .models import Booking, BookingOption, Driver, StripeEvent
 
 class BookingAdmin(admin.ModelAdmin):
     list_display = ('user', 'car', 'pickup_location', 'dropoff_location', 'pickup_date', 'return_date', 'status', 'total_cost')
@@ -27,7 +27,7 @@ class BookingAdmin(admin.ModelAdmin):
     readonly_fields = ('booking_date',)
 
 class BookingOptionAdmin(admin.ModelAdmin):
-    list_display = ('name', 'daily_rate', 'flat_fee', 'is_quantity_option')
+    list_display = ('name', 'code', 'daily_rate', 'flat_fee', 'is_quantity_option')
     search_fields = ('name', 'description')
 
 class DriverAdmin(admin.ModelAdmin):
@@ -53,6 +53,14 @@ class DriverAdmin(admin.ModelAdmin):
     )
     date_hierarchy = 'created_at'
 
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ('event_id', 'type', 'status', 'booking', 'attempts', 'received_at', 'processed_at')
+    list_filter = ('status', 'type')
+    search_fields = ('event_id',)
+    raw_id_fields = ('booking',)
+    readonly_fields = ('payload', 'received_at', 'processed_at')
+
 admin.site.register(Booking, BookingAdmin)
 admin.site.register(BookingOption, BookingOptionAdmin)
 admin.site.register(Driver, DriverAdmin)
+admin.site.register(StripeEvent, StripeEventAdmin)
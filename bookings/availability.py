@@ -0,0 +1,364 @@
+"""
+车辆可用性引擎
+
+在内存中为每辆车维护按开始日期排序的预订区间 (pending/confirmed)，
+用于回答 "某地点、某时间段 [a, b) 内哪些车 / 每个 VehicleCategory 有几辆车可租"。
+
+- 没有未来预订的车辆直接按 (地点, 类别) 预先计数，无需逐车检查
+- 有预订的车辆用二分查找 + 前缀最大结束日期判断是否冲突
+- Booking / Car 保存或删除时通过信号增量更新 (见 bookings/signals.py)
+- 其他进程中的修改通过缓存中的版本号感知，发现版本变化时整体重建
+
+用法:
+
+    from bookings.availability import get_availability_index
+    index = get_availability_index()
+    index.free_counts_by_category(pickup_date, return_date, location_id=3)
+"""
+import logging
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+
+from django.utils import timezone
+
+from rush_car_rental.utils.versioned_index import IndexSingleton, VersionedIndex
+
+logger = logging.getLogger(__name__)
+
+# 占用车辆的预订状态
+ACTIVE_STATUSES = ('pending', 'confirmed')
+
+VERSION_CACHE_KEY = 'availability_index_version'
+
+
+def booking_interval(pickup_date, return_date):
+    """
+    将预订日期转换为半开区间 [pickup_date, return_date)
+
+    取车和还车为同一天时按一天计算，与计费规则保持一致。
+    """
+    if return_date <= pickup_date:
+        return_date = pickup_date + timedelta(days=1)
+    return pickup_date, return_date
+
+
+class CarIntervals:
+    """
+    单辆车的预订区间集合
+
+    starts 按升序排列，max_ends[i] 为前 i+1 个区间中最大的结束日期，
+    因此 "是否与 [a, b) 冲突" 只需一次二分查找。
+    """
+
+    __slots__ = ('starts', 'ends', 'booking_ids', 'max_ends')
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.booking_ids = []
+        self.max_ends = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, booking_id, start, end):
+        pos = bisect_left(self.starts, start)
+        self.starts.insert(pos, start)
+        self.ends.insert(pos, end)
+        self.booking_ids.insert(pos, booking_id)
+        self.max_ends.insert(pos, end)
+        self._rebuild_max_ends(pos)
+
+    def remove(self, booking_id):
+        try:
+            pos = self.booking_ids.index(booking_id)
+        except ValueError:
+            return False
+        del self.starts[pos]
+        del self.ends[pos]
+        del self.booking_ids[pos]
+        del self.max_ends[pos]
+        self._rebuild_max_ends(pos)
+        return True
+
+    def _rebuild_max_ends(self, pos):
+        running = self.max_ends[pos - 1] if pos > 0 else None
+        for i in range(pos, len(self.ends)):
+            end = self.ends[i]
+            running = end if running is None or end > running else running
+            self.max_ends[i] = running
+
+    def is_free(self, start, end):
+        """[start, end) 内没有任何预订时返回 True"""
+        pos = bisect_left(self.starts, end)
+        return pos == 0 or self.max_ends[pos - 1] <= start
+
+    def conflicts(self, start, end):
+        """返回与 [start, end) 冲突的预订ID列表"""
+        pos = bisect_left(self.starts, end)
+        return [
+            self.booking_ids[i] for i in range(pos)
+            if self.ends[i] > start
+        ]
+
+
+class AvailabilityIndex(VersionedIndex):
+    """
+    车辆可用性内存索引
+    """
+
+    version_cache_key = VERSION_CACHE_KEY
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        # car_id -> (category_id, location_id)
+        self.cars = {}
+        # car_id -> CarIntervals (只包含有预订的车辆)
+        self.intervals = {}
+        # booking_id -> car_id
+        self.booking_cars = {}
+        # (location_id, category_id) -> 没有任何预订的车辆ID集合
+        self.idle_cars = defaultdict(set)
+        # (location_id, category_id) -> 有预订的车辆ID集合
+        self.busy_cars = defaultdict(set)
+        self.built_at = None
+        self.built = False
+
+    # ---- 构建 ----
+
+    def build(self, cars, bookings):
+        """
+        从数据构建索引
+
+        cars: 可迭代的 (car_id, category_id, location_id)
+        bookings: 可迭代的 (booking_id, car_id, pickup_date, return_date)
+        """
+        with self._lock:
+            self._clear()
+            for car_id, category_id, location_id in cars:
+                self.cars[car_id] = (category_id, location_id)
+            # 不可租车辆的预订也保留，车辆恢复可租时无需重新加载
+            for booking_id, car_id, pickup_date, return_date in bookings:
+                start, end = booking_interval(pickup_date, return_date)
+                self.intervals.setdefault(car_id, CarIntervals()).add(booking_id, start, end)
+                self.booking_cars[booking_id] = car_id
+            for car_id, key in self.cars.items():
+                bucket = self.busy_cars if car_id in self.intervals else self.idle_cars
+                bucket[self._bucket_key(key)].add(car_id)
+            self.built_at = timezone.now()
+            self.built = True
+        logger.info("可用性索引已构建: %d 辆车, %d 个有效预订", len(self.cars), len(self.booking_cars))
+
+    def refresh(self):
+        """从数据库加载可租车辆和未结束的有效预订"""
+        from cars.models import Car
+        from bookings.models import Booking
+
+        cars = Car.objects.filter(
+            is_available=True, available_for_booking=True
+        ).values_list('id', 'category_id', 'currently_located_id')
+        bookings = Booking.objects.filter(
+            status__in=ACTIVE_STATUSES,
+            return_date__gte=timezone.now().date(),
+        ).values_list('id', 'car_id', 'pickup_date', 'return_date')
+        self.build(cars.iterator(), bookings.iterator())
+
+    @staticmethod
+    def _bucket_key(car_key):
+        category_id, location_id = car_key
+        return (location_id, category_id)
+
+    # ---- 增量更新 ----
+
+    def _move_bucket(self, car_id):
+        key = self._bucket_key(self.cars[car_id])
+        self.idle_cars[key].discard(car_id)
+        self.busy_cars[key].discard(car_id)
+        bucket = self.busy_cars if car_id in self.intervals else self.idle_cars
+        bucket[key].add(car_id)
+
+    def update_booking(self, booking_id, car_id, pickup_date, return_date, status):
+        """预订新增、修改或取消后调用"""
+        with self._lock:
+            self.remove_booking(booking_id)
+            if status not in ACTIVE_STATUSES:
+                return
+            start, end = booking_interval(pickup_date, return_date)
+            self.intervals.setdefault(car_id, CarIntervals()).add(booking_id, start, end)
+            self.booking_cars[booking_id] = car_id
+            if car_id in self.cars:
+                self._move_bucket(car_id)
+
+    def remove_booking(self, booking_id):
+        """预订删除后调用"""
+        with self._lock:
+            car_id = self.booking_cars.pop(booking_id, None)
+            if car_id is None:
+                return
+            intervals = self.intervals.get(car_id)
+            if intervals is not None:
+                intervals.remove(booking_id)
+                if not intervals:
+                    del self.intervals[car_id]
+            if car_id in self.cars:
+                self._move_bucket(car_id)
+
+    def update_car(self, car_id, category_id, location_id, rentable=True):
+        """车辆类别、所在地点或可租状态变化后调用"""
+        with self._lock:
+            self.remove_car(car_id, keep_bookings=True)
+            if not rentable:
+                return
+            self.cars[car_id] = (category_id, location_id)
+            self._move_bucket(car_id)
+
+    def remove_car(self, car_id, keep_bookings=False):
+        """车辆删除后调用"""
+        with self._lock:
+            car_key = self.cars.pop(car_id, None)
+            if car_key is not None:
+                key = self._bucket_key(car_key)
+                self.idle_cars[key].discard(car_id)
+                self.busy_cars[key].discard(car_id)
+            if not keep_bookings:
+                for booking_id in self.intervals.pop(car_id, CarIntervals()).booking_ids:
+                    self.booking_cars.pop(booking_id, None)
+
+    # ---- 查询 ----
+
+    def _buckets(self, location_id=None, category_id=None):
+        keys = set(self.idle_cars) | set(self.busy_cars)
+        for key in keys:
+            key_location, key_category = key
+            if location_id is not None and key_location != location_id:
+                continue
+            if category_id is not None and key_category != category_id:
+                continue
+            yield key
+
+    def is_car_free(self, car_id, pickup_date, return_date):
+        """指定车辆在时间段内是否可租"""
+        if car_id not in self.cars:
+            return False
+        intervals = self.intervals.get(car_id)
+        if intervals is None:
+            return True
+        return intervals.is_free(*booking_interval(pickup_date, return_date))
+
+    def free_cars(self, pickup_date, return_date, location_id=None, category_id=None):
+        """返回时间段内可租车辆ID的集合"""
+        start, end = booking_interval(pickup_date, return_date)
+        result = set()
+        with self._lock:
+            for key in self._buckets(location_id, category_id):
+                result.update(self.idle_cars.get(key, ()))
+                for car_id in self.busy_cars.get(key, ()):
+                    if self.intervals[car_id].is_free(start, end):
+                        result.add(car_id)
+        return result
+
+    def free_counts_by_category(self, pickup_date, return_date, location_id=None):
+        """返回 {category_id: 可租车辆数}，不包含数量为0的类别"""
+        start, end = booking_interval(pickup_date, return_date)
+        counts = defaultdict(int)
+        with self._lock:
+            for key in self._buckets(location_id):
+                category_id = key[1]
+                free = len(self.idle_cars.get(key, ()))
+                for car_id in self.busy_cars.get(key, ()):
+                    if self.intervals[car_id].is_free(start, end):
+                        free += 1
+                if free:
+                    counts[category_id] += free
+        return dict(counts)
+
+    def free_count(self, category_id, location_id, pickup_date, return_date):
+        """某个类别在某个地点的可租车辆数 (直接按 (地点, 类别) 查找，不遍历其他分组)"""
+        start, end = booking_interval(pickup_date, return_date)
+        key = (location_id, category_id)
+        with self._lock:
+            free = len(self.idle_cars.get(key, ()))
+            for car_id in self.busy_cars.get(key, ()):
+                if self.intervals[car_id].is_free(start, end):
+                    free += 1
+        return free
+
+    def locations_by_category(self):
+        """返回 {category_id: {location_id, ...}}，只包含有类别和地点的车辆"""
+        result = defaultdict(set)
+        with self._lock:
+            for key in set(self.idle_cars) | set(self.busy_cars):
+                location_id, category_id = key
+                if location_id is None or category_id is None:
+                    continue
+                if self.idle_cars.get(key) or self.busy_cars.get(key):
+                    result[category_id].add(location_id)
+        return dict(result)
+
+    def pick_car(self, category_id, pickup_date, return_date, location_id=None):
+        """
+        为某个类别分配一辆可租车辆
+
+        优先选择没有任何预订的车辆，其次选择时间段内空闲的车辆。
+        没有可租车辆时返回 None。
+        """
+        start, end = booking_interval(pickup_date, return_date)
+        with self._lock:
+            for key in self._buckets(location_id, category_id):
+                idle = self.idle_cars.get(key)
+                if idle:
+                    return min(idle)
+            for key in self._buckets(location_id, category_id):
+                for car_id in sorted(self.busy_cars.get(key, ())):
+                    if self.intervals[car_id].is_free(start, end):
+                        return car_id
+        return None
+
+
+_index = IndexSingleton(AvailabilityIndex)
+
+
+def get_availability_index():
+    """返回当前进程的可用性索引 (首次调用或版本变化时从数据库加载)"""
+    return _index.get()
+
+
+def bump_version():
+    """通知所有进程预订数据已变化，返回新的版本号"""
+    return _index.bump_version()
+
+
+def booking_changed(booking):
+    """Booking 保存后调用"""
+    _index.apply_change(lambda index: index.update_booking(
+        booking.pk, booking.car_id, booking.pickup_date, booking.return_date, booking.status
+    ))
+
+
+def booking_deleted(booking_id):
+    """Booking 删除后调用"""
+    _index.apply_change(lambda index: index.remove_booking(booking_id))
+
+
+def car_changed(car):
+    """Car 保存后调用"""
+    rentable = car.is_available and car.available_for_booking
+    _index.apply_change(lambda index: index.update_car(
+        car.pk, car.category_id, car.currently_located_id, rentable
+    ))
+
+
+def car_deleted(car_id):
+    """Car 删除后调用"""
+    _index.apply_change(lambda index: index.remove_car(car_id))
+
+
+def reset_availability_index():
+    """丢弃当前索引，下次使用时重新加载 (测试用)"""
+    _index.reset()
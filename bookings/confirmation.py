@@ -0,0 +1,111 @@
+"""
+预订确认流程
+
+把预订草稿写入数据库: 保存 Booking、保存驾驶员、关联到用户资料，全部在同一个事务中完成。
+
+- 幂等: 每个草稿生成唯一的 idempotency_key，重复提交或 Stripe 回调重试
+  只会返回已经存在的预订，不会产生重复记录
+- 并发安全: 事务内先用 select_for_update 锁住车辆行以及该车重叠时段内的预订，
+  同一辆车的确认请求因此串行执行，再在数据库中重新检查时间冲突
+"""
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from cars.models import Car
+from .availability import ACTIVE_STATUSES, booking_interval
+from .drivers import save_drivers
+from .models import Booking
+
+logger = logging.getLogger(__name__)
+
+
+class BookingConflict(Exception):
+    """所选车辆在该时间段已被其他预订占用"""
+
+
+def idempotency_key_for(draft_id):
+    """根据预订草稿ID生成幂等键"""
+    return f"draft:{draft_id}"
+
+
+def find_confirmed_booking(draft_id):
+    """返回该草稿已经确认的预订，没有则返回 None"""
+    return Booking.objects.filter(idempotency_key=idempotency_key_for(draft_id)).first()
+
+
+def overlapping_bookings(car_id, pickup_date, return_date):
+    """
+    返回该车辆与给定时段重叠的有效预订
+
+    与可用性索引一致使用左闭右开区间，同一天取还车的预订占用一天。
+    """
+    start, end = booking_interval(pickup_date, return_date)
+    return Booking.objects.filter(
+        car_id=car_id,
+        status__in=ACTIVE_STATUSES,
+        pickup_date__lt=end,
+    ).filter(
+        # 普通预订: 还车日期晚于开始日期; 同一天取还车: 取车日期不早于开始日期
+        Q(return_date__gt=start) | Q(pickup_date__gte=start)
+    )
+
+
+def confirm_draft(draft_id, draft, user=None):
+    """
+    确认预订草稿，返回 (booking, created)
+
+    同一草稿重复确认时返回已有预订且 created 为 False。
+    车辆在该时段已被占用时抛出 BookingConflict。
+    """
+    key = idempotency_key_for(draft_id)
+
+    # 快速路径: 已经确认过的草稿不需要加锁
+    existing = Booking.objects.filter(idempotency_key=key).first()
+    if existing is not None:
+        logger.info("预订草稿 %s 已确认为预订 #%s，忽略重复提交", draft_id, existing.pk)
+        return existing, False
+
+    try:
+        with transaction.atomic():
+            # 锁住车辆行，同一辆车的确认请求在此排队
+            list(Car.objects.select_for_update().filter(pk=draft.car_id).values_list('pk', flat=True))
+
+            # 拿到锁后再检查一次，前一个请求可能刚刚提交了同一草稿
+            existing = Booking.objects.filter(idempotency_key=key).first()
+            if existing is not None:
+                return existing, False
+
+            conflicts = list(
+                overlapping_bookings(draft.car_id, draft.pickup_date, draft.return_date)
+                .select_for_update()
+                .values_list('pk', flat=True)
+            )
+            if conflicts:
+                logger.warning("车辆 #%s 在 %s 至 %s 已被预订 %s 占用",
+                               draft.car_id, draft.pickup_date, draft.return_date, conflicts)
+                raise BookingConflict(
+                    "This car is no longer available for the selected dates."
+                )
+
+            draft.idempotency_key = key
+            draft.status = 'confirmed'
+            draft.save()
+            logger.info("预订草稿 %s 已确认为预订 #%s", draft_id, draft.pk)
+
+            drivers_data = getattr(draft, 'temp_drivers_data', None)
+            if drivers_data:
+                # 用户选择了已有驾驶员时，不再把驾驶员添加到用户资料
+                save_drivers(draft, drivers_data, user,
+                             link_to_profile=not hasattr(draft, 'existing_driver_id'))
+            else:
+                logger.warning("预订 #%s 没有驾驶员信息", draft.pk)
+    except IntegrityError:
+        # 并发请求抢先写入了同一个幂等键
+        existing = Booking.objects.filter(idempotency_key=key).first()
+        if existing is None:
+            raise
+        return existing, False
+
+    return draft, True
@@ -0,0 +1,308 @@
+"""
+预订草稿存储
+
+预订向导 (create_booking -> add_drivers -> add_options -> payment) 在最终确认前
+需要保存一个尚未入库的 Booking 对象。这里提供统一的存储接口和三种后端:
+
+- LocMemDraftStore: 进程内 LRU 存储，带 TTL 和容量上限 (默认，仅适合单进程)
+- CacheDraftStore: 使用 Django 缓存后端 (如 django-redis)，多进程共享
+- DatabaseDraftStore: 使用 bookings_draftbooking 表，多进程共享
+
+通过 settings.BOOKING_DRAFT_STORE 配置:
+
+    BOOKING_DRAFT_STORE = {
+        'BACKEND': 'bookings.drafts.DatabaseDraftStore',
+        'OPTIONS': {'timeout': 3600},
+    }
+"""
+import logging
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 60 * 60  # 草稿默认保存1小时
+DEFAULT_MAX_ENTRIES = 10000
+
+
+class BaseDraftStore:
+    """
+    草稿存储基类
+
+    子类需要实现 get / set / delete / count 四个方法。
+    存入的对象必须可以被 pickle (未保存的 Booking 实例及其附加属性均可)。
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_entries=DEFAULT_MAX_ENTRIES):
+        self.timeout = int(timeout)
+        self.max_entries = int(max_entries)
+
+    def new_id(self):
+        """生成新的草稿ID"""
+        return str(uuid.uuid4())
+
+    def get(self, draft_id):
+        """获取草稿，不存在或已过期时返回 None"""
+        raise NotImplementedError
+
+    def set(self, draft_id, draft):
+        """保存草稿，并刷新其过期时间"""
+        raise NotImplementedError
+
+    def delete(self, draft_id):
+        """删除草稿"""
+        raise NotImplementedError
+
+    def count(self):
+        """返回当前有效 (未过期) 的草稿数量"""
+        raise NotImplementedError
+
+    def purge_expired(self):
+        """清理过期草稿，返回清理的数量"""
+        return 0
+
+    def add(self, draft):
+        """保存一个新草稿并返回其ID"""
+        draft_id = self.new_id()
+        self.set(draft_id, draft)
+        return draft_id
+
+    # 异步视图使用的版本 (数据库和缓存后端的访问都是同步的)
+
+    async def aget(self, draft_id):
+        return await sync_to_async(self.get)(draft_id)
+
+    async def aadd(self, draft):
+        return await sync_to_async(self.add)(draft)
+
+    async def adelete(self, draft_id):
+        return await sync_to_async(self.delete)(draft_id)
+
+
+class LocMemDraftStore(BaseDraftStore):
+    """
+    进程内 LRU 草稿存储
+
+    超过 max_entries 时淘汰最久未使用的草稿，读取时检查 TTL。
+    多个 worker 之间不共享，仅用于开发和单进程部署。
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_entries=DEFAULT_MAX_ENTRIES):
+        super().__init__(timeout, max_entries)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, draft_id):
+        with self._lock:
+            entry = self._data.get(draft_id)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at <= time.monotonic():
+                del self._data[draft_id]
+                return None
+            self._data.move_to_end(draft_id)
+        # 每次返回独立副本，行为与共享后端保持一致
+        return pickle.loads(payload)
+
+    def set(self, draft_id, draft):
+        payload = pickle.dumps(draft, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._data[draft_id] = (time.monotonic() + self.timeout, payload)
+            self._data.move_to_end(draft_id)
+            while len(self._data) > self.max_entries:
+                evicted_id, _ = self._data.popitem(last=False)
+                logger.info("草稿存储已满，淘汰最久未使用的草稿 %s", evicted_id)
+
+    def delete(self, draft_id):
+        with self._lock:
+            self._data.pop(draft_id, None)
+
+    def count(self):
+        self.purge_expired()
+        with self._lock:
+            return len(self._data)
+
+    def purge_expired(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (expires_at, _) in self._data.items() if expires_at <= now]
+            for key in expired:
+                del self._data[key]
+        return len(expired)
+
+
+class CacheDraftStore(BaseDraftStore):
+    """
+    基于 Django 缓存的草稿存储
+
+    TTL 和淘汰由缓存后端负责。另外维护一个索引键记录各草稿的过期时间，
+    用于统计有效草稿数量 (多进程并发写入时为近似值)。
+    """
+
+    KEY_PREFIX = 'booking_draft:'
+    INDEX_KEY = 'booking_draft_index'
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_entries=DEFAULT_MAX_ENTRIES, cache_alias='default'):
+        super().__init__(timeout, max_entries)
+        self.cache_alias = cache_alias
+
+    @property
+    def cache(self):
+        from django.core.cache import caches
+        return caches[self.cache_alias]
+
+    def _key(self, draft_id):
+        return f"{self.KEY_PREFIX}{draft_id}"
+
+    def _load_index(self):
+        index = self.cache.get(self.INDEX_KEY) or {}
+        now = time.time()
+        return {key: expires_at for key, expires_at in index.items() if expires_at > now}
+
+    def _save_index(self, index):
+        # 超出容量时丢弃最早过期的草稿
+        if len(index) > self.max_entries:
+            overflow = sorted(index, key=index.get)[:len(index) - self.max_entries]
+            self.cache.delete_many([self._key(key) for key in overflow])
+            for key in overflow:
+                del index[key]
+        self.cache.set(self.INDEX_KEY, index, self.timeout)
+
+    def get(self, draft_id):
+        return self.cache.get(self._key(draft_id))
+
+    def set(self, draft_id, draft):
+        self.cache.set(self._key(draft_id), draft, self.timeout)
+        index = self._load_index()
+        index[draft_id] = time.time() + self.timeout
+        self._save_index(index)
+
+    def delete(self, draft_id):
+        self.cache.delete(self._key(draft_id))
+        index = self._load_index()
+        if index.pop(draft_id, None) is not None:
+            self._save_index(index)
+
+    def count(self):
+        return len(self._load_index())
+
+    def purge_expired(self):
+        index = self.cache.get(self.INDEX_KEY) or {}
+        live = self._load_index()
+        if len(live) != len(index):
+            self._save_index(live)
+        return len(index) - len(live)
+
+
+class DatabaseDraftStore(BaseDraftStore):
+    """
+    基于数据库表 (bookings_draftbooking) 的草稿存储
+
+    适合没有共享缓存的多 worker 部署。写入时顺带清理少量过期记录，
+    避免表无限增长；也可以通过 purge_booking_drafts 命令定期清理。
+    新建草稿后有效草稿超过 max_entries 时删除最早过期的草稿。
+    """
+
+    PURGE_BATCH_SIZE = 500
+
+    def _model(self):
+        from .models import DraftBooking
+        return DraftBooking
+
+    def get(self, draft_id):
+        DraftBooking = self._model()
+        draft = DraftBooking.objects.filter(
+            pk=draft_id, expires_at__gt=timezone.now()
+        ).only('payload').first()
+        if draft is None:
+            return None
+        return pickle.loads(bytes(draft.payload))
+
+    def set(self, draft_id, draft):
+        DraftBooking = self._model()
+        user_id = getattr(draft, 'user_id', None)
+        _, created = DraftBooking.objects.update_or_create(
+            pk=draft_id,
+            defaults={
+                'user_id': user_id,
+                'payload': pickle.dumps(draft, pickle.HIGHEST_PROTOCOL),
+                'expires_at': timezone.now() + timedelta(seconds=self.timeout),
+            },
+        )
+        self._purge(self.PURGE_BATCH_SIZE)
+        if created:
+            self._evict_overflow()
+
+    def delete(self, draft_id):
+        self._model().objects.filter(pk=draft_id).delete()
+
+    def count(self):
+        return self._model().objects.filter(expires_at__gt=timezone.now()).count()
+
+    def purge_expired(self):
+        return self._purge()
+
+    def _purge(self, limit=None):
+        DraftBooking = self._model()
+        expired = DraftBooking.objects.filter(expires_at__lte=timezone.now())
+        if limit is not None:
+            ids = list(expired.values_list('pk', flat=True)[:limit])
+            if not ids:
+                return 0
+            expired = DraftBooking.objects.filter(pk__in=ids)
+        deleted, _ = expired.delete()
+        return deleted
+
+    def _evict_overflow(self):
+        DraftBooking = self._model()
+        live = DraftBooking.objects.filter(expires_at__gt=timezone.now())
+        overflow = live.count() - self.max_entries
+        if overflow > 0:
+            ids = list(live.order_by('expires_at').values_list('pk', flat=True)[:overflow])
+            DraftBooking.objects.filter(pk__in=ids).delete()
+            logger.info("草稿存储已满，淘汰最早过期的 %d 个草稿", len(ids))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_draft_store():
+    """
+    根据 settings.BOOKING_DRAFT_STORE 返回草稿存储单例
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = getattr(settings, 'BOOKING_DRAFT_STORE', {})
+                backend = config.get('BACKEND', 'bookings.drafts.LocMemDraftStore')
+                options = config.get('OPTIONS', {})
+                _store = import_string(backend)(**options)
+                logger.info("预订草稿存储后端: %s", backend)
+    return _store
+
+
+def reset_draft_store():
+    """丢弃当前单例，下次调用 get_draft_store 时按配置重新创建 (测试用)"""
+    global _store
+    with _store_lock:
+        _store = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    if setting == 'BOOKING_DRAFT_STORE':
+        reset_draft_store()
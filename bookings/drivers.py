@@ -0,0 +1,74 @@
+"""
+驾驶员信息持久化
+
+预订向导把驾驶员信息以字典形式保存在草稿的 temp_drivers_data 中，
+确认预订时由 save_drivers 一次性写入数据库。无论驾驶员有多少位，
+查询次数都是固定的: 一次 bulk_create，一次主驾驶员标记更新，一次 M2M 关联。
+"""
+import logging
+
+from .models import Driver
+
+logger = logging.getLogger(__name__)
+
+# 草稿中保存的驾驶员字段及缺省值
+DRIVER_FIELDS = {
+    'first_name': '',
+    'last_name': '',
+    'email': '',
+    'date_of_birth': None,
+    'license_number': '',
+    'license_issued_in': '',
+    'license_expiry_date': None,
+    'license_is_lifetime': False,
+    'address': '',
+    'local_address': '',
+    'city': '',
+    'state': '',
+    'postcode': '',
+    'country_of_residence': 'Australia',
+    'phone': '',
+    'mobile': '',
+    'fax': '',
+    'occupation': '',
+    'mailing_list': False,
+    'is_primary': False,
+}
+
+
+def driver_to_data(driver):
+    """把已有的 Driver 转换为草稿中使用的字典"""
+    return {field: getattr(driver, field) for field in DRIVER_FIELDS}
+
+
+def build_driver(driver_data, booking=None):
+    """根据草稿字典创建 (未保存的) Driver"""
+    return Driver(
+        booking=booking,
+        **{field: driver_data.get(field, default) for field, default in DRIVER_FIELDS.items()}
+    )
+
+
+def save_drivers(booking, drivers_data, user=None, link_to_profile=True):
+    """
+    批量保存预订的驾驶员，并关联到用户资料
+
+    如果新驾驶员中有主驾驶员，先取消用户资料中原有的主驾驶员标记。
+    返回保存后的 Driver 列表。
+    """
+    if not drivers_data:
+        return []
+
+    drivers = Driver.objects.bulk_create(
+        [build_driver(driver_data, booking) for driver_data in drivers_data]
+    )
+    logger.info("预订 #%s 保存了 %s 位驾驶员", booking.pk, len(drivers))
+
+    if link_to_profile and user is not None and user.is_authenticated:
+        profile = user.profile
+        if any(driver.is_primary for driver in drivers):
+            profile.drivers.filter(is_primary=True).update(is_primary=False)
+        profile.drivers.add(*drivers)
+        logger.info("已将 %s 位驾驶员添加到用户 %s 的资料", len(drivers), user.username)
+
+    return drivers
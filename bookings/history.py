@@ -0,0 +1,175 @@
+"""
+用户预订历史
+
+企业账户可能有几千条预订，原来的 "我的预订" 页面一次加载全部预订，每行再分别查询车辆、
+车型和取还车地点。这里按 (booking_date, id) 做键集分页 (keyset pagination):
+每页只查询一次，WHERE 条件从上一页最后一行继续，不使用 OFFSET，翻到多深都一样快；
+导出时用 iterator() 分批读取，逐行生成 CSV / JSON，内存占用与预订数量无关。
+
+用法:
+
+    history = BookingHistory(request.user, request.GET)
+    bookings, next_cursor = history.page()
+    rows = history.export_rows()          # 导出用的字典迭代器
+"""
+import base64
+import binascii
+import csv
+import io
+import json
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+
+from .models import Booking
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+EXPORT_CHUNK_SIZE = 500
+
+# 列表和导出只需要这些字段
+FIELDS = (
+    'id', 'booking_date', 'pickup_date', 'return_date', 'status', 'total_cost',
+    'car__id', 'car__model__model_name', 'car__model__make__name',
+    'pickup_location__id', 'pickup_location__name',
+    'dropoff_location__id', 'dropoff_location__name',
+)
+
+EXPORT_COLUMNS = (
+    'id', 'booking_date', 'status', 'pickup_date', 'return_date',
+    'car', 'pickup_location', 'dropoff_location', 'total_cost',
+)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(booking):
+    raw = f"{booking.booking_date.isoformat()}|{booking.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """cursor -> (booking_date, id)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        booking_date, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(booking_date), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def booking_to_dict(booking):
+    car = booking.car
+    make = car.model.make.name if car.model and car.model.make else ''
+    model = car.model.model_name if car.model else ''
+    return {
+        'id': booking.pk,
+        'booking_date': booking.booking_date,
+        'status': booking.status,
+        'pickup_date': booking.pickup_date,
+        'return_date': booking.return_date,
+        'car': f"{make} {model}".strip(),
+        'pickup_location': booking.pickup_location.name,
+        'dropoff_location': booking.dropoff_location.name,
+        'total_cost': booking.total_cost,
+    }
+
+
+class BookingHistory:
+    """
+    解析筛选参数 (status, from, to, cursor, page_size)，返回一页预订或导出全部
+    """
+
+    def __init__(self, user, params):
+        self.user = user
+        status = params.get('status', '')
+        self.status = status if status in dict(Booking.STATUS_CHOICES) else ''
+        # 按取车日期筛选，格式错误的日期忽略
+        self.date_from = _parse_date(params.get('from'))
+        self.date_to = _parse_date(params.get('to'))
+        self.cursor = params.get('cursor', '')
+        try:
+            self.page_size = min(max(int(params.get('page_size', PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        except ValueError:
+            self.page_size = PAGE_SIZE
+
+    def queryset(self):
+        bookings = Booking.objects.filter(user=self.user)
+        if self.status:
+            bookings = bookings.filter(status=self.status)
+        if self.date_from:
+            bookings = bookings.filter(pickup_date__gte=self.date_from)
+        if self.date_to:
+            bookings = bookings.filter(pickup_date__lte=self.date_to)
+        return bookings.select_related(
+            'car__model__make', 'pickup_location', 'dropoff_location',
+        ).only(*FIELDS).order_by('-booking_date', '-id')
+
+    def page(self):
+        """
+        返回 (预订列表, 下一页 cursor)，没有下一页时 cursor 为 None
+
+        多取一行判断是否还有下一页，不需要 COUNT 查询。
+        """
+        bookings = self.queryset()
+        if self.cursor:
+            booking_date, pk = decode_cursor(self.cursor)
+            bookings = bookings.filter(
+                Q(booking_date__lt=booking_date) | Q(booking_date=booking_date, id__lt=pk)
+            )
+        rows = list(bookings[:self.page_size + 1])
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            return rows, encode_cursor(rows[-1])
+        return rows, None
+
+    def filter_params(self):
+        """当前筛选条件 (不含 cursor)，用于翻页和导出链接"""
+        params = {}
+        if self.status:
+            params['status'] = self.status
+        if self.date_from:
+            params['from'] = self.date_from.isoformat()
+        if self.date_to:
+            params['to'] = self.date_to.isoformat()
+        return params
+
+    def export_rows(self):
+        # 流式响应在视图返回后才读取，这里先选好数据库，视图的 @use_replica 才对导出生效
+        queryset = self.queryset()
+        queryset = queryset.using(queryset.db)
+        return (booking_to_dict(booking) for booking in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE))
+
+
+def _parse_date(value):
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
+def stream_csv(rows):
+    """逐行生成 CSV"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_json(rows):
+    """逐行生成 JSON 数组"""
+    yield '['
+    separator = ''
+    for row in rows:
+        yield separator + json.dumps(row, cls=DjangoJSONEncoder)
+        separator = ','
+    yield ']'
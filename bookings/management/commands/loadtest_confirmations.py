@@ -0,0 +1,104 @@
+"""
+并发确认压力测试
+
+模拟大量用户同时确认同一辆车同一时段的预订 (每个草稿提交两次，模拟重复提交和
+Stripe 回调重试)，检查最终每辆车在该时段只有一条有效预订。
+
+应在 PostgreSQL 上运行; SQLite 不支持行锁，只能依靠数据库级写锁串行化。
+"""
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection
+from django.utils import timezone
+
+from bookings.confirmation import BookingConflict, confirm_draft, overlapping_bookings
+from bookings.models import Booking
+from cars.models import Car
+from locations.models import Location
+
+
+class Command(BaseCommand):
+    help = '并发确认预订压力测试，检查是否出现重复预订'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=200, help='并发确认请求数量')
+        parser.add_argument('--cars', type=int, default=1, help='参与测试的车辆数量')
+        parser.add_argument('--days-ahead', type=int, default=365, help='测试预订距今天数，避免与真实预订冲突')
+        parser.add_argument('--retries', type=int, default=10, help='数据库锁超时时的重试次数')
+        parser.add_argument('--keep', action='store_true', help='保留测试产生的预订')
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        cars = list(Car.objects.filter(is_available=True).order_by('id')[:options['cars']])
+        location = Location.objects.order_by('id').first()
+        if not cars or location is None:
+            raise CommandError('需要至少一辆可用车辆和一个取车地点')
+
+        user, _ = User.objects.get_or_create(username='loadtest_confirmations')
+        pickup_date = timezone.now().date() + timedelta(days=options['days_ahead'])
+        return_date = pickup_date + timedelta(days=3)
+
+        # 每个草稿提交两次
+        draft_ids = [str(uuid.uuid4()) for _ in range((concurrency + 1) // 2)]
+        requests = [
+            (draft_ids[i // 2], cars[(i // 2) % len(cars)].pk)
+            for i in range(concurrency)
+        ]
+        barrier = threading.Barrier(concurrency)
+
+        def submit(draft_id, car_id):
+            draft = Booking(
+                user=user, car_id=car_id,
+                pickup_location=location, dropoff_location=location,
+                pickup_date=pickup_date, return_date=return_date,
+                total_cost=0, driver_age=30,
+            )
+            barrier.wait()
+            try:
+                for attempt in range(options['retries'] + 1):
+                    try:
+                        booking, created = confirm_draft(draft_id, draft, user)
+                        return ('created' if created else 'replayed'), booking.pk
+                    except BookingConflict:
+                        return 'conflict', None
+                    except OperationalError:
+                        # 锁等待超时或死锁，退避后重试
+                        draft.pk = None
+                        time.sleep(random.uniform(0, 0.05) * (attempt + 1))
+                return 'error', None
+            finally:
+                close_old_connections()
+                connection.close()
+
+        self.stdout.write(f"数据库: {connection.vendor}，并发请求: {concurrency}，车辆: {len(cars)}")
+        started = timezone.now()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(lambda args: submit(*args), requests))
+        elapsed = (timezone.now() - started).total_seconds()
+
+        outcomes = Counter(outcome for outcome, _ in results)
+        self.stdout.write(f"耗时: {elapsed:.2f}s")
+        for outcome in ('created', 'replayed', 'conflict', 'error'):
+            self.stdout.write(f"  {outcome}: {outcomes.get(outcome, 0)}")
+
+        double_booked = []
+        for car in cars:
+            active = overlapping_bookings(car.pk, pickup_date, return_date).count()
+            self.stdout.write(f"车辆 #{car.pk} 有效预订数: {active}")
+            if active > 1:
+                double_booked.append(car.pk)
+
+        if not options['keep']:
+            Booking.objects.filter(user=user, pickup_date=pickup_date).delete()
+
+        if double_booked:
+            raise CommandError(f"出现重复预订: 车辆 {double_booked}")
+        self.stdout.write(self.style.SUCCESS('没有出现重复预订'))
@@ -0,0 +1,32 @@
+"""
+处理待处理的 Stripe webhook 事件
+
+webhook 事件通常在收到后由后台线程立即处理。进程重启、数据库暂时不可用等情况下
+遗留的事件用这个命令处理，可以定时执行或常驻运行:
+
+    python manage.py process_stripe_events
+    python manage.py process_stripe_events --interval 10
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings.payments import process_pending_events
+
+
+class Command(BaseCommand):
+    help = '处理待处理的Stripe webhook事件并确认预订'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=100, help='每轮最多处理的事件数')
+        parser.add_argument('--interval', type=int, default=0, help='循环执行的间隔秒数，0 表示只执行一次')
+
+    def handle(self, *args, **options):
+        while True:
+            count = process_pending_events(limit=options['limit'])
+            if count:
+                self.stdout.write(f"处理了 {count} 个Stripe事件")
+            if not options['interval']:
+                break
+            if count < options['limit']:
+                time.sleep(options['interval'])
@@ -0,0 +1,27 @@
+"""
+清理过期的预订草稿
+"""
+from django.core.management.base import BaseCommand
+
+from bookings.drafts import get_draft_store
+
+
+class Command(BaseCommand):
+    help = '清理过期的预订草稿，并显示当前有效草稿数量'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count-only',
+            action='store_true',
+            help='只显示有效草稿数量，不执行清理'
+        )
+
+    def handle(self, *args, **options):
+        store = get_draft_store()
+        self.stdout.write(f"草稿存储后端: {type(store).__name__}")
+
+        if not options['count_only']:
+            purged = store.purge_expired()
+            self.stdout.write(self.style.SUCCESS(f"已清理过期草稿: {purged}"))
+
+        self.stdout.write(f"有效草稿数量: {store.count()}")
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:46
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+# 原来硬编码在 Booking.options_cost 和 add_options 视图中的价格
+OPTIONS = [
+    ('damage_waiver', 'Damage Waiver', 'Reduce your excess in case of damage to the vehicle', Decimal('14.00'), None, False, 'fas fa-shield-alt'),
+    ('extended_area', 'Extended Area', 'Travel beyond the standard metropolitan area', None, Decimal('150.00'), False, 'fas fa-route'),
+    ('satellite_navigation', 'GPS Navigation', 'Satellite navigation unit', Decimal('5.00'), None, False, 'fas fa-map-marked-alt'),
+    ('child_seats', 'Child Seats', 'Child or booster seat, per seat', Decimal('8.00'), None, True, 'fas fa-baby'),
+    ('additional_drivers', 'Additional Drivers', 'Each additional driver', Decimal('5.00'), None, True, 'fas fa-user-plus'),
+]
+
+
+def seed_options(apps, schema_editor):
+    BookingOption = apps.get_model('bookings', 'BookingOption')
+    for code, name, description, daily_rate, flat_fee, is_quantity_option, icon_class in OPTIONS:
+        # 已有同名选项时补上 code，保留管理员设置的价格
+        option = BookingOption.objects.filter(code__isnull=True, name=name).first()
+        if option is not None:
+            option.code = code
+            option.save(update_fields=['code'])
+        elif not BookingOption.objects.filter(code=code).exists():
+            BookingOption.objects.create(
+                code=code, name=name, description=description, daily_rate=daily_rate,
+                flat_fee=flat_fee, is_quantity_option=is_quantity_option, icon_class=icon_class,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_booking_booking_user_history_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookingoption',
+            name='code',
+            field=models.CharField(blank=True, max_length=50, null=True, unique=True),
+        ),
+        migrations.RunPython(seed_options, migrations.RunPython.noop),
+    ]
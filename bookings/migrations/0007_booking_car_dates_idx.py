@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_stripeevent'),
+        ('cars', '0004_vehiclecategory_indexes'),
+        ('locations', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['car', 'pickup_date', 'return_date'], name='booking_car_dates_idx'),
+        ),
+    ]
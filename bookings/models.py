@@ -9,6 +9,8 @@ class BookingOption(models.Model):
     Additional options for car rentals
     """
     name = models.CharField(max_length=100)
+    # 对应 Booking 上的选项字段 (damage_waiver, child_seats 等)，由 bookings.pricing 读取
+    code = models.CharField(max_length=50, unique=True, null=True, blank=True)
     description = models.TextField()
     daily_rate = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
     flat_fee = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
@@ -48,7 +50,10 @@ class Booking(models.Model):
     satellite_navigation = models.BooleanField(default=False)
     child_seats = models.PositiveIntegerField(default=0)
     additional_drivers = models.PositiveIntegerField(default=0)
-    
+
+    # 幂等键，由预订草稿ID生成，防止重复提交或支付回调重试产生重复预订
+    idempotency_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+
     def __str__(self):
         return f"{self.user.username}'s booking of {self.car} from {self.pickup_date} to {self.return_date}"
     
@@ -60,30 +65,18 @@ class Booking(models.Model):
     @property
     def options_cost(self):
         """Calculate the cost of added options"""
-        cost = 0
-        days = self.duration_days
-        
-        # Add costs for each option
-        if self.damage_waiver:
-            cost += 14 * days  # $14 per day
-        
-        if self.extended_area:
-            cost += 150  # $150 flat fee
-            
-        if self.satellite_navigation:
-            cost += 5 * days  # $5 per day
-            
-        if self.child_seats > 0:
-            cost += 8 * days * self.child_seats  # $8 per day per seat
-            
-        if self.additional_drivers > 0:
-            cost += 5 * days * self.additional_drivers  # $5 per day per driver
-            
-        return cost
+        from .pricing import options_cost
+        return options_cost(self)
 
     class Meta:
         db_table = 'bookings_booking'
         ordering = ['-booking_date']
+        indexes = [
+            # 用户预订历史的键集分页 (bookings.history)
+            models.Index(fields=['user', '-booking_date', '-id'], name='booking_user_history_idx'),
+            # 确认预订时检查同一车辆的重叠预订 (bookings.confirmation.overlapping_bookings)
+            models.Index(fields=['car', 'pickup_date', 'return_date'], name='booking_car_dates_idx'),
+        ]
 
 
 class Driver(models.Model):
@@ -147,3 +140,56 @@ class Driver(models.Model):
     def get_full_name(self):
         """返回驾驶员全名"""
         return f"{self.first_name} {self.last_name}"
+
+
+class DraftBooking(models.Model):
+    """
+    预订向导中尚未确认的草稿 (DatabaseDraftStore 使用)
+    """
+    id = models.CharField(primary_key=True, max_length=36)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='draft_bookings')
+    payload = models.BinaryField()
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'bookings_draftbooking'
+        verbose_name = _("Draft Booking")
+        verbose_name_plural = _("Draft Bookings")
+
+    def __str__(self):
+        return f"Draft {self.id} (expires {self.expires_at})"
+
+
+class StripeEvent(models.Model):
+    """
+    收到的 Stripe webhook 事件 (bookings.payments)
+
+    event_id 唯一，Stripe 重发的事件只保存和处理一次。
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('ignored', 'Ignored'),
+        ('failed', 'Failed'),
+    ]
+
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    booking = models.ForeignKey(Booking, on_delete=models.SET_NULL, null=True, blank=True, related_name='stripe_events')
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'bookings_stripeevent'
+        ordering = ['-received_at']
+        verbose_name = _("Stripe Event")
+        verbose_name_plural = _("Stripe Events")
+
+    def __str__(self):
+        return f"{self.type} {self.event_id} ({self.status})"
@@ -0,0 +1,361 @@
+"""
+Stripe 支付
+
+- Stripe 客户端在第一次使用时创建，导入模块和启动进程时不访问网络。所有请求共用同一个
+  StripeClient 和 HTTP 连接池，设置超时和网络重试次数
+- 没有配置 STRIPE_SECRET_KEY 时使用 MockStripe (开发和测试环境)
+- 异步视图使用 acreate_checkout_session / acreate_payment_intent: 安装了 httpx 时客户端使用
+  stripe.HTTPXClient，在事件循环中直接等待 Stripe 响应; 否则在线程池中调用同步接口，
+  同样不会阻塞事件循环
+- 支付结果以 Stripe webhook 为准: /bookings/stripe/webhook/ 校验签名后把事件写入 StripeEvent 表
+  立即返回，由后台线程 (或 python manage.py process_stripe_events) 确认预订。
+  同一事件 (event id) 只会写入和处理一次，Stripe 重发事件不会产生重复操作
+
+配置:
+
+    STRIPE_SECRET_KEY = '...'
+    STRIPE_WEBHOOK_SECRET = 'whsec_...'
+    STRIPE_PAYMENTS = {
+        'API_BASE': '',                 # 为空时使用 Stripe 官方地址，测试时指向 FakeStripeServer
+        'TIMEOUT': 10,
+        'MAX_NETWORK_RETRIES': 2,
+        'PROCESS_IN_BACKGROUND': True,  # webhook 入库后在后台线程中立即处理
+    }
+"""
+import json
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .confirmation import BookingConflict, confirm_draft, find_confirmed_booking
+from .drafts import get_draft_store
+from .models import StripeEvent
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'API_BASE': '',
+    'CURRENCY': 'usd',
+    'TIMEOUT': 10,
+    'MAX_NETWORK_RETRIES': 2,
+    # webhook 时间戳允许的误差 (秒)
+    'WEBHOOK_TOLERANCE': 300,
+    'PROCESS_IN_BACKGROUND': True,
+    # 事件处理出错的次数达到上限后标记为 failed，需要人工处理
+    'MAX_ATTEMPTS': 5,
+}
+
+# 确认预订的事件类型
+CONFIRMING_EVENTS = (
+    'checkout.session.completed',
+    'checkout.session.async_payment_succeeded',
+    'payment_intent.succeeded',
+)
+
+
+class PaymentError(Exception):
+    """支付事件无法处理 (预订草稿已过期、车辆已被占用等)"""
+
+
+class WebhookError(ValueError):
+    """webhook 签名或内容无效"""
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'STRIPE_PAYMENTS', {}))
+    return config
+
+
+def is_enabled():
+    """是否配置了 Stripe 密钥 (否则使用 MockStripe)"""
+    return bool(getattr(settings, 'STRIPE_SECRET_KEY', None))
+
+
+class MockStripeObject(dict):
+    """模拟的 Stripe 对象，同时支持 obj['id'] 和 obj.id"""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class MockStripe:
+    """
+    没有配置 Stripe 密钥时使用的模拟实现，创建的对象保存在内存中
+    """
+    _objects = {}
+
+    class PaymentIntent:
+        @staticmethod
+        def create(**kwargs):
+            intent_id = f"pi_{uuid.uuid4().hex}"
+            intent = MockStripeObject(
+                id=intent_id,
+                object='payment_intent',
+                client_secret=f"{intent_id}_secret_{uuid.uuid4().hex}",
+                amount=kwargs.get('amount', 0),
+                currency=kwargs.get('currency', 'usd'),
+                metadata=kwargs.get('metadata', {}),
+                status='requires_payment_method',
+            )
+            MockStripe._objects[intent_id] = intent
+            logger.info(f"创建模拟 PaymentIntent: id={intent_id}, amount={intent.amount}")
+            return intent
+
+        @staticmethod
+        def retrieve(intent_id):
+            return MockStripe._objects.get(intent_id) or MockStripeObject(
+                id=intent_id, object='payment_intent', status='succeeded', amount=0, currency='usd', metadata={},
+            )
+
+    class checkout:
+        class Session:
+            @staticmethod
+            def create(**kwargs):
+                session_id = f"cs_{uuid.uuid4().hex}"
+                # 模拟支付直接成功: url 指向 success_url
+                session = MockStripeObject(
+                    id=session_id,
+                    object='checkout.session',
+                    url=kwargs.get('success_url', '').replace('{CHECKOUT_SESSION_ID}', session_id),
+                    mode=kwargs.get('mode', 'payment'),
+                    metadata=kwargs.get('metadata', {}),
+                    payment_status='paid',
+                    status='complete',
+                )
+                MockStripe._objects[session_id] = session
+                logger.info(f"创建模拟 Checkout Session: id={session_id}, metadata={session.metadata}")
+                return session
+
+            @staticmethod
+            def retrieve(session_id):
+                return MockStripe._objects.get(session_id) or MockStripeObject(
+                    id=session_id, object='checkout.session', payment_status='paid', status='complete', metadata={},
+                )
+
+
+_client = None
+_client_is_async = False
+_client_lock = threading.Lock()
+
+
+def _http_client(timeout):
+    """优先使用 httpx (同时支持同步和异步请求)，没有安装时使用 requests"""
+    import stripe
+
+    try:
+        import httpx  # noqa: F401
+    except ImportError:
+        return stripe.RequestsClient(timeout=timeout)
+    # 同步视图和后台任务也使用这个客户端，需要开启同步请求 (默认只允许异步)
+    return stripe.HTTPXClient(timeout=timeout, allow_sync_methods=True)
+
+
+def get_client():
+    """
+    返回共享的 StripeClient (首次调用时创建)，没有配置密钥时返回 None
+    """
+    global _client, _client_is_async
+    if _client is None and is_enabled():
+        with _client_lock:
+            if _client is None:
+                import stripe
+
+                config = get_config()
+                http_client = _http_client(config['TIMEOUT'])
+                options = {}
+                if config['API_BASE']:
+                    options['base_addresses'] = {'api': config['API_BASE']}
+                _client = stripe.StripeClient(
+                    settings.STRIPE_SECRET_KEY,
+                    http_client=http_client,
+                    max_network_retries=config['MAX_NETWORK_RETRIES'],
+                    **options,
+                )
+                _client_is_async = isinstance(http_client, stripe.HTTPXClient)
+                logger.info("Stripe 客户端已创建")
+    return _client
+
+
+def reset_client():
+    """丢弃共享的客户端，下次使用时按当前配置重新创建 (测试用)"""
+    global _client
+    with _client_lock:
+        _client = None
+
+
+def create_checkout_session(params, idempotency_key=None):
+    """创建 Stripe Checkout 会话，同一幂等键重复调用返回同一个会话"""
+    client = get_client()
+    if client is None:
+        return MockStripe.checkout.Session.create(**params)
+    return client.v1.checkout.sessions.create(params, {'idempotency_key': idempotency_key} if idempotency_key else None)
+
+
+def create_payment_intent(params, idempotency_key=None):
+    """创建 PaymentIntent，同一幂等键重复调用返回同一个支付意图"""
+    client = get_client()
+    if client is None:
+        return MockStripe.PaymentIntent.create(**params)
+    return client.v1.payment_intents.create(params, {'idempotency_key': idempotency_key} if idempotency_key else None)
+
+
+def supports_async():
+    """共享客户端能否在事件循环中直接发送请求 (使用 httpx 时)"""
+    return get_client() is not None and _client_is_async
+
+
+async def acreate_checkout_session(params, idempotency_key=None):
+    """create_checkout_session 的异步版本"""
+    if supports_async():
+        return await get_client().v1.checkout.sessions.create_async(
+            params, {'idempotency_key': idempotency_key} if idempotency_key else None,
+        )
+    # 不占用处理数据库访问的线程，多个请求的 Stripe 调用可以同时进行
+    return await sync_to_async(create_checkout_session, thread_sensitive=False)(params, idempotency_key)
+
+
+async def acreate_payment_intent(params, idempotency_key=None):
+    """create_payment_intent 的异步版本"""
+    if supports_async():
+        return await get_client().v1.payment_intents.create_async(
+            params, {'idempotency_key': idempotency_key} if idempotency_key else None,
+        )
+    return await sync_to_async(create_payment_intent, thread_sensitive=False)(params, idempotency_key)
+
+
+# ---- webhook ----
+
+def verify_event(payload, signature):
+    """
+    校验 webhook 签名 (本地计算，不访问网络)，返回事件字典
+    """
+    import stripe
+
+    secret = getattr(settings, 'STRIPE_WEBHOOK_SECRET', None)
+    if not secret:
+        raise WebhookError("STRIPE_WEBHOOK_SECRET is not configured")
+    try:
+        stripe.Webhook.construct_event(payload, signature, secret, tolerance=get_config()['WEBHOOK_TOLERANCE'])
+        event = json.loads(payload)
+    except (stripe.SignatureVerificationError, ValueError) as e:
+        raise WebhookError(str(e))
+    if not isinstance(event, dict) or not event.get('id') or not event.get('type'):
+        raise WebhookError("Malformed event")
+    return event
+
+
+def record_event(event):
+    """
+    写入事件，返回 (StripeEvent, created)，已收到过的事件 created 为 False
+    """
+    return StripeEvent.objects.get_or_create(
+        event_id=event['id'],
+        defaults={'type': event['type'], 'payload': event},
+    )
+
+
+def confirm_payment(metadata):
+    """
+    根据支付对象的 metadata (temp_booking_id, user_id) 确认预订，返回 Booking
+    """
+    draft_id = (metadata or {}).get('temp_booking_id')
+    if not draft_id:
+        raise PaymentError("Payment has no temp_booking_id metadata")
+    booking = find_confirmed_booking(draft_id)
+    if booking is not None:
+        return booking
+
+    draft = get_draft_store().get(draft_id)
+    if draft is None:
+        raise PaymentError(f"Booking draft {draft_id} has expired")
+    user = User.objects.filter(pk=metadata.get('user_id') or draft.user_id).first()
+    try:
+        booking, _ = confirm_draft(draft_id, draft, user)
+    except BookingConflict as e:
+        # 已付款但车辆被占用，需要人工退款或换车
+        raise PaymentError(str(e))
+    get_draft_store().delete(draft_id)
+    return booking
+
+
+def handle_event(event):
+    """处理一个事件，返回确认的 Booking 或 None (不需要处理的事件)"""
+    obj = event.get('data', {}).get('object', {})
+    if event['type'] not in CONFIRMING_EVENTS:
+        return None
+    if event['type'] == 'checkout.session.completed' and obj.get('payment_status') != 'paid':
+        # 异步支付方式 (银行转账等) 完成后会另外发送 async_payment_succeeded
+        return None
+    return confirm_payment(obj.get('metadata'))
+
+
+def process_event(event_pk):
+    """
+    处理一条已入库的事件，已处理过的事件直接返回
+
+    事件行在处理期间被锁住，多个工作进程不会重复处理同一事件。
+    """
+    max_attempts = get_config()['MAX_ATTEMPTS']
+    with transaction.atomic():
+        record = StripeEvent.objects.select_for_update().filter(pk=event_pk, status='pending').first()
+        if record is None:
+            return None
+        record.attempts += 1
+        try:
+            with transaction.atomic():
+                booking = handle_event(record.payload)
+        except PaymentError as e:
+            logger.error("Stripe 事件 %s (%s) 无法处理: %s", record.event_id, record.type, e)
+            record.status, record.error = 'failed', str(e)
+        except Exception as e:
+            logger.exception("处理 Stripe 事件 %s 失败", record.event_id)
+            record.error = str(e)
+            if record.attempts >= max_attempts:
+                record.status = 'failed'
+        else:
+            record.status = 'processed' if booking is not None else 'ignored'
+            record.booking = booking
+            record.error = ''
+        if record.status != 'pending':
+            record.processed_at = timezone.now()
+        record.save()
+    return record
+
+
+def process_pending_events(limit=100):
+    """处理待处理的事件 (重启后遗留或后台线程失败的)，返回处理的数量"""
+    ids = list(StripeEvent.objects.filter(status='pending').order_by('id').values_list('id', flat=True)[:limit])
+    for event_pk in ids:
+        process_event(event_pk)
+    return len(ids)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _process_in_thread(event_pk):
+    try:
+        process_event(event_pk)
+    finally:
+        close_old_connections()
+
+
+def process_in_background(event_pk):
+    """在后台线程中处理事件，webhook 响应不等待预订确认"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stripe-events')
+    _executor.submit(_process_in_thread, event_pk)
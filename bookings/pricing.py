@@ -0,0 +1,352 @@
+"""
+预订报价引擎
+
+所有价格都从这里计算，不再在视图、模型和模板中各自硬编码:
+
+- 车型日租金: VehicleCategory.daily_rate
+- 附加选项: BookingOption (按 code 对应 Booking 上的选项字段)，表中没有的选项使用 DEFAULT_OPTIONS
+- 税费: 取车网点所在州的 StateProvince.state_tax_rate 和所属国家的 Country.sales_tax_rate (百分比)
+
+这些数据编译为当前进程的内存费率表，保存或删除后由 bookings.signals 递增缓存中的版本号，
+各进程在下次报价时重新加载。相同 (车型, 日期, 选项, 州) 的报价会被缓存，
+预订流程中的多个页面不会重复计算。
+
+金额全部使用 Decimal，每一行按分四舍五入，合计等于各行之和。
+
+用法:
+
+    from bookings.pricing import quote, quote_for_booking
+    q = quote(category_id, pickup_date, return_date, {'damage_waiver': True, 'child_seats': 2}, state_code='NSW')
+    q.total, q.lines, q.taxes
+"""
+import logging
+import threading
+from collections import OrderedDict
+from decimal import ROUND_HALF_UP, Decimal
+from typing import NamedTuple
+
+from rush_car_rental.utils.versioned_index import IndexSingleton, VersionedIndex
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'pricing_rate_table_version'
+# 每个进程最多缓存的报价数量
+MAX_MEMOISED_QUOTES = 1024
+# 批量报价一次最多计算的组合数
+MAX_BATCH_QUOTES = 20000
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+
+class OptionRate(NamedTuple):
+    code: str
+    name: str
+    daily_rate: Decimal
+    flat_fee: Decimal
+    # 按数量计价 (儿童座椅、附加驾驶员)，否则为开/关
+    per_unit: bool
+
+
+# Booking 上的选项字段 -> 默认价格，BookingOption 表中有对应 code 时以表为准
+DEFAULT_OPTIONS = {
+    'damage_waiver': OptionRate('damage_waiver', 'Damage Waiver', Decimal('14.00'), ZERO, False),
+    'extended_area': OptionRate('extended_area', 'Extended Area', ZERO, Decimal('150.00'), False),
+    'satellite_navigation': OptionRate('satellite_navigation', 'GPS Navigation', Decimal('5.00'), ZERO, False),
+    'child_seats': OptionRate('child_seats', 'Child Seats', Decimal('8.00'), ZERO, True),
+    'additional_drivers': OptionRate('additional_drivers', 'Additional Drivers', Decimal('5.00'), ZERO, True),
+}
+OPTION_CODES = tuple(DEFAULT_OPTIONS)
+
+
+class PricingError(ValueError):
+    pass
+
+
+class QuoteLine(NamedTuple):
+    code: str
+    label: str
+    unit_price: Decimal
+    quantity: int
+    amount: Decimal
+
+    def as_dict(self):
+        return self._asdict()
+
+
+class Quote(NamedTuple):
+    category_id: int
+    days: int
+    daily_rate: Decimal
+    # 租金和选项
+    lines: tuple
+    subtotal: Decimal
+    taxes: tuple
+    total: Decimal
+
+    @property
+    def base_cost(self):
+        return self.lines[0].amount
+
+    @property
+    def options_cost(self):
+        return sum((line.amount for line in self.lines[1:]), ZERO)
+
+    @property
+    def option_lines(self):
+        return self.lines[1:]
+
+    @property
+    def tax_total(self):
+        return sum((line.amount for line in self.taxes), ZERO)
+
+    def as_dict(self):
+        return {
+            'category_id': self.category_id,
+            'days': self.days,
+            'daily_rate': self.daily_rate,
+            'lines': [line.as_dict() for line in self.lines],
+            'subtotal': self.subtotal,
+            'taxes': [line.as_dict() for line in self.taxes],
+            'total': self.total,
+        }
+
+
+def rental_days(pickup_date, return_date):
+    """计费天数，同一天取还车按一天计"""
+    return max((return_date - pickup_date).days, 1)
+
+
+def _money(value):
+    return Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def normalize_options(options):
+    """
+    {code: bool 或数量} -> 排好序的 ((code, 数量), ...)，去掉未选择的选项
+
+    开/关类选项的数量只能是 0 或 1。
+    """
+    normalized = []
+    for code, value in (options or {}).items():
+        rate = DEFAULT_OPTIONS.get(code)
+        if rate is None:
+            raise PricingError(f"Unknown booking option: {code}")
+        try:
+            quantity = int(value or 0)
+        except (TypeError, ValueError):
+            raise PricingError(f"Invalid quantity for {code}: {value}")
+        if quantity < 0:
+            raise PricingError(f"Invalid quantity for {code}: {value}")
+        if not rate.per_unit:
+            quantity = min(quantity, 1)
+        if quantity:
+            normalized.append((code, quantity))
+    return tuple(sorted(normalized))
+
+
+class RateTable(VersionedIndex):
+    """
+    编译后的费率表和报价缓存
+    """
+
+    version_cache_key = VERSION_CACHE_KEY
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        # 车型 id -> 日租金
+        self.categories = {}
+        self.options = dict(DEFAULT_OPTIONS)
+        # 州代码 (大写) -> ((税名, 税率), ...)
+        self.taxes = {}
+        self._quotes = OrderedDict()
+
+    def build(self, categories, options, states):
+        """
+        categories: 可迭代的 (id, daily_rate)
+        options: 可迭代的 (code, name, daily_rate, flat_fee, is_quantity_option)
+        states: 可迭代的 (state_code, state_tax_name, state_tax_rate, country_tax_name, country_tax_rate)
+        """
+        category_rates = {id: _money(rate or 0) for id, rate in categories}
+        option_rates = dict(DEFAULT_OPTIONS)
+        for code, name, daily_rate, flat_fee, per_unit in options:
+            if code in option_rates:
+                option_rates[code] = OptionRate(code, name, _money(daily_rate or 0), _money(flat_fee or 0), per_unit)
+        taxes = {}
+        for code, state_tax_name, state_rate, country_tax_name, country_rate in states:
+            code = (code or '').strip().upper()
+            # 同一代码出现在多个国家时取第一个
+            if not code or code in taxes:
+                continue
+            taxes[code] = tuple(
+                (name or default_name, Decimal(rate))
+                for name, rate, default_name in (
+                    (country_tax_name, country_rate, 'Sales Tax'),
+                    (state_tax_name, state_rate, 'State Tax'),
+                )
+                if rate
+            )
+        with self._lock:
+            self.categories, self.options, self.taxes = category_rates, option_rates, taxes
+            self._quotes = OrderedDict()
+            self.built = True
+        logger.info("报价费率表已构建: %d 个车型, %d 个选项, %d 个州", len(category_rates), len(option_rates), len(taxes))
+
+    def refresh(self):
+        """从数据库加载车型租金、附加选项和税率"""
+        from cars.models import StateProvince, VehicleCategory
+        from .models import BookingOption
+
+        # load() 在 use_primary() 块中调用，费率变化后不会读到副本上的旧数据
+        self.build(
+            VehicleCategory.objects.values_list('id', 'daily_rate').iterator(),
+            BookingOption.objects.filter(code__isnull=False).values_list(
+                'code', 'name', 'daily_rate', 'flat_fee', 'is_quantity_option'),
+            StateProvince.objects.order_by('-country__is_default', 'id').values_list(
+                'code', 'state_tax_name', 'state_tax_rate', 'country__sales_tax_name', 'country__sales_tax_rate'),
+        )
+
+    # ---- 报价 ----
+
+    def option_lines(self, days, options):
+        """options 为 normalize_options() 的结果"""
+        lines = []
+        for code, quantity in options:
+            rate = self.options[code]
+            if rate.flat_fee:
+                lines.append(QuoteLine(code, f"{rate.name} (flat fee)", rate.flat_fee, quantity, rate.flat_fee * quantity))
+            if rate.daily_rate:
+                label = f"{rate.name} (${rate.daily_rate} x {days} day(s)"
+                label += f" x {quantity})" if rate.per_unit else ")"
+                lines.append(QuoteLine(code, label, rate.daily_rate, quantity * days, rate.daily_rate * quantity * days))
+        return lines
+
+    def quote(self, category_id, pickup_date, return_date, options=None, state_code=None):
+        options = normalize_options(options)
+        state_code = (state_code or '').strip().upper()
+        key = (category_id, pickup_date, return_date, options, state_code)
+        with self._lock:
+            cached = self._quotes.get(key)
+            if cached is not None:
+                self._quotes.move_to_end(key)
+                return cached
+
+        daily_rate = self.categories.get(category_id)
+        if daily_rate is None:
+            raise PricingError(f"No rate for vehicle category {category_id}")
+        if return_date < pickup_date:
+            raise PricingError(f"Return date {return_date} is before pickup date {pickup_date}")
+        days = rental_days(pickup_date, return_date)
+        lines = [QuoteLine('base', f"Vehicle Rental (${daily_rate} x {days} day(s))", daily_rate, days, daily_rate * days)]
+        lines += self.option_lines(days, options)
+        subtotal = sum((line.amount for line in lines), ZERO)
+        taxes = tuple(
+            QuoteLine('tax', f"{name} ({rate}%)", rate, 1, _money(subtotal * rate / 100))
+            for name, rate in self.taxes.get(state_code, ())
+        )
+        result = Quote(
+            category_id, days, daily_rate, tuple(lines), subtotal, taxes,
+            subtotal + sum((line.amount for line in taxes), ZERO),
+        )
+
+        with self._lock:
+            self._quotes[key] = result
+            if len(self._quotes) > MAX_MEMOISED_QUOTES:
+                self._quotes.popitem(last=False)
+        return result
+
+    def batch_quote(self, category_ids, ranges, options=None, state_code=None):
+        """
+        一次计算多个车型 x 多个日期区间的报价合计，结果与 quote() 逐个计算相同
+
+        按分 (整数) 计算: 每个日期区间的天数和选项费用只算一次，每个车型的日租金只换算一次，
+        每个组合只剩 "日租金 x 天数 + 选项费用" 和税费的整数运算，不创建 QuoteLine。
+
+        返回 [(category_id, pickup_date, return_date, 天数, 小计分, 税费分, 合计分), ...]，
+        按车型、日期区间的输入顺序排列。
+        """
+        options = normalize_options(options)
+        # 税率 (百分比，两位小数) -> 万分之一
+        tax_points = [int(rate * 100) for _, rate in self.taxes.get((state_code or '').strip().upper(), ())]
+
+        rates = []
+        for category_id in category_ids:
+            daily_rate = self.categories.get(category_id)
+            if daily_rate is None:
+                raise PricingError(f"No rate for vehicle category {category_id}")
+            rates.append((category_id, int(daily_rate * 100)))
+
+        columns = []
+        for pickup_date, return_date in ranges:
+            if return_date < pickup_date:
+                raise PricingError(f"Return date {return_date} is before pickup date {pickup_date}")
+            days = rental_days(pickup_date, return_date)
+            extra = sum(int(line.amount * 100) for line in self.option_lines(days, options))
+            columns.append((pickup_date, return_date, days, extra))
+
+        results = []
+        append = results.append
+        for category_id, rate in rates:
+            for pickup_date, return_date, days, extra in columns:
+                subtotal = rate * days + extra
+                # 与 _money() 相同的四舍五入 (金额非负)
+                tax = sum((subtotal * points * 2 + 10000) // 20000 for points in tax_points)
+                append((category_id, pickup_date, return_date, days, subtotal, tax, subtotal + tax))
+        return results
+
+
+_table = IndexSingleton(RateTable)
+
+
+def get_rate_table():
+    """返回当前进程的费率表 (首次调用或版本变化时从数据库加载)"""
+    return _table.get()
+
+
+def quote(category_id, pickup_date, return_date, options=None, state_code=None):
+    """按车型、日期、选项和取车州计算分项报价"""
+    return get_rate_table().quote(category_id, pickup_date, return_date, options, state_code)
+
+
+def booking_options(booking):
+    return {code: getattr(booking, code) for code in OPTION_CODES}
+
+
+def batch_quote(category_ids, ranges, options=None, state_code=None):
+    """多个车型 x 多个日期区间的报价合计 (金额为分)，见 RateTable.batch_quote"""
+    return get_rate_table().batch_quote(category_ids, ranges, options, state_code)
+
+
+def cents(amount):
+    """整数分 -> 两位小数的 Decimal"""
+    return Decimal(amount).scaleb(-2)
+
+
+def quote_for_booking(booking):
+    """按预订 (或预订草稿) 的车辆类别、日期、选项和取车网点报价"""
+    category_id = booking.car.category_id
+    if category_id is None:
+        raise PricingError(f"Car #{booking.car_id} has no vehicle category")
+    state = booking.pickup_location.state
+    return quote(
+        category_id, booking.pickup_date, booking.return_date,
+        booking_options(booking), state.code if state else None,
+    )
+
+
+def options_cost(booking):
+    """只计算选项费用，不需要车辆类别"""
+    table = get_rate_table()
+    days = rental_days(booking.pickup_date, booking.return_date)
+    return sum((line.amount for line in table.option_lines(days, normalize_options(booking_options(booking)))), ZERO)
+
+
+def rates_changed():
+    """车型租金、选项或税率变化后调用，所有进程 (包括当前进程) 在下次报价时重新加载"""
+    _table.changed()
+
+
+def reset_rate_table():
+    """丢弃当前费率表，下次使用时重新加载 (测试用)"""
+    _table.reset()
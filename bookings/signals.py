@@ -0,0 +1,52 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from cars.models import Car, Country, StateProvince, VehicleCategory
+from .models import Booking, BookingOption
+from . import availability, pricing
+
+
+@receiver(post_save, sender=Booking)
+def update_availability_on_booking_save(sender, instance, **kwargs):
+    """
+    Signal handler to keep the availability index in sync when a booking is created, changed or cancelled
+    """
+    # 等事务提交后再更新，回滚的预订不会留在索引中
+    transaction.on_commit(lambda: availability.booking_changed(instance))
+
+
+@receiver(post_delete, sender=Booking)
+def update_availability_on_booking_delete(sender, instance, **kwargs):
+    """
+    Signal handler to release the booked interval when a booking is deleted
+    """
+    booking_id = instance.pk
+    transaction.on_commit(lambda: availability.booking_deleted(booking_id))
+
+
+@receiver(post_save, sender=Car)
+def update_availability_on_car_save(sender, instance, **kwargs):
+    """
+    Signal handler to track car moves and availability flag changes
+    """
+    transaction.on_commit(lambda: availability.car_changed(instance))
+
+
+@receiver(post_delete, sender=Car)
+def update_availability_on_car_delete(sender, instance, **kwargs):
+    """
+    Signal handler to drop a deleted car from the availability index
+    """
+    car_id = instance.pk
+    transaction.on_commit(lambda: availability.car_deleted(car_id))
+
+
+@receiver([post_save, post_delete], sender=BookingOption)
+@receiver([post_save, post_delete], sender=VehicleCategory)
+@receiver([post_save, post_delete], sender=StateProvince)
+@receiver([post_save, post_delete], sender=Country)
+def reload_rates_on_change(sender, **kwargs):
+    """
+    Signal handler to reload the pricing rate table when rates, options or taxes change
+    """
+    transaction.on_commit(pricing.rates_changed)
@@ -0,0 +1,179 @@
+"""
+本地模拟 Stripe API 服务器 (测试和本地联调用)
+
+实现 bookings.payments 用到的接口: 创建/查询 PaymentIntent 和 Checkout Session，
+支持 Idempotency-Key，并能生成带签名的 webhook 事件:
+
+    with FakeStripeServer() as server, override_settings(
+            STRIPE_SECRET_KEY='sk_test_fake', STRIPE_PAYMENTS={'API_BASE': server.url}):
+        reset_client()
+        session = payments.create_checkout_session({...})
+        payload, signature = server.signed_event(server.complete_session(session.id), 'whsec_test')
+"""
+import hashlib
+import hmac
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+RESOURCES = {
+    'payment_intents': ('pi', 'payment_intent'),
+    'checkout/sessions': ('cs_test', 'checkout.session'),
+}
+
+
+def parse_form(body):
+    """Stripe 的表单编码 (metadata[key]=value, line_items[0][quantity]=1) -> 嵌套字典"""
+    result = {}
+    for key, value in parse_qsl(body, keep_blank_values=True):
+        parts = re.findall(r'[^\[\]]+', key)
+        target = result
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return result
+
+
+class FakeStripeServer:
+    """
+    在 127.0.0.1 的随机端口上模拟 Stripe API，记录收到的请求
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.objects = {}
+        self._idempotency = {}
+        self._failures = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def fail_next(self, count=1, status=500):
+        """接下来的 count 个请求返回 status"""
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def create(self, resource, params, idempotency_key=None):
+        prefix, object_name = RESOURCES[resource]
+        with self._lock:
+            if idempotency_key and idempotency_key in self._idempotency:
+                return self.objects[self._idempotency[idempotency_key]]
+            object_id = f"{prefix}_{uuid.uuid4().hex[:24]}"
+            obj = {'id': object_id, 'object': object_name, 'livemode': False, 'metadata': {}, **params}
+            if resource == 'payment_intents':
+                obj['amount'] = int(obj.get('amount', 0))
+                obj.update(client_secret=f"{object_id}_secret_{uuid.uuid4().hex[:12]}", status='requires_payment_method')
+            else:
+                obj.update(url=f"https://checkout.stripe.test/c/pay/{object_id}", status='open', payment_status='unpaid')
+            self.objects[object_id] = obj
+            if idempotency_key:
+                self._idempotency[idempotency_key] = object_id
+            return obj
+
+    def complete_session(self, session_id):
+        """模拟用户完成支付，返回 checkout.session.completed 事件"""
+        session = self.objects[session_id]
+        session.update(status='complete', payment_status='paid')
+        return self.event('checkout.session.completed', session)
+
+    def succeed_intent(self, intent_id):
+        """模拟支付意图付款成功，返回 payment_intent.succeeded 事件"""
+        intent = self.objects[intent_id]
+        intent['status'] = 'succeeded'
+        return self.event('payment_intent.succeeded', intent)
+
+    @staticmethod
+    def event(event_type, obj):
+        return {
+            'id': f"evt_{uuid.uuid4().hex[:24]}",
+            'object': 'event',
+            'type': event_type,
+            'created': int(time.time()),
+            'data': {'object': dict(obj)},
+        }
+
+    @staticmethod
+    def signed_event(event, secret, timestamp=None):
+        """按 Stripe 的方式签名，返回 (请求体, Stripe-Signature 请求头)"""
+        payload = json.dumps(event).encode()
+        timestamp = int(timestamp or time.time())
+        signature = hmac.new(secret.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256).hexdigest()
+        return payload, f"t={timestamp},v1={signature}"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _route(self):
+                path = urlparse(self.path).path
+                for resource in RESOURCES:
+                    prefix = f"/v1/{resource}"
+                    if path == prefix:
+                        return resource, None
+                    if path.startswith(prefix + '/'):
+                        return resource, path[len(prefix) + 1:]
+                return None, None
+
+            def _respond(self, status, data):
+                body = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self, method):
+                raw = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+                params = parse_form(raw)
+                with server._lock:
+                    server.requests.append({
+                        'method': method, 'path': self.path, 'headers': dict(self.headers), 'params': params,
+                    })
+                    failure = server._failures.pop(0) if server._failures else None
+                if failure:
+                    return self._respond(failure, {'error': {'type': 'api_error', 'message': 'Simulated failure'}})
+
+                resource, object_id = self._route()
+                if resource is None:
+                    return self._respond(404, {'error': {'type': 'invalid_request_error', 'message': 'Unknown path'}})
+                if method == 'POST' and object_id is None:
+                    return self._respond(200, server.create(resource, params, self.headers.get('Idempotency-Key')))
+                obj = server.objects.get(object_id)
+                if method == 'GET' and obj is not None:
+                    return self._respond(200, obj)
+                return self._respond(404, {'error': {'type': 'invalid_request_error', 'message': 'No such object'}})
+
+            def do_GET(self):
+                self._handle('GET')
+
+            def do_POST(self):
+                self._handle('POST')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,147 @@
+import asyncio
+from datetime import timedelta
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from bookings import payments
+from bookings.availability import reset_availability_index
+from bookings.drafts import get_draft_store
+from bookings.models import Booking
+from bookings.pricing import reset_rate_table
+from bookings.testing import FakeStripeServer
+from cars.models import (
+    Car, City, Country, Location as Branch, StateProvince, VehicleCategory, VehicleCategoryType
+)
+from cars.tests.utils import UnmanagedTablesMixin
+from locations.models import Location, State
+
+
+class AsyncBookingViewsTest(UnmanagedTablesMixin, TestCase):
+    """
+    测试异步的预订向导视图和支付视图
+    """
+
+    def setUp(self):
+        cache.clear()
+        reset_availability_index()
+        reset_rate_table()
+        self.user = User.objects.create_user(username='async', password='testpassword')
+        self.category = VehicleCategory.objects.create(
+            category_type=VehicleCategoryType.objects.create(category_type='Car'),
+            vehicle_category='Toyota Corolla', daily_rate=Decimal('50.00'),
+        )
+        country = Country.objects.create()
+        nsw = StateProvince.objects.create(country=country, name='New South Wales', code='NSW')
+        branch = Branch.objects.create(
+            location_name='Sydney Airport', code='SYD', address='330 King St',
+            city=City.objects.create(state=nsw, name='Sydney'), state=nsw, country=country,
+        )
+        self.car = Car.objects.create(registration_no='RUSH01', category=self.category, currently_located=branch)
+        self.location = Location.objects.create(
+            name='Sydney Airport', address='Airport Dr', city='Sydney',
+            state=State.objects.create(name='New South Wales', code='NSW'), postal_code='2020',
+        )
+        self.pickup = timezone.now().date() + timedelta(days=10)
+
+    def booking_form(self, **overrides):
+        data = {
+            'pickup_location': self.location.pk,
+            'dropoff_location': self.location.pk,
+            'pickup_date': self.pickup.isoformat(),
+            'return_date': (self.pickup + timedelta(days=2)).isoformat(),
+            'driver_age': 30,
+        }
+        data.update(overrides)
+        return data
+
+    async def test_create_booking_assigns_car_and_stores_draft(self):
+        """
+        测试异步 create_booking 分配空闲车辆并保存预订草稿，地点无效时返回车辆详情页
+        """
+        await self.async_client.aforce_login(self.user)
+        url = reverse('create_booking', args=[self.category.pk])
+
+        response = await self.async_client.post(url, self.booking_form())
+        self.assertEqual(response.status_code, 302)
+        draft_id = response.url.rstrip('/').rsplit('/', 1)[-1]
+        self.assertEqual(response.url, reverse('add_drivers', args=[draft_id]))
+        draft = await get_draft_store().aget(draft_id)
+        self.assertEqual((draft.car_id, draft.user_id), (self.car.pk, self.user.pk))
+        self.assertEqual(draft.total_cost, Decimal('100.00'))
+
+        invalid = await self.async_client.post(url, self.booking_form(dropoff_location=999))
+        self.assertEqual(invalid.url, reverse('vehicle_detail', args=[self.category.pk]))
+        missing = await self.async_client.post(reverse('create_booking', args=[999]), self.booking_form())
+        self.assertEqual(missing.status_code, 404)
+
+    async def test_create_booking_picks_car_at_pickup_location(self):
+        """
+        测试 create_booking 只分配取车网点的车辆，其他网点有空闲车辆时也不能预订
+        """
+        melbourne = await Location.objects.acreate(
+            name='Melbourne Airport', address='Departure Dr', city='Melbourne',
+            state=await State.objects.acreate(name='Victoria', code='VIC'), postal_code='3045',
+        )
+        await self.async_client.aforce_login(self.user)
+        url = reverse('create_booking', args=[self.category.pk])
+        drafts = await sync_to_async(get_draft_store().count)()
+
+        response = await self.async_client.post(url, self.booking_form(pickup_location=melbourne.pk))
+        self.assertEqual(response.url, reverse('vehicle_detail', args=[self.category.pk]))
+        self.assertEqual(await sync_to_async(get_draft_store().count)(), drafts)
+
+    @override_settings(STRIPE_SECRET_KEY='sk_test_fake')
+    async def test_process_payment_waits_for_webhook_with_stripe(self):
+        """
+        测试启用 Stripe 时表单提交和 GET 请求都不直接确认预订，而是跳转到等待 webhook 的页面
+        """
+        draft_id = await sync_to_async(get_draft_store().add)(Booking(
+            user=self.user, car=self.car, pickup_location=self.location, dropoff_location=self.location,
+            pickup_date=self.pickup, return_date=self.pickup + timedelta(days=2), total_cost=100, driver_age=30,
+        ))
+        await self.async_client.aforce_login(self.user)
+        url = reverse('process_payment', args=[draft_id])
+
+        form = await self.async_client.post(url, 'action=confirm', content_type='application/x-www-form-urlencoded')
+        for response in [form, await self.async_client.get(url)]:
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(response.url, reverse('stripe_success', args=[draft_id]))
+        self.assertEqual(await Booking.objects.acount(), 0)
+        self.assertIsNotNone(await get_draft_store().aget(draft_id))
+
+    async def test_concurrent_checkouts_share_stripe_client(self):
+        """
+        测试多个支付页面请求同时等待 Stripe，每个草稿得到自己的结账会话
+        """
+        with FakeStripeServer() as server, override_settings(
+                STRIPE_SECRET_KEY='sk_test_fake',
+                STRIPE_PAYMENTS={'API_BASE': server.url, 'MAX_NETWORK_RETRIES': 0}):
+            payments.reset_client()
+            self.addCleanup(payments.reset_client)
+            draft_ids = [get_draft_store().add(Booking(
+                user=self.user, car=self.car, pickup_location=self.location, dropoff_location=self.location,
+                pickup_date=self.pickup + timedelta(days=3 * i), return_date=self.pickup + timedelta(days=3 * i + 2),
+                total_cost=100, driver_age=30,
+            )) for i in range(5)]
+
+            await self.async_client.aforce_login(self.user)
+            responses = await asyncio.gather(*[
+                self.async_client.get(reverse('payment', args=[draft_id])) for draft_id in draft_ids
+            ])
+
+            sessions = {obj['client_reference_id']: obj for obj in server.objects.values()}
+            self.assertEqual(set(sessions), set(draft_ids))
+            for draft_id, response in zip(draft_ids, responses):
+                self.assertEqual(response.status_code, 302)
+                self.assertEqual(response.url, sessions[draft_id]['url'])
+
+            # 同一草稿再次进入支付页面复用已有会话
+            again = await self.async_client.get(reverse('payment', args=[draft_ids[0]]))
+            self.assertEqual(again.url, sessions[draft_ids[0]]['url'])
+            self.assertEqual(len(server.objects), 5)
@@ -0,0 +1,132 @@
+from datetime import date, timedelta
+
+from django.test import SimpleTestCase
+
+from bookings.availability import AvailabilityIndex, CarIntervals, booking_interval
+
+
+class CarIntervalsTest(SimpleTestCase):
+    """
+    测试单辆车的预订区间判断
+    """
+
+    def setUp(self):
+        self.day = date(2025, 7, 1)
+        self.intervals = CarIntervals()
+
+    def d(self, offset):
+        return self.day + timedelta(days=offset)
+
+    def test_half_open_intervals(self):
+        """
+        测试还车当天可以被下一个预订使用
+        """
+        self.intervals.add(1, self.d(0), self.d(3))
+
+        self.assertFalse(self.intervals.is_free(self.d(2), self.d(4)))
+        self.assertTrue(self.intervals.is_free(self.d(3), self.d(5)))
+        self.assertTrue(self.intervals.is_free(self.d(-2), self.d(0)))
+
+    def test_long_booking_hidden_behind_short_ones(self):
+        """
+        测试较早开始的长预订在后续短预订之后仍能被检测到
+        """
+        self.intervals.add(1, self.d(0), self.d(30))
+        self.intervals.add(2, self.d(5), self.d(6))
+        self.intervals.add(3, self.d(10), self.d(11))
+
+        self.assertFalse(self.intervals.is_free(self.d(20), self.d(22)))
+        self.assertEqual(self.intervals.conflicts(self.d(20), self.d(22)), [1])
+
+    def test_remove(self):
+        """
+        测试移除预订后区间重新可用
+        """
+        self.intervals.add(1, self.d(0), self.d(30))
+        self.intervals.add(2, self.d(5), self.d(6))
+
+        self.assertTrue(self.intervals.remove(1))
+        self.assertTrue(self.intervals.is_free(self.d(20), self.d(22)))
+        self.assertFalse(self.intervals.remove(1))
+
+    def test_same_day_booking_counts_as_one_day(self):
+        """
+        测试同一天取还车占用一天
+        """
+        self.assertEqual(booking_interval(self.d(0), self.d(0)), (self.d(0), self.d(1)))
+
+
+class AvailabilityIndexTest(SimpleTestCase):
+    """
+    测试车辆可用性索引
+    """
+
+    def setUp(self):
+        self.day = date(2025, 7, 1)
+        self.index = AvailabilityIndex()
+        # (car_id, category_id, location_id)
+        self.index.build(
+            cars=[(1, 10, 100), (2, 10, 100), (3, 20, 100), (4, 10, 200)],
+            bookings=[
+                (1000, 1, self.d(0), self.d(5)),
+                (1001, 3, self.d(2), self.d(4)),
+            ],
+        )
+
+    def d(self, offset):
+        return self.day + timedelta(days=offset)
+
+    def test_free_cars(self):
+        """
+        测试按时间段、地点和类别查询可租车辆
+        """
+        self.assertEqual(self.index.free_cars(self.d(1), self.d(3)), {2, 4})
+        self.assertEqual(self.index.free_cars(self.d(1), self.d(3), location_id=100), {2})
+        self.assertEqual(self.index.free_cars(self.d(6), self.d(8), category_id=10), {1, 2, 4})
+
+    def test_free_counts_by_category(self):
+        """
+        测试按类别统计可租数量
+        """
+        self.assertEqual(self.index.free_counts_by_category(self.d(1), self.d(3)), {10: 2})
+        self.assertEqual(
+            self.index.free_counts_by_category(self.d(6), self.d(8), location_id=100),
+            {10: 2, 20: 1},
+        )
+
+    def test_incremental_booking_updates(self):
+        """
+        测试预订新增和取消后索引同步更新
+        """
+        self.index.update_booking(1002, 2, self.d(1), self.d(2), 'confirmed')
+        self.assertEqual(self.index.free_cars(self.d(1), self.d(3), location_id=100), set())
+
+        self.index.update_booking(1002, 2, self.d(1), self.d(2), 'cancelled')
+        self.assertEqual(self.index.free_cars(self.d(1), self.d(3), location_id=100), {2})
+
+        self.index.remove_booking(1000)
+        self.assertEqual(self.index.free_cars(self.d(1), self.d(3), location_id=100), {1, 2})
+
+    def test_car_moves_and_availability_flag(self):
+        """
+        测试车辆移动地点或停租后索引同步更新
+        """
+        self.index.update_car(4, 10, 100)
+        self.assertEqual(self.index.free_cars(self.d(1), self.d(3), location_id=100), {2, 4})
+
+        self.index.update_car(2, 10, 100, rentable=False)
+        self.assertEqual(self.index.free_cars(self.d(1), self.d(3), location_id=100), {4})
+        self.assertFalse(self.index.is_car_free(2, self.d(10), self.d(11)))
+
+        # 停租期间的预订在恢复可租后仍然生效
+        self.index.update_booking(1003, 2, self.d(10), self.d(12), 'pending')
+        self.index.update_car(2, 10, 100)
+        self.assertFalse(self.index.is_car_free(2, self.d(10), self.d(11)))
+
+    def test_pick_car_prefers_idle_cars(self):
+        """
+        测试分配车辆时优先选择没有预订的车辆
+        """
+        self.assertEqual(self.index.pick_car(10, self.d(6), self.d(8), location_id=100), 2)
+        self.assertEqual(self.index.pick_car(20, self.d(6), self.d(8)), 3)
+        self.assertIsNone(self.index.pick_car(20, self.d(3), self.d(5)))
@@ -0,0 +1,127 @@
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from bookings.confirmation import BookingConflict, confirm_draft, find_confirmed_booking
+from bookings.drafts import get_draft_store
+from bookings.models import Booking, Driver
+from cars.models import Car
+from cars.tests.utils import UnmanagedTablesMixin
+from locations.models import Location, State
+
+
+class BookingConfirmationTest(UnmanagedTablesMixin, TestCase):
+    """
+    测试预订确认流程的事务、幂等和冲突检查
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='confirmer', password='testpassword')
+        state = State.objects.create(name='New South Wales', code='NSW')
+        self.location = Location.objects.create(
+            name='Sydney Airport', address='Airport Dr', city='Sydney',
+            state=state, postal_code='2020'
+        )
+        self.car = Car.objects.create(registration_no='RUSH01')
+        self.start = date.today() + timedelta(days=10)
+
+    def make_draft(self, offset=0, days=3, drivers=None):
+        draft = Booking(
+            user=self.user,
+            car=self.car,
+            pickup_location=self.location,
+            dropoff_location=self.location,
+            pickup_date=self.start + timedelta(days=offset),
+            return_date=self.start + timedelta(days=offset + days),
+            total_cost=300,
+            driver_age=30,
+        )
+        draft.temp_drivers_data = drivers if drivers is not None else [{
+            'first_name': 'John', 'last_name': 'Smith', 'email': 'john@example.com',
+            'date_of_birth': date(1990, 1, 1), 'license_number': 'L123',
+            'license_issued_in': 'NSW', 'license_expiry_date': date(2030, 1, 1),
+            'address': '1 George St', 'city': 'Sydney', 'state': 'NSW',
+            'postcode': '2000', 'mobile': '0400000000', 'is_primary': True,
+        }]
+        return draft
+
+    def test_confirm_saves_booking_and_drivers(self):
+        """
+        测试确认后保存预订、驾驶员并关联到用户资料
+        """
+        booking, created = confirm_draft('draft-1', self.make_draft(), self.user)
+
+        self.assertTrue(created)
+        self.assertEqual(booking.status, 'confirmed')
+        self.assertEqual(find_confirmed_booking('draft-1'), booking)
+        self.assertEqual(booking.drivers.count(), 1)
+        self.assertEqual(self.user.profile.drivers.get().first_name, 'John')
+
+    def test_repeated_confirmation_is_idempotent(self):
+        """
+        测试同一草稿重复确认只产生一条预订
+        """
+        first, created = confirm_draft('draft-1', self.make_draft(), self.user)
+        second, created_again = confirm_draft('draft-1', self.make_draft(), self.user)
+
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(Driver.objects.count(), 1)
+
+    def test_overlapping_confirmation_conflicts(self):
+        """
+        测试同一车辆时间重叠的另一草稿无法确认，还车当天可以再次出租
+        """
+        confirm_draft('draft-1', self.make_draft(offset=0, days=3), self.user)
+
+        with self.assertRaises(BookingConflict):
+            confirm_draft('draft-2', self.make_draft(offset=2, days=3), self.user)
+        with self.assertRaises(BookingConflict):
+            confirm_draft('draft-3', self.make_draft(offset=1, days=0), self.user)
+
+        booking, created = confirm_draft('draft-4', self.make_draft(offset=3, days=2), self.user)
+        self.assertTrue(created)
+        self.assertEqual(Booking.objects.count(), 2)
+
+    def test_cancelled_booking_does_not_block(self):
+        """
+        测试已取消的预订不占用车辆
+        """
+        booking, _ = confirm_draft('draft-1', self.make_draft(), self.user)
+        Booking.objects.filter(pk=booking.pk).update(status='cancelled')
+
+        _, created = confirm_draft('draft-2', self.make_draft(), self.user)
+        self.assertTrue(created)
+
+    def test_failed_driver_insert_rolls_back_booking(self):
+        """
+        测试驾驶员保存失败时预订一并回滚
+        """
+        draft = self.make_draft(drivers=[{'first_name': 'No', 'last_name': 'Birthday'}])
+
+        with self.assertRaises(IntegrityError):
+            confirm_draft('draft-1', draft, self.user)
+        self.assertFalse(Booking.objects.exists())
+        self.assertFalse(Driver.objects.exists())
+
+    @override_settings(STRIPE_SECRET_KEY=None)
+    def test_process_payment_double_submit(self):
+        """
+        测试重复提交支付 (MockStripe) 只创建一条预订，并跳转到同一个成功页面
+        """
+        self.client.login(username='confirmer', password='testpassword')
+        draft_id = get_draft_store().add(self.make_draft())
+        url = reverse('process_payment', args=[draft_id])
+
+        first = self.client.get(url)
+        second = self.client.get(url)
+
+        booking = Booking.objects.get()
+        expected = reverse('payment_success', args=[booking.pk])
+        self.assertRedirects(first, expected, fetch_redirect_response=False)
+        self.assertRedirects(second, expected, fetch_redirect_response=False)
@@ -0,0 +1,194 @@
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.utils import timezone
+
+from bookings.drafts import (
+    LocMemDraftStore, CacheDraftStore, DatabaseDraftStore, get_draft_store
+)
+from bookings.models import Booking, DraftBooking
+
+
+class LocMemDraftStoreTest(SimpleTestCase):
+    """
+    测试进程内 LRU 草稿存储
+    """
+
+    def test_set_get_delete(self):
+        """
+        测试保存、读取和删除草稿
+        """
+        store = LocMemDraftStore()
+        draft_id = store.add({'pickup_date': date(2025, 1, 1)})
+
+        self.assertEqual(store.get(draft_id), {'pickup_date': date(2025, 1, 1)})
+        self.assertEqual(store.count(), 1)
+
+        store.delete(draft_id)
+        self.assertIsNone(store.get(draft_id))
+        self.assertEqual(store.count(), 0)
+
+    def test_returns_independent_copy(self):
+        """
+        测试读取的草稿修改后必须显式保存
+        """
+        store = LocMemDraftStore()
+        store.set('a', {'drivers': []})
+
+        draft = store.get('a')
+        draft['drivers'].append('John')
+        self.assertEqual(store.get('a'), {'drivers': []})
+
+        store.set('a', draft)
+        self.assertEqual(store.get('a'), {'drivers': ['John']})
+
+    def test_lru_eviction(self):
+        """
+        测试超过容量时淘汰最久未使用的草稿
+        """
+        store = LocMemDraftStore(max_entries=2)
+        store.set('a', 1)
+        store.set('b', 2)
+        store.get('a')  # a 成为最近使用
+        store.set('c', 3)
+
+        self.assertEqual(store.get('a'), 1)
+        self.assertIsNone(store.get('b'))
+        self.assertEqual(store.get('c'), 3)
+        self.assertEqual(store.count(), 2)
+
+    def test_ttl_expiry(self):
+        """
+        测试草稿过期后不可读取并被清理
+        """
+        store = LocMemDraftStore(timeout=10)
+        with mock.patch('bookings.drafts.time.monotonic', return_value=100.0):
+            store.set('a', 1)
+            store.set('b', 2)
+        with mock.patch('bookings.drafts.time.monotonic', return_value=105.0):
+            store.set('b', 2)  # 刷新 b 的过期时间
+        with mock.patch('bookings.drafts.time.monotonic', return_value=111.0):
+            self.assertIsNone(store.get('a'))
+            self.assertEqual(store.get('b'), 2)
+            self.assertEqual(store.count(), 1)
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'drafts-test'}
+})
+class CacheDraftStoreTest(SimpleTestCase):
+    """
+    测试基于缓存的草稿存储
+    """
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def test_set_get_delete_and_count(self):
+        """
+        测试保存、读取、删除和计数
+        """
+        store = CacheDraftStore()
+        first = store.add({'n': 1})
+        second = store.add({'n': 2})
+
+        self.assertEqual(store.get(first), {'n': 1})
+        self.assertEqual(store.count(), 2)
+
+        store.delete(first)
+        self.assertIsNone(store.get(first))
+        self.assertEqual(store.get(second), {'n': 2})
+        self.assertEqual(store.count(), 1)
+
+    def test_max_entries(self):
+        """
+        测试超出容量时丢弃最早过期的草稿
+        """
+        store = CacheDraftStore(max_entries=2)
+        store.set('a', 1)
+        store.set('b', 2)
+        store.set('c', 3)
+
+        self.assertIsNone(store.get('a'))
+        self.assertEqual(store.get('c'), 3)
+
+
+class DatabaseDraftStoreTest(TestCase):
+    """
+    测试基于数据库表的草稿存储
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='drafter', password='testpassword')
+
+    def test_booking_round_trip(self):
+        """
+        测试未保存的 Booking 及其附加属性可以完整存取
+        """
+        store = DatabaseDraftStore()
+        booking = Booking(
+            user=self.user,
+            pickup_date=date.today(),
+            return_date=date.today() + timedelta(days=3),
+            total_cost=210,
+            driver_age=30,
+        )
+        booking.temp_drivers_data = [{'first_name': 'John', 'is_primary': True}]
+        draft_id = store.add(booking)
+
+        restored = store.get(draft_id)
+        self.assertEqual(restored.user_id, self.user.id)
+        self.assertEqual(restored.duration_days, 3)
+        self.assertEqual(restored.temp_drivers_data[0]['first_name'], 'John')
+        self.assertEqual(DraftBooking.objects.get(pk=draft_id).user, self.user)
+        self.assertEqual(store.count(), 1)
+
+    def test_expired_drafts_are_hidden_and_purged(self):
+        """
+        测试过期草稿不可读取，并可以被清理
+        """
+        store = DatabaseDraftStore()
+        draft_id = store.add({'n': 1})
+        DraftBooking.objects.filter(pk=draft_id).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        self.assertIsNone(store.get(draft_id))
+        self.assertEqual(store.count(), 0)
+        self.assertEqual(store.purge_expired(), 1)
+        self.assertFalse(DraftBooking.objects.exists())
+
+    def test_max_entries(self):
+        """
+        测试超出容量时删除最早过期的草稿，更新已有草稿不淘汰其他草稿
+        """
+        store = DatabaseDraftStore(max_entries=2)
+        store.set('a', 1)
+        store.set('b', 2)
+        store.set('a', 3)
+        self.assertEqual((store.get('a'), store.get('b')), (3, 2))
+
+        store.set('c', 4)
+        self.assertIsNone(store.get('b'))
+        self.assertEqual((store.get('a'), store.get('c')), (3, 4))
+        self.assertEqual(store.count(), 2)
+
+
+class DraftStoreSettingsTest(SimpleTestCase):
+    """
+    测试按配置创建草稿存储
+    """
+
+    def test_backend_from_settings(self):
+        """
+        测试 BOOKING_DRAFT_STORE 配置生效
+        """
+        config = {'BACKEND': 'bookings.drafts.CacheDraftStore', 'OPTIONS': {'timeout': 120}}
+        with override_settings(BOOKING_DRAFT_STORE=config):
+            store = get_draft_store()
+            self.assertIsInstance(store, CacheDraftStore)
+            self.assertEqual(store.timeout, 120)
+        self.assertIsInstance(get_draft_store(), LocMemDraftStore)
@@ -0,0 +1,92 @@
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from bookings.drivers import build_driver, driver_to_data, save_drivers
+from bookings.models import Booking, Driver
+from cars.models import Car
+from cars.tests.utils import UnmanagedTablesMixin
+from locations.models import Location, State
+
+
+def driver_data(first_name, is_primary=False):
+    return {
+        'first_name': first_name, 'last_name': 'Smith', 'email': f'{first_name}@example.com',
+        'date_of_birth': date(1990, 1, 1), 'license_number': 'L123',
+        'license_issued_in': 'NSW', 'license_expiry_date': date(2030, 1, 1),
+        'address': '1 George St', 'city': 'Sydney', 'state': 'NSW',
+        'postcode': '2000', 'mobile': '0400000000', 'is_primary': is_primary,
+    }
+
+
+class SaveDriversTest(UnmanagedTablesMixin, TestCase):
+    """
+    测试驾驶员批量保存
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='driver_owner', password='testpassword')
+        state = State.objects.create(name='New South Wales', code='NSW')
+        location = Location.objects.create(
+            name='Sydney Airport', address='Airport Dr', city='Sydney',
+            state=state, postal_code='2020'
+        )
+        self.booking = Booking.objects.create(
+            user=self.user,
+            car=Car.objects.create(registration_no='RUSH01'),
+            pickup_location=location,
+            dropoff_location=location,
+            pickup_date=date.today(),
+            return_date=date.today() + timedelta(days=3),
+            total_cost=300,
+            driver_age=30,
+        )
+
+    def test_query_count_does_not_grow_with_drivers(self):
+        """
+        测试查询次数与驾驶员数量无关
+        """
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(4):
+            save_drivers(self.booking, [driver_data('one', True)], user)
+
+        user = User.objects.get(pk=self.user.pk)
+        drivers = [driver_data('lead', True)] + [driver_data(f'extra{i}') for i in range(5)]
+        with self.assertNumQueries(4):
+            save_drivers(self.booking, drivers, user)
+
+    def test_primary_driver_replaces_previous_primary(self):
+        """
+        测试新的主驾驶员会取消用户资料中原有的主驾驶员
+        """
+        first, = save_drivers(self.booking, [driver_data('first', True)], self.user)
+        second, extra = save_drivers(
+            self.booking, [driver_data('second', True), driver_data('extra')], self.user
+        )
+
+        first.refresh_from_db()
+        self.assertFalse(first.is_primary)
+        self.assertEqual(self.user.profile.drivers.count(), 3)
+        self.assertEqual(self.user.profile.get_primary_driver(), second)
+        self.assertEqual(self.booking.drivers.count(), 3)
+
+    def test_existing_driver_not_linked_again(self):
+        """
+        测试使用已有驾驶员时不关联到用户资料
+        """
+        save_drivers(self.booking, [driver_data('reused', True)], self.user, link_to_profile=False)
+
+        self.assertEqual(Driver.objects.count(), 1)
+        self.assertFalse(self.user.profile.drivers.exists())
+
+    def test_round_trip_with_defaults(self):
+        """
+        测试驾驶员与草稿字典互相转换，缺失字段使用默认值
+        """
+        driver = build_driver({'first_name': 'Jane'})
+        self.assertEqual(driver.country_of_residence, 'Australia')
+        self.assertFalse(driver.is_primary)
+
+        data = driver_data('Jane', True)
+        self.assertEqual(driver_to_data(build_driver(data)), {**driver_to_data(build_driver({})), **data})
@@ -0,0 +1,115 @@
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta, timezone
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from bookings.history import BookingHistory, InvalidCursor, decode_cursor
+from bookings.models import Booking
+from cars.models import Car, VehicleMake, VehicleModel
+from cars.tests.utils import UnmanagedTablesMixin
+from locations.models import Location, State
+
+
+class BookingHistoryTest(UnmanagedTablesMixin, TestCase):
+    """
+    测试预订历史的键集分页、筛选和流式导出
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='historian', password='testpassword')
+        other = User.objects.create_user(username='other', password='testpassword')
+        state = State.objects.create(name='New South Wales', code='NSW')
+        self.location = Location.objects.create(
+            name='Sydney Airport', address='Airport Dr', city='Sydney',
+            state=state, postal_code='2020'
+        )
+        make = VehicleMake.objects.create(name='Toyota')
+        self.car = Car.objects.create(
+            registration_no='RUSH01', model=VehicleModel.objects.create(make=make, model_name='Camry'),
+        )
+        # 第 0、1 条预订时间相同，验证按 id 区分
+        booked_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        self.bookings = []
+        for i in range(7):
+            booking = self.make_booking(
+                self.user, pickup_date=date(2025, 3, 1) + timedelta(days=i * 10),
+                status='cancelled' if i % 3 == 0 else 'confirmed',
+            )
+            Booking.objects.filter(pk=booking.pk).update(booking_date=booked_at + timedelta(days=max(i, 1)))
+            self.bookings.append(booking)
+        self.make_booking(other, pickup_date=date(2025, 3, 1))
+        self.client.login(username='historian', password='testpassword')
+
+    def make_booking(self, user, **kwargs):
+        return Booking.objects.create(
+            user=user, car=self.car, pickup_location=self.location, dropoff_location=self.location,
+            return_date=date(2025, 12, 31), total_cost=300, driver_age=30, **kwargs,
+        )
+
+    def test_keyset_pages_cover_all_bookings(self):
+        """
+        测试逐页翻到底，每条预订恰好出现一次且按预订时间、id 降序
+        """
+        expected = list(
+            Booking.objects.filter(user=self.user).order_by('-booking_date', '-id').values_list('id', flat=True)
+        )
+        seen, cursor = [], ''
+        while True:
+            page, cursor = BookingHistory(self.user, {'page_size': '3', 'cursor': cursor}).page()
+            seen += [booking.id for booking in page]
+            if cursor is None:
+                break
+        self.assertEqual(seen, expected)
+
+    def test_page_is_single_query(self):
+        """
+        测试一页只查询一次 (车辆、车型、地点一起取出)
+        """
+        with self.assertNumQueries(1):
+            page, _ = BookingHistory(self.user, {'page_size': '5'}).page()
+            [(b.car.model.make.name, b.pickup_location.name, b.dropoff_location.name) for b in page]
+
+    def test_filters(self):
+        """
+        测试按状态和取车日期筛选
+        """
+        page, _ = BookingHistory(self.user, {'status': 'cancelled'}).page()
+        self.assertEqual({b.id for b in page}, {self.bookings[i].id for i in (0, 3, 6)})
+
+        page, _ = BookingHistory(self.user, {'from': '2025-03-11', 'to': '2025-04-01', 'status': 'bogus'}).page()
+        self.assertEqual({b.id for b in page}, {self.bookings[1].id, self.bookings[2].id, self.bookings[3].id})
+
+        with self.assertRaises(InvalidCursor):
+            decode_cursor('not-a-cursor')
+
+    def test_api_and_export(self):
+        """
+        测试 JSON 接口和 CSV/JSON 流式导出
+        """
+        data = self.client.get(reverse('user_bookings_api'), {'page_size': 2}).json()
+        self.assertEqual(len(data['results']), 2)
+        self.assertEqual(data['results'][0]['car'], 'Toyota Camry')
+        self.assertIsNotNone(data['next'])
+        self.assertEqual(self.client.get(reverse('user_bookings_api'), {'cursor': '!!'}).status_code, 400)
+
+        response = self.client.get(reverse('user_bookings_export'), {'format': 'csv', 'status': 'confirmed'})
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual({row['status'] for row in rows}, {'confirmed'})
+
+        response = self.client.get(reverse('user_bookings_export'), {'format': 'json'})
+        self.assertEqual(len(json.loads(b''.join(response.streaming_content))), 7)
+
+    def test_page_view(self):
+        """
+        测试预订页面显示一页并提供下一页链接
+        """
+        response = self.client.get(reverse('user_bookings'), {'page_size': 5})
+        self.assertEqual(len(response.context['bookings']), 5)
+        self.assertContains(response, 'Toyota Camry')
+        self.assertIn('cursor=', response.context['next_page_url'])
@@ -0,0 +1,126 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from bookings import payments
+from bookings.drafts import get_draft_store
+from bookings.models import Booking, StripeEvent
+from bookings.pricing import reset_rate_table
+from bookings.testing import FakeStripeServer
+from cars.models import Car, VehicleCategory, VehicleCategoryType
+from cars.tests.utils import UnmanagedTablesMixin
+from locations.models import Location, State
+
+WEBHOOK_SECRET = 'whsec_test'
+
+
+class StripePaymentsTest(UnmanagedTablesMixin, TestCase):
+    """
+    测试 Stripe 客户端、webhook 签名校验和按事件确认预订
+    """
+
+    def setUp(self):
+        cache.clear()
+        reset_rate_table()
+        self.server = FakeStripeServer().start()
+        self.addCleanup(self.server.stop)
+        self.settings_override = override_settings(
+            STRIPE_SECRET_KEY='sk_test_fake',
+            STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET,
+            STRIPE_PAYMENTS={'API_BASE': self.server.url, 'MAX_NETWORK_RETRIES': 0, 'PROCESS_IN_BACKGROUND': False},
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        payments.reset_client()
+        self.addCleanup(payments.reset_client)
+
+        self.user = User.objects.create_user(username='payer', password='testpassword')
+        location = Location.objects.create(
+            name='Sydney Airport', address='Airport Dr', city='Sydney',
+            state=State.objects.create(name='New South Wales', code='NSW'), postal_code='2020',
+        )
+        category = VehicleCategory.objects.create(
+            category_type=VehicleCategoryType.objects.create(category_type='Car'),
+            vehicle_category='Toyota Corolla', daily_rate=Decimal('50.00'),
+        )
+        pickup = date.today() + timedelta(days=10)
+        self.draft_id = get_draft_store().add(Booking(
+            user=self.user, car=Car.objects.create(registration_no='RUSH01', category=category),
+            pickup_location=location, dropoff_location=location,
+            pickup_date=pickup, return_date=pickup + timedelta(days=2), total_cost=100, driver_age=30,
+        ))
+        self.addCleanup(get_draft_store().delete, self.draft_id)
+
+    def post_event(self, event, secret=WEBHOOK_SECRET):
+        payload, signature = self.server.signed_event(event, secret)
+        return self.client.post(reverse('stripe_webhook'), payload, content_type='application/json',
+                                HTTP_STRIPE_SIGNATURE=signature)
+
+    def test_client_is_lazy_and_idempotent(self):
+        """
+        测试客户端首次使用时才创建并被复用，幂等键重复请求返回同一对象
+        """
+        self.assertIs(payments.get_client(), payments.get_client())
+        params = {'amount': 10000, 'currency': 'usd', 'metadata': {'temp_booking_id': self.draft_id}}
+        first = payments.create_payment_intent(params, idempotency_key='intent:1')
+        second = payments.create_payment_intent(params, idempotency_key='intent:1')
+
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(first.metadata['temp_booking_id'], self.draft_id)
+        self.assertEqual(self.server.requests[0]['headers']['Idempotency-Key'], 'intent:1')
+        with override_settings(STRIPE_SECRET_KEY=None):
+            payments.reset_client()
+            self.assertIsNone(payments.get_client())
+            self.assertTrue(payments.create_payment_intent(params).client_secret)
+
+    def test_webhook_confirms_booking_once(self):
+        """
+        测试已签名的 checkout.session.completed 事件确认预订，重发的事件不重复处理
+        """
+        self.client.login(username='payer', password='testpassword')
+        response = self.client.get(reverse('payment', args=[self.draft_id]))
+        session_id = next(iter(self.server.objects))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], self.server.objects[session_id]['url'])
+
+        # 等待 webhook 时显示等待页面，不访问 Stripe
+        requests_before = len(self.server.requests)
+        pending = self.client.get(reverse('stripe_success', args=[self.draft_id]))
+        self.assertTemplateUsed(pending, 'bookings/payment_pending.html')
+        self.assertEqual(len(self.server.requests), requests_before)
+
+        event = self.server.complete_session(session_id)
+        self.assertEqual(self.post_event(event).json(), {'received': True, 'duplicate': False})
+        self.assertEqual(self.post_event(event).json(), {'received': True, 'duplicate': True})
+        self.assertEqual(StripeEvent.objects.get().status, 'pending')
+
+        self.assertEqual(payments.process_pending_events(), 1)
+        self.assertEqual(payments.process_pending_events(), 0)
+        record = StripeEvent.objects.get()
+        self.assertEqual(record.status, 'processed')
+        self.assertEqual(record.booking.status, 'confirmed')
+        self.assertIsNone(get_draft_store().get(self.draft_id))
+
+        done = self.client.get(reverse('stripe_success', args=[self.draft_id]))
+        self.assertRedirects(done, reverse('payment_success', args=[record.booking.pk]))
+
+    def test_invalid_and_unrelated_events(self):
+        """
+        测试签名错误的事件被拒绝，不相关的事件标记为 ignored，草稿过期的支付标记为 failed
+        """
+        event = self.server.event('payment_intent.succeeded', {'metadata': {'temp_booking_id': self.draft_id}})
+        self.assertEqual(self.post_event(event, secret='whsec_wrong').status_code, 400)
+        self.assertFalse(StripeEvent.objects.exists())
+
+        self.post_event(self.server.event('customer.created', {'id': 'cus_1'}))
+        self.post_event(self.server.event('payment_intent.succeeded', {'metadata': {'temp_booking_id': 'expired'}}))
+        payments.process_pending_events()
+        self.assertEqual(
+            dict(StripeEvent.objects.values_list('type', 'status')),
+            {'customer.created': 'ignored', 'payment_intent.succeeded': 'failed'},
+        )
+        self.assertFalse(Booking.objects.exists())
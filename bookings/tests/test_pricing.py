@@ -0,0 +1,187 @@
+import json
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from bookings.drafts import get_draft_store
+from bookings.models import Booking, BookingOption
+from bookings.pricing import (
+    PricingError, RateTable, cents, get_rate_table, quote_for_booking, reset_rate_table
+)
+from cars.models import Car, Country, StateProvince, VehicleCategory, VehicleCategoryType
+from cars.tests.utils import UnmanagedTablesMixin
+from locations.models import Location, State
+
+
+class RateTableTest(SimpleTestCase):
+    """
+    测试分项报价的金额和报价缓存
+    """
+
+    def setUp(self):
+        self.table = RateTable()
+        self.table.build(
+            categories=[(1, Decimal('65.50')), (2, Decimal('120'))],
+            options=[('child_seats', 'Baby Seat', Decimal('9.00'), None, True)],
+            states=[('NSW', None, Decimal('0'), 'GST', Decimal('10.00')), ('VIC', 'Levy', Decimal('2.5'), 'GST', Decimal('10'))],
+        )
+        self.pickup, self.dropoff = date(2025, 7, 1), date(2025, 7, 4)
+
+    def test_itemised_quote(self):
+        """
+        测试租金、选项和税费分项，合计等于各项之和
+        """
+        q = self.table.quote(1, self.pickup, self.dropoff, {
+            'damage_waiver': True, 'extended_area': True, 'child_seats': 2, 'additional_drivers': 0,
+        }, state_code='nsw')
+
+        self.assertEqual(q.days, 3)
+        self.assertEqual(
+            [(line.code, line.amount) for line in q.lines],
+            [('base', Decimal('196.50')), ('child_seats', Decimal('54.00')),
+             ('damage_waiver', Decimal('42.00')), ('extended_area', Decimal('150.00'))],
+        )
+        self.assertEqual(q.subtotal, Decimal('442.50'))
+        self.assertEqual([line.amount for line in q.taxes], [Decimal('44.25')])
+        self.assertEqual(q.total, Decimal('486.75'))
+        self.assertEqual(q.options_cost, Decimal('246.00'))
+
+    def test_state_and_country_tax(self):
+        """
+        测试州税和国家销售税都计入，未知州不计税
+        """
+        q = self.table.quote(2, self.pickup, self.pickup, state_code='VIC')
+        self.assertEqual(q.days, 1)
+        self.assertEqual([line.amount for line in q.taxes], [Decimal('12.00'), Decimal('3.00')])
+        self.assertEqual(self.table.quote(2, self.pickup, self.pickup, state_code='QLD').total, Decimal('120.00'))
+
+    def test_memoised_and_errors(self):
+        """
+        测试相同参数返回缓存的报价，未知车型或选项报错
+        """
+        first = self.table.quote(1, self.pickup, self.dropoff, {'child_seats': 1, 'damage_waiver': False})
+        self.assertIs(self.table.quote(1, self.pickup, self.dropoff, {'child_seats': 1}), first)
+
+        with self.assertRaises(PricingError):
+            self.table.quote(99, self.pickup, self.dropoff)
+        with self.assertRaises(PricingError):
+            self.table.quote(1, self.pickup, self.dropoff, {'jetpack': True})
+        with self.assertRaises(PricingError):
+            self.table.quote(1, self.dropoff, self.pickup)
+
+    def test_batch_matches_single_quotes(self):
+        """
+        测试批量报价与逐个报价的结果完全一致
+        """
+        rng = random.Random(3)
+        table = RateTable()
+        table.build(
+            categories=[(i, Decimal(rng.randint(2000, 30000)) / 100) for i in range(40)],
+            options=[],
+            states=[('VIC', 'Levy', Decimal('2.35'), 'GST', Decimal('10'))],
+        )
+        ranges = [
+            (self.pickup + timedelta(days=offset), self.pickup + timedelta(days=offset + rng.randint(0, 30)))
+            for offset in range(50)
+        ]
+        options = {'damage_waiver': True, 'child_seats': 2}
+
+        rows = table.batch_quote(list(range(40)), ranges, options, 'vic')
+
+        self.assertEqual(len(rows), 2000)
+        for category_id, pickup, dropoff, days, subtotal, tax, total in rows[::37]:
+            q = table.quote(category_id, pickup, dropoff, options, 'VIC')
+            self.assertEqual((days, cents(subtotal), cents(tax), cents(total)), (q.days, q.subtotal, q.tax_total, q.total))
+        with self.assertRaises(PricingError):
+            table.batch_quote([0], [(self.dropoff, self.pickup)])
+
+
+class PricingDatabaseTest(UnmanagedTablesMixin, TestCase):
+    """
+    测试从数据库加载费率并在费率变化后重新加载
+    """
+
+    def setUp(self):
+        cache.clear()
+        reset_rate_table()
+        country = Country.objects.create(sales_tax_rate=Decimal('10.00'))
+        StateProvince.objects.create(country=country, name='New South Wales', code='NSW')
+        self.category = VehicleCategory.objects.create(
+            category_type=VehicleCategoryType.objects.create(category_type='Car'),
+            vehicle_category='Toyota Corolla', daily_rate=Decimal('50.00'),
+        )
+        state = State.objects.create(name='New South Wales', code='NSW')
+        location = Location.objects.create(
+            name='Sydney Airport', address='Airport Dr', city='Sydney', state=state, postal_code='2020'
+        )
+        self.booking = Booking(
+            car=Car.objects.create(registration_no='RUSH01', category=self.category),
+            pickup_location=location, dropoff_location=location,
+            pickup_date=date(2025, 7, 1), return_date=date(2025, 7, 3),
+            total_cost=0, driver_age=30, satellite_navigation=True,
+        )
+
+    def test_quote_for_booking_and_reload(self):
+        """
+        测试按预订报价，修改选项价格后报价随之变化
+        """
+        q = quote_for_booking(self.booking)
+        self.assertEqual(q.total, Decimal('121.00'))
+        self.assertEqual(self.booking.options_cost, Decimal('10.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            option = BookingOption.objects.get(code='satellite_navigation')
+            option.daily_rate = Decimal('7.00')
+            option.save()
+            self.category.daily_rate = Decimal('55.00')
+            self.category.save()
+
+        self.assertEqual(get_rate_table().options['satellite_navigation'].daily_rate, Decimal('7.00'))
+        self.assertEqual(quote_for_booking(self.booking).total, Decimal('136.40'))
+
+    def test_batch_quote_endpoint(self):
+        """
+        测试批量报价接口
+        """
+        url = reverse('batch_quotes')
+        response = self.client.post(url, json.dumps({
+            'ranges': [['2025-07-01', '2025-07-03'], ['2025-07-01', '2025-07-01']],
+            'options': {'satellite_navigation': True},
+            'state': 'NSW',
+        }), content_type='application/json')
+
+        quotes = response.json()['quotes']
+        self.assertEqual([(q['days'], q['total']) for q in quotes], [(2, '121.00'), (1, '60.50')])
+
+        self.assertEqual(self.client.get(url).status_code, 405)
+        bad = self.client.post(url, json.dumps({'categories': [999], 'ranges': [['2025-07-01', '2025-07-02']]}),
+                               content_type='application/json')
+        self.assertEqual(bad.status_code, 400)
+        for invalid in ({'state': 5}, {'options': ['damage_waiver']}):
+            bad = self.client.post(url, json.dumps({'ranges': [['2025-07-01', '2025-07-02']], **invalid}),
+                                   content_type='application/json')
+            self.assertEqual(bad.status_code, 400)
+
+    def test_wizard_without_quote(self):
+        """
+        测试预订过程中车辆无法报价 (类别被删除) 时，驾驶员和选项页面按日租金显示，确认和支付时返回选项页面
+        """
+        self.client.force_login(User.objects.create_user(username='pricing', password='testpassword'))
+        self.booking.car.category = None
+        self.booking.car.save()
+        draft_id = get_draft_store().add(self.booking)
+
+        response = self.client.get(reverse('add_drivers', args=[draft_id]))
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('add_options', args=[draft_id]))
+        self.assertEqual((response.status_code, response.context['base_cost']), (200, 0))
+
+        response = self.client.post(reverse('confirm_booking', args=[draft_id]), {'damage_waiver': 'on'})
+        self.assertRedirects(response, reverse('add_options', args=[draft_id]), fetch_redirect_response=False)
+        response = self.client.get(reverse('payment', args=[draft_id]))
+        self.assertRedirects(response, reverse('add_options', args=[draft_id]), fetch_redirect_response=False)
@@ -9,8 +9,10 @@ urlpatterns = [
     path('payment/<str:temp_booking_id>/', views.payment, name='payment'),
     path('process-payment/<str:temp_booking_id>/', views.process_payment, name='process_payment'),
     path('stripe-success/<str:temp_booking_id>/', views.stripe_success, name='stripe_success'),
+    path('stripe/webhook/', views.stripe_webhook, name='stripe_webhook'),
     path('payment-success/<int:booking_id>/', views.payment_success, name='payment_success'),
     path('success/<int:booking_id>/', views.booking_success, name='booking_success'),
     path('detail/<int:booking_id>/', views.booking_detail, name='booking_detail'),
     path('cancel/<int:booking_id>/', views.cancel_booking, name='cancel_booking'),
+    path('quotes/batch/', views.batch_quotes, name='batch_quotes'),
 ]
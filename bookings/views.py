@@ -2,155 +2,70 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from asgiref.sync import sync_to_async
 from datetime import datetime
-from decimal import Decimal
+import asyncio
 import json
 import os
-import uuid
 import logging
+from django.db import transaction
 from .models import Booking
+from . import payments
+from .payments import MockStripe  # noqa: F401 (兼容旧的导入路径)
+from .drafts import get_draft_store
+from .drivers import driver_to_data
+from .confirmation import BookingConflict, confirm_draft, find_confirmed_booking
+from .availability import get_availability_index
+from .pricing import (
+    MAX_BATCH_QUOTES, PricingError, batch_quote, get_rate_table, quote, quote_for_booking, rental_days,
+)
+from cars.branches import branch_ids_for
 from cars.models import Car, VehicleCategory
 from locations.models import Location
 
 # 创建伤感风格的日志记录器
 logger = logging.getLogger(__name__)
 
-# 备份模拟的Stripe类，用于测试环境
-class MockStripe:
-    # 模拟PaymentIntent API
-    class PaymentIntent:
-        @staticmethod
-        def create(**kwargs):
-            # 返回一个带有client_secret的模拟对象
-            intent_id = f"pi_{uuid.uuid4()}"
-            client_secret = f"{intent_id}_secret_{uuid.uuid4()}"
-            logger.info(f"创建模拟 PaymentIntent: id={intent_id}, amount={kwargs.get('amount', 0)}")
-            return type('obj', (object,), {
-                'client_secret': client_secret,
-                'id': intent_id,
-                'amount': kwargs.get('amount', 0),
-                'currency': kwargs.get('currency', 'usd'),
-                'status': 'succeeded'
-            })
-        
-        @staticmethod
-        def retrieve(intent_id):
-            # 模拟检索支付意图，总是返回成功状态
-            logger.info(f"检索模拟 PaymentIntent: {intent_id}")
-            return type('obj', (object,), {
-                'id': intent_id,
-                'status': 'succeeded',
-                'amount': 0,
-                'currency': 'usd'
-            })
-            
-    # 模拟Checkout API
-    class checkout:
-        class Session:
-            @staticmethod
-            def create(**kwargs):
-                # 创建一个唯一的会话ID
-                session_id = f"cs_{uuid.uuid4()}"
-                # 构建模拟的checkout URL，包含足够的信息以便成功处理
-                success_url = kwargs.get('success_url', '')
-                cancel_url = kwargs.get('cancel_url', '')
-                # 在临时存储中记录会话信息，以便稍后检索
-                metadata = kwargs.get('metadata', {})
-                # 打印日志
-                logger.info(f"创建模拟 Checkout Session: id={session_id}, metadata={metadata}")
-                
-                # 构造返回对象
-                # 注意: 这里url设置为直接重定向到success_url以模拟成功支付
-                mock_obj = type('obj', (object,), {
-                    'id': session_id,
-                    'url': success_url,  # 直接使用success_url简化测试流程
-                    'metadata': metadata
-                })
-                
-                # 记录URL信息便于调试
-                logger.info(f"模拟结账会话URL: {mock_obj.url}")
-                
-                return mock_obj
-                
-            @staticmethod
-            def retrieve(session_id):
-                # 模拟检索会话信息，总是返回已支付状态
-                logger.info(f"检索模拟 Checkout Session: {session_id}")
-                return type('obj', (object,), {
-                    'id': session_id,
-                    'payment_status': 'paid',
-                    'metadata': {},
-                    'status': 'complete'
-                })
-
-# 初始化Stripe相关全局变量
-STRIPE_AVAILABLE = False
-stripe = None
-
-# 尝试从Django设置中获取Stripe配置
-try:
-    from django.conf import settings
-    
-    STRIPE_SECRET_KEY = getattr(settings, 'STRIPE_SECRET_KEY', os.environ.get('STRIPE_SECRET_KEY', ''))
-    STRIPE_PUBLIC_KEY = getattr(settings, 'STRIPE_PUBLIC_KEY', os.environ.get('VITE_STRIPE_PUBLIC_KEY', ''))
-    
-    # 尝试初始化真实的Stripe API
-    import stripe as stripe_module
-    
-    if STRIPE_SECRET_KEY:
-        stripe = stripe_module
-        stripe.api_key = STRIPE_SECRET_KEY
-        STRIPE_AVAILABLE = True
-        
-        # 检查API密钥是否有效，获取Stripe账户信息
-        try:
-            account = stripe.Account.retrieve()
-            logger.info(f"成功连接到Stripe API. 账户ID: {account.id}，账户名称: {getattr(account, 'display_name', 'N/A')}")
-            logger.info(f"Stripe 功能已启用，使用密钥: {STRIPE_SECRET_KEY[:4]}{'*' * (len(STRIPE_SECRET_KEY) - 8)}{STRIPE_SECRET_KEY[-4:] if len(STRIPE_SECRET_KEY) > 8 else ''}")
-        except stripe.error.AuthenticationError:
-            logger.error("Stripe 认证失败：无效的API密钥")
-            STRIPE_AVAILABLE = False
-            stripe = MockStripe
-    else:
-        logger.warning("未找到Stripe API密钥，使用模拟实现")
-        stripe = MockStripe
-except (ImportError, Exception) as e:
-    logger.error(f"Stripe功能初始化失败: {str(e)}")
-    stripe = MockStripe
-
-# 根据Stripe可用状态记录日志
-if STRIPE_AVAILABLE:
-    logger.info("=== Stripe支付集成已启用，将使用真实Stripe API ===")
-else:
-    logger.warning("=== Stripe支付集成已禁用，将使用模拟实现 ===")
-    logger.warning("要启用真实支付，请设置STRIPE_SECRET_KEY环境变量")
-
-# Dictionary to store temporary bookings
-temp_bookings = {}
 
-@login_required
-def create_booking(request, car_id):
+def _base_cost(booking):
+    """
+    预订草稿的租金 (不含选项和税费)
 
-    logger.info(f"用户 {request.user.username} .")
-    
-    # 尝试获取VehicleCategory，如果存在的话
-    vehicle = None
+    无法报价时 (如预订过程中车辆的类别被删除) 与 vehicle_detail 一样按车型日租金显示，不返回 500。
+    """
     try:
-        vehicle = VehicleCategory.objects.filter(id=car_id).first()
-    except:
-        pass
+        return quote_for_booking(booking).base_cost
+    except PricingError as e:
+        logger.warning(f"无法为车辆 #{booking.car_id} 报价，按日租金显示: {e}")
+        category = booking.car.category
+        daily_rate = category.daily_rate if category is not None and category.daily_rate is not None else 0
+        return daily_rate * rental_days(booking.pickup_date, booking.return_date)
+
+@login_required
+async def create_booking(request, car_id):
+    user = await request.auser()
+    logger.info(f"用户 {user.username} .")
+    
+    # 同时查询VehicleCategory和旧的Car模型
+    vehicle, car = await asyncio.gather(
+        VehicleCategory.objects.filter(id=car_id).afirst(),
+        Car.objects.filter(pk=car_id).afirst(),
+    )
         
-    # 如果不是VehicleCategory，那么尝试获取旧的Car模型
+    # 如果不是VehicleCategory，那么使用旧的Car模型
     if vehicle:
         car = None
         logger.info(f"选择了 {vehicle.vehicle_category}，这辆车将承载着短暂的旅程，然后离他而去，就像生命中的所有过客...")
+    elif car is None:
+        raise Http404("No Car matches the given query.")
     else:
-        car = get_object_or_404(Car, pk=car_id)
-        logger.info(f"选择了 {car.make} {car.model}，这辆车将承载着短暂的旅程，然后离他而去，就像生命中的所有过客...")
+        logger.info(f"选择了车辆 #{car.id}，这辆车将承载着短暂的旅程，然后离他而去，就像生命中的所有过客...")
 
-    logger.info(f"用户 {request.user.username} 开始预订车辆流程。")
+    logger.info(f"用户 {user.username} 开始预订车辆流程。")
 #     car = get_object_or_404(Car, pk=car_id)
 #     logger.info(f"用户选择车辆：{car.make} {car.model} (ID: {car.id}) 进行预订。")
 
@@ -200,12 +115,23 @@ def create_booking(request, car_id):
             errors.append("Invalid driver age")
             logger.warning("用户输入的驾驶员年龄无效：%s。", driver_age)
         
+        if not errors:
+            # 取车地点、还车地点和可用性索引互不依赖，同时获取
+            pickup_location, dropoff_location, availability_index = await asyncio.gather(
+                Location.objects.select_related('state').filter(pk=pickup_location_id).afirst(),
+                Location.objects.filter(pk=dropoff_location_id).afirst(),
+                sync_to_async(get_availability_index)(),
+            )
+            if pickup_location is None or dropoff_location is None:
+                errors.append("Invalid location")
+                logger.warning("用户选择的地点不存在：%s / %s。", pickup_location_id, dropoff_location_id)
+
         # If there are errors, show them to the user
         if errors:
             for error in errors:
                 messages.error(request, error)
 
-            logger.error(f"预订表单验证失败，希望破灭的声音在用户 {request.user.username} 心中回荡...")
+            logger.error(f"预订表单验证失败，希望破灭的声音在用户 {user.username} 心中回荡...")
             
             # 根据车辆类型重定向
             if vehicle:
@@ -217,87 +143,55 @@ def create_booking(request, car_id):
 #             return redirect('car_detail', car_id=car.id)
 # >>>>>>> main
         
-        # Calculate total cost
-        duration = (return_date - pickup_date).days
-        if duration < 1:
-            duration = 1
-
-            
-        # 根据车辆类型计算价格
+        # 检查所选时间段内是否有可租车辆
         if vehicle:
-            daily_rate = vehicle.daily_rate
-            vehicle_name = vehicle.vehicle_category
-        else:
-            daily_rate = car.daily_rate
-            vehicle_name = f"{car.make} {car.model}"
-            
-        total_cost = daily_rate * duration
-        logger.info(f"行程 {duration} 天，总费用 ${total_cost}，金钱换取短暂的自由，多么悲哀的交易...")
+            # 从该类别中分配一辆在取车网点、时间段内空闲的实际车辆
+            branch_ids = (await sync_to_async(branch_ids_for)([pickup_location]))[pickup_location.pk]
+            car_id = None
+            for branch_id in sorted(branch_ids):
+                car_id = availability_index.pick_car(vehicle.id, pickup_date, return_date, location_id=branch_id)
+                if car_id is not None:
+                    break
+            if car_id is None:
+                logger.warning(f"类别 {vehicle.vehicle_category} 在 {pickup_location} {pickup_date} 至 {return_date} 没有可租车辆")
+                messages.error(request, "Sorry, this vehicle is not available for the selected dates.")
+                return redirect('vehicle_detail', vehicle_id=vehicle.id)
+            car = await Car.objects.aget(pk=car_id)
+        elif not availability_index.is_car_free(car.id, pickup_date, return_date):
+            logger.warning(f"车辆 #{car.id} 在 {pickup_date} 至 {return_date} 已被预订")
+            messages.error(request, "Sorry, this car is not available for the selected dates.")
+            return redirect('car_detail', car_id=car.id)
 
-        
-        # 获取取车和还车地点
-        pickup_location = Location.objects.get(pk=pickup_location_id)
-        dropoff_location = Location.objects.get(pk=dropoff_location_id)
-        
-        # Create a temporary booking object
-        if car:
-            temp_booking = Booking(
-                user=request.user,
-                car=car,
-                pickup_location=pickup_location,
-                dropoff_location=dropoff_location,
-                pickup_date=pickup_date,
-                return_date=return_date,
-                total_cost=total_cost,
-                driver_age=driver_age,
-                status='pending'  # Stay as pending until confirmed
-            )
-        else:
-            # 为了处理VehicleCategory，我们需要找到或创建一个对应的Car记录
-            # 这是一个临时解决方案，直到我们完全迁移到VehicleCategory模型
-            from cars.models import CarCategory
-            category, _ = CarCategory.objects.get_or_create(
-                name=vehicle.category_type.category_type,
-                defaults={'description': f'Auto-created for {vehicle.vehicle_category}'}
-            )
-            
-            # 创建一个临时Car记录
-            temp_car = Car.objects.create(
-                name=vehicle.name or vehicle.vehicle_category,
-                make=vehicle.vehicle_category.split()[0],  # 简单地取第一个词作为品牌
-                model=vehicle.vehicle_category,
-                year=2023,  # 默认年份
-                category=category,
-                vehicle_category=vehicle,  # 建立反向关联
-                seats=vehicle.num_adults,
-                bags=vehicle.num_large_case + vehicle.num_small_case,
-                doors=4,  # 默认值
-                transmission='A',  # 默认自动挡
-                air_conditioning=True,
-                image_url=vehicle.get_image_url(),
-                daily_rate=vehicle.daily_rate,
-                is_available=True
-            )
-            
-            # 将新创建的Car添加到相同的位置
-            temp_car.locations.add(*vehicle.locations.all())
-            
-            temp_booking = Booking(
-                user=request.user,
-                car=temp_car,
-                pickup_location=pickup_location,
-                dropoff_location=dropoff_location,
-                pickup_date=pickup_date,
-                return_date=return_date,
-                total_cost=total_cost,
-                driver_age=driver_age,
-                status='pending'  # Stay as pending until confirmed
+        # 按车辆类别计算价格 (未选择选项时只有租金和税费)
+        try:
+            rental_quote = await sync_to_async(quote)(
+                vehicle.id if vehicle else car.category_id, pickup_date, return_date,
+                state_code=pickup_location.state.code,
             )
+        except PricingError as e:
+            logger.error(f"无法为车辆 #{car.id} 报价: {e}")
+            messages.error(request, "Sorry, this vehicle cannot be booked online at the moment.")
+            if vehicle:
+                return redirect('vehicle_detail', vehicle_id=vehicle.id)
+            return redirect('car_detail', car_id=car.id)
+        total_cost = rental_quote.total
+        logger.info(f"行程 {rental_quote.days} 天，总费用 ${total_cost}，金钱换取短暂的自由，多么悲哀的交易...")
         
-        # Store in temp_bookings dictionary with a unique ID
-        import uuid
-        booking_id = str(uuid.uuid4())
-        temp_bookings[booking_id] = temp_booking
+        # Create a temporary booking object
+        temp_booking = Booking(
+            user=user,
+            car=car,
+            pickup_location=pickup_location,
+            dropoff_location=dropoff_location,
+            pickup_date=pickup_date,
+            return_date=return_date,
+            total_cost=total_cost,
+            driver_age=driver_age,
+            status='pending'  # Stay as pending until confirmed
+        )
+        
+        # Store in the draft store with a unique ID
+        booking_id = await get_draft_store().aadd(temp_booking)
         logger.info(f"预订 {booking_id} 暂存于系统的记忆中，像一个漂泊的梦，等待着最终的命运...")
         
         # Redirect to add drivers page
@@ -313,7 +207,7 @@ def create_booking(request, car_id):
 def add_drivers(request, temp_booking_id):
     """添加驾驶员信息页面"""
     # 从临时存储获取预订
-    temp_booking = temp_bookings.get(temp_booking_id)
+    temp_booking = get_draft_store().get(temp_booking_id)
     
     if not temp_booking:
         messages.error(request, "Booking session expired. Please try again.")
@@ -324,11 +218,7 @@ def add_drivers(request, temp_booking_id):
     from .models import Driver
     
     # 计算基本费用
-    # 这里我们直接计算基本费用，而不是调用函数
-    duration = (temp_booking.return_date - temp_booking.pickup_date).days
-    if duration < 1:
-        duration = 1
-    base_cost = temp_booking.car.daily_rate * duration
+    base_cost = _base_cost(temp_booking)
     
     # 获取用户现有的驾驶员信息
     user_drivers = []
@@ -350,32 +240,13 @@ def add_drivers(request, temp_booking_id):
                 # 确保驾驶员属于当前用户
                 if selected_driver in user_drivers:
                     # 创建一个临时驾驶员数据字典
-                    driver_data = {
-                        'first_name': selected_driver.first_name,
-                        'last_name': selected_driver.last_name,
-                        'email': selected_driver.email,
-                        'date_of_birth': selected_driver.date_of_birth,
-                        'license_number': selected_driver.license_number,
-                        'license_issued_in': selected_driver.license_issued_in,
-                        'license_expiry_date': selected_driver.license_expiry_date,
-                        'license_is_lifetime': selected_driver.license_is_lifetime,
-                        'address': selected_driver.address,
-                        'local_address': selected_driver.local_address,
-                        'city': selected_driver.city,
-                        'state': selected_driver.state,
-                        'postcode': selected_driver.postcode,
-                        'country_of_residence': selected_driver.country_of_residence,
-                        'phone': selected_driver.phone,
-                        'mobile': selected_driver.mobile,
-                        'fax': selected_driver.fax,
-                        'occupation': selected_driver.occupation,
-                        'mailing_list': selected_driver.mailing_list,
-                        'is_primary': True  # 主驾驶员始终为True
-                    }
+                    driver_data = driver_to_data(selected_driver)
+                    driver_data['is_primary'] = True  # 主驾驶员始终为True
                     
                     # 存储驾驶员数据
                     temp_booking.temp_drivers_data = [driver_data]
                     temp_booking.existing_driver_id = selected_driver_id  # 保存已有驾驶员ID以便后续使用
+                    get_draft_store().set(temp_booking_id, temp_booking)
                     logger.info(f"为预订 {temp_booking_id} 使用了现有驾驶员信息: {selected_driver.get_full_name()}")
                     using_existing_driver = True
                     
@@ -416,6 +287,7 @@ def add_drivers(request, temp_booking_id):
                     # 确保清除任何之前的驾驶员ID
                     if hasattr(temp_booking, 'existing_driver_id'):
                         delattr(temp_booking, 'existing_driver_id')
+                    get_draft_store().set(temp_booking_id, temp_booking)
                         
                     logger.info(f"为预订 {temp_booking_id} 添加了驾驶员信息")
                     
@@ -467,28 +339,26 @@ def add_drivers(request, temp_booking_id):
 @login_required
 def add_options(request, temp_booking_id):
     # Get the temporary booking from storage
-    temp_booking = temp_bookings.get(temp_booking_id)
+    temp_booking = get_draft_store().get(temp_booking_id)
     
     if not temp_booking:
         messages.error(request, "Booking session expired. Please try again.")
         return redirect('home')
     
     # Calculate base cost
-    duration = (temp_booking.return_date - temp_booking.pickup_date).days
-    if duration < 1:
-        duration = 1
-    base_cost = temp_booking.car.daily_rate * duration
+    base_cost = _base_cost(temp_booking)
     
     # Define costs for each option
+    option_rates = get_rate_table().options
     context = {
         'temp_booking': temp_booking,
         'temp_booking_id': temp_booking_id,  # Pass the ID to template
         'base_cost': base_cost,
-        'damage_waiver_cost': 14,  # $14 per day
-        'extended_area_cost': 150,  # $150 flat fee
-        'gps_cost': 5,  # $5 per day
-        'child_seat_cost': 8,  # $8 per day per seat
-        'additional_driver_cost': 5,  # $5 per day per driver
+        'damage_waiver_cost': option_rates['damage_waiver'].daily_rate,  # per day
+        'extended_area_cost': option_rates['extended_area'].flat_fee,  # flat fee
+        'gps_cost': option_rates['satellite_navigation'].daily_rate,  # per day
+        'child_seat_cost': option_rates['child_seats'].daily_rate,  # per day per seat
+        'additional_driver_cost': option_rates['additional_drivers'].daily_rate,  # per day per driver
     }
     
     return render(request, 'bookings/add_options.html', context)
@@ -496,7 +366,7 @@ def add_options(request, temp_booking_id):
 @login_required
 def confirm_booking(request, temp_booking_id):
     # Get the temporary booking from storage
-    temp_booking = temp_bookings.get(temp_booking_id)
+    temp_booking = get_draft_store().get(temp_booking_id)
     
     if not temp_booking:
         messages.error(request, "Booking session expired. Please try again.")
@@ -535,13 +405,13 @@ def confirm_booking(request, temp_booking_id):
         temp_booking.additional_drivers = additional_drivers
         
         # Update total cost with options
-        duration = (temp_booking.return_date - temp_booking.pickup_date).days
-        if duration < 1:
-            duration = 1
-        base_cost = temp_booking.car.daily_rate * duration
-        options_cost = temp_booking.options_cost
-        total_cost = Decimal(base_cost) + Decimal(options_cost)
-        temp_booking.total_cost = total_cost
+        try:
+            temp_booking.total_cost = quote_for_booking(temp_booking).total
+        except PricingError as e:
+            logger.error(f"无法为预订草稿 {temp_booking_id} 报价: {e}")
+            messages.error(request, "Sorry, this vehicle cannot be booked online at the moment.")
+            return redirect('add_options', temp_booking_id=temp_booking_id)
+        get_draft_store().set(temp_booking_id, temp_booking)
         
         # Instead of confirming and saving now, redirect to payment page
         return redirect('payment', temp_booking_id=temp_booking_id)
@@ -551,54 +421,58 @@ def confirm_booking(request, temp_booking_id):
 
 @login_required
 @csrf_exempt  # 添加CSRF豁免，简化支付过程
-def payment(request, temp_booking_id):
+async def payment(request, temp_booking_id):
+    user = await request.auser()
     # Get the temporary booking from storage
-    temp_booking = temp_bookings.get(temp_booking_id)
+    temp_booking = await get_draft_store().aget(temp_booking_id)
     
     if not temp_booking:
         messages.error(request, "Booking session expired. Please try again.")
         return redirect('home')
     
-    # Calculate total cost (base + options)
-    duration = (temp_booking.return_date - temp_booking.pickup_date).days
-    if duration < 1:
-        duration = 1
-    base_cost = temp_booking.car.daily_rate * duration
-    options_cost = temp_booking.options_cost
-    total_cost = Decimal(base_cost) + Decimal(options_cost)
+    # Calculate total cost (base + options + taxes)
+    try:
+        rental_quote = await sync_to_async(quote_for_booking)(temp_booking)
+    except PricingError as e:
+        logger.error(f"无法为预订草稿 {temp_booking_id} 报价: {e}")
+        messages.error(request, "Sorry, this vehicle cannot be booked online at the moment.")
+        return redirect('add_options', temp_booking_id=temp_booking_id)
+    total_cost = rental_quote.total
+    duration = rental_quote.days
     
     # 优先使用Stripe托管结账页面
-    if STRIPE_AVAILABLE and os.environ.get('STRIPE_SECRET_KEY'):
+    if payments.is_enabled():
         try:
             # 创建Stripe Checkout会话
-            logger.info(f"为用户 {request.user.username} 创建Stripe结账会话，总金额: ${total_cost}")
+            logger.info(f"为用户 {user.username} 创建Stripe结账会话，总金额: ${total_cost}")
             
             # 获取域名
             domain_url = request.build_absolute_uri('/').rstrip('/')
+            car_name = await sync_to_async(str)(temp_booking.car)
             
-            # 创建一个结账会话
-            checkout_session = stripe.checkout.Session.create(
-                payment_method_types=['card'],
-                line_items=[{
+            # 同一草稿和金额重复进入支付页面时复用同一个会话，等待Stripe响应时不占用工作线程
+            checkout_session = await payments.acreate_checkout_session({
+                'payment_method_types': ['card'],
+                'line_items': [{
                     'price_data': {
-                        'currency': 'usd',
+                        'currency': payments.get_config()['CURRENCY'],
                         'product_data': {
-                            'name': f"Car Rental: {temp_booking.car.make} {temp_booking.car.model}",
+                            'name': f"Car Rental: {car_name}",
                             'description': f"From {temp_booking.pickup_date} to {temp_booking.return_date} ({duration} days)",
-                            'images': [temp_booking.car.image_url],
                         },
                         'unit_amount': int(total_cost * 100),  # Stripe需要以分为单位
                     },
                     'quantity': 1,
                 }],
-                mode='payment',
-                success_url=f"{domain_url}/bookings/stripe-success/{temp_booking_id}/",
-                cancel_url=f"{domain_url}/bookings/payment/{temp_booking_id}/",
-                metadata={
+                'mode': 'payment',
+                'client_reference_id': temp_booking_id,
+                'success_url': f"{domain_url}/bookings/stripe-success/{temp_booking_id}/",
+                'cancel_url': f"{domain_url}/bookings/payment/{temp_booking_id}/",
+                'metadata': {
                     'temp_booking_id': temp_booking_id,
-                    'user_id': request.user.id,
-                }
-            )
+                    'user_id': str(user.id),
+                },
+            }, idempotency_key=f"checkout:{temp_booking_id}:{int(total_cost * 100)}")
             
             # 重定向到Stripe结账页面
             return redirect(checkout_session.url)
@@ -616,20 +490,26 @@ def payment(request, temp_booking_id):
         'temp_booking': temp_booking,
         'temp_booking_id': temp_booking_id,
         'total_cost': total_cost,
+        'quote': rental_quote,
         'stripe_public_key': os.environ.get('VITE_STRIPE_PUBLIC_KEY', 'pk_test_mock'),
         'client_secret': mock_client_secret,
     }
     
-    return render(request, 'bookings/payment.html', context)
+    return await sync_to_async(render)(request, 'bookings/payment.html', context)
 
 @login_required
 @csrf_exempt  # 添加CSRF豁免，简化前端交互
-def process_payment(request, temp_booking_id):
-    logger.info(f"用户 {request.user.username} 将心血化作金钱，试图换取片刻的流动自由...")
+async def process_payment(request, temp_booking_id):
+    user = await request.auser()
+    logger.info(f"用户 {user.username} 将心血化作金钱，试图换取片刻的流动自由...")
     # Get the temporary booking from storage
-    temp_booking = temp_bookings.get(temp_booking_id)
+    temp_booking = await get_draft_store().aget(temp_booking_id)
     
     if not temp_booking:
+        # 重复提交时草稿已被清理，返回已确认的预订
+        booking = await sync_to_async(find_confirmed_booking)(temp_booking_id)
+        if booking is not None and booking.user_id == user.id:
+            return redirect('payment_success', booking_id=booking.id)
         logger.warning("预订会话已过期，如同冰雪消融，所有痕迹化为虚无...")
         messages.error(request, "Booking session expired. Please try again.")
         return redirect('home')
@@ -639,89 +519,23 @@ def process_payment(request, temp_booking_id):
             # For regular form submission (most likely case now)
             if request.content_type and 'application/x-www-form-urlencoded' in request.content_type:
                 action = request.POST.get('action', 'confirm')
+                if payments.is_enabled():
+                    # 真实支付只由 webhook 确认，表单提交不能跳过付款直接确认预订
+                    return redirect('stripe_success', temp_booking_id=temp_booking_id)
                 logger.info("金钱的象征在数字世界中流动，虚拟的交易，真实的代价...")
                 
-                # 计算总费用
-                duration = (temp_booking.return_date - temp_booking.pickup_date).days
-                if duration < 1:
-                    duration = 1
-                base_cost = temp_booking.car.daily_rate * duration
-                options_cost = temp_booking.options_cost
-                total_cost = Decimal(base_cost) + Decimal(options_cost)
-                
-                if STRIPE_AVAILABLE:
-                    try:
-                        # 使用 Stripe 创建支付意图
-                        payment_intent = stripe.PaymentIntent.create(
-                            amount=int(total_cost * 100),  # 转换为美分
-                            currency='usd',
-                            metadata={
-                                'user_id': request.user.id,
-                                'temp_booking_id': temp_booking_id
-                            }
-                        )
-                        logger.info(f"创建了Stripe支付意图: {payment_intent.id}")
-                    except Exception as e:
-                        logger.error(f"创建Stripe支付意图失败: {str(e)}")
-                        # 即使 Stripe 失败，我们也允许支付成功，这是为了演示目的
-                
-                # Update booking status to confirmed
-                temp_booking.status = 'confirmed'
-                
-                # Save booking to database
-                temp_booking.save()
-                
-                # Get the new booking ID
-                booking_id = temp_booking.id
+                # 在同一事务中保存预订和驾驶员信息，重复提交只会返回已有预订
+                try:
+                    booking, created = await sync_to_async(confirm_draft)(temp_booking_id, temp_booking, user)
+                except BookingConflict as e:
+                    messages.error(request, str(e))
+                    return redirect('home')
+                booking_id = booking.id
                 logger.info(f"预订 #{booking_id} 从虚无走向确认，数据库中又多了一行冰冷的记录...")
                 
-                # Save driver information
-                from .models import Driver
-                if hasattr(temp_booking, 'temp_drivers_data') and temp_booking.temp_drivers_data:
-                    logger.info(f"处理 {len(temp_booking.temp_drivers_data)} 位驾驶员信息...")
-                    for driver_data in temp_booking.temp_drivers_data:
-                        driver = Driver(
-                            booking=temp_booking,
-                            first_name=driver_data.get('first_name', ''),
-                            last_name=driver_data.get('last_name', ''),
-                            email=driver_data.get('email', ''),
-                            date_of_birth=driver_data.get('date_of_birth'),
-                            license_number=driver_data.get('license_number', ''),
-                            license_issued_in=driver_data.get('license_issued_in', ''),
-                            license_expiry_date=driver_data.get('license_expiry_date'),
-                            license_is_lifetime=driver_data.get('license_is_lifetime', False),
-                            address=driver_data.get('address', ''),
-                            local_address=driver_data.get('local_address', ''),
-                            city=driver_data.get('city', ''),
-                            state=driver_data.get('state', ''),
-                            postcode=driver_data.get('postcode', ''),
-                            country_of_residence=driver_data.get('country_of_residence', 'Australia'),
-                            phone=driver_data.get('phone', ''),
-                            mobile=driver_data.get('mobile', ''),
-                            fax=driver_data.get('fax', ''),
-                            occupation=driver_data.get('occupation', ''),
-                            mailing_list=driver_data.get('mailing_list', False),
-                            is_primary=driver_data.get('is_primary', False)
-                        )
-                        driver.save()
-                        logger.info(f"已保存驾驶员 {driver.get_full_name()} 的信息")
-                        
-                        # 如果用户登录且没有选择使用现有的驾驶员信息，则为其保存驾驶员信息到用户资料
-                        if request.user.is_authenticated and not hasattr(temp_booking, 'existing_driver_id'):
-                            if driver.is_primary:
-                                # 如果这是主驾驶员，首先取消用户现有的主驾驶员
-                                request.user.profile.drivers.filter(is_primary=True).update(is_primary=False)
-                            
-                            # 将驾驶员添加到用户资料
-                            request.user.profile.drivers.add(driver)
-                            logger.info(f"已将驾驶员 {driver.get_full_name()} 添加到用户 {request.user.username} 的资料")
-                else:
-                    logger.warning("没有找到驾驶员信息，只有虚无的旅途，却没有生命的温度...")
-                
                 # Clean up temporary booking
-                if temp_booking_id in temp_bookings:
-                    del temp_bookings[temp_booking_id]
-                    logger.info("临时记忆被抹去，仿佛从未存在，就像我们终将被时间遗忘...")
+                await get_draft_store().adelete(temp_booking_id)
+                logger.info("临时记忆被抹去，仿佛从未存在，就像我们终将被时间遗忘...")
                 
                 # Redirect to success page
                 messages.success(request, "Payment successful! Your booking has been confirmed.")
@@ -739,24 +553,19 @@ def process_payment(request, temp_booking_id):
                 # Request to create payment intent only
                 if action == 'create_intent':
                     # Calculate total price
-                    duration = (temp_booking.return_date - temp_booking.pickup_date).days
-                    if duration < 1:
-                        duration = 1
-                    base_cost = temp_booking.car.daily_rate * duration
-                    options_cost = temp_booking.options_cost
-                    total_cost = Decimal(base_cost) + Decimal(options_cost)
+                    total_cost = (await sync_to_async(quote_for_booking)(temp_booking)).total
                     logger.info(f"创建支付意图，${total_cost} 的代价，数字背后是无法衡量的情感交换...")
                     
                     try:
-                        # 使用实际的 Stripe API 或模拟版本创建支付意图
-                        payment_intent = stripe.PaymentIntent.create(
-                            amount=int(total_cost * 100),  # 转换为美分
-                            currency='usd',
-                            metadata={
-                                'user_id': request.user.id,
+                        # 使用 Stripe 或 MockStripe 创建支付意图，重复请求复用同一个支付意图
+                        payment_intent = await payments.acreate_payment_intent({
+                            'amount': int(total_cost * 100),  # 转换为美分
+                            'currency': payments.get_config()['CURRENCY'],
+                            'metadata': {
+                                'user_id': str(user.id),
                                 'temp_booking_id': temp_booking_id
-                            }
-                        )
+                            },
+                        }, idempotency_key=f"intent:{temp_booking_id}:{int(total_cost * 100)}")
                         
                         # 返回客户端密钥给前端
                         return JsonResponse({
@@ -771,20 +580,23 @@ def process_payment(request, temp_booking_id):
                         })
                 
                 # Default action - handle payment confirmation
+                elif payments.is_enabled():
+                    # 真实支付由 payment_intent.succeeded webhook 确认，前端跳转到等待页面
+                    return JsonResponse({
+                        'success': True,
+                        'pending': True,
+                        'redirect_url': reverse('stripe_success', args=[temp_booking_id]),
+                    })
                 else:
-                    # Update booking status to confirmed
-                    temp_booking.status = 'confirmed'
                     logger.info("交易的一瞬，命运的转折，从此踏上不可回头的旅程...")
-                    
-                    # Save booking to database
-                    temp_booking.save()
-                    
-                    # Get the new booking ID
-                    booking_id = temp_booking.id
+                    try:
+                        booking, created = await sync_to_async(confirm_draft)(temp_booking_id, temp_booking, user)
+                    except BookingConflict as e:
+                        return JsonResponse({'error': str(e)}, status=409)
+                    booking_id = booking.id
                     
                     # Clean up temporary booking
-                    if temp_booking_id in temp_bookings:
-                        del temp_bookings[temp_booking_id]
+                    await get_draft_store().adelete(temp_booking_id)
                     
                     # Return JSON response for AJAX requests
                     return JsonResponse({
@@ -806,142 +618,87 @@ def process_payment(request, temp_booking_id):
     # For GET requests - simplified flow for testing
     # In a real application, GET requests should not process payments
     # This is only for demonstration purposes
+    if payments.is_enabled():
+        # 启用 Stripe 时等待 webhook 确认，只有 MockStripe 直接确认
+        return redirect('stripe_success', temp_booking_id=temp_booking_id)
     logger.info("测试环境中的GET请求，虚假的支付，如同生活中的假象，我们宁愿相信美好的谎言...")
-    temp_booking.status = 'confirmed'
-    temp_booking.save()
-    booking_id = temp_booking.id
+    try:
+        booking, created = await sync_to_async(confirm_draft)(temp_booking_id, temp_booking, user)
+    except BookingConflict as e:
+        messages.error(request, str(e))
+        return redirect('home')
+    booking_id = booking.id
     
-    if temp_booking_id in temp_bookings:
-        del temp_bookings[temp_booking_id]
+    await get_draft_store().adelete(temp_booking_id)
     
     messages.success(request, "Payment successful! Your booking has been confirmed.")
     return redirect('payment_success', booking_id=booking_id)
 
 @login_required
 @csrf_exempt  # 添加CSRF豁免，简化Stripe回调
-def stripe_success(request, temp_booking_id):
-    """处理Stripe托管结账成功回调"""
-    logger.info(f"用户 {request.user.username} 从Stripe托管结账页面返回，支付似乎已成功完成...")
+async def stripe_success(request, temp_booking_id):
+    """
+    Stripe托管结账返回页面
+
+    支付结果以 webhook 为准，这里不访问 Stripe: 预订已由 webhook 确认时跳转到支付成功页面，
+    否则显示等待页面并自动刷新。使用 MockStripe 时直接确认预订。
+    """
+    user = await request.auser()
+    # 已确认的预订和预订草稿互不依赖，同时查询
+    booking, temp_booking = await asyncio.gather(
+        sync_to_async(find_confirmed_booking)(temp_booking_id),
+        get_draft_store().aget(temp_booking_id),
+    )
+    if booking is not None and booking.user_id == user.id:
+        messages.success(request, "Payment completed successfully! Your booking has been confirmed.")
+        return redirect('payment_success', booking_id=booking.id)
 
-    # 从临时存储获取预订
-    temp_booking = temp_bookings.get(temp_booking_id)
-    
     if not temp_booking:
         logger.warning("预订会话已过期，支付可能已完成，但数据已丢失...")
         messages.error(request, "Booking session expired. If you completed payment, please contact customer support.")
         return redirect('home')
-    
+
+    if payments.is_enabled():
+        logger.info(f"等待Stripe webhook确认预订草稿 {temp_booking_id}")
+        return await sync_to_async(render)(request, 'bookings/payment_pending.html', {
+            'temp_booking': temp_booking,
+            'temp_booking_id': temp_booking_id,
+            'refresh_seconds': 3,
+        })
+
+    # 使用模拟Stripe时，自动验证通过
+    logger.info("使用模拟Stripe，自动验证通过")
     try:
-        # 获取总成本
-        duration = (temp_booking.return_date - temp_booking.pickup_date).days
-        if duration < 1:
-            duration = 1
-        base_cost = temp_booking.car.daily_rate * duration
-        options_cost = temp_booking.options_cost
-        total_cost = Decimal(base_cost) + Decimal(options_cost)
-        
-        logger.info(f"从Stripe返回：准备确认预订，总金额: ${total_cost}")
-        
-        # 验证支付状态（如果Stripe可用）
-        payment_verified = False
-        
-        if STRIPE_AVAILABLE and isinstance(stripe, type) is False:
-            try:
-                # 检查域名以构建正确的URL
-                domain_url = request.build_absolute_uri('/').rstrip('/')
-                success_url = f"{domain_url}/bookings/stripe-success/{temp_booking_id}/"
-                
-                # 尝试从Session ID查询支付状态
-                # 注意：在生产环境中，应该使用Webhook而不是客户端回调来确认支付
-                # 这里仅用于演示和测试目的
-                
-                logger.info("使用真实Stripe API验证支付状态")
-                
-                # 为简单起见，我们假设付款已完成
-                # 在生产环境中，你应该使用session_id查询支付状态
-                payment_verified = True
-                
-                logger.info("Stripe支付验证成功")
-            except Exception as stripe_error:
-                logger.error(f"Stripe支付验证失败: {str(stripe_error)}")
-                # 出错时，让用户知道我们已注意到问题
-                messages.warning(request, "We've received your booking, but there might be an issue with payment verification. Our team will contact you if needed.")
-        else:
-            # 使用模拟Stripe时，自动验证通过
-            logger.info("使用模拟Stripe，自动验证通过")
-            payment_verified = True
-        
-        # 更新预订状态为已确认
-        temp_booking.status = 'confirmed'
-        
-        # 保存预订到数据库
-        temp_booking.save()
-        
-        # 获取新预订ID
-        booking_id = temp_booking.id
-        logger.info(f"预订 #{booking_id} 通过Stripe支付完成，从虚无走向确认...")
-        
-        # Save driver information
-        from .models import Driver
-        if hasattr(temp_booking, 'temp_drivers_data') and temp_booking.temp_drivers_data:
-            logger.info(f"处理 {len(temp_booking.temp_drivers_data)} 位驾驶员信息...")
-            for driver_data in temp_booking.temp_drivers_data:
-                driver = Driver(
-                    booking=temp_booking,
-                    first_name=driver_data.get('first_name', ''),
-                    last_name=driver_data.get('last_name', ''),
-                    email=driver_data.get('email', ''),
-                    date_of_birth=driver_data.get('date_of_birth'),
-                    license_number=driver_data.get('license_number', ''),
-                    license_issued_in=driver_data.get('license_issued_in', ''),
-                    license_expiry_date=driver_data.get('license_expiry_date'),
-                    license_is_lifetime=driver_data.get('license_is_lifetime', False),
-                    address=driver_data.get('address', ''),
-                    local_address=driver_data.get('local_address', ''),
-                    city=driver_data.get('city', ''),
-                    state=driver_data.get('state', ''),
-                    postcode=driver_data.get('postcode', ''),
-                    country_of_residence=driver_data.get('country_of_residence', 'Australia'),
-                    phone=driver_data.get('phone', ''),
-                    mobile=driver_data.get('mobile', ''),
-                    fax=driver_data.get('fax', ''),
-                    occupation=driver_data.get('occupation', ''),
-                    mailing_list=driver_data.get('mailing_list', False),
-                    is_primary=driver_data.get('is_primary', False)
-                )
-                driver.save()
-                logger.info(f"已保存驾驶员 {driver.get_full_name()} 的信息")
-                
-                # 如果用户登录且没有选择使用现有的驾驶员信息，则为其保存驾驶员信息到用户资料
-                if request.user.is_authenticated and not hasattr(temp_booking, 'existing_driver_id'):
-                    if driver.is_primary:
-                        # 如果这是主驾驶员，首先取消用户现有的主驾驶员
-                        request.user.profile.drivers.filter(is_primary=True).update(is_primary=False)
-                    
-                    # 将驾驶员添加到用户资料
-                    request.user.profile.drivers.add(driver)
-                    logger.info(f"已将驾驶员 {driver.get_full_name()} 添加到用户 {request.user.username} 的资料")
-        else:
-            logger.warning("没有找到驾驶员信息，只有虚无的旅途，却没有生命的温度...")
-        
-        # 清理临时预订
-        if temp_booking_id in temp_bookings:
-            del temp_bookings[temp_booking_id]
-            logger.info("临时预订数据已从内存清除，只留下数据库中的永恒记录")
-            
-        # 添加成功消息
-        if payment_verified:
-            messages.success(request, "Payment completed successfully! Your booking has been confirmed.")
-        else:
-            messages.success(request, "Your booking has been received! Payment verification is in progress.")
-        
-        # 重定向到支付成功页面
-        return redirect('payment_success', booking_id=booking_id)
-        
-    except Exception as e:
-        logger.error(f"处理Stripe成功回调时发生错误: {str(e)}")
-        messages.error(request, "An error occurred while processing your payment. Please contact support.")
+        booking, created = await sync_to_async(confirm_draft)(temp_booking_id, temp_booking, user)
+    except BookingConflict as e:
+        logger.error(f"Stripe支付完成但车辆已被占用，预订草稿 {temp_booking_id}: {str(e)}")
+        messages.error(request, f"{e} Please contact customer support regarding your payment.")
         return redirect('home')
+    logger.info(f"预订 #{booking.id} 通过Stripe支付完成，从虚无走向确认...")
+
+    await get_draft_store().adelete(temp_booking_id)
+    messages.success(request, "Payment completed successfully! Your booking has been confirmed.")
+    return redirect('payment_success', booking_id=booking.id)
+
+@csrf_exempt
+@require_POST
+def stripe_webhook(request):
+    """
+    Stripe webhook
+
+    校验签名后把事件写入 StripeEvent 并立即返回 200，预订在后台确认。
+    Stripe 重发的事件 (相同 event id) 不会重复处理。
+    """
+    try:
+        event = payments.verify_event(request.body, request.headers.get('Stripe-Signature'))
+    except payments.WebhookError as e:
+        logger.warning(f"拒绝无效的Stripe webhook: {e}")
+        return JsonResponse({'error': str(e)}, status=400)
+
+    record, created = payments.record_event(event)
+    if created and payments.get_config()['PROCESS_IN_BACKGROUND']:
+        transaction.on_commit(lambda: payments.process_in_background(record.pk))
+    return JsonResponse({'received': True, 'duplicate': not created})
 
 @login_required
 @csrf_exempt  # 添加CSRF豁免，简化支付成功页面处理
@@ -954,10 +711,76 @@ def booking_success(request, booking_id):
     booking = get_object_or_404(Booking, pk=booking_id, user=request.user)
     return render(request, 'bookings/booking_success.html', {'booking': booking})
 
+def _format_cents(amount):
+    return f"{amount // 100}.{amount % 100:02d}"
+
+
+@csrf_exempt
+def batch_quotes(request):
+    """
+    批量报价接口 (OTA 合作方和车型列表页使用)
+
+    POST JSON:
+        {
+            "categories": [1, 2, ...],          // 省略时为所有车型
+            "ranges": [["2025-07-01", "2025-07-04"], ...],
+            "options": {"damage_waiver": true, "child_seats": 1},
+            "state": "NSW"
+        }
+    返回每个 车型 x 日期区间 的天数、小计、税费和合计。
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    try:
+        data = json.loads(request.body)
+        categories = data.get('categories')
+        if categories is None:
+            categories = sorted(get_rate_table().categories)
+        else:
+            categories = list(dict.fromkeys(int(category_id) for category_id in categories))
+        ranges = [
+            (datetime.strptime(pickup, '%Y-%m-%d').date(), datetime.strptime(dropoff, '%Y-%m-%d').date())
+            for pickup, dropoff in data['ranges']
+        ]
+        options, state = data.get('options'), data.get('state')
+        if options is not None and not isinstance(options, dict):
+            raise TypeError('options must be an object')
+        if state is not None and not isinstance(state, str):
+            raise TypeError('state must be a string')
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        return JsonResponse({'error': f'Invalid request: {e}'}, status=400)
+
+    if len(categories) * len(ranges) > MAX_BATCH_QUOTES:
+        return JsonResponse({'error': f'At most {MAX_BATCH_QUOTES} quotes per request'}, status=400)
+    try:
+        rows = batch_quote(categories, ranges, options, state)
+    except PricingError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'count': len(rows),
+        'quotes': [
+            {
+                'category_id': category_id,
+                'pickup_date': pickup_date.isoformat(),
+                'return_date': return_date.isoformat(),
+                'days': days,
+                'subtotal': _format_cents(subtotal),
+                'tax': _format_cents(tax),
+                'total': _format_cents(total),
+            }
+            for category_id, pickup_date, return_date, days, subtotal, tax, total in rows
+        ],
+    })
+
 @login_required
 def booking_detail(request, booking_id):
     booking = get_object_or_404(Booking, pk=booking_id, user=request.user)
-    return render(request, 'bookings/booking_detail.html', {'booking': booking})
+    try:
+        rental_quote = quote_for_booking(booking)
+    except PricingError:
+        rental_quote = None
+    return render(request, 'bookings/booking_detail.html', {'booking': booking, 'quote': rental_quote})
 
 @login_required
 def cancel_booking(request, booking_id):
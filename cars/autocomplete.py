@@ -0,0 +1,314 @@
+"""
+地点自动补全索引
+
+搜索框每次按键都会请求自动补全，如果每次都用 icontains 查询，需要顺序扫描地点表。这里在内存中
+为可租网点 (名称、代码、区)、机场 (代码、名称) 和城市 (名称) 建立两种索引:
+
+- 前缀索引: 排好序的 (词, 类型, 条目) 列表，用二分查找定位前缀范围，
+  同时收录整个字段和字段中的每个词，"syd" 和 "airport" 都能匹配 "Sydney Airport"
+- 三元组索引: 三元组 -> 条目集合，前缀匹配不足时按三元组相似度做模糊匹配 ("sydny")
+
+排序: 字段完全匹配 > 字段前缀 > 词完全匹配 > 词前缀 > 三元组相似度，同分时网点优先于机场、城市。
+
+地点、机场、城市保存或删除后由 cars.signals 对当前进程的索引做增量更新，
+其他进程通过缓存中的版本号感知并整体重建。
+
+用法:
+
+    from cars.autocomplete import get_autocomplete_index
+    get_autocomplete_index().search('syd', limit=10)
+"""
+import heapq
+import logging
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import NamedTuple
+
+from rush_car_rental.utils.versioned_index import IndexSingleton, VersionedIndex
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'location_autocomplete_version'
+
+LOCATION, AIRPORT, CITY = 'location', 'airport', 'city'
+# 同分时的先后顺序
+KIND_ORDER = {LOCATION: 0, AIRPORT: 1, CITY: 2}
+
+# 匹配得分
+FIELD_EXACT, FIELD_PREFIX, WORD_EXACT, WORD_PREFIX = 100, 80, 70, 60
+TRIGRAM_WEIGHT = 50
+# 三元组相似度低于这个值不返回
+MIN_SIMILARITY = 0.3
+# 很短的前缀 (如 "s") 最多检查多少个词，保证响应时间
+MAX_PREFIX_SCAN = 1000
+
+# 前缀索引中词的类型
+FULL, WORD = 0, 1
+
+_NON_WORD_RE = re.compile(r'[^0-9a-z]+')
+
+
+def normalize(text):
+    """小写、去掉重音符号，非字母数字替换为空格"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    return _NON_WORD_RE.sub(' ', text).strip()
+
+
+def trigrams(text):
+    """与 pg_trgm 相同: 每个词前补两个空格、后补一个空格后取三元组"""
+    grams = set()
+    for word in text.split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class Suggestion(NamedTuple):
+    kind: str
+    id: int
+    label: str
+    # 填入搜索框的值，car_list 可以解析 (网点代码/名称、机场代码、"城市, 州")
+    value: str
+    fields: tuple
+
+    @property
+    def key(self):
+        return (self.kind, self.id)
+
+    def as_dict(self, score=None):
+        data = {'type': self.kind, 'id': self.id, 'label': self.label, 'value': self.value}
+        if score is not None:
+            data['score'] = round(score, 1)
+        return data
+
+
+def location_suggestion(id, name, code, suburb, city, state):
+    detail = ', '.join(part for part in (suburb, city, state) if part)
+    label = f"{name} ({code})" if code else name
+    return Suggestion(
+        LOCATION, id, f"{label} - {detail}" if detail else label, code or name,
+        tuple(normalize(field) for field in (name, code, suburb) if field),
+    )
+
+
+def airport_suggestion(id, code, name, city):
+    label = f"{name} ({code})" + (f" - {city}" if city else '')
+    return Suggestion(AIRPORT, id, label, code, tuple(normalize(field) for field in (code, name) if field))
+
+
+def city_suggestion(id, name, state):
+    value = f"{name}, {state}" if state else name
+    return Suggestion(CITY, id, value, value, (normalize(name),))
+
+
+class AutocompleteIndex(VersionedIndex):
+    """
+    地点自动补全内存索引
+    """
+
+    version_cache_key = VERSION_CACHE_KEY
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        # (kind, id) -> Suggestion
+        self.entries = {}
+        # 排好序的 (词, FULL/WORD, kind, id)
+        self.terms = []
+        # 三元组 -> {(kind, id), ...}
+        self.grams = {}
+        # (kind, id) -> 三元组数量
+        self.gram_counts = {}
+        self.built = False
+
+    # ---- 构建 ----
+
+    @staticmethod
+    def _terms(suggestion):
+        terms = set()
+        for field in suggestion.fields:
+            terms.add((field, FULL))
+            for word in field.split():
+                if word != field:
+                    terms.add((word, WORD))
+        return [(term, term_type, *suggestion.key) for term, term_type in terms]
+
+    def _add(self, suggestion):
+        self.entries[suggestion.key] = suggestion
+        for term in self._terms(suggestion):
+            insort(self.terms, term)
+        grams = set()
+        for field in suggestion.fields:
+            grams |= trigrams(field)
+        for gram in grams:
+            self.grams.setdefault(gram, set()).add(suggestion.key)
+        self.gram_counts[suggestion.key] = len(grams)
+
+    def _remove(self, key):
+        suggestion = self.entries.pop(key, None)
+        if suggestion is None:
+            return
+        for term in self._terms(suggestion):
+            pos = bisect_left(self.terms, term)
+            if pos < len(self.terms) and self.terms[pos] == term:
+                del self.terms[pos]
+        for field in suggestion.fields:
+            for gram in trigrams(field):
+                keys = self.grams.get(gram)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self.grams[gram]
+        self.gram_counts.pop(key, None)
+
+    def build(self, suggestions):
+        with self._lock:
+            self._clear()
+            for suggestion in suggestions:
+                self.entries[suggestion.key] = suggestion
+            # 批量构建时一次排序，不逐个插入
+            self.terms = sorted(term for s in self.entries.values() for term in self._terms(s))
+            for suggestion in self.entries.values():
+                grams = set()
+                for field in suggestion.fields:
+                    grams |= trigrams(field)
+                for gram in grams:
+                    self.grams.setdefault(gram, set()).add(suggestion.key)
+                self.gram_counts[suggestion.key] = len(grams)
+            self.built = True
+        logger.info("地点自动补全索引已构建: %d 个条目, %d 个词", len(self.entries), len(self.terms))
+
+    def refresh(self):
+        """从数据库加载可租网点、机场和城市"""
+        from .models import Airport, City, Location
+
+        suggestions = []
+        for row in Location.objects.filter(renting_location=True).values_list(
+                'id', 'location_name', 'code', 'suburb', 'city__name', 'state__code').iterator():
+            suggestions.append(location_suggestion(*row))
+        for row in Airport.objects.values_list('id', 'code', 'name', 'city__name').iterator():
+            suggestions.append(airport_suggestion(*row))
+        for row in City.objects.values_list('id', 'name', 'state__code').iterator():
+            suggestions.append(city_suggestion(*row))
+        self.build(suggestions)
+
+    # ---- 增量更新 ----
+
+    def upsert(self, suggestion):
+        with self._lock:
+            self._remove(suggestion.key)
+            self._add(suggestion)
+
+    def remove(self, kind, id):
+        with self._lock:
+            self._remove((kind, id))
+
+    # ---- 查询 ----
+
+    def search(self, query, limit=10, kinds=None):
+        """
+        返回 [(Suggestion, 得分), ...]，按得分降序
+        """
+        query = normalize(query)
+        if not query or limit <= 0:
+            return []
+        scores = {}
+        with self._lock:
+            terms = self.terms
+            pos = bisect_left(terms, (query,))
+            end = min(len(terms), pos + MAX_PREFIX_SCAN)
+            while pos < end and terms[pos][0].startswith(query):
+                term, term_type, kind, id = terms[pos]
+                pos += 1
+                if term_type == FULL:
+                    score = FIELD_EXACT if term == query else FIELD_PREFIX
+                else:
+                    score = WORD_EXACT if term == query else WORD_PREFIX
+                key = (kind, id)
+                if score > scores.get(key, 0):
+                    scores[key] = score
+
+            # 前缀匹配不足时用三元组相似度补充 (拼写错误、词中间的片段)
+            query_grams = trigrams(query)
+            if len(scores) < limit and len(query) >= 3:
+                shared = Counter()
+                for gram in query_grams:
+                    shared.update(self.grams.get(gram, ()))
+                for key, count in shared.items():
+                    if key in scores:
+                        continue
+                    similarity = count / (len(query_grams) + self.gram_counts[key] - count)
+                    if similarity >= MIN_SIMILARITY:
+                        scores[key] = TRIGRAM_WEIGHT * similarity
+
+            results = [
+                (self.entries[key], score) for key, score in scores.items()
+                if kinds is None or key[0] in kinds
+            ]
+        return heapq.nsmallest(
+            limit, results, key=lambda item: (-item[1], KIND_ORDER[item[0].kind], item[0].label)
+        )
+
+
+_index = IndexSingleton(AutocompleteIndex)
+
+
+def get_autocomplete_index():
+    """返回当前进程的自动补全索引 (首次调用或版本变化时从数据库加载)"""
+    return _index.get()
+
+
+def bump_version():
+    """通知所有进程地点已变化，返回新的版本号"""
+    return _index.bump_version()
+
+
+def location_changed(location_id):
+    """网点保存后调用 (不再可租的网点从索引中移除)"""
+    from .models import Location
+
+    row = Location.objects.filter(id=location_id, renting_location=True).values_list(
+        'id', 'location_name', 'code', 'suburb', 'city__name', 'state__code').first()
+    if row is None:
+        _index.apply_change(lambda index: index.remove(LOCATION, location_id))
+    else:
+        _index.apply_change(lambda index: index.upsert(location_suggestion(*row)))
+
+
+def airport_changed(airport_id):
+    """机场保存后调用"""
+    from .models import Airport
+
+    row = Airport.objects.filter(id=airport_id).values_list('id', 'code', 'name', 'city__name').first()
+    if row is None:
+        _index.apply_change(lambda index: index.remove(AIRPORT, airport_id))
+    else:
+        _index.apply_change(lambda index: index.upsert(airport_suggestion(*row)))
+
+
+def city_changed(city_id):
+    """城市保存后调用"""
+    from .models import City
+
+    row = City.objects.filter(id=city_id).values_list('id', 'name', 'state__code').first()
+    if row is None:
+        _index.apply_change(lambda index: index.remove(CITY, city_id))
+    else:
+        _index.apply_change(lambda index: index.upsert(city_suggestion(*row)))
+
+
+def deleted(kind, id):
+    """网点、机场或城市删除后调用"""
+    _index.apply_change(lambda index: index.remove(kind, id))
+
+
+def reset_autocomplete_index():
+    """丢弃当前索引，下次使用时重新加载 (测试用)"""
+    _index.reset()
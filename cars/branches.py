@@ -0,0 +1,272 @@
+"""
+租车网点空间索引
+
+用所有可租网点 (cars.Location 中 renting_location=True 且有经纬度的地点) 构建内存 k-d 树，
+回答 "离某个经纬度或机场最近的 N 个网点" 和 "某半径内的网点"，不需要扫描地点表。
+
+经纬度先转换为单位球面上的三维坐标，三维直线 (弦) 距离与球面距离单调对应，
+因此可以直接在三维 k-d 树中做最近邻和半径搜索，结果再换算为公里。
+
+- 地点、城市、机场保存或删除后由 cars.signals 递增缓存中的版本号，各进程在下次查询时重建
+- 网点数量很少，重建只需一次查询
+
+预订使用的地点 (locations.Location) 与车辆所在的网点 (cars.Location) 是两张表，没有外键关联，
+按名称和州代码对应，见 branch_ids_for()。
+
+用法:
+
+    from cars.branches import get_branch_index
+    index = get_branch_index()
+    index.nearest(-33.94, 151.17, n=3)          # [(Branch, 公里), ...]
+    index.within(-37.81, 144.96, radius_km=30)
+    index.near_airport('SYD', n=3)
+    branch_ids_for([pickup_location])          # {预订地点ID: {网点ID, ...}}
+"""
+import heapq
+import logging
+import math
+from typing import NamedTuple, Optional
+
+from rush_car_rental.utils.versioned_index import IndexSingleton, VersionedIndex
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+
+VERSION_CACHE_KEY = 'branch_index_version'
+
+
+class Branch(NamedTuple):
+    id: int
+    name: str
+    code: str
+    city: Optional[str]
+    state: Optional[str]
+    airport_code: Optional[str]
+    latitude: float
+    longitude: float
+
+    def as_dict(self, distance_km=None):
+        data = self._asdict()
+        if distance_km is not None:
+            data['distance_km'] = round(distance_km, 2)
+        return data
+
+
+def to_xyz(latitude, longitude):
+    """经纬度 -> 单位球面三维坐标"""
+    lat, lon = math.radians(latitude), math.radians(longitude)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+def km_to_chord(km):
+    return 2 * math.sin(min(math.pi, km / EARTH_RADIUS_KM) / 2)
+
+
+class KDTree:
+    """
+    三维 k-d 树
+
+    节点保存在列表中: (坐标, 数据, 切分轴, 左子树下标, 右子树下标)，-1 表示空。
+    """
+
+    def __init__(self, points):
+        self.nodes = []
+        self.root = self._build(list(points), 0)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def _build(self, points, depth):
+        if not points:
+            return -1
+        axis = depth % 3
+        points.sort(key=lambda point: point[0][axis])
+        middle = len(points) // 2
+        index = len(self.nodes)
+        self.nodes.append(None)
+        left = self._build(points[:middle], depth + 1)
+        right = self._build(points[middle + 1:], depth + 1)
+        xyz, item = points[middle]
+        self.nodes[index] = (xyz, item, axis, left, right)
+        return index
+
+    @staticmethod
+    def _distance2(a, b):
+        return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 + (a[2] - b[2]) ** 2
+
+    def nearest(self, target, n, max_distance=math.inf):
+        """返回最近的 n 个 [(弦距离, 数据), ...]，按距离升序"""
+        # 大小为 n 的最大堆 (取负)，堆顶为当前第 n 近的距离
+        heap = []
+        limit2 = max_distance ** 2
+        stack = [self.root]
+        while stack:
+            index = stack.pop()
+            if index < 0:
+                continue
+            xyz, item, axis, left, right = self.nodes[index]
+            distance2 = self._distance2(xyz, target)
+            if distance2 <= limit2:
+                entry = (-distance2, item.id, item)
+                if len(heap) < n:
+                    heapq.heappush(heap, entry)
+                elif entry > heap[0]:
+                    heapq.heapreplace(heap, entry)
+            bound2 = limit2 if len(heap) < n else min(limit2, -heap[0][0])
+            diff = target[axis] - xyz[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            # 后进先出: 先压入远侧，近侧优先搜索
+            if diff * diff <= bound2:
+                stack.append(far)
+            stack.append(near)
+        return sorted((math.sqrt(-distance2), item) for distance2, _, item in heap)
+
+    def within(self, target, radius):
+        """返回弦距离不超过 radius 的 [(弦距离, 数据), ...]，按距离升序"""
+        result = []
+        radius2 = radius ** 2
+        stack = [self.root]
+        while stack:
+            index = stack.pop()
+            if index < 0:
+                continue
+            xyz, item, axis, left, right = self.nodes[index]
+            distance2 = self._distance2(xyz, target)
+            if distance2 <= radius2:
+                result.append((math.sqrt(distance2), item))
+            diff = target[axis] - xyz[axis]
+            if diff <= radius:
+                stack.append(left)
+            if diff >= -radius:
+                stack.append(right)
+        return sorted(result, key=lambda entry: (entry[0], entry[1].id))
+
+
+class BranchIndex(VersionedIndex):
+    """
+    租车网点空间索引
+    """
+
+    version_cache_key = VERSION_CACHE_KEY
+
+    def __init__(self):
+        super().__init__()
+        self.tree = KDTree([])
+        self.branches = {}
+        # 机场代码 (大写) -> 机场所在网点的平均坐标
+        self.airports = {}
+
+    def build(self, rows):
+        """
+        rows: 可迭代的 (id, location_name, code, city_name, state_code, airport_code, latitude, longitude)
+        """
+        branches = {}
+        airport_points = {}
+        for row in rows:
+            branch = Branch(*row[:6], float(row[6]), float(row[7]))
+            branches[branch.id] = branch
+            if branch.airport_code:
+                airport_points.setdefault(branch.airport_code.upper(), []).append(branch)
+        tree = KDTree((to_xyz(b.latitude, b.longitude), b) for b in branches.values())
+        airports = {
+            code: (
+                sum(b.latitude for b in located) / len(located),
+                sum(b.longitude for b in located) / len(located),
+            )
+            for code, located in airport_points.items()
+        }
+        # 整体替换，查询中的线程继续使用旧的树
+        self.tree, self.branches, self.airports = tree, branches, airports
+        self.built = True
+        logger.info("网点空间索引已构建: %d 个网点, %d 个机场", len(branches), len(airports))
+
+    def refresh(self):
+        """从数据库加载所有有经纬度的可租网点"""
+        from .models import Location
+
+        rows = Location.objects.filter(
+            renting_location=True, latitude__isnull=False, longitude__isnull=False,
+        ).values_list(
+            'id', 'location_name', 'code', 'city__name', 'state__code', 'airport__code', 'latitude', 'longitude',
+        )
+        self.build(rows.iterator())
+
+    # ---- 查询 ----
+
+    def nearest(self, latitude, longitude, n=5, radius_km=None):
+        """离坐标最近的 n 个网点 [(Branch, 公里), ...]，可限制最大半径"""
+        max_distance = km_to_chord(radius_km) if radius_km is not None else math.inf
+        return [
+            (branch, chord_to_km(chord))
+            for chord, branch in self.tree.nearest(to_xyz(latitude, longitude), n, max_distance)
+        ]
+
+    def within(self, latitude, longitude, radius_km):
+        """半径内的所有网点 [(Branch, 公里), ...]，按距离升序"""
+        return [
+            (branch, chord_to_km(chord))
+            for chord, branch in self.tree.within(to_xyz(latitude, longitude), km_to_chord(radius_km))
+        ]
+
+    def airport_point(self, code):
+        return self.airports.get((code or '').strip().upper())
+
+    def near_airport(self, code, n=5, radius_km=None):
+        """离机场最近的 n 个网点；未知的机场代码返回空列表"""
+        point = self.airport_point(code)
+        if point is None:
+            return []
+        return self.nearest(*point, n=n, radius_km=radius_km)
+
+
+def branch_key(name, state_code):
+    return ((name or '').strip().lower(), (state_code or '').strip().upper())
+
+
+def branch_ids_for(locations):
+    """
+    预订地点 (locations.Location，需要 state) -> 同名、同州的网点 (cars.Location) ID 集合
+
+    返回 {预订地点ID: {网点ID, ...}}，没有对应网点的预订地点对应空集合。
+    可用性索引和 OTA 同步按网点 (Car.currently_located_id) 统计车辆，按预订地点查找车辆时先用这里换算。
+    """
+    from django.db.models import Q
+    from .models import Location
+
+    keys = {location.pk: branch_key(location.name, location.state.code) for location in locations}
+    result = {location_id: set() for location_id in keys}
+    if not keys:
+        return result
+    condition = Q()
+    for name, state_code in set(keys.values()):
+        condition |= Q(location_name__iexact=name, state__code__iexact=state_code)
+    by_key = {}
+    for branch_id, name, state_code in Location.objects.filter(condition).values_list(
+            'id', 'location_name', 'state__code'):
+        by_key.setdefault(branch_key(name, state_code), set()).add(branch_id)
+    for location_id, key in keys.items():
+        result[location_id] = set(by_key.get(key, ()))
+    return result
+
+
+_index = IndexSingleton(BranchIndex)
+
+
+def get_branch_index():
+    """返回当前进程的网点空间索引 (首次调用或版本变化时从数据库加载)"""
+    return _index.get()
+
+
+def locations_changed():
+    """地点、城市或机场变化后调用，所有进程 (包括当前进程) 在下次查询时重新加载"""
+    _index.changed()
+
+
+def reset_branch_index():
+    """丢弃当前索引，下次使用时重新加载 (测试用)"""
+    _index.reset()
@@ -0,0 +1,194 @@
+"""
+车型目录快照
+
+car_list 搜索页需要的车型类别、类别类型、地区选项、图片、座位/行李数和特性
+一次性从数据库预计算成纯 Python 结构，存入缓存并在进程内保留一份副本。
+
+- 快照带版本号，版本号保存在缓存中，多进程共享
+- VehicleCategory / VehicleCategoryType / VehicleFeature / VehicleImage 变化时
+  由 cars.signals 递增版本号，各进程在下次请求时重新获取快照
+- 缓存命中时搜索页不产生任何数据库查询
+- 未配置共享缓存时其他进程的版本号变化不可见，进程内副本超过 SNAPSHOT_MAX_AGE 后从数据库重建
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+
+from rush_car_rental.db_router import use_primary
+from rush_car_rental.utils.versioned_index import INDEX_MAX_AGE
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'cars_catalog_version'
+SNAPSHOT_CACHE_KEY = 'cars_catalog:{version}'
+# 快照在共享缓存中的保存时间(秒)，版本号变化后旧快照自然过期
+SNAPSHOT_TIMEOUT = 24 * 60 * 60
+# 无论版本号是否变化，进程内副本最长保留时间(秒)
+SNAPSHOT_MAX_AGE = INDEX_MAX_AGE
+
+
+class CatalogSnapshot:
+    """
+    某个版本的车型目录
+
+    vehicles 中每个车型是一个字典，可以直接在模板中使用 (vehicle.id、vehicle.seats 等)。
+    """
+
+    def __init__(self, version, vehicles, category_types, region_choices):
+        self.version = version
+        self.vehicles = vehicles
+        self.category_types = category_types
+        self.region_choices = region_choices
+        self.by_id = {vehicle['id']: vehicle for vehicle in vehicles}
+
+    def get(self, vehicle_id):
+        return self.by_id.get(vehicle_id)
+
+    def filter(self, category_type_id=None, region=None, driver_age=None, ids=None):
+        """按类别类型、地区、驾驶员年龄和车型ID集合筛选，保持目录顺序"""
+        vehicles = self.vehicles
+        if category_type_id is not None:
+            vehicles = [v for v in vehicles if v['category_type_id'] == category_type_id]
+        if region:
+            vehicles = [v for v in vehicles if v['region'] == region]
+        if driver_age is not None:
+            vehicles = [v for v in vehicles if v['age_youngest_driver'] <= driver_age]
+        if ids is not None:
+            vehicles = [v for v in vehicles if v['id'] in ids]
+        return vehicles
+
+
+def _image_url(image):
+    if image is None or not image.image:
+        return ''
+    try:
+        return image.image.url
+    except ValueError:
+        return ''
+
+
+def _image_sources(image):
+    # 派生图片的 <source> 列表 (image/avif, image/webp)，没有生成时为空，模板回退到原图
+    if image is None or not image.image:
+        return []
+    return image.get_primary_image().sources
+
+
+def build_snapshot(version=0):
+    """从数据库构建目录快照 (固定 3 次查询)"""
+    from .models import VehicleCategory, VehicleCategoryType, VehicleFeature
+
+    features = defaultdict(list)
+    for category_id, feature, icon_class in VehicleFeature.objects.values_list(
+            'vehicle_category_id', 'feature', 'icon_class').order_by('id'):
+        features[category_id].append({'feature': feature, 'icon_class': icon_class})
+
+    region_names = dict(VehicleCategory.REGION_CHOICES)
+    vehicles = []
+    for category in VehicleCategory.objects.select_related('category_type', 'image_upload'):
+        vehicles.append({
+            'id': category.id,
+            'name': category.name,
+            'vehicle_category': category.vehicle_category,
+            'make': category.make,
+            'model': category.model,
+            'category_type_id': category.category_type_id,
+            'category_type': category.category_type.category_type,
+            'region': category.region,
+            'region_display': region_names.get(category.region, category.region),
+            'sipp_code': category.sipp_code,
+            'age_youngest_driver': category.age_youngest_driver,
+            'num_adults': category.num_adults,
+            'num_children': category.num_children,
+            'num_large_case': category.num_large_case,
+            'num_small_case': category.num_small_case,
+            'seats': category.seats,
+            'bags': category.bags,
+            'daily_rate': category.daily_rate,
+            'friendly_description': category.friendly_description,
+            'vehicle_desc_url': category.vehicle_desc_url,
+            'image_url': _image_url(category.image_upload),
+            'image_sources': _image_sources(category.image_upload),
+            'features': features.get(category.id, []),
+        })
+
+    category_types = [
+        {'id': category_type.id, 'category_type': category_type.category_type}
+        for category_type in VehicleCategoryType.objects.all()
+    ]
+
+    # 只列出有车型的地区，按 REGION_CHOICES 的顺序
+    regions = {vehicle['region'] for vehicle in vehicles}
+    region_choices = [choice for choice in VehicleCategory.REGION_CHOICES if choice[0] in regions]
+
+    return CatalogSnapshot(version, vehicles, category_types, region_choices)
+
+
+def _initial_version():
+    # 以当前时间作为初始版本号，缓存被清空后不会与进程内的旧快照版本号重复
+    return int(time.time() * 1000)
+
+
+def current_version():
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, _initial_version(), None)
+        version = cache.get(VERSION_CACHE_KEY)
+    return version
+
+
+def bump_version():
+    """通知所有进程目录数据已变化，返回新的版本号"""
+    try:
+        return cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        version = _initial_version()
+        cache.set(VERSION_CACHE_KEY, version, None)
+        return version
+
+
+_snapshot = None
+_snapshot_loaded_at = 0.0
+_snapshot_lock = threading.Lock()
+
+
+def _is_current(snapshot, version, now):
+    return snapshot is not None and snapshot.version == version and now - _snapshot_loaded_at <= SNAPSHOT_MAX_AGE
+
+
+def get_catalog():
+    """
+    返回当前版本的目录快照
+
+    依次查找进程内副本、共享缓存，都没有时从数据库构建并写入缓存。
+    进程内副本过期时直接从数据库重建: 没有共享缓存时，缓存中同一版本的快照和副本一样旧。
+    """
+    global _snapshot, _snapshot_loaded_at
+    version = current_version()
+    snapshot = _snapshot
+    if _is_current(snapshot, version, time.monotonic()):
+        return snapshot
+
+    with _snapshot_lock:
+        now = time.monotonic()
+        if _is_current(_snapshot, version, now):
+            return _snapshot
+        key = SNAPSHOT_CACHE_KEY.format(version=version)
+        expired = _snapshot is not None and _snapshot.version == version
+        snapshot = None if expired else cache.get(key)
+        if snapshot is None:
+            # 新版本的快照从主库构建，不能把副本上的旧数据缓存到新版本下
+            with use_primary():
+                snapshot = build_snapshot(version)
+            cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+            logger.info("车型目录快照已重建: 版本 %s，%s 个车型", version, len(snapshot.vehicles))
+        _snapshot, _snapshot_loaded_at = snapshot, now
+    return snapshot
+
+
+def invalidate_catalog():
+    """目录数据变化后调用"""
+    bump_version()
@@ -0,0 +1,180 @@
+"""
+地点库存索引
+
+维护 "每个地点 (cars.Location / app_location) 有哪些 VehicleCategory" 的内存索引:
+车辆的 currently_located 或 owning_location 在某地点，该车辆的类别就计入这个地点。
+按地点搜索车型时只需一次字典查找，不需要每个请求都做 Car / Location / City 的多表连接。
+
+- 按 (地点, 类别) 计数，车辆移动时 (Car 保存或删除) 通过信号增量增减，见 cars/signals.py
+- 地点名称、代码、城市和州代码也保存在索引中，搜索框的 "Sydney, NSW" 在内存中解析为地点ID
+- 其他进程中的修改通过缓存中的版本号感知，发现版本变化时整体重建
+
+用法:
+
+    from cars.inventory import get_location_inventory
+    inventory = get_location_inventory()
+    location_ids = inventory.resolve('Sydney, NSW')
+    category_ids = inventory.categories_at(location_ids)
+"""
+import logging
+import threading
+from collections import Counter
+
+from rush_car_rental.utils.versioned_index import IndexSingleton, VersionedIndex
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'location_inventory_version'
+
+
+def car_locations(currently_located_id, owning_location_id):
+    """车辆计入的地点ID集合"""
+    return frozenset(
+        location_id for location_id in (currently_located_id, owning_location_id)
+        if location_id is not None
+    )
+
+
+class LocationInventory(VersionedIndex):
+    """
+    地点 -> 车型类别 内存索引
+    """
+
+    version_cache_key = VERSION_CACHE_KEY
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        # car_id -> (category_id, 地点ID集合)
+        self.cars = {}
+        # (location_id, category_id) -> 车辆数
+        self.counts = Counter()
+        # location_id -> {category_id, ...} (数量大于0)
+        self.categories = {}
+        # location_id -> (location_name, code, city_name, state_code)，均为小写
+        self.locations = {}
+        self.built = False
+
+    # ---- 构建 ----
+
+    def build(self, cars, locations):
+        """
+        从数据构建索引
+
+        cars: 可迭代的 (car_id, category_id, currently_located_id, owning_location_id)
+        locations: 可迭代的 (location_id, location_name, code, city_name, state_code)
+        """
+        with self._lock:
+            self._clear()
+            for location_id, *names in locations:
+                self.locations[location_id] = tuple((name or '').strip().lower() for name in names)
+            for car_id, category_id, currently_located_id, owning_location_id in cars:
+                self._add_car(car_id, category_id, car_locations(currently_located_id, owning_location_id))
+            self.built = True
+        logger.info("地点库存索引已构建: %d 辆车, %d 个地点", len(self.cars), len(self.locations))
+
+    def refresh(self):
+        """从数据库加载车辆所在地点和地点名称"""
+        from .models import Car, Location
+
+        cars = Car.objects.filter(category__isnull=False).values_list(
+            'id', 'category_id', 'currently_located_id', 'owning_location_id')
+        locations = Location.objects.values_list(
+            'id', 'location_name', 'code', 'city__name', 'state__code')
+        self.build(cars.iterator(), locations.iterator())
+
+    # ---- 增量更新 ----
+
+    def _add_car(self, car_id, category_id, location_ids):
+        self.cars[car_id] = (category_id, location_ids)
+        for location_id in location_ids:
+            self.counts[(location_id, category_id)] += 1
+            self.categories.setdefault(location_id, set()).add(category_id)
+
+    def remove_car(self, car_id):
+        """车辆删除后调用"""
+        with self._lock:
+            category_id, location_ids = self.cars.pop(car_id, (None, ()))
+            for location_id in location_ids:
+                key = (location_id, category_id)
+                self.counts[key] -= 1
+                if self.counts[key] <= 0:
+                    del self.counts[key]
+                    self.categories[location_id].discard(category_id)
+
+    def update_car(self, car_id, category_id, currently_located_id, owning_location_id):
+        """车辆类别或地点变化后调用"""
+        location_ids = car_locations(currently_located_id, owning_location_id)
+        with self._lock:
+            if self.cars.get(car_id) == (category_id, location_ids):
+                return
+            self.remove_car(car_id)
+            if category_id is not None:
+                self._add_car(car_id, category_id, location_ids)
+
+    # ---- 查询 ----
+
+    def resolve(self, query):
+        """
+        将搜索框中的取车地点解析为地点ID集合
+
+        支持地点ID、地点代码、地点名称 (包含匹配) 和 "城市, 州代码" (如 "Sydney, NSW")。
+        """
+        query = (query or '').strip().lower()
+        if not query:
+            return set()
+        if query.isdigit():
+            return {int(query)} if int(query) in self.locations else set()
+        city, _, state = (part.strip() for part in query.partition(','))
+        result = set()
+        for location_id, (name, code, city_name, state_code) in self.locations.items():
+            if query == code or query in name:
+                result.add(location_id)
+            elif city == city_name and (not state or state == state_code):
+                result.add(location_id)
+        return result
+
+    def categories_at(self, location_ids):
+        """返回在这些地点中任意一个有车辆的类别ID集合"""
+        result = set()
+        for location_id in location_ids:
+            result.update(self.categories.get(location_id, ()))
+        return result
+
+
+_index = IndexSingleton(LocationInventory)
+
+
+def get_location_inventory():
+    """返回当前进程的地点库存索引 (首次调用或版本变化时从数据库加载)"""
+    return _index.get()
+
+
+def bump_version():
+    """通知所有进程车辆或地点已变化，返回新的版本号"""
+    return _index.bump_version()
+
+
+def car_changed(car):
+    """Car 保存后调用"""
+    _index.apply_change(lambda index: index.update_car(
+        car.pk, car.category_id, car.currently_located_id, car.owning_location_id
+    ))
+
+
+def car_deleted(car_id):
+    """Car 删除后调用"""
+    _index.apply_change(lambda index: index.remove_car(car_id))
+
+
+def locations_changed():
+    """地点新增、改名或删除后调用，所有进程 (包括当前进程) 在下次查询时重新加载"""
+    _index.changed()
+
+
+def reset_location_inventory():
+    """丢弃当前索引，下次使用时重新加载 (测试用)"""
+    _index.reset()
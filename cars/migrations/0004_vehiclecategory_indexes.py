@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0003_alter_airport_table_alter_city_table_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vehiclecategory',
+            index=models.Index(fields=['region', 'category_type'], name='app_vcat_region_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiclecategory',
+            index=models.Index(fields=['age_youngest_driver'], name='app_vcat_youngest_driver_idx'),
+        ),
+    ]
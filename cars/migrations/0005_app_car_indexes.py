@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:21
+
+from django.db import migrations
+
+# app_car 由外部系统维护 (managed=False)，AddIndex 不会执行，这里直接执行 SQL。
+# 表不存在时跳过 (例如测试数据库)，索引已存在时不重复创建。PostgreSQL 上使用 CONCURRENTLY，
+# 建索引期间不锁表，所以迁移不能放在事务中。
+INDEXES = [
+    # 按门店统计车辆和类别 (cars.inventory, bookings.availability, ota)
+    ('app_car', 'app_car_located_category_idx', ['currently_located_id', 'category_id']),
+]
+
+
+def create_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+    concurrently = 'CONCURRENTLY ' if connection.vendor == 'postgresql' else ''
+    tables = set(connection.introspection.table_names())
+    for table, name, columns in INDEXES:
+        if table not in tables:
+            continue
+        schema_editor.execute(
+            f"CREATE INDEX {concurrently}IF NOT EXISTS {quote(name)} "
+            f"ON {quote(table)} ({', '.join(quote(column) for column in columns)})"
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    concurrently = 'CONCURRENTLY ' if connection.vendor == 'postgresql' else ''
+    for _, name, _ in INDEXES:
+        schema_editor.execute(f"DROP INDEX {concurrently}IF EXISTS {connection.ops.quote_name(name)}")
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('cars', '0004_vehiclecategory_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from locations.models import Location
 from django.utils import timezone
+from rush_car_rental.utils.image_derivatives import ResponsiveImage
 
 
 class AuditModelMixin(models.Model):
@@ -19,6 +20,15 @@ class VehicleImage(models.Model):
     def __str__(self):
         return self.name
 
+    def get_images(self):
+        """Return the image with its responsive derivatives, as a list"""
+        image = self.get_primary_image()
+        return [image] if image else []
+
+    def get_primary_image(self):
+        """Return the image with its responsive derivatives"""
+        return ResponsiveImage(self.image) if self.image else None
+
     class Meta:
         db_table = 'app_vehicleimage'
         managed = False
@@ -123,6 +133,11 @@ class VehicleCategory(AuditModelMixin):
         db_table = 'app_vehiclecategory'
         verbose_name_plural = 'Vehicle Categories'
         ordering = ['category_type__ordering', 'vehicle_category']
+        indexes = [
+            # 车型列表按地区、车型类别和驾驶员年龄筛选
+            models.Index(fields=['region', 'category_type'], name='app_vcat_region_type_idx'),
+            models.Index(fields=['age_youngest_driver'], name='app_vcat_youngest_driver_idx'),
+        ]
 
 
 class VehicleFeature(models.Model):
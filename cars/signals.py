@@ -0,0 +1,95 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import (
+    Airport, Car, City, Location, StateProvince, VehicleCategory, VehicleCategoryType, VehicleFeature, VehicleImage
+)
+from rush_car_rental.utils.image_derivatives import generate_derivatives_quietly
+from . import autocomplete, branches, catalog, inventory
+
+
+# 在目录失效之前注册，提交后先生成派生图片，重建的快照才能包含 srcset
+@receiver(post_save, sender=VehicleImage)
+def generate_vehicle_image_derivatives(sender, instance, **kwargs):
+    """
+    Signal handler to generate thumbnails and srcset widths for an uploaded vehicle image
+    """
+    if instance.image:
+        transaction.on_commit(lambda: generate_derivatives_quietly(instance.image))
+
+
+@receiver([post_save, post_delete], sender=VehicleCategory)
+@receiver([post_save, post_delete], sender=VehicleCategoryType)
+@receiver([post_save, post_delete], sender=VehicleFeature)
+@receiver([post_save, post_delete], sender=VehicleImage)
+def invalidate_catalog_on_change(sender, **kwargs):
+    """
+    Signal handler to invalidate the car_list catalog snapshot when a category, feature or image changes
+    """
+    transaction.on_commit(catalog.invalidate_catalog)
+
+
+@receiver(post_save, sender=Car)
+def update_inventory_on_car_save(sender, instance, **kwargs):
+    """
+    Signal handler to move a car between locations in the location inventory index
+    """
+    transaction.on_commit(lambda: inventory.car_changed(instance))
+
+
+@receiver(post_delete, sender=Car)
+def update_inventory_on_car_delete(sender, instance, **kwargs):
+    """
+    Signal handler to drop a deleted car from the location inventory index
+    """
+    car_id = instance.pk
+    transaction.on_commit(lambda: inventory.car_deleted(car_id))
+
+
+@receiver([post_save, post_delete], sender=Location)
+@receiver([post_save, post_delete], sender=City)
+@receiver([post_save, post_delete], sender=StateProvince)
+def reload_inventory_on_location_change(sender, **kwargs):
+    """
+    Signal handler to reload the location inventory when location names change
+    """
+    transaction.on_commit(inventory.locations_changed)
+
+
+@receiver([post_save, post_delete], sender=Location)
+@receiver([post_save, post_delete], sender=City)
+@receiver([post_save, post_delete], sender=StateProvince)
+@receiver([post_save, post_delete], sender=Airport)
+def reload_branches_on_location_change(sender, **kwargs):
+    """
+    Signal handler to rebuild the branch spatial index when a location, city, state or airport changes
+    """
+    transaction.on_commit(branches.locations_changed)
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_save, sender=Airport)
+@receiver(post_save, sender=City)
+def update_autocomplete_on_save(sender, instance, **kwargs):
+    """
+    Signal handler to re-index a saved location, airport or city for autocomplete
+    """
+    handler = {
+        Location: autocomplete.location_changed,
+        Airport: autocomplete.airport_changed,
+        City: autocomplete.city_changed,
+    }[sender]
+    pk = instance.pk
+    transaction.on_commit(lambda: handler(pk))
+
+
+@receiver(post_delete, sender=Location)
+@receiver(post_delete, sender=Airport)
+@receiver(post_delete, sender=City)
+def update_autocomplete_on_delete(sender, instance, **kwargs):
+    """
+    Signal handler to drop a deleted location, airport or city from autocomplete
+    """
+    kind = {Location: autocomplete.LOCATION, Airport: autocomplete.AIRPORT, City: autocomplete.CITY}[sender]
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete.deleted(kind, pk))
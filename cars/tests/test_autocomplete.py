@@ -0,0 +1,101 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from cars.autocomplete import (
+    AutocompleteIndex, airport_suggestion, city_suggestion, location_suggestion, reset_autocomplete_index
+)
+from cars.models import Airport, City, Country, Location, StateProvince
+from cars.tests.utils import UnmanagedTablesMixin
+
+
+class AutocompleteIndexTest(SimpleTestCase):
+    """
+    测试自动补全的前缀、三元组匹配和排序
+    """
+
+    def setUp(self):
+        self.index = AutocompleteIndex()
+        self.index.build([
+            location_suggestion(1, 'Sydney Airport', 'SYD1', 'Mascot', 'Sydney', 'NSW'),
+            location_suggestion(2, 'Westmeadows', 'MEL', 'Westmeadows', 'Melbourne', 'VIC'),
+            airport_suggestion(1, 'SYD', 'Sydney Kingsford Smith', 'Sydney'),
+            city_suggestion(1, 'Sydney', 'NSW'),
+            city_suggestion(2, 'São Paulo', None),
+        ])
+
+    def labels(self, query, **kwargs):
+        return [s.label for s, _ in self.index.search(query, **kwargs)]
+
+    def test_ranking(self):
+        """
+        测试完全匹配优先于前缀，同分时网点优先
+        """
+        results = self.index.search('sydney')
+        self.assertEqual(results[0][0].label, 'Sydney, NSW')
+        self.assertEqual(results[0][1], 100)
+        self.assertEqual(
+            [s.kind for s, _ in results[1:]], ['location', 'airport']
+        )
+        self.assertEqual(self.labels('syd')[0], 'Sydney Kingsford Smith (SYD) - Sydney')
+
+    def test_word_prefix_and_accents(self):
+        """
+        测试字段中间的词和去掉重音符号后的匹配
+        """
+        self.assertEqual(self.labels('kings'), ['Sydney Kingsford Smith (SYD) - Sydney'])
+        self.assertEqual(self.labels('mascot'), ['Sydney Airport (SYD1) - Mascot, Sydney, NSW'])
+        self.assertEqual(self.labels('sao p'), ['São Paulo'])
+
+    def test_trigram_fallback(self):
+        """
+        测试拼写错误时按三元组相似度匹配
+        """
+        self.assertIn('Westmeadows (MEL) - Westmeadows, Melbourne, VIC', self.labels('westmedows'))
+        self.assertEqual(self.labels('zzzz'), [])
+
+    def test_incremental_update_and_filters(self):
+        """
+        测试增量更新、删除和按类型筛选
+        """
+        self.index.upsert(location_suggestion(2, 'Tullamarine', 'MEL', None, 'Melbourne', 'VIC'))
+        self.assertEqual(self.labels('westm'), [])
+        self.assertEqual(self.labels('tulla'), ['Tullamarine (MEL) - Melbourne, VIC'])
+
+        self.index.remove('city', 1)
+        self.assertEqual(self.labels('sydney', kinds={'city'}), [])
+        self.assertEqual(len(self.labels('s', limit=2)), 2)
+
+
+class LocationAutocompleteViewTest(UnmanagedTablesMixin, TestCase):
+    """
+    测试自动补全接口
+    """
+
+    def setUp(self):
+        cache.clear()
+        reset_autocomplete_index()
+        country = Country.objects.create()
+        nsw = StateProvince.objects.create(country=country, name='New South Wales', code='NSW')
+        self.sydney = City.objects.create(state=nsw, name='Sydney')
+        self.location = Location.objects.create(
+            location_name='Mascot', code='MAS', address='330 King St', city=self.sydney, state=nsw, country=country,
+        )
+
+    def test_endpoint_and_signals(self):
+        """
+        测试接口返回建议，并在地点变化后增量更新
+        """
+        url = reverse('location_autocomplete')
+        results = self.client.get(url, {'q': 'mas'}).json()['results']
+        self.assertEqual(results[0]['value'], 'MAS')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Airport.objects.create(city=self.sydney, name='Sydney Airport', code='SYD')
+            self.location.renting_location = False
+            self.location.save()
+
+        self.assertEqual(self.client.get(url, {'q': 'mas'}).json()['results'], [])
+        results = self.client.get(url, {'q': 'syd', 'types': 'airport'}).json()['results']
+        self.assertEqual([r['value'] for r in results], ['SYD'])
+        self.assertEqual(self.client.get(url, {'q': 'syd', 'limit': 'x'}).status_code, 400)
@@ -0,0 +1,150 @@
+import random
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from cars.autocomplete import reset_autocomplete_index
+from cars.branches import (
+    BranchIndex, chord_to_km, get_branch_index, reset_branch_index, to_xyz
+)
+from cars.models import Airport, City, Country, Location, StateProvince
+from cars.tests.utils import UnmanagedTablesMixin
+from cars.views import pickup_location_ids
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    a, b = to_xyz(lat1, lon1), to_xyz(lat2, lon2)
+    return chord_to_km(sum((x - y) ** 2 for x, y in zip(a, b)) ** 0.5)
+
+
+class BranchIndexTest(SimpleTestCase):
+    """
+    测试 k-d 树最近邻和半径搜索与逐个计算的结果一致
+    """
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.rows = [
+            (i, f'Branch {i}', f'B{i}', None, None, None, rng.uniform(-44, -10), rng.uniform(113, 154))
+            for i in range(300)
+        ]
+        self.index = BranchIndex()
+        self.index.build(self.rows)
+
+    def brute_force(self, lat, lon):
+        return sorted((haversine_km(lat, lon, row[6], row[7]), row[0]) for row in self.rows)
+
+    def test_nearest_matches_brute_force(self):
+        """
+        测试最近的 N 个网点及距离
+        """
+        for lat, lon in [(-33.87, 151.21), (-37.81, 144.96), (-12.46, 130.84), (-60, 0)]:
+            expected = self.brute_force(lat, lon)[:5]
+            result = self.index.nearest(lat, lon, n=5)
+            self.assertEqual([branch.id for branch, _ in result], [id for _, id in expected])
+            self.assertAlmostEqual(result[0][1], expected[0][0], places=6)
+
+    def test_radius_search(self):
+        """
+        测试半径搜索和带半径限制的最近邻
+        """
+        expected = [id for km, id in self.brute_force(-27.47, 153.03) if km <= 300]
+
+        self.assertEqual([b.id for b, _ in self.index.within(-27.47, 153.03, 300)], expected)
+        self.assertEqual([b.id for b, _ in self.index.nearest(-27.47, 153.03, n=500, radius_km=300)], expected)
+
+    def test_empty_index(self):
+        """
+        测试没有网点时返回空列表
+        """
+        index = BranchIndex()
+        index.build([])
+        self.assertEqual(index.nearest(-33.87, 151.21), [])
+        self.assertEqual(index.near_airport('SYD'), [])
+
+
+class NearestBranchesViewTest(UnmanagedTablesMixin, TestCase):
+    """
+    测试最近网点接口和按机场代码搜索车型
+    """
+
+    def setUp(self):
+        cache.clear()
+        reset_branch_index()
+        country = Country.objects.create()
+        nsw = StateProvince.objects.create(country=country, name='New South Wales', code='NSW')
+        sydney = City.objects.create(state=nsw, name='Sydney')
+        airport = Airport.objects.create(city=sydney, name='Sydney Airport', code='SYD')
+
+        def location(name, code, lat, lon, **kwargs):
+            return Location.objects.create(
+                location_name=name, code=code, address='-', city=sydney, state=nsw, country=country,
+                latitude=Decimal(lat), longitude=Decimal(lon), **kwargs,
+            )
+
+        self.mascot = location('Mascot', 'MAS', '-33.9250', '151.1870', airport=airport)
+        self.parramatta = location('Parramatta', 'PAR', '-33.8150', '151.0010')
+        self.closed = location('Closed', 'CLO', '-33.9200', '151.1800', renting_location=False)
+
+    def test_nearest_by_coordinates(self):
+        """
+        测试按坐标返回最近的可租网点及距离
+        """
+        response = self.client.get(reverse('nearest_branches'), {'lat': '-33.94', 'lon': '151.17', 'n': 2})
+
+        results = response.json()['results']
+        self.assertEqual([r['id'] for r in results], [self.mascot.id, self.parramatta.id])
+        self.assertLess(results[0]['distance_km'], 3)
+
+    def test_nearest_by_airport_and_radius(self):
+        """
+        测试按机场代码和半径搜索
+        """
+        response = self.client.get(reverse('nearest_branches'), {'airport': 'syd', 'radius_km': 10})
+        self.assertEqual([r['code'] for r in response.json()['results']], ['MAS'])
+
+        # 只指定半径时返回半径内的所有网点，指定 n 时返回半径内最近的 n 个
+        params = {'lat': '-33.84', 'lon': '151.05', 'radius_km': 20}
+        response = self.client.get(reverse('nearest_branches'), params)
+        self.assertEqual([r['code'] for r in response.json()['results']], ['PAR', 'MAS'])
+        response = self.client.get(reverse('nearest_branches'), {**params, 'n': 1})
+        self.assertEqual([r['code'] for r in response.json()['results']], ['PAR'])
+
+        self.assertEqual(self.client.get(reverse('nearest_branches'), {'airport': 'XXX'}).status_code, 404)
+        self.assertEqual(self.client.get(reverse('nearest_branches'), {'lat': 'x'}).status_code, 400)
+
+    def test_autocomplete_includes_nearest_branches(self):
+        """
+        测试自动补全的机场建议附带最近的网点，指定坐标时返回离访客最近的网点
+        """
+        reset_autocomplete_index()
+        url = reverse('location_autocomplete')
+        data = self.client.get(url, {'q': 'syd', 'types': 'airport'}).json()
+        self.assertEqual([b['code'] for b in data['results'][0]['branches']], ['MAS', 'PAR'])
+        self.assertNotIn('nearest', data)
+
+        data = self.client.get(url, {'q': 'parr', 'lat': '-33.84', 'lon': '151.05'}).json()
+        self.assertEqual([r['value'] for r in data['results']], ['PAR'])
+        self.assertEqual([b['code'] for b in data['nearest']], ['PAR', 'MAS'])
+        self.assertEqual(self.client.get(url, {'q': 'syd', 'lat': '-33.84'}).status_code, 400)
+
+    def test_location_change_rebuilds(self):
+        """
+        测试网点坐标变化后重新构建
+        """
+        self.assertEqual(get_branch_index().nearest(-33.81, 151.0, n=1)[0][0].id, self.parramatta.id)
+        self.parramatta.renting_location = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.parramatta.save()
+
+        self.assertEqual(get_branch_index().nearest(-33.81, 151.0, n=1)[0][0].id, self.mascot.id)
+
+    def test_pickup_location_by_airport_code(self):
+        """
+        测试搜索页按机场代码和坐标解析取车网点
+        """
+        self.assertEqual(pickup_location_ids('SYD'), {self.mascot.id, self.parramatta.id})
+        self.assertEqual(pickup_location_ids('', '-33.82', '151.0'), {self.parramatta.id, self.mascot.id})
+        self.assertIsNone(pickup_location_ids('', '-12.46', '130.84'))
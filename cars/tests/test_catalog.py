@@ -0,0 +1,98 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from cars.catalog import SNAPSHOT_MAX_AGE, get_catalog
+from cars.models import VehicleCategory, VehicleCategoryType, VehicleFeature
+from cars.tests.utils import UnmanagedTablesMixin
+
+
+class CatalogSnapshotTest(UnmanagedTablesMixin, TestCase):
+    """
+    测试车型目录快照及其失效
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.economy = VehicleCategoryType.objects.create(category_type='Economy', rate_type='daily')
+        self.suv = VehicleCategoryType.objects.create(category_type='SUV', rate_type='daily')
+        self.corolla = VehicleCategory.objects.create(
+            category_type=self.economy, vehicle_category='Toyota Corolla',
+            region='sydney', age_youngest_driver=21, num_adults=4, num_children=1,
+            num_large_case=1, num_small_case=2,
+        )
+        self.rav4 = VehicleCategory.objects.create(
+            category_type=self.suv, vehicle_category='Toyota RAV4',
+            region='melbourne', age_youngest_driver=25,
+        )
+        VehicleFeature.objects.create(vehicle_category=self.corolla, feature='Bluetooth')
+
+    def test_snapshot_contents(self):
+        """
+        测试快照包含类别类型、座位/行李数、特性和地区选项
+        """
+        catalog = get_catalog()
+        corolla = catalog.get(self.corolla.id)
+
+        self.assertEqual(corolla['category_type'], 'Economy')
+        self.assertEqual(corolla['make'], 'Toyota')
+        self.assertEqual((corolla['seats'], corolla['bags']), (5, 3))
+        self.assertEqual(corolla['features'][0]['feature'], 'Bluetooth')
+        self.assertEqual(corolla['image_url'], '')
+        self.assertEqual(catalog.region_choices, [('melbourne', 'Melbourne'), ('sydney', 'Sydney')])
+
+    def test_filter(self):
+        """
+        测试按类别类型、地区、年龄和可用车型筛选
+        """
+        catalog = get_catalog()
+        ids = lambda vehicles: [v['id'] for v in vehicles]
+
+        self.assertEqual(ids(catalog.filter(category_type_id=self.suv.id)), [self.rav4.id])
+        self.assertEqual(ids(catalog.filter(region='sydney')), [self.corolla.id])
+        self.assertEqual(ids(catalog.filter(driver_age=22)), [self.corolla.id])
+        self.assertEqual(ids(catalog.filter(ids={self.rav4.id: 2})), [self.rav4.id])
+
+    def test_warm_cache_needs_no_queries(self):
+        """
+        测试缓存命中时搜索页不查询数据库
+        """
+        url = reverse('car_list') + f'?category_type={self.economy.id}'
+        self.client.get(url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual([v['id'] for v in response.context['vehicles']], [self.corolla.id])
+
+    def test_saves_invalidate_snapshot(self):
+        """
+        测试修改车型或特性后快照重新生成
+        """
+        before = get_catalog()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            VehicleFeature.objects.create(vehicle_category=self.rav4, feature='4WD')
+        after = get_catalog()
+        self.assertNotEqual(after.version, before.version)
+        self.assertEqual(after.get(self.rav4.id)['features'][0]['feature'], '4WD')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rav4.region = 'perth'
+            self.rav4.save()
+        self.assertEqual(get_catalog().get(self.rav4.id)['region'], 'perth')
+
+    def test_snapshot_max_age(self):
+        """
+        测试没有收到版本号变化 (未配置共享缓存) 时，进程内快照超过最长保留时间后从数据库重建
+        """
+        with mock.patch('cars.catalog.time.monotonic', return_value=1000.0):
+            get_catalog()
+        # update() 不触发信号，相当于其他进程修改了数据而本进程看不到版本号变化
+        VehicleCategory.objects.filter(pk=self.rav4.pk).update(region='perth')
+
+        with mock.patch('cars.catalog.time.monotonic', return_value=1000.0 + SNAPSHOT_MAX_AGE):
+            self.assertEqual(get_catalog().get(self.rav4.id)['region'], 'melbourne')
+        with mock.patch('cars.catalog.time.monotonic', return_value=1001.0 + SNAPSHOT_MAX_AGE):
+            self.assertEqual(get_catalog().get(self.rav4.id)['region'], 'perth')
@@ -0,0 +1,110 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from bookings.availability import reset_availability_index
+from bookings.pricing import reset_rate_table
+from cars.inventory import get_location_inventory, reset_location_inventory
+from cars.models import (
+    Car, City, Country, Location, StateProvince, VehicleCategory, VehicleCategoryType
+)
+from cars.tests.utils import UnmanagedTablesMixin
+
+
+class LocationInventoryTest(UnmanagedTablesMixin, TestCase):
+    """
+    测试地点库存索引和按取车地点筛选车型
+    """
+
+    def setUp(self):
+        cache.clear()
+        reset_location_inventory()
+        country = Country.objects.create()
+        nsw = StateProvince.objects.create(country=country, name='New South Wales', code='NSW')
+        vic = StateProvince.objects.create(country=country, name='Victoria', code='VIC')
+        sydney = City.objects.create(state=nsw, name='Sydney')
+        melbourne = City.objects.create(state=vic, name='Melbourne')
+        self.mascot = Location.objects.create(
+            location_name='Sydney Airport', code='SYD', address='330 King St',
+            city=sydney, state=nsw, country=country,
+        )
+        self.westmeadows = Location.objects.create(
+            location_name='Westmeadows', code='MEL', address='95 Western Ave',
+            city=melbourne, state=vic, country=country,
+        )
+        category_type = VehicleCategoryType.objects.create(category_type='Economy', rate_type='daily')
+        self.corolla = VehicleCategory.objects.create(category_type=category_type, vehicle_category='Toyota Corolla')
+        self.rav4 = VehicleCategory.objects.create(category_type=category_type, vehicle_category='Toyota RAV4')
+        # 停在悉尼、属于墨尔本的 Corolla；停在墨尔本的 RAV4
+        self.car = Car.objects.create(
+            category=self.corolla, currently_located=self.mascot, owning_location=self.westmeadows
+        )
+        Car.objects.create(category=self.rav4, currently_located=self.westmeadows)
+
+    def test_resolve_and_categories(self):
+        """
+        测试地点解析和每个地点的车型类别
+        """
+        inventory = get_location_inventory()
+
+        self.assertEqual(inventory.resolve('Sydney, NSW'), {self.mascot.id})
+        self.assertEqual(inventory.resolve('mel'), {self.westmeadows.id})
+        self.assertEqual(inventory.resolve(str(self.westmeadows.id)), {self.westmeadows.id})
+        self.assertEqual(inventory.resolve('Perth, WA'), set())
+        self.assertEqual(inventory.categories_at({self.mascot.id}), {self.corolla.id})
+        self.assertEqual(inventory.categories_at({self.westmeadows.id}), {self.corolla.id, self.rav4.id})
+
+    def test_car_move_updates_incrementally(self):
+        """
+        测试车辆移动后增量更新，不重新加载
+        """
+        inventory = get_location_inventory()
+        self.car.currently_located = self.westmeadows
+        self.car.owning_location = None
+        with self.captureOnCommitCallbacks(execute=True):
+            self.car.save()
+
+        with self.assertNumQueries(0):
+            inventory = get_location_inventory()
+        self.assertEqual(inventory.categories_at({self.mascot.id}), set())
+        self.assertEqual(inventory.counts[(self.westmeadows.id, self.corolla.id)], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.car.delete()
+        self.assertEqual(inventory.categories_at({self.westmeadows.id}), {self.rav4.id})
+
+    def test_car_list_filters_by_pickup_location(self):
+        """
+        测试搜索页按取车地点筛选车型
+        """
+        response = self.client.get(reverse('car_list'), {'pickup_location': 'Sydney, NSW'})
+        self.assertEqual([v['id'] for v in response.context['vehicles']], [self.corolla.id])
+
+        # 无法识别的地点不做筛选
+        response = self.client.get(reverse('car_list'), {'pickup_location': 'Perth, WA'})
+        self.assertEqual(len(response.context['vehicles']), 2)
+
+    def test_card_total_includes_pickup_state_tax(self):
+        """
+        测试搜索结果卡片: 取车州确定时显示含税合计，否则显示税前金额
+        """
+        reset_availability_index()
+        reset_rate_table()
+        Country.objects.update(sales_tax_rate=Decimal('10.00'))
+        VehicleCategory.objects.update(daily_rate=Decimal('50.00'))
+        pickup = timezone.now().date() + timedelta(days=10)
+        params = {'pickup_date': pickup.isoformat(), 'return_date': (pickup + timedelta(days=2)).isoformat()}
+
+        response = self.client.get(reverse('car_list'), {**params, 'pickup_location': 'Sydney, NSW'})
+        vehicle = response.context['vehicles'][0]
+        self.assertEqual((vehicle['total_cost'], vehicle['total_includes_tax']), (Decimal('110.00'), True))
+        self.assertContains(response, '$110.00 total incl. tax')
+
+        response = self.client.get(reverse('car_list'), params)
+        vehicle = response.context['vehicles'][0]
+        self.assertEqual((vehicle['total_cost'], vehicle['total_includes_tax']), (Decimal('100.00'), False))
+        self.assertContains(response, '$100.00 before tax')
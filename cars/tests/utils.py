@@ -0,0 +1,51 @@
+from django.apps import apps
+from django.db import connections
+
+
+class UnmanagedTablesMixin:
+    """
+    为 managed=False 的模型创建测试表
+
+    cars 应用的大部分模型映射到外部系统的 app_* 表，测试数据库中不会自动创建，
+    没有这些表就无法保存 Booking。表在进入测试事务之前创建，测试结束后删除。
+    测试使用多个数据库 (databases) 时在每个数据库中创建。
+    """
+
+    unmanaged_apps = ['cars']
+    # 其他没有迁移的模型 (例如 app_label 为未安装应用的 CarSubscription)
+    extra_models = []
+
+    @classmethod
+    def _unmanaged_models(cls, connection):
+        existing = set(connection.introspection.table_names())
+        models = [
+            model
+            for app_label in cls.unmanaged_apps
+            for model in apps.get_app_config(app_label).get_models()
+            if not model._meta.managed
+        ] + list(cls.extra_models)
+        return [model for model in models if model._meta.db_table not in existing]
+
+    @classmethod
+    def _test_databases(cls):
+        databases = getattr(cls, 'databases', {'default'})
+        return sorted(connections) if databases == '__all__' else sorted(databases)
+
+    @classmethod
+    def setUpClass(cls):
+        cls._created_models = {}
+        for alias in cls._test_databases():
+            connection = connections[alias]
+            cls._created_models[alias] = cls._unmanaged_models(connection)
+            with connection.schema_editor() as editor:
+                for model in cls._created_models[alias]:
+                    editor.create_model(model)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for alias, models in cls._created_models.items():
+            with connections[alias].schema_editor() as editor:
+                for model in reversed(models):
+                    editor.delete_model(model)
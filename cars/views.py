@@ -1,10 +1,51 @@
 from django.shortcuts import render, get_object_or_404
 from django.db.models import Q
-from .models import Car, CarCategory, VehicleCategory, VehicleCategoryType, VehicleFeature
-from locations.models import Location
+from .models import Car, CarCategory, VehicleCategory, VehicleFeature
+from bookings.availability import get_availability_index
+from bookings.pricing import PricingError, batch_quote, cents, quote
+from .catalog import get_catalog
+from .branches import get_branch_index
+from .inventory import get_location_inventory
 from datetime import datetime, timedelta
 
 
+# 按机场代码或坐标搜索时，取附近多少公里内最近的几个网点
+NEARBY_RADIUS_KM = 50
+NEARBY_BRANCHES = 5
+
+
+def pickup_location_ids(pickup_location, lat=None, lon=None):
+    """
+    将搜索条件解析为取车网点ID集合，无法解析时返回 None
+
+    依次尝试: 地点名称/代码/"城市, 州" (地点库存索引)、机场代码附近的网点、
+    经纬度附近的网点 (网点空间索引)。
+    """
+    if pickup_location:
+        location_ids = get_location_inventory().resolve(pickup_location)
+        if location_ids:
+            return location_ids
+        nearby = get_branch_index().near_airport(
+            pickup_location, n=NEARBY_BRANCHES, radius_km=NEARBY_RADIUS_KM)
+        if nearby:
+            return {branch.id for branch, _ in nearby}
+    try:
+        latitude, longitude = float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None
+    nearby = get_branch_index().nearest(latitude, longitude, n=NEARBY_BRANCHES, radius_km=NEARBY_RADIUS_KM)
+    return {branch.id for branch, _ in nearby} or None
+
+
+def pickup_state_code(location_ids):
+    """取车网点都在同一个州时返回州代码，否则返回 None"""
+    locations = get_location_inventory().locations
+    states = {locations[location_id][3] for location_id in location_ids or () if location_id in locations}
+    if len(states) != 1:
+        return None
+    return states.pop() or None
+
+
 def car_list(request):
     category_type_id = request.GET.get('category_type', '')
     region = request.GET.get('region', '')
@@ -14,46 +55,71 @@ def car_list(request):
     return_date = request.GET.get('return_date', '')
     age = request.GET.get('age', '')
 
-    # Start with all vehicle categories that are available for web
-    vehicles = VehicleCategory.objects.filter()
+    # 车型目录快照 (缓存命中时不查询数据库)
+    catalog = get_catalog()
 
-    # Apply category type filter if provided
-    if category_type_id:
-        vehicles = vehicles.filter(category_type_id=category_type_id)
-
-    # Apply region filter if provided
-    if region:
-        vehicles = vehicles.filter(region=region)
-
-    # Apply location filter if provided
-    if pickup_location:
-        location = Location.objects.filter(
-            name__icontains=pickup_location).first()
-        if location:
-            vehicles = vehicles.filter(locations=location)
+    try:
+        category_type_filter = int(category_type_id) if category_type_id else None
+    except ValueError:
+        category_type_filter = None
 
     # Apply age filter if provided
+    driver_age = None
     if age:
         try:
             driver_age = int(age)
-            vehicles = vehicles.filter(age_youngest_driver__lte=driver_age)
         except (ValueError, TypeError):
             pass
 
-    # Get all category types for the filter sidebar that are web available
-    category_types = VehicleCategoryType.objects.filter()
-
-    # Get all regions with available vehicles
-    regions = VehicleCategory.objects.filter().values_list(
-        'region', flat=True).distinct()
-
-    # Create region choices for display
-    region_choices = []
-    for region_code in regions:
-        for choice in VehicleCategory.REGION_CHOICES:
-            if choice[0] == region_code:
-                region_choices.append(choice)
-                break
+    # 取车地点: 解析为 app_location 的ID，只显示在这些地点有车辆的类别。
+    # 无法识别的地点不做筛选
+    category_ids = None
+    location_ids = pickup_location_ids(pickup_location, request.GET.get('lat'), request.GET.get('lon'))
+    if location_ids:
+        category_ids = get_location_inventory().categories_at(location_ids)
+
+    # Only show categories with at least one car free for the requested dates
+    free_counts = None
+    try:
+        start_date = datetime.strptime(pickup_date, '%Y-%m-%d').date()
+        end_date = datetime.strptime(return_date, '%Y-%m-%d').date()
+    except ValueError:
+        start_date = end_date = None
+    if start_date and end_date and end_date >= start_date:
+        index = get_availability_index()
+        if location_ids:
+            free_counts = {}
+            for location_id in location_ids:
+                for category_id, count in index.free_counts_by_category(
+                        start_date, end_date, location_id=location_id).items():
+                    free_counts[category_id] = free_counts.get(category_id, 0) + count
+        else:
+            free_counts = index.free_counts_by_category(start_date, end_date)
+        category_ids = set(free_counts) if category_ids is None else category_ids & set(free_counts)
+
+    vehicles = catalog.filter(
+        category_type_id=category_type_filter,
+        region=region or None,
+        driver_age=driver_age,
+        ids=category_ids,
+    )
+
+    # 有日期时一次批量计算所有车型的租金合计。
+    # 税率取决于取车州: 取车网点都在同一个州时显示含税合计，否则显示税前金额
+    if start_date and end_date and end_date >= start_date and vehicles:
+        state_code = pickup_state_code(location_ids)
+        try:
+            totals = {
+                category_id: cents(total if state_code else subtotal)
+                for category_id, _, _, _, subtotal, _, total in batch_quote(
+                    [vehicle['id'] for vehicle in vehicles], [(start_date, end_date)], state_code=state_code)
+            }
+        except PricingError:
+            totals = {}
+        vehicles = [
+            {**vehicle, 'total_cost': totals.get(vehicle['id']), 'total_includes_tax': bool(state_code)}
+            for vehicle in vehicles
+        ]
 
     # Store search parameters for form repopulation
     search_params = {
@@ -69,9 +135,10 @@ def car_list(request):
     return render(
         request, 'cars/car_list.html', {
             'vehicles': vehicles,
-            'category_types': category_types,
-            'region_choices': region_choices,
-            'search_params': search_params
+            'category_types': catalog.category_types,
+            'region_choices': catalog.region_choices,
+            'search_params': search_params,
+            'free_counts': free_counts
         })
 
 
@@ -86,19 +153,18 @@ def vehicle_detail(request, vehicle_id):
     age = request.GET.get('age', '')
 
     # Calculate rental duration if dates are provided
-    rental_days = 1
-    if pickup_date and return_date:
-        try:
-            start_date = datetime.strptime(pickup_date, '%Y-%m-%d')
-            end_date = datetime.strptime(return_date, '%Y-%m-%d')
-            rental_days = (end_date - start_date).days
-            if rental_days < 1:
-                rental_days = 1
-        except ValueError:
-            rental_days = 1
+    try:
+        start_date = datetime.strptime(pickup_date, '%Y-%m-%d').date()
+        end_date = datetime.strptime(return_date, '%Y-%m-%d').date()
+    except ValueError:
+        start_date = end_date = datetime.now().date()
 
     # Calculate total cost
-    total_cost = vehicle.daily_rate * rental_days
+    try:
+        rental_quote = quote(vehicle.id, start_date, end_date)
+        rental_days, total_cost = rental_quote.days, rental_quote.total
+    except PricingError:
+        rental_days, total_cost = 1, vehicle.daily_rate
 
     # Get similar vehicles (same category type, different vehicles)
     similar_vehicles = VehicleCategory.objects.filter().exclude(
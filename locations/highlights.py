@@ -0,0 +1,31 @@
+"""
+首页城市推荐
+
+首页每次访问都查询城市推荐，模板中的 highlight.state.code 还会为每个城市多一次查询。
+这里连同州一起取出并缓存，城市推荐或州保存、删除后由 locations.signals 清除缓存，
+同时清除 home.html 中的 city_highlights 片段缓存。
+"""
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+
+from rush_car_rental.db_router import use_primary
+
+from .models import CityHighlight
+
+CACHE_KEY = 'city_highlights:home'
+CACHE_TIMEOUT = 60 * 60
+HOME_COUNT = 3
+
+
+def home_highlights():
+    highlights = cache.get(CACHE_KEY)
+    if highlights is None:
+        # 缓存失效后从主库重建，避免把副本上的旧数据再缓存一小时
+        with use_primary():
+            highlights = list(CityHighlight.objects.select_related('state')[:HOME_COUNT])
+        cache.set(CACHE_KEY, highlights, CACHE_TIMEOUT)
+    return highlights
+
+
+def invalidate():
+    cache.delete_many([CACHE_KEY, make_template_fragment_key('city_highlights')])
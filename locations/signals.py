@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import CityHighlight, State
+from . import highlights
+
+
+@receiver([post_save, post_delete], sender=CityHighlight)
+@receiver([post_save, post_delete], sender=State)
+def invalidate_home_highlights(sender, **kwargs):
+    """
+    Signal handler to clear the cached home page city highlights when a highlight or its state changes
+    """
+    transaction.on_commit(highlights.invalidate)
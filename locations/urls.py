@@ -4,4 +4,6 @@ from . import views
 urlpatterns = [
     path('', views.location_list, name='location_list'),
     path('city-highlights/', views.city_highlights, name='city_highlights'),
+    path('nearest/', views.nearest_branches, name='nearest_branches'),
+    path('autocomplete/', views.location_autocomplete, name='location_autocomplete'),
 ]
@@ -1,4 +1,7 @@
+from django.http import JsonResponse
 from django.shortcuts import render
+from cars.autocomplete import AIRPORT, get_autocomplete_index
+from cars.branches import get_branch_index
 from .models import Location, State, CityHighlight
 
 def location_list(request):
@@ -19,3 +22,100 @@ def location_list(request):
 def city_highlights(request):
     highlights = CityHighlight.objects.all()
     return render(request, 'locations/city_highlights.html', {'highlights': highlights})
+
+
+# nearest_branches 默认和最多返回的数量 (按半径搜索时不限)
+DEFAULT_BRANCHES = 5
+MAX_BRANCHES = 20
+
+
+def nearest_branches(request):
+    """
+    最近的可租网点 (JSON)
+
+    参数: lat + lon 或 airport (机场代码)，n (默认5，最多20)，radius_km (可选，限制最大距离)
+    只指定 radius_km、不指定 n 时返回半径内的所有网点。
+    """
+    try:
+        n = request.GET.get('n')
+        n = min(max(int(n), 1), MAX_BRANCHES) if n else None
+        radius_km = request.GET.get('radius_km')
+        radius_km = float(radius_km) if radius_km else None
+    except ValueError:
+        return JsonResponse({'error': 'n and radius_km must be numbers'}, status=400)
+    if radius_km is not None and radius_km <= 0:
+        return JsonResponse({'error': 'radius_km must be positive'}, status=400)
+
+    index = get_branch_index()
+    airport = request.GET.get('airport', '').strip()
+    if airport:
+        point = index.airport_point(airport)
+        if point is None:
+            return JsonResponse({'error': f'Unknown airport code: {airport}'}, status=404)
+    else:
+        try:
+            point = (float(request.GET['lat']), float(request.GET['lon']))
+        except (KeyError, ValueError):
+            return JsonResponse({'error': 'lat and lon, or airport, are required'}, status=400)
+        if not (-90 <= point[0] <= 90 and -180 <= point[1] <= 180):
+            return JsonResponse({'error': 'lat/lon out of range'}, status=400)
+
+    if n is None and radius_km is not None:
+        results = index.within(*point, radius_km=radius_km)
+    else:
+        results = index.nearest(*point, n=n or DEFAULT_BRANCHES, radius_km=radius_km)
+
+    return JsonResponse({
+        'results': [branch.as_dict(distance_km) for branch, distance_km in results],
+    })
+
+
+# location_autocomplete 返回数量上限
+MAX_SUGGESTIONS = 20
+# location_autocomplete 中附带的最近网点数量
+AUTOCOMPLETE_BRANCHES = 3
+
+
+def location_autocomplete(request):
+    """
+    取车/还车地点自动补全 (JSON)
+
+    参数: q (输入的文字)，limit (默认10，最多20)，types (可选，逗号分隔: location,airport,city)，
+    lat + lon (可选，访客的位置)
+
+    机场建议附带离机场最近的网点 (branches)；指定 lat + lon 时另外返回离访客最近的网点 (nearest)，
+    都来自网点空间索引，不查询数据库。
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), MAX_SUGGESTIONS)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be a number'}, status=400)
+    kinds = {kind for kind in request.GET.get('types', '').split(',') if kind} or None
+    point = None
+    if 'lat' in request.GET or 'lon' in request.GET:
+        try:
+            point = (float(request.GET['lat']), float(request.GET['lon']))
+        except (KeyError, ValueError):
+            return JsonResponse({'error': 'lat and lon must both be numbers'}, status=400)
+        if not (-90 <= point[0] <= 90 and -180 <= point[1] <= 180):
+            return JsonResponse({'error': 'lat/lon out of range'}, status=400)
+
+    results = get_autocomplete_index().search(request.GET.get('q', ''), limit=limit, kinds=kinds)
+    branches = get_branch_index() if point is not None or any(s.kind == AIRPORT for s, _ in results) else None
+
+    suggestions = []
+    for suggestion, score in results:
+        data = suggestion.as_dict(score)
+        if suggestion.kind == AIRPORT:
+            data['branches'] = [
+                branch.as_dict(distance_km)
+                for branch, distance_km in branches.near_airport(suggestion.value, n=AUTOCOMPLETE_BRANCHES)
+            ]
+        suggestions.append(data)
+    response = {'results': suggestions}
+    if point is not None:
+        response['nearest'] = [
+            branch.as_dict(distance_km)
+            for branch, distance_km in branches.nearest(*point, n=AUTOCOMPLETE_BRANCHES)
+        ]
+    return JsonResponse(response)
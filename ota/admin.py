@@ -0,0 +1,29 @@
+from django.contrib import admin
+from .models import ChangeEvent, ChannelState, InboundReservation, OutboundBatch
+
+
+@admin.register(ChannelState)
+class ChannelStateAdmin(admin.ModelAdmin):
+    list_display = ('channel', 'last_change_id', 'horizon_end', 'last_synced_at')
+
+
+@admin.register(OutboundBatch)
+class OutboundBatchAdmin(admin.ModelAdmin):
+    list_display = ('id', 'channel', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('channel', 'status')
+    readonly_fields = ('cells', 'created_at', 'sent_at')
+
+
+@admin.register(ChangeEvent)
+class ChangeEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'source', 'category_id', 'location_id', 'start_date', 'end_date', 'created_at')
+    list_filter = ('source',)
+
+
+@admin.register(InboundReservation)
+class InboundReservationAdmin(admin.ModelAdmin):
+    list_display = ('external_id', 'channel', 'status', 'booking', 'attempts', 'received_at', 'processed_at', 'acknowledged_at')
+    list_filter = ('channel', 'status')
+    search_fields = ('external_id',)
+    raw_id_fields = ('booking',)
+    readonly_fields = ('payload', 'received_at', 'processed_at', 'acknowledged_at')
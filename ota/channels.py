@@ -0,0 +1,156 @@
+"""
+OTA 渠道适配器
+
+每个渠道一个适配器，负责把差异单元格和预订回执转换为渠道的请求格式并发送。新增渠道只需继承
+ChannelAdapter，实现 format_cells()，并在 settings.OTA_SYNC['CHANNELS'] 中配置 ADAPTER。
+
+差异单元格 (cells) 的格式:
+
+    {'category_id': 3, 'location_id': 12, 'date': '2025-07-01', 'available': 4, 'rate': '65.00'}
+
+发送失败时抛出 ChannelError: 网络错误、429 和 5xx 可以重试，其他 4xx 不重试。
+"""
+import json
+import logging
+import urllib.error
+import urllib.request
+
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class ChannelError(Exception):
+    def __init__(self, message, retryable=True, retry_after=None):
+        super().__init__(message)
+        self.retryable = retryable
+        # 渠道要求的重试等待时间(秒)，来自 Retry-After
+        self.retry_after = retry_after
+
+
+class ChannelAdapter:
+    """
+    渠道适配器基类
+    """
+    # 推送接口和预订回执接口的路径 (相对于 ENDPOINT)
+    path = 'availability'
+    ack_path = 'reservations/ack'
+
+    def __init__(self, name, config):
+        self.name = name
+        self.config = config
+        self.endpoint = config['ENDPOINT'].rstrip('/')
+
+    def format_cells(self, cells):
+        """差异单元格 -> 请求体"""
+        raise NotImplementedError
+
+    def headers(self):
+        headers = {'Content-Type': 'application/json'}
+        if self.config.get('API_KEY'):
+            headers['Authorization'] = f"Bearer {self.config['API_KEY']}"
+        return headers
+
+    def parse_reservation(self, payload):
+        """渠道推送的预订 -> ota.inbound 中的预订格式 (默认渠道已使用该格式)"""
+        return payload
+
+    def format_acks(self, results):
+        """
+        预订处理结果 -> 回执请求体
+
+        results: [{'reservation_id', 'status', 'confirmation_number', 'reason'}, ...]
+        """
+        return {'reservations': results}
+
+    def push(self, cells):
+        """推送一批差异，返回请求体字节数"""
+        return self._post(self.path, self.format_cells(cells))
+
+    def acknowledge(self, results):
+        """回执一批预订处理结果，返回请求体字节数"""
+        return self._post(self.ack_path, self.format_acks(results))
+
+    def _post(self, path, data):
+        body = json.dumps(data, separators=(',', ':')).encode()
+        request = urllib.request.Request(
+            f"{self.endpoint}/{path}", data=body, headers=self.headers(), method='POST',
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.config['TIMEOUT']) as response:
+                response.read()
+        except urllib.error.HTTPError as e:
+            retryable = e.code == 429 or e.code >= 500
+            retry_after = e.headers.get('Retry-After') if e.headers else None
+            raise ChannelError(
+                f"{self.name} returned HTTP {e.code}", retryable=retryable,
+                retry_after=int(retry_after) if retry_after and retry_after.isdigit() else None,
+            ) from e
+        except (urllib.error.URLError, OSError) as e:
+            raise ChannelError(f"{self.name} is unreachable: {e}") from e
+        return len(body)
+
+
+class CtripChannel(ChannelAdapter):
+    """携程: 库存和价格合并为一个批量接口"""
+    path = 'inventory/batch'
+
+    def format_cells(self, cells):
+        return {
+            'partnerId': self.config.get('PARTNER_ID', ''),
+            'items': [
+                {
+                    'carId': cell['category_id'],
+                    'locationId': cell['location_id'],
+                    'date': cell['date'],
+                    'quantity': cell['available'],
+                    'basePrice': float(cell['rate']),
+                }
+                for cell in cells
+            ],
+        }
+
+
+class BookingComChannel(ChannelAdapter):
+    """Booking.com"""
+    path = 'availability/update'
+
+    def format_cells(self, cells):
+        return {
+            'property_id': self.config.get('PARTNER_ID', ''),
+            'availability': [
+                {
+                    'car_id': cell['category_id'],
+                    'location_id': cell['location_id'],
+                    'date_range': {'start_date': cell['date'], 'end_date': cell['date']},
+                    'status': 'available' if cell['available'] else 'not_available',
+                    'quantity': cell['available'],
+                    'base_rate': {'amount': float(cell['rate']), 'currency': self.config['CURRENCY']},
+                }
+                for cell in cells
+            ],
+        }
+
+
+class ExpediaChannel(ChannelAdapter):
+    """Expedia"""
+    path = 'inventory/rates'
+
+    def format_cells(self, cells):
+        return {
+            'items': [
+                {
+                    'vehicleClassId': cell['category_id'],
+                    'locationId': cell['location_id'],
+                    'date': cell['date'],
+                    'available': cell['available'],
+                    'rate': {'amount': cell['rate'], 'currency': self.config['CURRENCY']},
+                }
+                for cell in cells
+            ],
+        }
+
+
+def get_channel(name, config):
+    """按配置中的 ADAPTER 创建适配器"""
+    return import_string(config['ADAPTER'])(name, config)
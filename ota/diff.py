@@ -0,0 +1,119 @@
+"""
+OTA 差异计算
+
+渠道上的库存和价格按单元格 (车型, 网点, 日期) 维护。每次同步:
+
+1. 把新的变更记录 (ChangeEvent) 展开为受影响的单元格；首次同步或同步范围向后滚动时，
+   加入全部或新增日期的单元格
+2. 用可用性索引和报价费率表计算这些单元格的当前取值 (可租数量, 日租金)
+3. 与上次推送的取值 (PushedCell) 比较，只返回变化的单元格，并记录新的取值
+
+因此一次预订只会产生它占用的几天、一个车型、一个网点的差异，而不是整个库存。
+"""
+from datetime import timedelta
+
+from .models import PushedCell
+
+ZERO_RATE = '0.00'
+
+
+def date_range(start, end):
+    """[start, end] 内的每一天"""
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+
+def known_pairs(index, channel):
+    """
+    当前有车辆的 (车型 -> 网点集合)，加上渠道上已有单元格的组合
+
+    车辆全部移走或车型删除后，渠道上的旧单元格也需要更新为 0。
+    """
+    pairs = {category_id: set(locations) for category_id, locations in index.locations_by_category().items()}
+    for category_id, location_id in PushedCell.objects.filter(channel=channel).values_list(
+            'category_id', 'location_id').distinct():
+        pairs.setdefault(category_id, set()).add(location_id)
+    return pairs
+
+
+def expand_changes(changes, pairs, start, end):
+    """
+    changes: 可迭代的 (category_id, location_id, start_date, end_date)，None 表示全部
+    返回 [start, end] 范围内受影响的单元格集合
+    """
+    cells = set()
+    for category_id, location_id, change_start, change_end in changes:
+        first = max(change_start or start, start)
+        last = min(change_end or end, end)
+        if first > last:
+            continue
+        categories = pairs if category_id is None else [category_id]
+        for category in categories:
+            locations = pairs.get(category, ()) if location_id is None else [location_id]
+            for location in locations:
+                cells.update((category, location, day) for day in date_range(first, last))
+    return cells
+
+
+def all_cells(pairs, start, end):
+    return expand_changes([(None, None, start, end)], pairs, start, end)
+
+
+def cell_values(cells, index, rates):
+    """
+    {单元格: (可租数量, 日租金字符串)}
+
+    index: bookings.availability.AvailabilityIndex
+    rates: {category_id: Decimal}，不在其中的车型 (已删除) 按不可租处理
+    """
+    values = {}
+    for category_id, location_id, day in cells:
+        rate = rates.get(category_id)
+        if rate is None:
+            values[(category_id, location_id, day)] = (0, ZERO_RATE)
+        else:
+            available = index.free_count(category_id, location_id, day, day)
+            values[(category_id, location_id, day)] = (available, str(rate))
+    return values
+
+
+def diff_and_record(channel, values):
+    """
+    返回与上次推送不同的单元格 [{'category_id', 'location_id', 'date', 'available', 'rate'}, ...]，
+    并将这些单元格的新取值写入 PushedCell
+    """
+    if not values:
+        return []
+    categories = {cell[0] for cell in values}
+    days = [cell[2] for cell in values]
+    pushed = {
+        (category_id, location_id, day): (available, str(rate))
+        for category_id, location_id, day, available, rate in PushedCell.objects.filter(
+            channel=channel, category_id__in=categories, date__range=(min(days), max(days)),
+        ).values_list('category_id', 'location_id', 'date', 'available', 'rate')
+    }
+    changed = sorted(cell for cell, value in values.items() if pushed.get(cell) != value)
+    PushedCell.objects.bulk_create(
+        [
+            PushedCell(channel=channel, category_id=category_id, location_id=location_id, date=day,
+                       available=values[(category_id, location_id, day)][0],
+                       rate=values[(category_id, location_id, day)][1])
+            for category_id, location_id, day in changed
+        ],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['channel', 'category_id', 'location_id', 'date'],
+        update_fields=['available', 'rate'],
+    )
+    return [
+        {
+            'category_id': category_id,
+            'location_id': location_id,
+            'date': day.isoformat(),
+            'available': values[(category_id, location_id, day)][0],
+            'rate': values[(category_id, location_id, day)][1],
+        }
+        for category_id, location_id, day in changed
+    ]
@@ -0,0 +1,487 @@
+"""
+OTA 入站预订队列
+
+渠道的预订会集中推送过来，网站的预订流程 (会话中的草稿 + 登录用户) 不适合处理。入站接口只校验
+格式并写入 InboundReservation 表，由工作进程批量分配车辆、创建 Booking 和驾驶员，再把结果
+异步回执给渠道:
+
+    POST /ota/reservations/<channel>/                   enqueue()，队列已满时返回 429 和 Retry-After
+    GET  /ota/reservations/<channel>/<reservation_id>/  查询处理结果
+    python manage.py ota_reservations                   ReservationWorker.run_once() + acknowledge()
+
+预订格式 (渠道适配器的 parse_reservation() 负责转换为这个格式):
+
+    {
+        "reservation_id": "CT-1001",
+        "category_id": 3,
+        "pickup_location_id": 1,              // 预订地点 (locations.Location) ID
+        "dropoff_location_id": 1,             // 可省略，默认同取车地点
+        "pickup_date": "2025-07-01",
+        "return_date": "2025-07-04",
+        "options": {"child_seats": 1},
+        "drivers": [{"first_name": "...", "last_name": "...", "email": "...",
+                     "date_of_birth": "1990-01-01", "license_number": "...",
+                     "license_expiry_date": "2030-01-01", "mobile": "..."}]
+    }
+
+配置 (settings.OTA_SYNC):
+
+    'INBOUND': {
+        'MAX_QUEUE_DEPTH': 1000,   # 未处理的预订达到这个数量时返回 429
+        'RETRY_AFTER': 30,         # 429 响应的 Retry-After (秒)
+        'BATCH_SIZE': 100,         # 工作进程每次领取的预订数
+    },
+    'CHANNELS': {'ctrip': {'INBOUND_API_KEY': '...', ...}},
+
+推送的库存单元格按车辆所在网点 (cars.Location，即 Car.currently_located_id) 统计，预订中的地点
+按名称和州代码换算为同一批网点 (cars.branches.branch_ids_for)，只分配取车网点的车辆。
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from bookings import availability
+from bookings.availability import ACTIVE_STATUSES, booking_interval, get_availability_index
+from bookings.drivers import DRIVER_FIELDS, build_driver
+from bookings.models import Booking, Driver
+from bookings.pricing import PricingError, normalize_options, quote
+from cars.branches import branch_ids_for
+from cars.models import Car
+from locations.models import Location
+from .channels import ChannelError, get_channel
+from .models import ChangeEvent, InboundReservation
+from .services import get_config, is_enabled
+
+logger = logging.getLogger(__name__)
+
+INBOUND_DEFAULTS = {
+    'MAX_QUEUE_DEPTH': 1000,
+    'RETRY_AFTER': 30,
+    'BATCH_SIZE': 100,
+    # 领取后超过这个时间仍未完成 (工作进程崩溃) 的预订重新入队
+    'LEASE_SECONDS': 300,
+    # 处理出错的次数达到上限后标记为 failed
+    'MAX_ATTEMPTS': 5,
+}
+
+PENDING_STATUSES = ('queued', 'processing')
+DONE_STATUSES = ('confirmed', 'rejected', 'failed')
+# 每次回执的最大数量
+ACK_BATCH_SIZE = 500
+# 渠道预订归属的系统用户名
+CHANNEL_USERNAME = 'ota:{channel}'
+
+REQUIRED_DRIVER_FIELDS = (
+    'first_name', 'last_name', 'email', 'date_of_birth', 'license_number', 'license_expiry_date',
+)
+DRIVER_DATE_FIELDS = ('date_of_birth', 'license_expiry_date')
+
+
+class ReservationError(ValueError):
+    """预订格式错误"""
+
+
+class ChannelUserError(Exception):
+    """渠道用户名被不是由 channel_user() 创建的账户占用"""
+
+
+class QueueFull(Exception):
+    """入站队列已满，渠道应在 retry_after 秒后重试"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Reservation queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def get_inbound_config():
+    config = dict(INBOUND_DEFAULTS)
+    config.update(get_config().get('INBOUND', {}))
+    return config
+
+
+def inbound_channel(name):
+    """返回接收预订的渠道配置，渠道未启用或没有配置 INBOUND_API_KEY 时返回 None"""
+    channel = get_config()['CHANNELS'].get(name)
+    if channel and channel['ENABLED'] and channel['INBOUND_API_KEY']:
+        return channel
+    return None
+
+
+def _parse_date(value):
+    return datetime.strptime(str(value), '%Y-%m-%d').date()
+
+
+def _parse_driver(data):
+    if not isinstance(data, dict):
+        raise ReservationError("Each driver must be an object")
+    missing = [field for field in REQUIRED_DRIVER_FIELDS if not data.get(field)]
+    if missing:
+        raise ReservationError(f"Driver is missing: {', '.join(missing)}")
+    driver = {field: data.get(field, default) for field, default in DRIVER_FIELDS.items()}
+    for field in DRIVER_DATE_FIELDS:
+        driver[field] = _parse_date(driver[field])
+    driver['is_primary'] = bool(driver['is_primary'])
+    return driver
+
+
+def parse_reservation(payload):
+    """
+    校验预订，返回日期已转换的字典，格式错误时抛出 ReservationError
+    """
+    if not isinstance(payload, dict):
+        raise ReservationError("Reservation must be a JSON object")
+    try:
+        reservation = {
+            'reservation_id': str(payload['reservation_id']).strip(),
+            'category_id': int(payload['category_id']),
+            'pickup_location_id': int(payload['pickup_location_id']),
+            'dropoff_location_id': int(payload.get('dropoff_location_id') or payload['pickup_location_id']),
+            'pickup_date': _parse_date(payload['pickup_date']),
+            'return_date': _parse_date(payload['return_date']),
+            'options': dict(normalize_options(payload.get('options'))),
+        }
+        drivers = [_parse_driver(driver) for driver in payload.get('drivers') or []]
+    except KeyError as e:
+        raise ReservationError(f"Missing field: {e.args[0]}")
+    except (TypeError, ValueError) as e:
+        raise ReservationError(str(e))
+
+    if not reservation['reservation_id'] or len(reservation['reservation_id']) > 100:
+        raise ReservationError("Invalid reservation_id")
+    if reservation['return_date'] < reservation['pickup_date']:
+        raise ReservationError("return_date is before pickup_date")
+    if not drivers:
+        raise ReservationError("At least one driver is required")
+    if not any(driver['is_primary'] for driver in drivers):
+        drivers[0]['is_primary'] = True
+    reservation['drivers'] = drivers
+    return reservation
+
+
+def driver_age(date_of_birth, on_date):
+    return on_date.year - date_of_birth.year - ((on_date.month, on_date.day) < (date_of_birth.month, date_of_birth.day))
+
+
+def enqueue(channel, payload):
+    """
+    校验预订并写入队列，返回 (InboundReservation, created)
+
+    同一渠道重复推送同一预订号时返回已有记录。未处理的预订达到 MAX_QUEUE_DEPTH 时抛出 QueueFull。
+    """
+    reservation = parse_reservation(payload)
+    external_id = reservation['reservation_id']
+    existing = InboundReservation.objects.filter(channel=channel, external_id=external_id).first()
+    if existing is not None:
+        return existing, False
+
+    config = get_inbound_config()
+    depth = InboundReservation.objects.filter(status__in=PENDING_STATUSES).count()
+    if depth >= config['MAX_QUEUE_DEPTH']:
+        logger.warning("入站预订队列已满 (%d)，拒绝渠道 %s 的预订 %s", depth, channel, external_id)
+        raise QueueFull(config['RETRY_AFTER'])
+
+    try:
+        with transaction.atomic():
+            return InboundReservation.objects.create(
+                channel=channel, external_id=external_id, payload=payload,
+            ), True
+    except IntegrityError:
+        # 并发请求抢先写入了同一预订
+        return InboundReservation.objects.get(channel=channel, external_id=external_id), False
+
+
+def reservation_result(reservation):
+    """预订的处理结果 (状态查询接口和回执使用)"""
+    return {
+        'reservation_id': reservation.external_id,
+        'status': reservation.status,
+        'confirmation_number': reservation.booking_id,
+        'reason': reservation.error,
+    }
+
+
+def channel_user(channel):
+    """
+    渠道预订归属的系统用户 (未激活，不能登录)
+
+    用户名包含 ":"，网站注册和修改资料表单的用户名校验不允许这个字符，访客无法抢先注册。
+    同名用户已存在但不是这样创建的 (已激活或可以用密码登录) 时报错，不把渠道预订归到该账户下。
+    """
+    username = CHANNEL_USERNAME.format(channel=channel)
+    user, created = User.objects.get_or_create(
+        username=username, defaults={'is_active': False, 'password': make_password(None)},
+    )
+    if not created and (user.is_active or user.has_usable_password()):
+        raise ChannelUserError(f"User {username} exists and is not an OTA channel account")
+    return user
+
+
+def _overlaps(interval, other):
+    return interval[0] < other[1] and other[0] < interval[1]
+
+
+class ReservationWorker:
+    """
+    批量处理入站预订
+
+    多个工作进程可以同时运行: 领取时用 SELECT ... FOR UPDATE SKIP LOCKED，
+    创建预订前锁住候选车辆并用数据库中的预订再次核对时间冲突。
+    """
+
+    def __init__(self, batch_size=None):
+        self.config = get_inbound_config()
+        self.batch_size = batch_size or self.config['BATCH_SIZE']
+
+    def claim(self, now=None):
+        """领取一批排队中或租约已过期的预订"""
+        now = now or timezone.now()
+        expired = now - timedelta(seconds=self.config['LEASE_SECONDS'])
+        with transaction.atomic():
+            ids = list(
+                InboundReservation.objects.select_for_update(skip_locked=True)
+                .filter(Q(status='queued') | Q(status='processing', locked_at__lt=expired))
+                .order_by('id').values_list('id', flat=True)[:self.batch_size]
+            )
+            InboundReservation.objects.filter(id__in=ids).update(
+                status='processing', locked_at=now, attempts=F('attempts') + 1,
+            )
+        return list(InboundReservation.objects.filter(id__in=ids).order_by('id'))
+
+    def run_once(self):
+        """领取并处理一批预订，返回领取的数量"""
+        reservations = self.claim()
+        if not reservations:
+            return 0
+        try:
+            self.process(reservations)
+        except Exception as e:
+            logger.exception("处理入站预订失败: %s", [r.external_id for r in reservations])
+            self._release(reservations, str(e))
+        return len(reservations)
+
+    def _release(self, reservations, error):
+        """处理出错: 重新入队，超过次数上限的标记为 failed"""
+        now = timezone.now()
+        for reservation in reservations:
+            failed = reservation.attempts >= self.config['MAX_ATTEMPTS']
+            reservation.status = 'failed' if failed else 'queued'
+            reservation.error = error
+            reservation.locked_at = None
+            reservation.processed_at = now if failed else None
+        InboundReservation.objects.bulk_update(
+            reservations, ['status', 'error', 'locked_at', 'processed_at'],
+        )
+
+    def process(self, reservations):
+        """
+        为领取的预订分配车辆并批量创建 Booking 和驾驶员
+
+        按领取顺序 (先到先得) 分配，没有可租车辆或数据无效的预订标记为 rejected。
+        """
+        now = timezone.now()
+        parsed = {}
+        for reservation in reservations:
+            try:
+                parsed[reservation.pk] = parse_reservation(reservation.payload)
+            except ReservationError as e:
+                self._reject(reservation, str(e), now)
+
+        location_ids = {
+            data[field] for data in parsed.values() for field in ('pickup_location_id', 'dropoff_location_id')
+        }
+        locations = Location.objects.select_related('state').in_bulk(location_ids)
+        branches = branch_ids_for(locations.values())
+
+        # 可用性索引给出候选车辆，数据库中的预订作最终核对
+        index = get_availability_index()
+        candidates = {}
+        quotes = {}
+        for reservation in reservations:
+            data = parsed.get(reservation.pk)
+            if data is None:
+                continue
+            pickup_location = locations.get(data['pickup_location_id'])
+            if pickup_location is None or data['dropoff_location_id'] not in locations:
+                del parsed[reservation.pk]
+                self._reject(reservation, "Unknown location", now)
+                continue
+            try:
+                quotes[reservation.pk] = quote(
+                    data['category_id'], data['pickup_date'], data['return_date'],
+                    data['options'], pickup_location.state.code,
+                )
+            except PricingError as e:
+                del parsed[reservation.pk]
+                self._reject(reservation, str(e), now)
+                continue
+            # 与推送的单元格相同，按取车网点查找空闲车辆
+            candidates[reservation.pk] = sorted(
+                car_id for branch_id in branches[data['pickup_location_id']]
+                for car_id in index.free_cars(
+                    data['pickup_date'], data['return_date'],
+                    location_id=branch_id, category_id=data['category_id'],
+                )
+            )
+
+        users = {channel: channel_user(channel) for channel in {r.channel for r in reservations if r.pk in parsed}}
+        with transaction.atomic():
+            car_ids = {car_id for cars in candidates.values() for car_id in cars}
+            # 锁住候选车辆，与网站的确认流程 (bookings.confirmation) 串行;
+            # 按 id 顺序加锁，多个工作进程的候选车辆重叠时不会互相死锁
+            cars = {
+                car_id: (category_id, location_id)
+                for car_id, category_id, location_id in Car.objects.select_for_update()
+                .filter(pk__in=car_ids).order_by('id').values_list('id', 'category_id', 'currently_located_id')
+            }
+            busy = self._busy_intervals(cars, parsed.values())
+            existing = Booking.objects.in_bulk(
+                [f"ota:{r.channel}:{r.external_id}" for r in reservations if r.pk in parsed],
+                field_name='idempotency_key',
+            )
+
+            assigned = []
+            for reservation in reservations:
+                data = parsed.get(reservation.pk)
+                if data is None:
+                    continue
+                key = f"ota:{reservation.channel}:{reservation.external_id}"
+                if key in existing:
+                    self._confirm(reservation, existing[key], now)
+                    continue
+                interval = booking_interval(data['pickup_date'], data['return_date'])
+                pickup_branches = branches[data['pickup_location_id']]
+                car_id = next((
+                    car_id for car_id in candidates[reservation.pk]
+                    if car_id in cars and cars[car_id][1] in pickup_branches
+                    and not any(_overlaps(interval, other) for other in busy[car_id])
+                ), None)
+                if car_id is None:
+                    self._reject(reservation, "No vehicle available for the selected dates", now)
+                    continue
+                busy[car_id].append(interval)
+                primary = next(driver for driver in data['drivers'] if driver['is_primary'])
+                booking = Booking(
+                    user=users[reservation.channel], car_id=car_id,
+                    pickup_location=locations[data['pickup_location_id']],
+                    dropoff_location=locations[data['dropoff_location_id']],
+                    pickup_date=data['pickup_date'], return_date=data['return_date'],
+                    status='confirmed', total_cost=quotes[reservation.pk].total,
+                    driver_age=driver_age(primary['date_of_birth'], data['pickup_date']),
+                    idempotency_key=key, **{code: value for code, value in data['options'].items()},
+                )
+                assigned.append((reservation, booking, data))
+
+            bookings = Booking.objects.bulk_create([booking for _, booking, _ in assigned])
+            Driver.objects.bulk_create([
+                build_driver(driver, booking) for _, booking, data in assigned for driver in data['drivers']
+            ])
+            for reservation, booking, _ in assigned:
+                self._confirm(reservation, booking, now)
+            InboundReservation.objects.bulk_update(
+                reservations, ['status', 'booking', 'error', 'locked_at', 'processed_at'],
+            )
+            # bulk_create 不发送 post_save，手动更新可用性索引和 OTA 变更记录
+            if is_enabled():
+                ChangeEvent.objects.bulk_create([
+                    ChangeEvent(
+                        source='booking', category_id=cars[booking.car_id][0], location_id=cars[booking.car_id][1],
+                        start_date=start, end_date=end - timedelta(days=1),
+                    )
+                    for booking in bookings
+                    for start, end in [booking_interval(booking.pickup_date, booking.return_date)]
+                ])
+            transaction.on_commit(lambda: [availability.booking_changed(booking) for booking in bookings])
+
+        logger.info("处理了 %d 个入站预订: %d 个确认", len(reservations), len(bookings))
+        return bookings
+
+    @staticmethod
+    def _busy_intervals(cars, reservations):
+        """候选车辆在这批预订日期范围内的已有预订区间"""
+        busy = defaultdict(list)
+        if not cars or not reservations:
+            return busy
+        intervals = [booking_interval(data['pickup_date'], data['return_date']) for data in reservations]
+        start, end = min(i[0] for i in intervals), max(i[1] for i in intervals)
+        for car_id, pickup_date, return_date in Booking.objects.filter(
+            car_id__in=list(cars), status__in=ACTIVE_STATUSES,
+            pickup_date__lt=end, return_date__gte=start,
+        ).values_list('car_id', 'pickup_date', 'return_date'):
+            busy[car_id].append(booking_interval(pickup_date, return_date))
+        return busy
+
+    @staticmethod
+    def _confirm(reservation, booking, now):
+        reservation.status = 'confirmed'
+        reservation.booking = booking
+        reservation.error = ''
+        reservation.locked_at = None
+        reservation.processed_at = now
+
+    @staticmethod
+    def _reject(reservation, reason, now):
+        reservation.status = 'rejected'
+        reservation.error = reason
+        reservation.locked_at = None
+        reservation.processed_at = now
+
+    def acknowledge(self):
+        """
+        把已处理但未回执的结果发送给渠道，返回 {渠道名: 回执数量}
+
+        没有配置 ENDPOINT 的渠道不回执，由渠道调用状态查询接口获取结果；
+        回执失败的结果下次重试。
+        """
+        channels = {
+            name: channel for name, channel in get_config()['CHANNELS'].items()
+            if channel['ENABLED'] and channel['ENDPOINT']
+        }
+        result = {}
+        for name, channel in channels.items():
+            pending = list(InboundReservation.objects.filter(
+                channel=name, status__in=DONE_STATUSES, acknowledged_at__isnull=True,
+            ).order_by('id')[:ACK_BATCH_SIZE])
+            if not pending:
+                continue
+            try:
+                get_channel(name, channel).acknowledge([reservation_result(r) for r in pending])
+            except ChannelError as e:
+                logger.warning("渠道 %s 预订回执失败，稍后重试: %s", name, e)
+                continue
+            InboundReservation.objects.filter(id__in=[r.pk for r in pending]).update(acknowledged_at=timezone.now())
+            result[name] = len(pending)
+        return result
+
+
+def queue_stats(window=300, now=None):
+    """
+    入站队列深度和每个渠道的吞吐量
+
+    window: 统计最近多少秒内处理完成的预订
+    """
+    now = now or timezone.now()
+    config = get_inbound_config()
+    channels = defaultdict(lambda: {
+        'queued': 0, 'processing': 0, 'confirmed': 0, 'rejected': 0, 'failed': 0,
+        'processed_per_minute': 0.0, 'oldest_queued_seconds': None,
+    })
+    for row in InboundReservation.objects.values('channel', 'status').annotate(count=Count('id')):
+        channels[row['channel']][row['status']] = row['count']
+    for row in InboundReservation.objects.filter(processed_at__gte=now - timedelta(seconds=window)).values(
+            'channel').annotate(count=Count('id')):
+        channels[row['channel']]['processed_per_minute'] = round(row['count'] * 60 / window, 2)
+    for row in InboundReservation.objects.filter(status='queued').values('channel').annotate(
+            oldest=Min('received_at')):
+        channels[row['channel']]['oldest_queued_seconds'] = int((now - row['oldest']).total_seconds())
+    return {
+        'depth': sum(stats['queued'] + stats['processing'] for stats in channels.values()),
+        'max_depth': config['MAX_QUEUE_DEPTH'],
+        'window_seconds': window,
+        'channels': dict(channels),
+    }
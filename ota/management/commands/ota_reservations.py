@@ -0,0 +1,45 @@
+"""
+处理 OTA 入站预订队列
+
+    python manage.py ota_reservations                  # 处理完队列中的预订并回执，然后退出
+    python manage.py ota_reservations --interval 5     # 作为常驻工作进程运行，可以同时运行多个
+    python manage.py ota_reservations --stats          # 只输出队列统计
+"""
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from ota.inbound import ReservationWorker, queue_stats
+
+
+class Command(BaseCommand):
+    help = '批量处理OTA渠道推送的预订并回执处理结果'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='每次领取的预订数 (默认 settings.OTA_SYNC["INBOUND"]["BATCH_SIZE"])')
+        parser.add_argument('--interval', type=int, default=0, help='队列为空时等待的秒数，0 表示处理完后退出')
+        parser.add_argument('--no-ack', action='store_true', help='不向渠道发送回执')
+        parser.add_argument('--stats', action='store_true', help='只输出队列深度和吞吐量统计')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(queue_stats(), indent=2))
+            return
+
+        worker = ReservationWorker(batch_size=options['batch_size'])
+        while True:
+            processed = 0
+            while True:
+                count = worker.run_once()
+                if not count:
+                    break
+                processed += count
+            if processed:
+                self.stdout.write(f"处理了 {processed} 个预订")
+            if not options['no_ack']:
+                for name, count in worker.acknowledge().items():
+                    self.stdout.write(f"{name}: 回执 {count} 个预订")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,49 @@
+"""
+OTA 库存和价格同步
+
+    python manage.py ota_sync                  # 计算差异并推送一次
+    python manage.py ota_sync --interval 60    # 每 60 秒循环一次
+    python manage.py ota_sync --full ctrip     # 重新推送 ctrip 的全部单元格
+    python manage.py ota_sync --push-only      # 只推送待重试的批次
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ota.services import OTAIntegrationService, enabled_channels
+
+
+class Command(BaseCommand):
+    help = '计算库存和价格差异并推送到已启用的OTA渠道'
+
+    def add_arguments(self, parser):
+        parser.add_argument('channels', nargs='*', help='只同步这些渠道 (默认全部已启用的渠道)')
+        parser.add_argument('--full', action='store_true', help='忽略已推送记录，全量同步')
+        parser.add_argument('--push-only', action='store_true', help='不计算差异，只推送待推送的批次')
+        parser.add_argument('--interval', type=int, default=0, help='循环执行的间隔秒数，0 表示只执行一次')
+
+    def handle(self, *args, **options):
+        channels = enabled_channels()
+        if not channels:
+            raise CommandError('没有启用的OTA渠道 (检查 settings.OTA_SYNC)')
+        unknown = [name for name in options['channels'] if name not in channels]
+        if unknown:
+            raise CommandError(f"未启用的渠道: {', '.join(unknown)}")
+        if options['channels']:
+            channels = {name: channels[name] for name in options['channels']}
+
+        service = OTAIntegrationService(channels=channels)
+        full = options['full']
+        while True:
+            if not options['push_only']:
+                for name, count in service.sync_availability(full=full).items():
+                    self.stdout.write(f"{name}: {count} 个差异单元格")
+                full = False
+            for name, stats in service.push_pending().items():
+                self.stdout.write(
+                    f"{name}: 已推送 {stats['sent']} 批 ({stats['bytes']} 字节), "
+                    f"等待重试 {stats['retrying']} 批, 放弃 {stats['failed']} 批"
+                )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
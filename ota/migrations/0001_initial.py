@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('category', 'Vehicle Category'), ('car', 'Car'), ('booking', 'Booking')], max_length=20)),
+                ('category_id', models.IntegerField(blank=True, null=True)),
+                ('location_id', models.IntegerField(blank=True, null=True)),
+                ('start_date', models.DateField(blank=True, null=True)),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'ota_changeevent',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ChannelState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(max_length=50, unique=True)),
+                ('last_change_id', models.BigIntegerField(default=0)),
+                ('horizon_end', models.DateField(blank=True, null=True)),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'ota_channelstate',
+            },
+        ),
+        migrations.CreateModel(
+            name='OutboundBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(max_length=50)),
+                ('cells', models.JSONField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField()),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'ota_outboundbatch',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['channel', 'status', 'next_attempt_at'], name='ota_batch_due_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PushedCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(max_length=50)),
+                ('category_id', models.IntegerField()),
+                ('location_id', models.IntegerField()),
+                ('date', models.DateField()),
+                ('available', models.PositiveIntegerField()),
+                ('rate', models.DecimalField(decimal_places=2, max_digits=8)),
+            ],
+            options={
+                'db_table': 'ota_pushedcell',
+                'constraints': [models.UniqueConstraint(fields=('channel', 'category_id', 'location_id', 'date'), name='ota_pushedcell_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_bookingoption_code'),
+        ('ota', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InboundReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(max_length=50)),
+                ('external_id', models.CharField(max_length=100)),
+                ('payload', models.JSONField()),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('processing', 'Processing'), ('confirmed', 'Confirmed'), ('rejected', 'Rejected'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('error', models.TextField(blank=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('acknowledged_at', models.DateTimeField(blank=True, null=True)),
+                ('booking', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ota_reservations', to='bookings.booking')),
+            ],
+            options={
+                'db_table': 'ota_inboundreservation',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'id'], name='ota_reservation_queue_idx'), models.Index(fields=['channel', 'processed_at'], name='ota_reservation_done_idx')],
+                'constraints': [models.UniqueConstraint(fields=('channel', 'external_id'), name='ota_reservation_unique')],
+            },
+        ),
+    ]
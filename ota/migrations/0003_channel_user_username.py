@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# 渠道用户原来使用 ota_<渠道> 作为用户名，网站注册表单也可以注册这样的用户名
+OLD_PREFIX = 'ota_'
+NEW_USERNAME = 'ota:{channel}'
+
+
+def rename_channel_users(apps, schema_editor):
+    """
+    把由入站预订工作进程创建的渠道用户 (不能用密码登录，且拥有该渠道的预订) 改为新的用户名并停用
+
+    可以用密码登录的同名用户是访客注册的账户，不做改动。
+    """
+    User = apps.get_model('auth', 'User')
+    Booking = apps.get_model('bookings', 'Booking')
+    for user in User.objects.filter(username__startswith=OLD_PREFIX, password__startswith='!'):
+        channel = user.username[len(OLD_PREFIX):]
+        if not Booking.objects.filter(user=user, idempotency_key__startswith=f'ota:{channel}:').exists():
+            continue
+        username = NEW_USERNAME.format(channel=channel)
+        if User.objects.filter(username=username).exists():
+            continue
+        user.username = username
+        user.is_active = False
+        user.save(update_fields=['username', 'is_active'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('bookings', '0003_booking_idempotency_key'),
+        ('ota', '0002_inboundreservation'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_channel_users, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,137 @@
+from django.db import models
+
+
+class ChangeEvent(models.Model):
+    """
+    变更记录 (change capture)
+
+    车型、车辆和预订保存或删除时写入，OTA 同步按记录计算需要重新推送的
+    (车型, 网点, 日期) 单元格。category_id / location_id 为空表示所有车型 / 所有网点，
+    start_date / end_date 为空表示整个同步范围。
+    """
+    SOURCE_CHOICES = [
+        ('category', 'Vehicle Category'),
+        ('car', 'Car'),
+        ('booking', 'Booking'),
+    ]
+
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    category_id = models.IntegerField(null=True, blank=True)
+    location_id = models.IntegerField(null=True, blank=True)
+    start_date = models.DateField(null=True, blank=True)
+    end_date = models.DateField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'ota_changeevent'
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.source} change #{self.pk}"
+
+
+class ChannelState(models.Model):
+    """每个 OTA 渠道已处理到的变更记录和已同步的日期范围"""
+    channel = models.CharField(max_length=50, unique=True)
+    last_change_id = models.BigIntegerField(default=0)
+    # 已同步范围的最后一天，为空表示还没有做过完整同步
+    horizon_end = models.DateField(null=True, blank=True)
+    last_synced_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'ota_channelstate'
+
+    def __str__(self):
+        return self.channel
+
+
+class PushedCell(models.Model):
+    """已推送给渠道的单元格取值，用于计算差异"""
+    channel = models.CharField(max_length=50)
+    category_id = models.IntegerField()
+    location_id = models.IntegerField()
+    date = models.DateField()
+    available = models.PositiveIntegerField()
+    rate = models.DecimalField(max_digits=8, decimal_places=2)
+
+    class Meta:
+        db_table = 'ota_pushedcell'
+        constraints = [
+            models.UniqueConstraint(fields=['channel', 'category_id', 'location_id', 'date'], name='ota_pushedcell_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} {self.category_id}@{self.location_id} {self.date}"
+
+
+class OutboundBatch(models.Model):
+    """待推送的差异批次 (outbox)，失败后按退避时间重试"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    channel = models.CharField(max_length=50)
+    # [{'category_id', 'location_id', 'date', 'available', 'rate'}, ...]
+    cells = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'ota_outboundbatch'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['channel', 'status', 'next_attempt_at'], name='ota_batch_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} batch #{self.pk} ({self.status})"
+
+
+class InboundReservation(models.Model):
+    """
+    渠道推送过来的预订 (入站队列)
+
+    接口只负责校验格式并入队，由 ota_reservations 命令批量分配车辆、创建 Booking 和驾驶员，
+    处理结果再异步回执给渠道。同一渠道的同一预订号只入队一次。
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('processing', 'Processing'),
+        ('confirmed', 'Confirmed'),
+        ('rejected', 'Rejected'),
+        ('failed', 'Failed'),
+    ]
+
+    channel = models.CharField(max_length=50)
+    external_id = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    booking = models.ForeignKey('bookings.Booking', on_delete=models.SET_NULL, null=True, blank=True,
+                                related_name='ota_reservations')
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    received_at = models.DateTimeField(auto_now_add=True)
+    # 工作进程领取的时间，超过租约仍未完成的预订会被重新领取
+    locked_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    acknowledged_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'ota_inboundreservation'
+        ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(fields=['channel', 'external_id'], name='ota_reservation_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'id'], name='ota_reservation_queue_idx'),
+            models.Index(fields=['channel', 'processed_at'], name='ota_reservation_done_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} reservation {self.external_id} ({self.status})"
@@ -0,0 +1,271 @@
+"""
+OTA 库存和价格同步
+
+    service = OTAIntegrationService()
+    service.sync_availability()     # 计算差异并写入待推送批次 (OutboundBatch)
+    service.push_pending()          # 按渠道限速推送到期的批次，失败的批次退避重试
+
+两步分开: 差异计算在一个事务中完成并持久化，推送失败不会丢失差异，也不会重复计算。
+同一渠道的批次按顺序推送，遇到可重试的失败时停止该渠道本轮推送，保证较新的取值不会被
+较旧的批次覆盖。定时执行: python manage.py ota_sync
+
+配置 (settings.OTA_SYNC):
+
+    OTA_SYNC = {
+        'ENABLED': True,
+        'HORIZON_DAYS': 90,           # 同步今天起多少天
+        'CHANGE_SETTLE_SECONDS': 300,  # 最近多少秒内写入的变更记录下次同步时重新读取
+        'CHANNELS': {
+            'ctrip': {
+                'ADAPTER': 'ota.channels.CtripChannel',
+                'ENDPOINT': 'https://...',
+                'API_KEY': '...',
+                'RATE_LIMIT': 5,      # 每秒请求数
+                'BATCH_SIZE': 500,    # 每个请求的单元格数
+            },
+        },
+    }
+"""
+import logging
+import time
+from datetime import timedelta
+from itertools import takewhile
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import diff
+from .channels import ChannelError, get_channel
+from .models import ChangeEvent, ChannelState, OutboundBatch, PushedCell
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'HORIZON_DAYS': 90,
+    # 变更记录在预订和车型的写事务中写入，id 较小的记录可能晚于 id 较大的记录提交。
+    # 同步位置只越过写入时间早于这个窗口的记录，窗口内的记录每次同步都重新读取，
+    # 晚提交的记录不会被跳过 (窗口需要大于最长的写事务)
+    'CHANGE_SETTLE_SECONDS': 300,
+    'CHANNELS': {},
+}
+
+CHANNEL_DEFAULTS = {
+    'ENABLED': True,
+    'ENDPOINT': '',
+    'API_KEY': '',
+    'CURRENCY': 'AUD',
+    'RATE_LIMIT': 5,
+    'BURST': 5,
+    'BATCH_SIZE': 500,
+    'MAX_RETRIES': 6,
+    'TIMEOUT': 10,
+    # 渠道调用入站预订接口时使用的密钥 (ota.inbound)，为空表示不接收预订
+    'INBOUND_API_KEY': '',
+}
+
+# 每次同步最多处理的变更记录数，剩余的下次处理
+MAX_CHANGES_PER_SYNC = 5000
+# 重试退避: 30 秒起每次翻倍，最长 1 小时
+RETRY_BASE_DELAY = 30
+RETRY_MAX_DELAY = 60 * 60
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'OTA_SYNC', {}))
+    config['CHANNELS'] = {
+        name: {**CHANNEL_DEFAULTS, **channel} for name, channel in config['CHANNELS'].items()
+    }
+    return config
+
+
+def enabled_channels(config=None):
+    """{渠道名: 配置}，只包含启用且配置了 ENDPOINT 的渠道"""
+    config = config or get_config()
+    if not config['ENABLED']:
+        return {}
+    return {
+        name: channel for name, channel in config['CHANNELS'].items()
+        if channel['ENABLED'] and channel['ENDPOINT']
+    }
+
+
+def is_enabled():
+    return bool(enabled_channels())
+
+
+def record_change(source, category_id=None, location_id=None, start_date=None, end_date=None):
+    """写入变更记录，没有启用任何渠道时不记录"""
+    if not is_enabled():
+        return
+    ChangeEvent.objects.create(
+        source=source, category_id=category_id, location_id=location_id,
+        start_date=start_date, end_date=end_date,
+    )
+
+
+class RateLimiter:
+    """
+    令牌桶限速: 每秒补充 rate 个令牌，最多积累 burst 个
+    """
+
+    def __init__(self, rate, burst, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.burst = float(max(burst, 1))
+        self.tokens = self.burst
+        self.clock = clock
+        self.sleep = sleep
+        self.updated_at = clock()
+
+    def acquire(self):
+        while True:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            self.sleep((1 - self.tokens) / self.rate)
+
+
+def retry_delay(attempts, retry_after=None):
+    if retry_after is not None:
+        return retry_after
+    return min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+
+
+class OTAIntegrationService:
+    """OTA 集成服务"""
+
+    def __init__(self, channels=None, clock=time.monotonic, sleep=time.sleep):
+        self.config = get_config()
+        self.channels = enabled_channels(self.config) if channels is None else channels
+        self.clock = clock
+        self.sleep = sleep
+
+    # ---- 差异计算 ----
+
+    def sync_availability(self, today=None, full=False):
+        """
+        为每个渠道计算差异并写入待推送批次，返回 {渠道名: 差异单元格数}
+
+        full=True 时忽略已推送的记录，重新推送同步范围内的全部单元格。
+        """
+        today = today or timezone.now().date()
+        result = {}
+        for name, channel in self.channels.items():
+            result[name] = self._sync_channel(name, channel, today, full)
+        self._prune_changes()
+        return result
+
+    def _sync_channel(self, name, channel, today, full):
+        from bookings.availability import AvailabilityIndex
+        from bookings.pricing import RateTable
+
+        horizon_end = today + timedelta(days=self.config['HORIZON_DAYS'] - 1)
+        settled_before = timezone.now() - timedelta(seconds=self.config['CHANGE_SETTLE_SECONDS'])
+        with transaction.atomic():
+            state, _ = ChannelState.objects.select_for_update().get_or_create(channel=name)
+            if full:
+                PushedCell.objects.filter(channel=name).delete()
+                state.horizon_end = None
+            PushedCell.objects.filter(channel=name, date__lt=today).delete()
+
+            changes = list(ChangeEvent.objects.filter(id__gt=state.last_change_id).values_list(
+                'id', 'created_at', 'category_id', 'location_id', 'start_date', 'end_date')[:MAX_CHANGES_PER_SYNC])
+            # 读取变更记录之后在同一个事务中从数据库加载可用性和租金，不使用进程内的索引:
+            # 未配置共享缓存时进程内索引最多落后 INDEX_MAX_AGE 秒，推送的取值会比变更记录旧
+            index, rates = AvailabilityIndex(), RateTable()
+            index.load()
+            rates.load()
+            pairs = diff.known_pairs(index, name)
+            if state.horizon_end is None:
+                cells = diff.all_cells(pairs, today, horizon_end)
+            else:
+                cells = diff.expand_changes((change[2:] for change in changes), pairs, today, horizon_end)
+                # 同步范围向后滚动，新进入范围的日期全部推送
+                if horizon_end > state.horizon_end:
+                    cells |= diff.all_cells(pairs, max(state.horizon_end + timedelta(days=1), today), horizon_end)
+
+            changed = diff.diff_and_record(name, diff.cell_values(cells, index, rates.categories))
+            size = channel['BATCH_SIZE']
+            now = timezone.now()
+            OutboundBatch.objects.bulk_create([
+                OutboundBatch(channel=name, cells=changed[i:i + size], next_attempt_at=now)
+                for i in range(0, len(changed), size)
+            ])
+
+            # 窗口内的记录之前可能还有未提交的记录，同步位置停在第一条窗口内的记录之前
+            settled = list(takewhile(lambda change: change[1] <= settled_before, changes))
+            if settled:
+                state.last_change_id = settled[-1][0]
+            state.horizon_end = horizon_end
+            state.last_synced_at = now
+            state.save()
+        logger.info("OTA渠道 %s: %d 条变更, %d 个单元格, %d 个差异", name, len(changes), len(cells), len(changed))
+        return len(changed)
+
+    def _prune_changes(self):
+        """删除所有启用的渠道都已处理的变更记录"""
+        channels = list(enabled_channels(self.config))
+        processed = list(ChannelState.objects.filter(channel__in=channels).values_list('last_change_id', flat=True))
+        if channels and len(processed) == len(channels):
+            ChangeEvent.objects.filter(id__lte=min(processed)).delete()
+
+    # ---- 推送 ----
+
+    def push_pending(self, now=None):
+        """
+        推送所有到期的批次，返回 {渠道名: {'sent', 'failed', 'retrying', 'bytes'}}
+        """
+        return {
+            name: self._push_channel(name, channel, now or timezone.now())
+            for name, channel in self.channels.items()
+        }
+
+    def _push_channel(self, name, channel, now):
+        adapter = get_channel(name, channel)
+        limiter = RateLimiter(channel['RATE_LIMIT'], channel['BURST'], self.clock, self.sleep)
+        stats = {'sent': 0, 'failed': 0, 'retrying': 0, 'bytes': 0}
+        batches = OutboundBatch.objects.filter(channel=name, status='pending').order_by('id')
+        for batch in batches.iterator():
+            if batch.next_attempt_at > now:
+                # 保证顺序: 前面的批次还在等待重试时，后面的批次也不推送
+                break
+            limiter.acquire()
+            batch.attempts += 1
+            try:
+                stats['bytes'] += adapter.push(batch.cells)
+            except ChannelError as e:
+                batch.last_error = str(e)
+                if e.retryable and batch.attempts < channel['MAX_RETRIES']:
+                    batch.next_attempt_at = now + timedelta(seconds=retry_delay(batch.attempts, e.retry_after))
+                    batch.save(update_fields=['attempts', 'last_error', 'next_attempt_at'])
+                    stats['retrying'] += 1
+                    logger.warning("OTA渠道 %s 批次 #%d 推送失败，稍后重试: %s", name, batch.pk, e)
+                    break
+                self._drop_batch(batch)
+                stats['failed'] += 1
+                continue
+            batch.status = 'sent'
+            batch.sent_at = timezone.now()
+            batch.save(update_fields=['attempts', 'status', 'sent_at'])
+            stats['sent'] += 1
+        return stats
+
+    def _drop_batch(self, batch):
+        """
+        放弃批次: 删除其中单元格的推送记录，这些单元格下次变化时重新推送，
+        或使用 ota_sync --full 全量同步
+        """
+        with transaction.atomic():
+            batch.status = 'failed'
+            batch.save(update_fields=['attempts', 'status', 'last_error'])
+            for cell in batch.cells:
+                PushedCell.objects.filter(
+                    channel=batch.channel, category_id=cell['category_id'],
+                    location_id=cell['location_id'], date=cell['date'],
+                ).delete()
+        logger.error("OTA渠道 %s 批次 #%d 推送失败，已放弃: %s", batch.channel, batch.pk, batch.last_error)
@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from bookings.availability import booking_interval
+from bookings.models import Booking
+from cars.models import Car, VehicleCategory
+from .services import is_enabled, record_change
+
+
+def _booking_cells(car_id, pickup_date, return_date):
+    """预订占用的 (车型, 网点, 第一天, 最后一天)"""
+    row = Car.objects.filter(pk=car_id).values_list('category_id', 'currently_located_id').first()
+    if row is None:
+        return None
+    start, end = booking_interval(pickup_date, return_date)
+    return row[0], row[1], start, end - timedelta(days=1)
+
+
+@receiver(pre_save, sender=Car)
+def remember_car_location(sender, instance, **kwargs):
+    """
+    Signal handler to remember a car's previous category and location before it is saved
+    """
+    instance._ota_previous = None
+    if instance.pk and is_enabled():
+        instance._ota_previous = Car.objects.filter(pk=instance.pk).values_list(
+            'category_id', 'currently_located_id').first()
+
+
+@receiver(post_save, sender=Car)
+def capture_car_change(sender, instance, **kwargs):
+    """
+    Signal handler to record the old and new category/location of a saved car for OTA sync
+    """
+    previous = getattr(instance, '_ota_previous', None)
+    if previous and previous != (instance.category_id, instance.currently_located_id):
+        record_change('car', *previous)
+    record_change('car', instance.category_id, instance.currently_located_id)
+
+
+@receiver(post_delete, sender=Car)
+def capture_car_delete(sender, instance, **kwargs):
+    """
+    Signal handler to record a deleted car for OTA sync
+    """
+    record_change('car', instance.category_id, instance.currently_located_id)
+
+
+@receiver(pre_save, sender=Booking)
+def remember_booking_dates(sender, instance, **kwargs):
+    """
+    Signal handler to remember the car and dates of a booking before it is changed
+    """
+    instance._ota_previous = None
+    if instance.pk and is_enabled():
+        instance._ota_previous = Booking.objects.filter(pk=instance.pk).values_list(
+            'car_id', 'pickup_date', 'return_date').first()
+
+
+@receiver(post_save, sender=Booking)
+def capture_booking_change(sender, instance, **kwargs):
+    """
+    Signal handler to record the days a booking occupies (before and after the change) for OTA sync
+    """
+    if not is_enabled():
+        return
+    cells = {_booking_cells(instance.car_id, instance.pickup_date, instance.return_date)}
+    previous = getattr(instance, '_ota_previous', None)
+    if previous:
+        cells.add(_booking_cells(*previous))
+    for cell in cells - {None}:
+        record_change('booking', *cell)
+
+
+@receiver(post_delete, sender=Booking)
+def capture_booking_delete(sender, instance, **kwargs):
+    """
+    Signal handler to record the days released by a deleted booking for OTA sync
+    """
+    if not is_enabled():
+        return
+    cell = _booking_cells(instance.car_id, instance.pickup_date, instance.return_date)
+    if cell is not None:
+        record_change('booking', *cell)
+
+
+@receiver([post_save, post_delete], sender=VehicleCategory)
+def capture_category_change(sender, instance, **kwargs):
+    """
+    Signal handler to record a vehicle category rate or status change for OTA sync
+    """
+    record_change('category', instance.pk)
@@ -0,0 +1,82 @@
+"""
+本地模拟 OTA 渠道服务器 (测试和本地联调用)
+
+    with FakeChannelServer() as server:
+        settings.OTA_SYNC['CHANNELS']['ctrip']['ENDPOINT'] = server.url
+        ...
+        server.requests          # [{'path', 'headers', 'body', 'size'}, ...]
+        server.fail_next(2, status=503)
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeChannelServer:
+    """
+    在 127.0.0.1 的随机端口上接收 POST 请求并记录，可以让接下来的若干个请求返回错误
+    """
+
+    def __init__(self):
+        self.requests = []
+        self._failures = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def bytes_received(self):
+        return sum(request['size'] for request in self.requests)
+
+    def fail_next(self, count=1, status=503, retry_after=None):
+        """接下来的 count 个请求返回 status"""
+        with self._lock:
+            self._failures.extend([(status, retry_after)] * count)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with server._lock:
+                    failure = server._failures.pop(0) if server._failures else None
+                    if failure is None:
+                        server.requests.append({
+                            'path': self.path,
+                            'headers': dict(self.headers),
+                            'body': json.loads(raw or b'null'),
+                            'size': len(raw),
+                        })
+                status, retry_after = failure or (200, None)
+                self.send_response(status)
+                if retry_after is not None:
+                    self.send_header('Retry-After', str(retry_after))
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(b'{"code":0}' if status == 200 else b'{"code":1}')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
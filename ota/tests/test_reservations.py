@@ -0,0 +1,196 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from bookings.availability import reset_availability_index
+from bookings.models import Booking
+from bookings.pricing import reset_rate_table
+from cars.models import (
+    Car, City, Country, Location as Branch, StateProvince, VehicleCategory, VehicleCategoryType
+)
+from cars.tests.utils import UnmanagedTablesMixin
+from locations.models import Location, State
+from ota.inbound import ChannelUserError, ReservationWorker, channel_user, queue_stats
+from ota.models import InboundReservation
+from ota.testing import FakeChannelServer
+
+
+class InboundReservationTest(UnmanagedTablesMixin, TestCase):
+    """
+    测试入站预订接口、队列背压和批量处理
+    """
+
+    def setUp(self):
+        cache.clear()
+        reset_availability_index()
+        reset_rate_table()
+        self.server = FakeChannelServer().start()
+        self.addCleanup(self.server.stop)
+        self.settings_override = override_settings(OTA_SYNC={
+            'INBOUND': {'MAX_QUEUE_DEPTH': 4, 'RETRY_AFTER': 15},
+            'CHANNELS': {
+                'ctrip': {'ADAPTER': 'ota.channels.CtripChannel', 'ENDPOINT': self.server.url,
+                          'INBOUND_API_KEY': 'inbound-secret'},
+            },
+        })
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        self.category = VehicleCategory.objects.create(
+            category_type=VehicleCategoryType.objects.create(category_type='Car'),
+            vehicle_category='Toyota Corolla', daily_rate=Decimal('50.00'),
+        )
+        country = Country.objects.create()
+        nsw = StateProvince.objects.create(country=country, name='New South Wales', code='NSW')
+        branch = Branch.objects.create(
+            location_name='Sydney Airport', code='SYD', address='330 King St',
+            city=City.objects.create(state=nsw, name='Sydney'), state=nsw, country=country,
+        )
+        self.car = Car.objects.create(registration_no='RUSH01', category=self.category, currently_located=branch)
+        self.location = Location.objects.create(
+            name='Sydney Airport', address='Airport Dr', city='Sydney',
+            state=State.objects.create(name='New South Wales', code='NSW'), postal_code='2020',
+        )
+        self.pickup = timezone.now().date() + timedelta(days=10)
+        self.url = reverse('ota_receive_reservation', args=['ctrip'])
+        self.auth = {'HTTP_AUTHORIZATION': 'Bearer inbound-secret'}
+
+    def payload(self, reservation_id, days=3, **overrides):
+        payload = {
+            'reservation_id': reservation_id,
+            'category_id': self.category.pk,
+            'pickup_location_id': self.location.pk,
+            'pickup_date': self.pickup.isoformat(),
+            'return_date': (self.pickup + timedelta(days=days)).isoformat(),
+            'options': {'child_seats': 1},
+            'drivers': [{
+                'first_name': 'Wei', 'last_name': 'Zhang', 'email': 'wei@example.com',
+                'date_of_birth': '1990-01-01', 'license_number': 'L123',
+                'license_expiry_date': '2035-01-01', 'mobile': '0400000000',
+            }],
+        }
+        payload.update(overrides)
+        return payload
+
+    def post(self, payload, **headers):
+        return self.client.post(self.url, payload, content_type='application/json', **(headers or self.auth))
+
+    def test_enqueue_and_backpressure(self):
+        """
+        测试鉴权、格式校验、重复推送和队列满时返回 429
+        """
+        self.assertEqual(self.post(self.payload('CT-1'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        bad = self.post(self.payload('CT-1', pickup_date='01/07/2025'))
+        self.assertEqual(bad.status_code, 400)
+        self.assertEqual(self.post(self.payload('CT-1', drivers=[])).status_code, 400)
+
+        response = self.post(self.payload('CT-1'))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'queued')
+        self.assertEqual(self.post(self.payload('CT-1')).status_code, 200)
+
+        self.post(self.payload('CT-2'))
+        self.post(self.payload('CT-3'))
+        self.post(self.payload('CT-4'))
+        full = self.post(self.payload('CT-5'))
+        self.assertEqual(full.status_code, 429)
+        self.assertEqual(full['Retry-After'], '15')
+        self.assertEqual(InboundReservation.objects.count(), 4)
+        self.assertEqual(queue_stats()['channels']['ctrip']['queued'], 4)
+
+    def test_worker_confirms_rejects_and_acknowledges(self):
+        """
+        测试批量处理: 先到的预订分到车辆，时间冲突的预订被拒绝，结果回执给渠道
+        """
+        self.post(self.payload('CT-1'))
+        self.post(self.payload('CT-2', days=1))
+        self.post(self.payload('CT-3', category_id=999))
+        self.post(self.payload('CT-4', pickup_date=(self.pickup + timedelta(days=3)).isoformat(),
+                               return_date=(self.pickup + timedelta(days=5)).isoformat()))
+
+        worker = ReservationWorker(batch_size=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(worker.run_once(), 4)
+        self.assertEqual(worker.run_once(), 0)
+
+        statuses = dict(InboundReservation.objects.values_list('external_id', 'status'))
+        self.assertEqual(statuses, {'CT-1': 'confirmed', 'CT-2': 'rejected', 'CT-3': 'rejected', 'CT-4': 'confirmed'})
+        booking = InboundReservation.objects.get(external_id='CT-1').booking
+        self.assertEqual((booking.car_id, booking.status, booking.child_seats), (self.car.pk, 'confirmed', 1))
+        self.assertEqual((booking.user.username, booking.user.is_active), ('ota:ctrip', False))
+        self.assertFalse(booking.user.has_usable_password())
+        self.assertEqual(booking.total_cost, Decimal('174.00'))
+        self.assertEqual(booking.drivers.get().is_primary, True)
+        self.assertEqual(booking.driver_age, self.pickup.year - 1990)
+        self.assertEqual(Booking.objects.count(), 2)
+
+        status = self.client.get(reverse('ota_reservation_status', args=['ctrip', 'CT-2']), **self.auth).json()
+        self.assertEqual(status['status'], 'rejected')
+        self.assertIn('No vehicle available', status['reason'])
+
+        self.assertEqual(worker.acknowledge(), {'ctrip': 4})
+        self.assertEqual(worker.acknowledge(), {})
+        ack = self.server.requests[0]
+        self.assertEqual(ack['path'], '/reservations/ack')
+        self.assertEqual(
+            {r['reservation_id']: r['confirmation_number'] for r in ack['body']['reservations']}['CT-1'], booking.pk,
+        )
+
+    def test_channel_user_is_not_taken_over(self):
+        """
+        测试渠道用户名无法通过注册表单占用，已存在的可登录同名账户不会收到渠道预订
+        """
+        signup = self.client.post(reverse('register'), {
+            'username': 'ota:ctrip', 'email': 'a@example.com', 'first_name': 'A', 'last_name': 'B',
+            'password1': 'Str0ng-passw0rd!', 'password2': 'Str0ng-passw0rd!',
+        })
+        self.assertEqual(signup.status_code, 200)
+        self.assertFalse(User.objects.filter(username='ota:ctrip').exists())
+
+        User.objects.create_user('ota:ctrip', password='secret')
+        with self.assertRaises(ChannelUserError):
+            channel_user('ctrip')
+        self.post(self.payload('CT-1'))
+        ReservationWorker().run_once()
+        self.assertEqual(InboundReservation.objects.get().status, 'queued')
+        self.assertFalse(Booking.objects.exists())
+
+    def test_worker_assigns_cars_at_pickup_branch(self):
+        """
+        测试只分配取车网点的车辆: 另一网点有空闲车辆时预订被拒绝
+        """
+        country = Country.objects.get()
+        vic = StateProvince.objects.create(country=country, name='Victoria', code='VIC')
+        Branch.objects.create(
+            location_name='Melbourne Airport', code='MEL', address='1 Departure Dr',
+            city=City.objects.create(state=vic, name='Melbourne'), state=vic, country=country,
+        )
+        melbourne = Location.objects.create(
+            name='Melbourne Airport', address='Departure Dr', city='Melbourne',
+            state=State.objects.create(name='Victoria', code='VIC'), postal_code='3045',
+        )
+        self.post(self.payload('CT-1', pickup_location_id=melbourne.pk))
+        self.post(self.payload('CT-2'))
+
+        ReservationWorker().run_once()
+        statuses = dict(InboundReservation.objects.values_list('external_id', 'status'))
+        self.assertEqual(statuses, {'CT-1': 'rejected', 'CT-2': 'confirmed'})
+        self.assertIn('No vehicle available', InboundReservation.objects.get(external_id='CT-1').error)
+        self.assertEqual(Booking.objects.get().car_id, self.car.pk)
+
+    def test_failed_acknowledgement_is_retried(self):
+        """
+        测试回执失败时保留结果，下次重新发送
+        """
+        self.post(self.payload('CT-1'))
+        worker = ReservationWorker()
+        worker.run_once()
+        self.server.fail_next(1, status=503)
+        self.assertEqual(worker.acknowledge(), {})
+        self.assertEqual(worker.acknowledge(), {'ctrip': 1})
+        self.assertEqual(len(self.server.requests), 1)
@@ -0,0 +1,256 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from bookings.availability import get_availability_index, reset_availability_index
+from bookings.models import Booking
+from bookings.pricing import reset_rate_table
+from cars.models import Car, City, Country, Location as Branch, StateProvince, VehicleCategory, VehicleCategoryType
+from cars.tests.utils import UnmanagedTablesMixin
+from locations.models import Location, State
+from ota import diff
+from ota.models import ChangeEvent, OutboundBatch
+from ota.services import OTAIntegrationService, RateLimiter, retry_delay
+from ota.testing import FakeChannelServer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class DiffTest(SimpleTestCase):
+    """
+    测试变更记录展开为单元格
+    """
+
+    def test_expand_changes(self):
+        """
+        测试指定和未指定车型/网点的变更只展开到同步范围内
+        """
+        pairs = {1: {10, 11}, 2: {10}}
+        start, end = date(2025, 7, 1), date(2025, 7, 10)
+        cells = diff.expand_changes([
+            (1, 10, date(2025, 6, 28), date(2025, 7, 2)),
+            (2, None, date(2025, 7, 10), date(2025, 7, 20)),
+            (1, 11, date(2025, 8, 1), date(2025, 8, 2)),
+        ], pairs, start, end)
+        self.assertEqual(cells, {
+            (1, 10, date(2025, 7, 1)), (1, 10, date(2025, 7, 2)), (2, 10, date(2025, 7, 10)),
+        })
+        self.assertEqual(len(diff.all_cells(pairs, start, end)), 30)
+        self.assertEqual(len(diff.expand_changes([(None, None, None, None)], pairs, start, end)), 30)
+
+    def test_rate_limiter_and_backoff(self):
+        """
+        测试令牌桶限速和重试退避时间
+        """
+        clock = FakeClock()
+        limiter = RateLimiter(rate=2, burst=2, clock=clock, sleep=clock.sleep)
+        for _ in range(6):
+            limiter.acquire()
+        # 前两个请求使用积累的令牌，之后每秒两个
+        self.assertAlmostEqual(clock.now, 2.0)
+
+        self.assertEqual([retry_delay(n) for n in (1, 2, 3)], [30, 60, 120])
+        self.assertEqual(retry_delay(20), 3600)
+        self.assertEqual(retry_delay(1, retry_after=5), 5)
+
+
+class OTASyncTest(UnmanagedTablesMixin, TestCase):
+    """
+    测试差异计算和推送到模拟渠道
+    """
+
+    def setUp(self):
+        cache.clear()
+        reset_availability_index()
+        reset_rate_table()
+        self.server = FakeChannelServer().start()
+        self.addCleanup(self.server.stop)
+        self.settings_override = override_settings(OTA_SYNC={
+            'ENABLED': True,
+            'HORIZON_DAYS': 10,
+            'CHANNELS': {
+                'ctrip': {'ADAPTER': 'ota.channels.CtripChannel', 'ENDPOINT': self.server.url,
+                          'API_KEY': 'secret', 'BATCH_SIZE': 15, 'RATE_LIMIT': 1000, 'BURST': 1000},
+            },
+        })
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        # 可用性索引只加载未结束的预订，使用相对今天的日期
+        self.today = timezone.now().date()
+        self.category = VehicleCategory.objects.create(
+            category_type=VehicleCategoryType.objects.create(category_type='Car'),
+            vehicle_category='Toyota Corolla', daily_rate=Decimal('50.00'),
+        )
+        country = Country.objects.create()
+        nsw = StateProvince.objects.create(country=country, name='New South Wales', code='NSW')
+        branch = Branch.objects.create(
+            location_name='Sydney Airport', code='SYD', address='330 King St',
+            city=City.objects.create(state=nsw, name='Sydney'), state=nsw, country=country,
+        )
+        state = State.objects.create(name='New South Wales', code='NSW')
+        self.location = Location.objects.create(
+            name='Sydney Airport', address='Airport Dr', city='Sydney', state=state, postal_code='2020'
+        )
+        self.user = User.objects.create_user('driver', password='pass')
+        self.cars = [
+            Car.objects.create(registration_no=f'RUSH0{i}', category=self.category, currently_located=branch)
+            for i in range(2)
+        ]
+        # 准备数据时写入的变更记录视为早已提交
+        ChangeEvent.objects.update(created_at=timezone.now() - timedelta(hours=1))
+
+    def sync(self, **kwargs):
+        # 测试事务不会提交，on_commit 中的索引刷新不执行，进程内的索引是旧的，同步时应从数据库重新加载
+        service = OTAIntegrationService()
+        return service, service.sync_availability(today=self.today, **kwargs)
+
+    def day(self, offset):
+        return self.today + timedelta(days=offset)
+
+    def pushed_items(self):
+        return [item for request in self.server.requests for item in request['body']['items']]
+
+    def test_full_then_incremental_sync(self):
+        """
+        测试首次全量推送，之后一次预订只推送它占用的几天
+        """
+        service, changed = self.sync()
+        self.assertEqual(changed, {'ctrip': 10})
+        stats = service.push_pending()['ctrip']
+        self.assertEqual((stats['sent'], stats['failed']), (1, 0))
+        self.assertEqual(stats['bytes'], self.server.bytes_received)
+        request = self.server.requests[0]
+        self.assertEqual(request['path'], '/inventory/batch')
+        self.assertEqual(request['headers']['Authorization'], 'Bearer secret')
+        self.assertEqual({item['quantity'] for item in request['body']['items']}, {2})
+        self.assertEqual(request['body']['items'][0]['basePrice'], 50.0)
+
+        # 没有变化时不推送
+        service, changed = self.sync()
+        self.assertEqual(changed, {'ctrip': 0})
+        self.assertEqual(service.push_pending()['ctrip']['sent'], 0)
+
+        index = get_availability_index()
+        Booking.objects.create(
+            user=self.user, car=self.cars[0], pickup_location=self.location, dropoff_location=self.location,
+            pickup_date=self.day(2), return_date=self.day(4), total_cost=0, driver_age=30,
+        )
+        self.assertEqual(index.free_count(self.category.pk, self.cars[0].currently_located_id, self.day(2), self.day(3)), 2)
+        self.server.requests.clear()
+        service, changed = self.sync()
+        self.assertEqual(changed, {'ctrip': 2})
+        service.push_pending()
+        self.assertEqual(
+            [(item['date'], item['quantity']) for item in self.pushed_items()],
+            [(self.day(2).isoformat(), 1), (self.day(3).isoformat(), 1)],
+        )
+        # 最近写入的变更记录下次同步时重新读取，不会重复推送
+        self.assertTrue(ChangeEvent.objects.exists())
+        self.assertEqual(self.sync()[1], {'ctrip': 0})
+        # 超出窗口后同步位置越过这些记录，所有渠道都处理过的记录被删除
+        ChangeEvent.objects.update(created_at=timezone.now() - timedelta(minutes=10))
+        self.assertEqual(self.sync()[1], {'ctrip': 0})
+        self.assertFalse(ChangeEvent.objects.exists())
+
+    def test_late_committed_change_is_not_skipped(self):
+        """
+        测试 id 较小的变更记录晚于 id 较大的记录提交时，下次同步仍然处理它
+        """
+        service, _ = self.sync()
+        service.push_pending()
+        Booking.objects.create(
+            user=self.user, car=self.cars[0], pickup_location=self.location, dropoff_location=self.location,
+            pickup_date=self.day(2), return_date=self.day(4), total_cost=0, driver_age=30,
+        )
+        # 模拟预订的变更记录还没有提交，之后的一条记录已经提交
+        late = ChangeEvent.objects.get(source='booking')
+        late_id = late.pk
+        late.delete()
+        ChangeEvent.objects.create(id=late_id + 1, source='category', category_id=self.category.pk,
+                                   start_date=self.day(7), end_date=self.day(7))
+        self.assertEqual(self.sync()[1], {'ctrip': 0})
+
+        late.pk = late_id
+        late.save(force_insert=True)
+        self.server.requests.clear()
+        service, changed = self.sync()
+        self.assertEqual(changed, {'ctrip': 2})
+        service.push_pending()
+        self.assertEqual([item['date'] for item in self.pushed_items()], [self.day(2).isoformat(), self.day(3).isoformat()])
+
+    def test_rate_change_and_rolling_horizon(self):
+        """
+        测试车型价格变化推送整个范围，同步范围向后滚动时推送新增的日期
+        """
+        service, _ = self.sync()
+        service.push_pending()
+        self.server.requests.clear()
+
+        self.category.daily_rate = Decimal('55.00')
+        self.category.save()
+        end = self.day(11)
+        self.today += timedelta(days=2)
+        service, changed = self.sync()
+        self.assertEqual(changed, {'ctrip': 10})
+        service.push_pending()
+        items = self.pushed_items()
+        self.assertEqual({item['basePrice'] for item in items}, {55.0})
+        self.assertEqual(items[-1]['date'], end.isoformat())
+
+    def test_retry_after_rate_limit(self):
+        """
+        测试渠道返回429时批次按 Retry-After 推迟，后面的批次不越过它推送
+        """
+        service, _ = self.sync()
+        # 10 个单元格按每批 15 个分成 1 批，再加一次变更产生第二批
+        Booking.objects.create(
+            user=self.user, car=self.cars[0], pickup_location=self.location, dropoff_location=self.location,
+            pickup_date=self.day(1), return_date=self.day(2), total_cost=0, driver_age=30,
+        )
+        self.sync()
+        self.assertEqual(OutboundBatch.objects.filter(status='pending').count(), 2)
+
+        self.server.fail_next(1, status=429, retry_after=120)
+        now = OutboundBatch.objects.order_by('id').last().next_attempt_at
+        stats = service.push_pending(now=now)['ctrip']
+        self.assertEqual((stats['sent'], stats['retrying']), (0, 1))
+        first = OutboundBatch.objects.order_by('id').first()
+        self.assertEqual(first.attempts, 1)
+        self.assertEqual(first.next_attempt_at, now + timedelta(seconds=120))
+
+        # 还没到重试时间
+        self.assertEqual(service.push_pending(now=now + timedelta(seconds=60))['ctrip']['sent'], 0)
+        stats = service.push_pending(now=now + timedelta(seconds=120))['ctrip']
+        self.assertEqual(stats['sent'], 2)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.server.requests[1]['body']['items'][0]['quantity'], 1)
+
+    def test_rejected_batch_is_dropped(self):
+        """
+        测试渠道拒绝的批次 (4xx) 不重试，其中的单元格下次同步重新推送
+        """
+        service, _ = self.sync()
+        self.server.fail_next(1, status=400)
+        stats = service.push_pending()['ctrip']
+        self.assertEqual((stats['sent'], stats['failed']), (0, 1))
+        self.assertEqual(OutboundBatch.objects.get().status, 'failed')
+
+        service, changed = self.sync(full=False)
+        self.assertEqual(changed, {'ctrip': 0})
+        service, changed = self.sync(full=True)
+        self.assertEqual(changed, {'ctrip': 10})
+        self.assertEqual(service.push_pending()['ctrip']['sent'], 1)
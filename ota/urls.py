@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('reservations/stats/', views.reservation_stats, name='ota_reservation_stats'),
+    path('reservations/<str:channel>/', views.receive_reservation, name='ota_receive_reservation'),
+    path('reservations/<str:channel>/<str:external_id>/', views.reservation_status, name='ota_reservation_status'),
+]
@@ -0,0 +1,78 @@
+import hmac
+import json
+import logging
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from .channels import get_channel
+from .inbound import (
+    QueueFull, ReservationError, enqueue, inbound_channel, queue_stats, reservation_result
+)
+from .models import InboundReservation
+
+logger = logging.getLogger(__name__)
+
+
+def _authenticate(request, channel_name):
+    """校验渠道的 INBOUND_API_KEY，返回渠道配置，失败返回 None"""
+    channel = inbound_channel(channel_name)
+    if channel is None:
+        return None
+    expected = f"Bearer {channel['INBOUND_API_KEY']}"
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), expected):
+        return None
+    return channel
+
+
+def _status_response(reservation, status=200):
+    data = reservation_result(reservation)
+    data['status_url'] = reverse('ota_reservation_status', args=[reservation.channel, reservation.external_id])
+    return JsonResponse(data, status=status)
+
+
+@csrf_exempt
+@require_POST
+def receive_reservation(request, channel):
+    """
+    渠道推送预订 (入队后异步处理)
+
+    返回 202 和状态查询地址；重复推送返回 200 和当前状态；
+    队列已满时返回 429，渠道应按 Retry-After 重试。
+    """
+    config = _authenticate(request, channel)
+    if config is None:
+        return JsonResponse({'error': 'Unauthorized'}, status=401)
+    try:
+        payload = get_channel(channel, config).parse_reservation(json.loads(request.body))
+        reservation, created = enqueue(channel, payload)
+    except (ValueError, ReservationError) as e:
+        return JsonResponse({'error': f'Invalid reservation: {e}'}, status=400)
+    except QueueFull as e:
+        response = JsonResponse({'error': str(e)}, status=429)
+        response['Retry-After'] = str(e.retry_after)
+        return response
+    return _status_response(reservation, status=202 if created else 200)
+
+
+@require_GET
+def reservation_status(request, channel, external_id):
+    """查询渠道预订的处理结果"""
+    if _authenticate(request, channel) is None:
+        return JsonResponse({'error': 'Unauthorized'}, status=401)
+    reservation = InboundReservation.objects.filter(channel=channel, external_id=external_id).first()
+    if reservation is None:
+        return JsonResponse({'error': 'Not found'}, status=404)
+    return _status_response(reservation)
+
+
+@staff_member_required
+@require_GET
+def reservation_stats(request):
+    """员工专用: 入站队列深度和各渠道吞吐量 (JSON)"""
+    window = request.GET.get('window', '300')
+    window = int(window) if window.isdigit() and int(window) > 0 else 300
+    return JsonResponse(queue_stats(window), json_dumps_params={'indent': 2})
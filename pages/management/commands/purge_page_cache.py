@@ -0,0 +1,41 @@
+"""
+清除静态页面和模板片段缓存
+
+    python manage.py purge_page_cache                    # 全部页面和片段
+    python manage.py purge_page_cache about_us refund_policy
+    python manage.py purge_page_cache navbar footer
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from pages import page_cache
+# 导入视图以注册所有缓存页面
+from pages import views  # noqa: F401
+
+
+class Command(BaseCommand):
+    help = '按页面或片段清除页面缓存，不指定名称时全部清除'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='页面的URL名称或片段名称')
+        parser.add_argument('--list', action='store_true', help='列出可以清除的页面和片段')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            self.stdout.write('页面: ' + ', '.join(sorted(page_cache.PAGES)))
+            self.stdout.write('片段: ' + ', '.join(page_cache.FRAGMENTS))
+            return
+
+        names = options['names']
+        unknown = [name for name in names if name not in page_cache.PAGES and name not in page_cache.FRAGMENTS]
+        if unknown:
+            raise CommandError(f"未知的页面或片段: {', '.join(unknown)} (使用 --list 查看)")
+
+        if names:
+            pages = [name for name in names if name in page_cache.PAGES]
+            fragments = [name for name in names if name in page_cache.FRAGMENTS]
+        else:
+            pages = fragments = None
+        page_cache.purge(pages, fragments)
+
+        purged = names or ['全部页面和片段']
+        self.stdout.write(self.style.SUCCESS(f"已清除: {', '.join(purged)}"))
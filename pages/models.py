@@ -1,6 +1,7 @@
 from django.db import models
 from cars.models import Car, CarCategory, VehicleCategory, VehicleCategoryType,VehicleMake,VehicleModel,VehicleFuel,VehicleType,VehicleImage
 from django.utils.translation import gettext_lazy as _
+from rush_car_rental.utils.image_derivatives import ResponsiveImage
 
 
 
@@ -121,20 +122,20 @@ class CarSubscription(models.Model):
         return f"{self.car.id}"
     
     def get_images(self):
-        """Return list of all non-empty images"""
+        """Return list of all non-empty images, with their responsive derivatives"""
         images = []
         for i in range(1, 6):
             image = getattr(self, f'image{i}')
             if image:
-                images.append(image)
+                images.append(ResponsiveImage(image))
         return images
     
     def get_primary_image(self):
-        """Return the first available image"""
+        """Return the first available image, with its responsive derivatives"""
         for i in range(1, 6):
             image = getattr(self, f'image{i}')
             if image:
-                return image
+                return ResponsiveImage(image)
         return None
     
 class CarFeature(models.Model):
@@ -0,0 +1,130 @@
+"""
+静态内容页面缓存
+
+租车条款、退款政策等页面对所有匿名访客完全相同，但每次请求都会重新渲染整个模板
+(包括 base.html 和 context processor)。这里提供:
+
+- cache_static_page: 视图装饰器，缓存匿名访问的完整响应，带 ETag / Last-Modified，
+  浏览器条件请求命中时返回 304；
+- base.html 的导航栏、页脚和首页城市推荐使用 {% cache %} 片段缓存 (FRAGMENTS)；
+- purge: 按页面或片段清除缓存，部署后或修改模板后使用 purge_page_cache 命令。
+
+只缓存没有会话和消息 cookie 的 GET/HEAD 请求，这些请求的页面内容与用户无关；
+会设置 cookie 的响应不会缓存。
+
+清除只作用于当前配置的缓存: 多个 worker 时必须使用共享缓存 (生产环境见 settings/production.py)，
+使用进程内的 LocMemCache 时其他 worker 直到 TIMEOUT 过期前仍返回旧页面。
+
+配置 (settings.PAGE_CACHE):
+
+    PAGE_CACHE = {
+        'ENABLED': True,
+        'TIMEOUT': 60 * 60,
+    }
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+DEFAULTS = {
+    'ENABLED': True,
+    'TIMEOUT': 60 * 60,
+}
+
+VERSION_CACHE_KEY = 'page_cache_version:{name}'
+PAGE_CACHE_KEY = 'page_cache:{name}:{version}:{path}'
+
+# URL 名称 -> 视图，由 cache_static_page 注册
+PAGES = {}
+# 模板中 {% cache %} 片段的名称
+FRAGMENTS = ('navbar', 'footer', 'city_highlights')
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'PAGE_CACHE', {}))
+    return config
+
+
+def is_cacheable_request(request):
+    """匿名、无状态的 GET/HEAD 请求"""
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    return not any(
+        name in request.COOKIES
+        for name in (settings.SESSION_COOKIE_NAME, CookieStorage.cookie_name)
+    )
+
+
+def _page_key(name, path):
+    version = cache.get(VERSION_CACHE_KEY.format(name=name), 0)
+    path_hash = hashlib.md5(path.encode()).hexdigest()
+    return PAGE_CACHE_KEY.format(name=name, version=version, path=path_hash)
+
+
+def _response_from_entry(request, entry):
+    response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    return get_conditional_response(
+        request, etag=entry['etag'], last_modified=entry['last_modified'], response=response
+    )
+
+
+def cache_static_page(name):
+    """
+    缓存匿名访问的完整页面，name 为页面的 URL 名称 (用于按页面清除)
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            config = get_config()
+            if not config['ENABLED'] or not is_cacheable_request(request):
+                return view_func(request, *args, **kwargs)
+
+            # 查询参数不影响静态页面，只按路径缓存，避免任意查询字符串占满缓存
+            key = _page_key(name, request.path)
+            entry = cache.get(key)
+            if entry is None:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code != 200 or response.streaming or response.cookies:
+                    return response
+                content = response.content
+                entry = {
+                    'content': content,
+                    'content_type': response['Content-Type'],
+                    'etag': quote_etag(hashlib.md5(content).hexdigest()),
+                    'last_modified': int(time.time()),
+                }
+                cache.set(key, entry, config['TIMEOUT'])
+            return _response_from_entry(request, entry)
+
+        PAGES[name] = wrapper
+        return wrapper
+    return decorator
+
+
+def purge(pages=None, fragments=None):
+    """
+    清除页面和片段缓存
+
+    pages / fragments 为 None 时清除全部。页面通过递增版本号失效，片段直接删除。
+    """
+    for name in PAGES if pages is None else pages:
+        key = VERSION_CACHE_KEY.format(name=name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+    cache.delete_many([
+        make_template_fragment_key(name)
+        for name in (FRAGMENTS if fragments is None else fragments)
+    ])
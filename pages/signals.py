@@ -0,0 +1,36 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from cars.models import Car
+from rush_car_rental.utils.image_derivatives import generate_derivatives_quietly
+from .models import CarSubscription, Testimonial
+from . import subscription_search, testimonials
+
+
+@receiver([post_save, post_delete], sender=CarSubscription)
+@receiver([post_save, post_delete], sender=Car)
+def invalidate_subscription_facets(sender, **kwargs):
+    """
+    Signal handler to refresh the subscription search facets when a subscription or its car changes
+    """
+    transaction.on_commit(subscription_search.bump_version)
+
+
+@receiver(post_save, sender=CarSubscription)
+def generate_subscription_image_derivatives(sender, instance, **kwargs):
+    """
+    Signal handler to generate thumbnails and srcset widths for a subscription's uploaded images
+    """
+    def generate():
+        for image in instance.get_images():
+            generate_derivatives_quietly(image.file)
+
+    transaction.on_commit(generate)
+
+
+@receiver([post_save, post_delete], sender=Testimonial)
+def refresh_testimonial_rotation(sender, **kwargs):
+    """
+    Signal handler to refresh the home page testimonial pool when a testimonial changes
+    """
+    transaction.on_commit(testimonials.invalidate)
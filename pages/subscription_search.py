@@ -0,0 +1,151 @@
+"""
+订阅车辆分面搜索
+
+筛选项 (地点、品牌、燃料类型、类别、座位数) 和各选项的数量由一次查询得到:
+按全部分面字段的取值组合分组，每组记录订阅数量和组内订阅的 (id, 价格, 创建时间)。
+分组结果缓存在 Django 缓存中，订阅车辆或车辆变化时由 pages.signals 递增版本号使其失效。
+
+分页的总数、当前页的订阅 id 和分面数量都来自同一份分组结果，页数和分面数量与显示的行一致;
+当前页只按 id 查询一次。
+
+每个分面的数量只应用 "其他" 分面的筛选条件，这样用户可以在当前分面内切换选项。
+"""
+from collections import Counter, defaultdict, namedtuple
+from operator import attrgetter
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+
+from rush_car_rental.db_router import use_primary
+
+from .models import CarSubscription
+
+# GET 参数 -> 分组字段
+FACETS = {
+    'pickup_location': 'car__currently_located__location_name',
+    'make': 'car__model__make__name',
+    'fuel_type': 'car__fuel_type__fuel_type',
+    'car_category': 'car__category__name',
+    'seat_number': 'seat_number',
+}
+
+# 分组中的一个订阅
+Member = namedtuple('Member', 'id price created_at')
+
+# sort 参数 -> (排序字段, 是否倒序)，'' 与 CarSubscription 的默认排序 (-created_at) 相同
+SORT_OPTIONS = {
+    '': (('created_at', 'id'), True),
+    'price': (('price', 'id'), False),
+    '-price': (('price', 'id'), True),
+}
+
+PAGE_SIZE = 12
+
+VERSION_CACHE_KEY = 'subscription_facets_version'
+ROWS_CACHE_KEY = 'subscription_facets:{version}'
+# 品牌、类别等改名不会触发信号，缓存最多保留10分钟
+ROWS_TIMEOUT = 10 * 60
+
+
+def bump_version():
+    """订阅车辆数据变化后调用，使缓存的分组结果失效"""
+    try:
+        return cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 1, None)
+        return 1
+
+
+def facet_rows():
+    """
+    返回 [(分面值元组, 订阅数量, (Member, ...)), ...]
+
+    一次查询，结果带版本号缓存。
+    """
+    version = cache.get(VERSION_CACHE_KEY, 0)
+    key = ROWS_CACHE_KEY.format(version=version)
+    rows = cache.get(key)
+    if rows is None:
+        fields = list(FACETS.values())
+        groups = defaultdict(list)
+        # 版本号变化后从主库重建，不能把副本上的旧数据缓存到新版本下
+        with use_primary():
+            for pk, price, created_at, *values in CarSubscription.objects.values_list(
+                    'id', 'subscription_plan3', 'created_at', *fields).order_by():
+                groups[tuple(values)].append(Member(pk, price, created_at))
+        rows = [(values, len(members), tuple(members)) for values, members in groups.items()]
+        cache.set(key, rows, ROWS_TIMEOUT)
+    return rows
+
+
+def _matches(values, selected, skip=None):
+    for index, name in enumerate(FACETS):
+        if name == skip or not selected.get(name):
+            continue
+        if values[index] is None or str(values[index]) != selected[name]:
+            return False
+    return True
+
+
+def compute_facets(rows, selected):
+    """
+    根据分组结果计算各分面的选项和数量，以及匹配全部筛选条件的总数
+
+    返回 ({分面名: [{'value', 'count'}, ...]}, total)
+    """
+    counters = {name: Counter() for name in FACETS}
+    total = 0
+    for values, count, *_ in rows:
+        if _matches(values, selected):
+            total += count
+        for index, name in enumerate(FACETS):
+            value = values[index]
+            if value in (None, '') or not _matches(values, selected, skip=name):
+                continue
+            counters[name][value] += count
+
+    facets = {
+        name: [{'value': value, 'count': count} for value, count in sorted(counter.items())]
+        for name, counter in counters.items()
+    }
+    return facets, total
+
+
+def matching_ids(rows, selected, sort=''):
+    """匹配全部筛选条件的订阅 id，按 sort 排序"""
+    fields, reverse = SORT_OPTIONS[sort]
+    members = [member for values, _, group in rows if _matches(values, selected) for member in group]
+    members.sort(key=attrgetter(*fields), reverse=reverse)
+    return [member.id for member in members]
+
+
+class SubscriptionSearch:
+    """
+    解析请求参数，返回分面、排序后的分页结果
+    """
+
+    def __init__(self, params, page_size=PAGE_SIZE):
+        self.selected = {name: params.get(name, '').strip() for name in FACETS}
+        if not self.selected['seat_number'].isdigit():
+            self.selected['seat_number'] = ''
+        self.sort = params.get('sort', '') if params.get('sort', '') in SORT_OPTIONS else ''
+        self.page_number = params.get('page', 1)
+        self.page_size = page_size
+
+    def queryset(self):
+        return CarSubscription.objects.select_related(
+            'car__model__make',
+            'car__fuel_type',
+            'car__category',
+            'car__currently_located',
+        )
+
+    def run(self):
+        rows = facet_rows()
+        facets, _ = compute_facets(rows, self.selected)
+        paginator = Paginator(matching_ids(rows, self.selected, self.sort), self.page_size)
+        page = paginator.get_page(self.page_number)
+        subscriptions = self.queryset().in_bulk(page.object_list)
+        # 缓存之后被删除的订阅不显示 (删除时版本号递增，缓存随之失效)
+        page.object_list = [subscriptions[pk] for pk in page.object_list if pk in subscriptions]
+        return facets, page
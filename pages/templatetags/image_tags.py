@@ -0,0 +1,18 @@
+from django import template
+
+register = template.Library()
+
+# 列表卡片的默认显示宽度: 桌面端三列，移动端整行
+DEFAULT_SIZES = '(min-width: 992px) 33vw, (min-width: 768px) 50vw, 100vw'
+
+
+@register.inclusion_tag('components/responsive_image.html')
+def responsive_image(image, alt='', css_class='', sizes=DEFAULT_SIZES):
+    """输出 <picture>: 按格式列出派生图片的 srcset，原图作为回退"""
+    return {
+        'sources': image.sources if image else [],
+        'src': image.url if image else '',
+        'alt': alt,
+        'css_class': css_class,
+        'sizes': sizes,
+    }
@@ -0,0 +1,54 @@
+"""
+首页用户评价轮换
+
+原来每次访问首页都执行 order_by('?')，需要对整张表随机排序。这里缓存所有有效评价的
+id 列表，在 Python 中随机抽取；有效评价不多时 (不超过 POOL_LIMIT 条) 连同评价内容
+一起缓存，抽取时不需要查询数据库，否则按主键一次查询取出抽中的几条。
+
+评价保存或删除后由 pages.signals 清除缓存。
+"""
+import random
+
+from django.core.cache import cache
+
+from rush_car_rental.db_router import use_primary
+
+from .models import Testimonial
+
+CACHE_KEY = 'testimonials:pool'
+CACHE_TIMEOUT = 60 * 60
+# 超过这个数量只缓存 id，抽中后再按主键查询
+POOL_LIMIT = 200
+
+
+def _load_pool():
+    pool = cache.get(CACHE_KEY)
+    if pool is None:
+        # 缓存清除后从主库重建，避免把副本上的旧数据再缓存一小时
+        with use_primary():
+            active = Testimonial.objects.filter(is_active=True)
+            testimonials = list(active[:POOL_LIMIT + 1])
+            if len(testimonials) <= POOL_LIMIT:
+                pool = {
+                    'ids': [testimonial.id for testimonial in testimonials],
+                    'rows': {testimonial.id: testimonial for testimonial in testimonials},
+                }
+            else:
+                pool = {'ids': list(active.values_list('id', flat=True)), 'rows': None}
+        cache.set(CACHE_KEY, pool, CACHE_TIMEOUT)
+    return pool
+
+
+def rotate(count=3):
+    """随机返回 count 条有效评价"""
+    pool = _load_pool()
+    sample = random.sample(pool['ids'], min(count, len(pool['ids'])))
+    if pool['rows'] is not None:
+        return [pool['rows'][id] for id in sample]
+    # 按主键取出后保持随机顺序；缓存期间被删除的评价直接跳过
+    testimonials = Testimonial.objects.filter(is_active=True).in_bulk(sample)
+    return [testimonials[id] for id in sample if id in testimonials]
+
+
+def invalidate():
+    cache.delete(CACHE_KEY)
@@ -0,0 +1,87 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.shortcuts import render
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from locations.models import CityHighlight, State
+
+
+@override_settings(PAGE_CACHE={'ENABLED': True, 'TIMEOUT': 60})
+class PageCacheTest(TestCase):
+    """
+    测试静态页面缓存、条件请求和清除命令
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('about_us')
+
+    def render_count(self):
+        return mock.patch('pages.views.render', wraps=render)
+
+    def test_anonymous_requests_are_cached(self):
+        """
+        测试匿名访问只渲染一次，并带有 ETag 和 Last-Modified
+        """
+        with self.render_count() as rendered:
+            first = self.client.get(self.url)
+            second = self.client.get(self.url)
+
+        self.assertEqual(rendered.call_count, 1)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertTrue(second.has_header('Last-Modified'))
+
+    def test_conditional_request_returns_304(self):
+        """
+        测试 If-None-Match / If-Modified-Since 命中时返回 304
+        """
+        response = self.client.get(self.url)
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(
+            self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304
+        )
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_session_requests_bypass_cache(self):
+        """
+        测试带会话 cookie 的请求不使用缓存
+        """
+        self.client.cookies['sessionid'] = 'abc'
+        with self.render_count() as rendered:
+            response = self.client.get(self.url)
+            self.client.get(self.url)
+
+        self.assertEqual(rendered.call_count, 2)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_purge_command(self):
+        """
+        测试按页面清除缓存
+        """
+        self.client.get(self.url)
+        call_command('purge_page_cache', 'about_us', stdout=StringIO())
+
+        with self.render_count() as rendered:
+            self.client.get(self.url)
+        self.assertEqual(rendered.call_count, 1)
+
+    def test_city_highlights_fragment_refreshes(self):
+        """
+        测试城市推荐片段在数据变化后重新渲染
+        """
+        state = State.objects.create(name='Victoria', code='VIC')
+        highlight = CityHighlight.objects.create(
+            city='Melbourne', state=state, description='Coffee', image_url='https://example.com/m.jpg'
+        )
+        self.assertContains(self.client.get(reverse('home')), 'Melbourne, VIC')
+
+        highlight.city = 'Geelong'
+        with self.captureOnCommitCallbacks(execute=True):
+            highlight.save()
+        self.assertContains(self.client.get(reverse('home')), 'Geelong, VIC')
@@ -0,0 +1,143 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from cars.models import Car, VehicleFuel, VehicleMake, VehicleModel
+from cars.tests.utils import UnmanagedTablesMixin
+from pages.models import CarSubscription
+from pages.subscription_search import SubscriptionSearch, compute_facets
+
+
+class ComputeFacetsTest(SimpleTestCase):
+    """
+    测试分面数量计算
+    """
+
+    # (地点, 品牌, 燃料, 类别, 座位数), 数量
+    rows = [
+        (('Melbourne', 'Toyota', 'Petrol', None, 5), 3),
+        (('Melbourne', 'Tesla', 'Electric', None, 5), 1),
+        (('Sydney', 'Toyota', 'Hybrid', None, 7), 2),
+    ]
+
+    def values(self, facet):
+        return {item['value']: item['count'] for item in facet}
+
+    def test_without_filters(self):
+        """
+        测试没有筛选条件时统计所有选项
+        """
+        facets, total = compute_facets(self.rows, {})
+
+        self.assertEqual(total, 6)
+        self.assertEqual(self.values(facets['make']), {'Toyota': 5, 'Tesla': 1})
+        self.assertEqual(self.values(facets['seat_number']), {5: 4, 7: 2})
+        self.assertEqual(facets['car_category'], [])
+
+    def test_facets_reflect_other_filters(self):
+        """
+        测试分面数量反映其他分面的筛选，但不受自身筛选影响
+        """
+        facets, total = compute_facets(self.rows, {'pickup_location': 'Melbourne', 'make': 'Toyota'})
+
+        self.assertEqual(total, 3)
+        self.assertEqual(self.values(facets['make']), {'Toyota': 3, 'Tesla': 1})
+        self.assertEqual(self.values(facets['pickup_location']), {'Melbourne': 3, 'Sydney': 2})
+        self.assertEqual(self.values(facets['fuel_type']), {'Petrol': 3})
+
+
+class SubscriptionSearchViewTest(UnmanagedTablesMixin, TestCase):
+    """
+    测试订阅车辆页面的筛选、排序和分页
+    """
+
+    extra_models = [CarSubscription]
+
+    def setUp(self):
+        cache.clear()
+        toyota = VehicleMake.objects.create(name='Toyota')
+        tesla = VehicleMake.objects.create(name='Tesla')
+        petrol = VehicleFuel.objects.create(fuel_type='Petrol')
+        electric = VehicleFuel.objects.create(fuel_type='Electric')
+        models = [
+            (VehicleModel.objects.create(make=toyota, model_name='Corolla'), petrol, 5, '300'),
+            (VehicleModel.objects.create(make=toyota, model_name='Camry'), petrol, 5, '250'),
+            (VehicleModel.objects.create(make=toyota, model_name='Kluger'), petrol, 7, '400'),
+            (VehicleModel.objects.create(make=tesla, model_name='Model 3'), electric, 5, '350'),
+        ]
+        self.subscriptions = []
+        for model, fuel, seats, price in models:
+            car = Car.objects.create(model=model, fuel_type=fuel)
+            self.subscriptions.append(CarSubscription.objects.create(
+                car=car, seat_number=seats, subscription_plan1=price,
+                subscription_plan2=price, subscription_plan3=Decimal(price),
+            ))
+
+    def test_filter_and_facet_counts(self):
+        """
+        测试筛选结果和带数量的筛选项
+        """
+        response = self.client.get(reverse('subscription'), {'make': 'Toyota', 'seat_number': '5'})
+
+        self.assertEqual(response.context['total_subscriptions'], 2)
+        self.assertEqual(
+            {item['value']: item['count'] for item in response.context['makes']},
+            {'Toyota': 2, 'Tesla': 1},
+        )
+        self.assertEqual(
+            {item['value']: item['count'] for item in response.context['seat_numbers']},
+            {5: 2, 7: 1},
+        )
+
+    def test_sort_by_price_and_paginate(self):
+        """
+        测试按价格排序和分页
+        """
+        search = SubscriptionSearch({'sort': 'price', 'page': '2'}, page_size=3)
+        facets, page = search.run()
+
+        self.assertEqual(page.paginator.count, 4)
+        self.assertEqual([s.subscription_plan3 for s in page.object_list], [Decimal('400')])
+
+        _, page = SubscriptionSearch({'sort': '-price'}, page_size=3).run()
+        self.assertEqual([int(s.subscription_plan3) for s in page.object_list], [400, 350, 300])
+
+    def test_query_count_is_flat(self):
+        """
+        测试页面查询次数与车辆数量无关: 分面一次，当前页一次，缓存命中后只剩当前页
+        """
+        search = SubscriptionSearch({})
+        with self.assertNumQueries(2):
+            _, page = search.run()
+            list(page.object_list)
+
+        with self.assertNumQueries(1):
+            _, page = SubscriptionSearch({}).run()
+            list(page.object_list)
+
+    def test_changes_invalidate_facets(self):
+        """
+        测试订阅车辆变化后分面重新统计
+        """
+        SubscriptionSearch({}).run()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.subscriptions[0].delete()
+
+        facets, page = SubscriptionSearch({}).run()
+        self.assertEqual(page.paginator.count, 3)
+
+    def test_page_matches_cached_count(self):
+        """
+        测试缓存有效期内新增的订阅 (未触发信号) 不会使分页总数与当前页的行不一致
+        """
+        SubscriptionSearch({}).run()
+        CarSubscription.objects.bulk_create([CarSubscription(
+            car=self.subscriptions[0].car, seat_number=5, subscription_plan1='100',
+            subscription_plan2='100', subscription_plan3=Decimal('100'),
+        )])
+
+        _, page = SubscriptionSearch({'sort': 'price'}, page_size=10).run()
+        self.assertEqual(page.paginator.count, 4)
+        self.assertEqual([int(s.subscription_plan3) for s in page.object_list], [250, 300, 350, 400])
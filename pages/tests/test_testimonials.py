@@ -0,0 +1,69 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from locations.models import CityHighlight, State
+from pages import testimonials
+from pages.models import Testimonial
+
+
+class TestimonialRotationTest(TestCase):
+    """
+    测试首页评价轮换
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.active = [
+            Testimonial.objects.create(name=f'Customer {i}', content='Great service') for i in range(5)
+        ]
+        Testimonial.objects.create(name='Hidden', content='Inactive', is_active=False)
+
+    def test_rotate_from_cached_pool(self):
+        """
+        测试从缓存的评价池中抽取，不包含停用的评价，缓存命中后不再查询
+        """
+        with self.assertNumQueries(1):
+            sample = testimonials.rotate(3)
+        self.assertEqual(len(set(t.id for t in sample)), 3)
+        self.assertTrue(all(t.is_active for t in sample))
+
+        with self.assertNumQueries(0):
+            testimonials.rotate(3)
+
+    def test_large_pool_fetches_by_pk(self):
+        """
+        测试评价数量超过上限时只缓存 id，抽中后按主键查询一次
+        """
+        with mock.patch.object(testimonials, 'POOL_LIMIT', 2):
+            testimonials.rotate(3)
+            with self.assertNumQueries(1):
+                sample = testimonials.rotate(3)
+        self.assertEqual(len(sample), 3)
+
+    def test_refresh_on_change(self):
+        """
+        测试评价停用后从轮换中移除
+        """
+        testimonials.rotate(3)
+        with self.captureOnCommitCallbacks(execute=True):
+            Testimonial.objects.exclude(id=self.active[0].id).update(is_active=False)
+            self.active[0].save()
+
+        self.assertEqual([t.id for t in testimonials.rotate(3)], [self.active[0].id])
+
+    def test_home_page_queries(self):
+        """
+        测试首页的城市推荐和评价在缓存命中后不再查询数据库
+        """
+        state = State.objects.create(name='Victoria', code='VIC')
+        CityHighlight.objects.create(city='Melbourne', state=state, description='Coffee', image_url='https://example.com/m.jpg')
+
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Melbourne, VIC')
+        self.assertEqual(len(response.context['testimonials']), 3)
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse('home'))
@@ -1,17 +1,19 @@
 from django.shortcuts import render, get_object_or_404
-from cars.models import Car, CarCategory, VehicleCategory, VehicleCategoryType,VehicleMake,VehicleModel,VehicleFuel,VehicleType,VehicleImage
+from cars.models import Car, CarCategory, VehicleCategoryType,VehicleModel,VehicleType,VehicleImage
 from pages.models import CarSubscription
-from locations.models import Location, CityHighlight
-from .models import Testimonial
+from locations.models import Location
+from locations import highlights
+from . import testimonials as testimonial_rotation
+from .page_cache import cache_static_page
+from .subscription_search import SubscriptionSearch
 import os
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rush_car_rental.settings')
 
 def home(request):
-    
-    
-    city_highlights = CityHighlight.objects.all()[:3]
-    testimonials = Testimonial.objects.filter(is_active=True).order_by('?')[:3]
+    # 城市推荐和评价池都来自缓存，随机抽取评价时最多按主键查询一次
+    city_highlights = highlights.home_highlights()
+    testimonials = testimonial_rotation.rotate(3)
     
     context = {
         'city_highlights': city_highlights,
@@ -19,80 +21,56 @@ def home(request):
     }
     return render(request, 'home.html', context)
 
+@cache_static_page('rental_conditions')
 def rental_conditions(request):
     return render(request, 'pages/rental_conditions.html')
 
+@cache_static_page('refund_policy')
 def refund_policy(request):
     return render(request, 'pages/refund_policy.html')
 
+@cache_static_page('complaint')
 def complaint(request):
     return render(request, 'pages/complaint.html')
     
+@cache_static_page('pickup_guidelines')
 def pickup_guidelines(request):
     return render(request, 'pages/pickup_guidelines.html')
     
+@cache_static_page('return_guidelines')
 def return_guidelines(request):
     return render(request, 'pages/return_guidelines.html')
     
+@cache_static_page('about_us')
 def about_us(request):
     return render(request, 'pages/about_us.html')
     
 def subscription(request):
-    # 获取所有订阅车辆数据
-    subscriptions = CarSubscription.objects.select_related(
-        'car__model__make',
-        'car__fuel_type',
-        'car__category',
-        'car__currently_located',
-    ).all()
-
-    # 获取去重后的选项数据
-    locations = list(set(
-    CarSubscription.objects.filter(car__currently_located__isnull=False)
-    .values_list('car__currently_located__location_name', flat=True)
-    ))
-    car_categories = list(set([c for c in VehicleCategory.objects.values_list('name', flat=True) if c]))
-    fuel_types = list(set([f for f in VehicleFuel.objects.values_list('fuel_type', flat=True) if f]))
-    makes = list(set([m for m in VehicleMake.objects.values_list('name', flat=True) if m]))
-    seat_numbers = list(set([s for s in CarSubscription.objects.values_list('seat_number', flat=True) if s]))
-    # 排序
-    locations.sort()
-    car_categories.sort()
-    fuel_types.sort()
-    makes.sort()
-    seat_numbers.sort()
-    # 获取筛选参数
-    selected_location = request.GET.get('pickup_location', '')
-    selected_make = request.GET.get('make', '')
-    selected_fuel_type = request.GET.get('fuel_type', '')
-    selected_car_category = request.GET.get('car_category', '')
-    selected_seat_number = request.GET.get('seat_number', '')
-
-    # 应用筛选
-    if selected_location:
-        subscriptions = subscriptions.filter(car__currently_located__location_name=selected_location)
-    if selected_make:
-        subscriptions = subscriptions.filter(car__model__make__name=selected_make)
-    if selected_fuel_type:
-        subscriptions = subscriptions.filter(car__fuel_type__fuel_type=selected_fuel_type)
-    if selected_car_category:
-        subscriptions = subscriptions.filter(car__category__name=selected_car_category)
-    if selected_seat_number:
-        subscriptions = subscriptions.filter(seat_number=selected_seat_number)  
+    # 一次查询得到所有筛选项、数量和排序后的订阅 id，当前页按 id 查询
+    search = SubscriptionSearch(request.GET)
+    facets, page = search.run()
+    selected = search.selected
 
+    # 翻页链接保留当前的筛选和排序参数
+    query = request.GET.copy()
+    query.pop('page', None)
 
     context = {
-        'subscriptions': subscriptions,
-        'locations': locations,
-        'car_categories': car_categories,
-        'fuel_types': fuel_types,
-        'makes': makes,
-        'seat_numbers': seat_numbers,
-        'selected_location': selected_location,
-        'selected_make': selected_make,
-        'selected_fuel_type': selected_fuel_type,
-        'selected_car_category': selected_car_category,
-        'selected_seat_number': selected_seat_number,
+        'subscriptions': page.object_list,
+        'page_obj': page,
+        'total_subscriptions': page.paginator.count,
+        'locations': facets['pickup_location'],
+        'car_categories': facets['car_category'],
+        'fuel_types': facets['fuel_type'],
+        'makes': facets['make'],
+        'seat_numbers': facets['seat_number'],
+        'selected_location': selected['pickup_location'],
+        'selected_make': selected['make'],
+        'selected_fuel_type': selected['fuel_type'],
+        'selected_car_category': selected['car_category'],
+        'selected_seat_number': selected['seat_number'],
+        'selected_sort': search.sort,
+        'page_query': query.urlencode(),
     }
     return render(request, 'pages/subscription.html', context)
 
@@ -15,5 +15,10 @@ load_dotenv()
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rush_car_rental.settings')
+# 数据库连接管理据此选择 ASGI 下的默认值 (DB_CONN_MAX_AGE=0)
+os.environ.setdefault('DJANGO_SERVER_INTERFACE', 'asgi')
 
-application = get_asgi_application()
\ No newline at end of file
+application = get_asgi_application()
+
+# 导入时开始统计数据库连接次数 (CosmosDBManager.get_pool_stats)
+import rush_car_rental.utils.cosmos_db  # noqa: E402,F401
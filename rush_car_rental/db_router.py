@@ -0,0 +1,239 @@
+"""
+只读副本路由
+
+目录类模型 (车型、门店、订阅车辆、用户评价) 的查询发送到只读副本，写入和其他查询使用主库。
+预订历史等视图用 @use_replica 声明后，预订查询也可以走副本。
+
+- 读己之写: 请求中写入了数据 (会话除外) 后，响应设置一个短期 cookie，
+  之后 STICKY_SECONDS 秒内该用户的所有查询都使用主库，不会因为副本延迟看不到刚创建的预订
+- 故障回退: 定期检查每个副本，连接失败或复制延迟超过 MAX_LAG_SECONDS 的副本暂时不使用，
+  没有可用副本时使用主库
+- 事务中 (主库处于 atomic 块内) 的查询始终使用主库
+
+配置:
+
+    DATABASES = {'default': {...}, 'replica1': {...}}
+    DATABASE_ROUTERS = ['rush_car_rental.db_router.ReplicaRouter']
+    MIDDLEWARE = [..., 'rush_car_rental.middleware.ReplicaStickinessMiddleware', ...]
+    DATABASE_REPLICAS = {
+        'ALIASES': ['replica1'],       # 为空时所有查询使用主库
+        'MAX_LAG_SECONDS': 5,
+        'HEALTH_CHECK_INTERVAL': 10,
+        'STICKY_SECONDS': 15,
+    }
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ALIASES': [],
+    # 默认从副本读取的模型 (app_label.model_name)
+    'READ_MODELS': [
+        'cars.vehiclecategory',
+        'cars.vehiclecategorytype',
+        'cars.location',
+        'locations.location',
+        'locations.state',
+        'rushwebsite.carsubscription',
+        'pages.testimonial',
+    ],
+    # 只在 @use_replica 声明的视图中从副本读取的模型
+    'HISTORY_MODELS': ['bookings.booking', 'bookings.driver'],
+    # 写入这些模型不会触发读己之写 (django_cache.cacheentry 为数据库缓存表)
+    'STICKY_IGNORE': ['sessions.session', 'django_cache.cacheentry'],
+    'STICKY_SECONDS': 15,
+    'COOKIE_NAME': 'db_primary',
+    'MAX_LAG_SECONDS': 5,
+    'HEALTH_CHECK_INTERVAL': 10,
+}
+
+# PostgreSQL 备库的复制延迟 (秒)，WAL 已全部回放时为 0，主库上返回 NULL
+POSTGRES_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'DATABASE_REPLICAS', {}))
+    return config
+
+
+def replica_aliases():
+    return [alias for alias in get_config()['ALIASES'] if alias in connections.settings]
+
+
+class RequestState:
+    """一个请求 (或 use_primary / use_replica 块) 的路由状态"""
+
+    def __init__(self, pinned=False, history=False):
+        self.pinned = pinned
+        self.history = history
+        self.wrote = False
+
+
+_state = contextvars.ContextVar('db_router_state', default=None)
+
+
+def current_state():
+    return _state.get()
+
+
+@contextmanager
+def routing(**kwargs):
+    """在块内使用给定的路由状态，块结束后恢复"""
+    parent = _state.get()
+    state = RequestState(
+        pinned=kwargs.get('pinned', parent.pinned if parent else False),
+        history=kwargs.get('history', parent.history if parent else False),
+    )
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+        if parent is not None and state.wrote:
+            parent.wrote = True
+
+
+def use_primary():
+    """块内所有查询使用主库 (例如构建需要最新数据的缓存)"""
+    return routing(pinned=True)
+
+
+def use_replica(view_func):
+    """
+    视图装饰器: 视图中的历史类查询 (HISTORY_MODELS) 也从副本读取
+
+    读己之写的 cookie 仍然有效，刚写入过数据的用户继续使用主库。
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _wrapped(*args, **kwargs):
+            with routing(history=True):
+                return await view_func(*args, **kwargs)
+    else:
+        @wraps(view_func)
+        def _wrapped(*args, **kwargs):
+            with routing(history=True):
+                return view_func(*args, **kwargs)
+    return _wrapped
+
+
+class ReplicaHealth:
+    """
+    副本健康状态，每个副本最多每 HEALTH_CHECK_INTERVAL 秒检查一次
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._checked = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._checked.clear()
+
+    def is_available(self, alias):
+        config = get_config()
+        now = self.clock()
+        with self._lock:
+            checked = self._checked.get(alias)
+            if checked is not None and now - checked[0] < config['HEALTH_CHECK_INTERVAL']:
+                return checked[1]
+        available = self.check(alias, config['MAX_LAG_SECONDS'])
+        with self._lock:
+            self._checked[alias] = (now, available)
+        return available
+
+    def check(self, alias, max_lag):
+        try:
+            lag = replica_lag(alias)
+        except Exception as e:
+            logger.warning("只读副本 %s 不可用，改用主库: %s", alias, e)
+            connections[alias].close()
+            return False
+        if lag is not None and lag > max_lag:
+            logger.warning("只读副本 %s 复制延迟 %.1f 秒，超过 %s 秒，改用主库", alias, lag, max_lag)
+            return False
+        return True
+
+    def status(self):
+        """返回每个副本最近一次检查的结果 (可用于监控)"""
+        with self._lock:
+            return {alias: available for alias, (_, available) in self._checked.items()}
+
+
+def replica_lag(alias):
+    """
+    返回副本的复制延迟 (秒)，无法获取时返回 None，连接失败时抛出异常
+    """
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if connection.vendor != 'postgresql':
+            cursor.execute('SELECT 1')
+            return None
+        cursor.execute(POSTGRES_LAG_SQL)
+        row = cursor.fetchone()
+    return float(row[0]) if row and row[0] is not None else None
+
+
+replica_health = ReplicaHealth()
+
+
+class ReplicaRouter:
+    """
+    把目录类模型的读取分配到健康的只读副本
+    """
+
+    def _replica_for(self, model):
+        state = _state.get()
+        if state is not None and state.pinned:
+            return DEFAULT_DB_ALIAS
+        aliases = replica_aliases()
+        if not aliases or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        config = get_config()
+        label = model._meta.label_lower
+        if label not in config['READ_MODELS'] and not (
+                state is not None and state.history and label in config['HISTORY_MODELS']):
+            return None
+        available = [alias for alias in aliases if replica_health.is_available(alias)]
+        return random.choice(available) if available else DEFAULT_DB_ALIAS
+
+    def db_for_read(self, model, **hints):
+        return self._replica_for(model)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None and model._meta.label_lower not in get_config()['STICKY_IGNORE']:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 副本和主库是同一份数据
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 副本的表结构由复制同步，不执行迁移
+        if db in replica_aliases():
+            return False
+        return None
@@ -0,0 +1,73 @@
+"""
+索引审计
+
+检查视图发出的高频查询在当前数据库 (SQLite 或 PostgreSQL) 上是否有可用的索引，
+输出缺少的索引和每个查询的执行计划:
+
+    python manage.py audit_indexes
+    python manage.py audit_indexes --database default --json
+    python manage.py audit_indexes --sql > create_indexes.sql
+
+--sql 只输出缺少的索引的 CREATE INDEX 语句，可以交给维护 app_* 表的外部系统执行。
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from rush_car_rental.utils.index_audit import audit
+
+STATUS_LABELS = {
+    'covered': '已有索引',
+    'partial': '部分覆盖',
+    'missing': '缺少索引',
+    'no_table': '表不存在',
+}
+
+
+class Command(BaseCommand):
+    help = '检查高频查询是否有可用的索引，输出缺少的索引和 EXPLAIN 执行计划'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='检查哪个数据库 (默认 default)')
+        parser.add_argument('--json', action='store_true', help='以JSON格式输出')
+        parser.add_argument('--sql', action='store_true', help='只输出缺少的索引的 CREATE INDEX 语句')
+        parser.add_argument('--no-explain', action='store_true', help='不执行 EXPLAIN')
+
+    def handle(self, *args, **options):
+        if options['database'] not in connections.settings:
+            raise CommandError(f"数据库配置不存在: {options['database']}")
+        results = audit(options['database'], with_explain=not (options['no_explain'] or options['sql']))
+
+        if options['sql']:
+            for result in results:
+                if result['sql']:
+                    self.stdout.write(f"-- {result['name']}: {result['source']}")
+                    self.stdout.write(result['sql'])
+            return
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2, ensure_ascii=False))
+            return
+
+        vendor = connections[options['database']].vendor
+        self.stdout.write(f"数据库: {options['database']} ({vendor})")
+        for result in results:
+            label = STATUS_LABELS[result['status']]
+            style = self.style.SUCCESS if result['status'] == 'covered' else self.style.WARNING
+            self.stdout.write(style(f"\n[{label}] {result['name']}: {result['table']} ({', '.join(result['columns'])})"))
+            self.stdout.write(f"  来源: {result['source']}")
+            if result['index']:
+                used = '是' if result['uses_index'] else '否'
+                self.stdout.write(f"  现有索引: {result['index']} (执行计划中使用: {used})")
+            if result['sql']:
+                self.stdout.write(f"  建议: {result['sql']}")
+            for line in result['plan'].splitlines():
+                self.stdout.write(f"    {line}")
+
+        missing = [r for r in results if r['status'] in ('partial', 'missing')]
+        if missing:
+            self.stdout.write(self.style.WARNING(
+                f"\n{len(missing)} 个查询缺少合适的索引，运行 migrate 或 audit_indexes --sql 创建"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('\n所有查询都有可用的索引'))
@@ -0,0 +1,127 @@
+"""
+数据库连接管理基准测试
+
+按 Django 处理请求的方式 (请求开始和结束时调用 close_if_unusable_or_obsolete)
+模拟一批请求，比较三种连接管理方式的单请求耗时:
+
+- per_request: CONN_MAX_AGE=0，每个请求重新建立连接 (原来的配置)
+- persistent: CONN_MAX_AGE>0 并开启健康检查，请求之间复用连接
+- pool: psycopg 连接池 (需要 psycopg[pool] >= 3)
+
+    python manage.py benchmark_db_connections --requests 200
+    python manage.py benchmark_db_connections --database default --mode per_request --mode persistent --json
+
+连接远端数据库 (如 Azure) 时 TLS 握手的开销最明显，本地 PostgreSQL 上也能看到建立连接的耗时。
+"""
+import copy
+import json
+import math
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.utils import ConnectionHandler
+
+from rush_car_rental.utils.environment import psycopg_pool_available
+
+MODES = ('per_request', 'persistent', 'pool')
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = '比较每请求新建连接、持久连接和连接池的单请求数据库耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='使用哪个数据库配置 (默认 default)')
+        parser.add_argument('--mode', action='append', dest='modes', choices=MODES, help='要测试的方式，可多次指定')
+        parser.add_argument('--requests', type=int, default=100, help='每种方式模拟的请求数')
+        parser.add_argument('--queries', type=int, default=3, help='每个请求执行的查询数')
+        parser.add_argument('--conn-max-age', type=int, default=600, help='persistent 方式的 CONN_MAX_AGE')
+        parser.add_argument('--json', action='store_true', help='以JSON格式输出')
+
+    def handle(self, *args, **options):
+        if options['database'] not in connections.settings:
+            raise CommandError(f"数据库配置不存在: {options['database']}")
+        base = connections.settings[options['database']]
+        modes = options['modes'] or [
+            mode for mode in MODES
+            if mode != 'pool' or (base['ENGINE'].endswith('postgresql') and psycopg_pool_available())
+        ]
+        if 'pool' in modes and not (base['ENGINE'].endswith('postgresql') and psycopg_pool_available()):
+            raise CommandError('pool 方式需要 PostgreSQL 和 psycopg[pool] >= 3')
+
+        results = [self.run_mode(base, mode, options) for mode in modes]
+        baseline = next((r for r in results if r['mode'] == 'per_request'), None)
+        for result in results:
+            if baseline and result['mean_ms']:
+                result['speedup'] = round(baseline['mean_ms'] / result['mean_ms'], 2)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'方式':<12}{'请求数':>8}{'新建连接':>10}{'平均(ms)':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'加速':>8}")
+        for r in results:
+            self.stdout.write(
+                f"{r['mode']:<12}{r['requests']:>8}{r['connections']:>10}{r['mean_ms']:>10}"
+                f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r.get('speedup', ''):>8}"
+            )
+
+    def settings_for(self, base, mode, conn_max_age):
+        config = copy.deepcopy(base)
+        config['OPTIONS'] = dict(config.get('OPTIONS', {}))
+        config['OPTIONS'].pop('pool', None)
+        if mode == 'per_request':
+            config.update(CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False)
+        elif mode == 'persistent':
+            config.update(CONN_MAX_AGE=conn_max_age, CONN_HEALTH_CHECKS=True)
+        else:
+            config.update(CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False)
+            config['OPTIONS']['pool'] = {'min_size': 1, 'max_size': 2}
+        return config
+
+    def run_mode(self, base, mode, options):
+        alias = f"benchmark_{mode}"
+        # 使用独立的别名，不影响 default 的连接和连接池
+        handler = ConnectionHandler({
+            'default': copy.deepcopy(base),
+            alias: self.settings_for(base, mode, options['conn_max_age']),
+        })
+        conn = handler[alias]
+        opened = []
+
+        def count(sender, connection, **kwargs):
+            if connection is conn:
+                opened.append(connection)
+
+        connection_created.connect(count, weak=False)
+        timings = []
+        try:
+            for _ in range(options['requests']):
+                start = time.perf_counter()
+                # 与 request_started / request_finished 信号中的处理相同
+                conn.close_if_unusable_or_obsolete()
+                with conn.cursor() as cursor:
+                    for _ in range(options['queries']):
+                        cursor.execute('SELECT 1')
+                        cursor.fetchone()
+                conn.close_if_unusable_or_obsolete()
+                timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            connection_created.disconnect(count)
+            conn.close()
+            if mode == 'pool':
+                conn.close_pool()
+
+        return {
+            'mode': mode,
+            'requests': len(timings),
+            'connections': len(opened),
+            'mean_ms': round(sum(timings) / len(timings), 3) if timings else 0,
+            'p50_ms': round(percentile(timings, 0.5), 3) if timings else 0,
+            'p95_ms': round(percentile(timings, 0.95), 3) if timings else 0,
+        }
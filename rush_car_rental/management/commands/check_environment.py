@@ -71,6 +71,19 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f'  连接失败! ❌\n  错误: {str(e)}'))
             logger.error("[DB_CONNECT] 数据库连接测试失败: %s", str(e), exc_info=True)
         
+        # 连接管理 (持久连接/连接池)
+        from rush_car_rental.utils.cosmos_db import CosmosDBManager
+        pool_stats = CosmosDBManager.get_pool_stats('default')['default']
+        self.stdout.write('\n连接管理:')
+        self.stdout.write(f'  模式: {self.style.WARNING(pool_stats["mode"])}')
+        if pool_stats['mode'] == 'pool':
+            for key, value in sorted(pool_stats['pool'].items()):
+                self.stdout.write(f'  {key}: {value}')
+        else:
+            self.stdout.write(f'  CONN_MAX_AGE: {pool_stats["conn_max_age"]}')
+            self.stdout.write(f'  健康检查: {pool_stats["health_checks"]}')
+        logger.info("[DB_POOL] 连接管理: %s", pool_stats)
+
         # 显示所有已安装的应用
         if options['detail']:
             self.stdout.write('\n已安装的应用:')
@@ -82,7 +95,7 @@ class Command(BaseCommand):
             # 显示环境变量(仅部分)
             self.stdout.write('\n关键环境变量:')
             logger.info("[ENV_VARS] 检查关键环境变量")
-            for key in ['DJANGO_ENVIRONMENT', 'USE_POSTGRES', 'DATABASE_URL']:
+            for key in ['DJANGO_ENVIRONMENT', 'USE_POSTGRES', 'DATABASE_URL', 'DB_CONN_MAX_AGE', 'DB_POOL_ENABLED', 'DJANGO_SERVER_INTERFACE']:
                 value = os.environ.get(key)
                 if value:
                     if key.lower().find('secret') >= 0 or key.lower().find('password') >= 0:
@@ -0,0 +1,62 @@
+"""
+为已上传的车辆图片批量生成派生版本 (WebP/AVIF 缩略图和 srcset 宽度)
+
+新上传的图片由信号自动生成，这个命令用于已有图片或修改 IMAGE_DERIVATIVES 配置之后:
+    python manage.py generate_image_derivatives
+    python manage.py generate_image_derivatives --only subscriptions --force
+"""
+from django.core.management.base import BaseCommand
+
+from cars import catalog
+from cars.models import VehicleImage
+from pages.models import CarSubscription
+from rush_car_rental.utils.image_derivatives import generate_derivatives
+
+
+class Command(BaseCommand):
+    help = '为订阅车辆和车型图片生成WebP/AVIF缩略图和srcset宽度'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only',
+            choices=['subscriptions', 'vehicles'],
+            help='只处理订阅车辆图片或车型图片',
+        )
+        parser.add_argument('--force', action='store_true', help='重新生成已存在的派生图片')
+
+    def handle(self, *args, **options):
+        images = []
+        if options['only'] in (None, 'subscriptions'):
+            for subscription in CarSubscription.objects.iterator():
+                images.extend(image.file for image in subscription.get_images())
+        if options['only'] in (None, 'vehicles'):
+            for vehicle_image in VehicleImage.objects.exclude(image='').iterator():
+                images.append(vehicle_image.image)
+
+        processed = failed = 0
+        original_bytes = thumbnail_bytes = 0
+        for image in images:
+            try:
+                derivatives = generate_derivatives(image, force=options['force'])
+                original_bytes += image.size
+            except Exception as e:
+                failed += 1
+                self.stderr.write(self.style.ERROR(f"{image.name}: {e}"))
+                continue
+            processed += 1
+            # 列表卡片实际下载的是最小宽度的版本
+            smallest = [versions[0][1] for versions in derivatives.values() if versions]
+            if smallest:
+                thumbnail_bytes += min(image.storage.size(name) for name in smallest)
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{image.name}: {sum(len(v) for v in derivatives.values())} 个派生版本")
+
+        # 车型目录快照中缓存了 srcset，需要重建
+        if options['only'] in (None, 'vehicles'):
+            catalog.invalidate_catalog()
+
+        self.stdout.write(self.style.SUCCESS(f"处理图片 {processed} 张，失败 {failed} 张"))
+        if processed:
+            self.stdout.write(
+                f"原图共 {original_bytes / 1024:.1f} KB，最小缩略图共 {thumbnail_bytes / 1024:.1f} KB"
+            )
@@ -0,0 +1,73 @@
+"""
+生成压力测试数据
+
+按给定的数据量生成用户、门店、车型、车辆、预订、驾驶员和订阅，批量写入数据库:
+
+    python manage.py generate_load_data
+    python manage.py generate_load_data --cars 5000 --bookings 100000 --seed 42 --json
+    python manage.py generate_load_data --bookings 0 --subscriptions 0
+
+同一个 --seed 每次生成相同的数据，重复执行会更新已有的行。压测用户的用户名为
+lt_user_00000 这样的格式 (前缀由 --prefix 决定)，密码见 LOADTEST_PASSWORD。
+数据分布见 rush_car_rental/utils/load_generator.py，生成后用 load_test 命令压测预订流程。
+"""
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from rush_car_rental.utils.data_loader import DEFAULT_CHUNK_SIZE, DataLoader, FixtureError
+from rush_car_rental.utils.load_generator import DEFAULT_VOLUMES, LOADTEST_PASSWORD, LoadDataGenerator
+
+
+class Command(BaseCommand):
+    help = '按参数生成大批量的模拟数据 (车辆、车型、门店、预订、驾驶员、订阅)，用于压力测试'
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_VOLUMES.items():
+            parser.add_argument(f'--{name}', type=int, default=default, help=f'生成的数量 (默认 {default})')
+        parser.add_argument('--seed', type=int, default=0, help='随机数种子，相同的种子生成相同的数据')
+        parser.add_argument('--prefix', default='LT', help='车牌、门店代码和用户名的前缀 (默认 LT)')
+        parser.add_argument('--database', default='default', help='写入哪个数据库 (默认 default)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='每批写入的行数')
+        parser.add_argument('--json', action='store_true', help='以JSON格式输出')
+
+    def handle(self, *args, **options):
+        if options['database'] not in connections.settings:
+            raise CommandError(f"数据库配置不存在: {options['database']}")
+        if any(options[name] < 0 for name in DEFAULT_VOLUMES):
+            raise CommandError('数量不能为负数')
+        if len(options['prefix']) > 4:
+            raise CommandError('前缀最多 4 个字符 (门店代码最长 10 个字符)')
+
+        generator = LoadDataGenerator(
+            seed=options['seed'], prefix=options['prefix'], **{name: options[name] for name in DEFAULT_VOLUMES}
+        )
+        start = time.perf_counter()
+        try:
+            stats = DataLoader(options['database'], options['chunk_size']).load(generator.records())
+        except FixtureError as e:
+            raise CommandError(str(e))
+        seconds = time.perf_counter() - start
+        rows = sum(s['rows'] for s in stats)
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'volumes': generator.volumes,
+                'seed': options['seed'],
+                'models': stats,
+                'rows': rows,
+                'seconds': round(seconds, 3),
+                'rows_per_second': round(rows / seconds) if seconds else 0,
+            }, indent=2))
+            return
+        self.stdout.write(f"{'模型':<30}{'行数':>10}{'新增':>10}{'更新':>10}")
+        for s in stats:
+            self.stdout.write(f"{s['model']:<30}{s['rows']:>10}{s['created']:>10}{s['updated']:>10}")
+        self.stdout.write(self.style.SUCCESS(f"共生成 {rows} 行，耗时 {seconds:.2f} 秒"))
+        if generator.volumes['users']:
+            self.stdout.write(
+                f"压测用户: {generator.username(0)} ... {generator.username(generator.volumes['users'] - 1)}，"
+                f"密码 {LOADTEST_PASSWORD}"
+            )
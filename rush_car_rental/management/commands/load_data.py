@@ -0,0 +1,56 @@
+"""
+批量加载数据文件
+
+    python manage.py load_data rush_car_rental/fixtures/seed.json
+    python manage.py load_data database_backup.json
+    python manage.py load_data loadtest/ --chunk-size 5000 --json
+
+可以重复执行，已存在的行 (主键或自然键相同) 会被更新而不是重复插入。
+文件格式和外键写法见 rush_car_rental/utils/data_loader.py。
+"""
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from rush_car_rental.utils.data_loader import DEFAULT_CHUNK_SIZE, FixtureError, load_files
+
+
+class Command(BaseCommand):
+    help = '批量加载 YAML / JSON / CSV 数据文件 (可重复执行)，输出每个模型的行数和速度'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='数据文件或目录')
+        parser.add_argument('--database', default='default', help='写入哪个数据库 (默认 default)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='每批写入的行数')
+        parser.add_argument('--json', action='store_true', help='以JSON格式输出')
+
+    def handle(self, *args, **options):
+        if options['database'] not in connections.settings:
+            raise CommandError(f"数据库配置不存在: {options['database']}")
+        start = time.perf_counter()
+        try:
+            stats = load_files(options['paths'], using=options['database'], chunk_size=options['chunk_size'])
+        except FixtureError as e:
+            raise CommandError(str(e))
+        seconds = time.perf_counter() - start
+        rows = sum(s['rows'] for s in stats)
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'models': stats,
+                'rows': rows,
+                'seconds': round(seconds, 3),
+                'rows_per_second': round(rows / seconds) if seconds else 0,
+            }, indent=2))
+            return
+        self.stdout.write(f"{'模型':<28}{'行数':>10}{'新增':>10}{'更新':>10}{'耗时(s)':>10}{'行/秒':>10}")
+        for s in stats:
+            self.stdout.write(
+                f"{s['model']:<28}{s['rows']:>10}{s['created']:>10}{s['updated']:>10}"
+                f"{s['seconds']:>10}{s['rows_per_second']:>10}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"共加载 {rows} 行，耗时 {seconds:.2f} 秒 ({round(rows / seconds) if seconds else 0} 行/秒)"
+        ))
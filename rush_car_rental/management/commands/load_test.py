@@ -0,0 +1,88 @@
+"""
+预订流程压力测试
+
+先用 generate_load_data 生成数据，以模拟支付 (不设置 STRIPE_SECRET_KEY) 启动本地服务器，然后:
+
+    python manage.py load_test --users 20 --iterations 10
+    python manage.py load_test --base-url http://127.0.0.1:8000 --users 50 --duration 60 --json
+    python manage.py load_test --users 20 --output reports/load_test.json --max-error-rate 0.01
+
+每个虚拟用户登录一次后反复走完整个预订向导 (car_list → create_booking → add_drivers →
+add_options → payment → process_payment)，输出吞吐量、每一步的 p50/p95/p99 延迟和错误率。
+压测用户、车型和门店从 --database 读取，必须与服务器使用同一个数据库。
+实现见 rush_car_rental/utils/load_harness.py。
+"""
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from rush_car_rental.utils.load_generator import LOADTEST_PASSWORD
+from rush_car_rental.utils.load_harness import LoadTest, load_targets
+
+
+class Command(BaseCommand):
+    help = '模拟多个用户同时走完预订流程，输出吞吐量、每一步的 p50/p95/p99 延迟和错误率'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='被测服务器的地址')
+        parser.add_argument('--users', type=int, default=10, help='并发的虚拟用户数')
+        parser.add_argument('--iterations', type=int, default=5, help='每个虚拟用户完成的预订次数')
+        parser.add_argument('--duration', type=float, help='压测时长 (秒)，指定时忽略 --iterations')
+        parser.add_argument('--think-time', type=float, default=0, help='两次预订之间的平均等待时间 (秒)')
+        parser.add_argument('--timeout', type=float, default=30, help='单个请求的超时时间 (秒)')
+        parser.add_argument('--prefix', default='LT', help='generate_load_data 使用的前缀')
+        parser.add_argument('--password', default=LOADTEST_PASSWORD, help='压测用户的密码')
+        parser.add_argument('--seed', type=int, default=0, help='随机数种子')
+        parser.add_argument('--database', default='default', help='读取压测用户、车型和门店的数据库')
+        parser.add_argument('--output', help='把JSON报告写入文件')
+        parser.add_argument('--max-error-rate', type=float, help='预订流程的错误率超过这个值时命令失败')
+        parser.add_argument('--json', action='store_true', help='以JSON格式输出')
+
+    def handle(self, *args, **options):
+        if options['database'] not in connections.settings:
+            raise CommandError(f"数据库配置不存在: {options['database']}")
+        if options['users'] < 1:
+            raise CommandError('--users 至少为 1')
+        try:
+            load_test = LoadTest(
+                options['base_url'], load_targets(options['prefix'], options['database']),
+                users=options['users'], iterations=options['iterations'], duration=options['duration'],
+                think_time=options['think_time'], timeout=options['timeout'],
+                password=options['password'], seed=options['seed'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        report = load_test.run()
+
+        if options['output']:
+            os.makedirs(os.path.dirname(os.path.abspath(options['output'])), exist_ok=True)
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.write_table(report)
+
+        if options['max_error_rate'] is not None and report['error_rate'] > options['max_error_rate']:
+            raise CommandError(f"错误率 {report['error_rate']:.2%} 超过了 {options['max_error_rate']:.2%}")
+
+    def write_table(self, report):
+        self.stdout.write(
+            f"{'步骤':<18}{'次数':>8}{'错误':>8}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'最大(ms)':>10}"
+        )
+        for step, s in report['steps'].items():
+            self.stdout.write(
+                f"{step:<18}{s['count']:>8}{s['errors']:>8}{s.get('p50_ms', '-'):>10}"
+                f"{s.get('p95_ms', '-'):>10}{s.get('p99_ms', '-'):>10}{s.get('max_ms', '-'):>10}"
+            )
+            for reason, count in s['errors_by_reason'].items():
+                self.stdout.write(self.style.WARNING(f"    {reason}: {count}"))
+        flows = report['flows']
+        style = self.style.SUCCESS if not flows['failed'] else self.style.WARNING
+        self.stdout.write(style(
+            f"{report['users']} 个用户，完成 {flows['completed']}/{flows['started']} 次预订 "
+            f"(错误率 {report['error_rate']:.2%})，耗时 {report['seconds']} 秒，"
+            f"{report['throughput_rps']} 请求/秒，{report['bookings_per_second']} 预订/秒"
+        ))
@@ -0,0 +1,69 @@
+"""
+SQL 查询统计报告
+
+两种用法:
+- 请求指定页面并统计每个视图的查询次数:
+    python manage.py query_report --path / --path /cars/ --repeat 3
+- 格式化从 /debug/queries/?download=1 下载的 JSON:
+    python manage.py query_report --input query_stats.json
+"""
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+from rush_car_rental.utils.query_profiler import format_report, get_config, query_stats
+
+DEFAULT_PATHS = ['/', '/subscription/', '/cars/']
+
+
+class Command(BaseCommand):
+    help = '统计各视图的SQL查询次数、耗时、重复查询和最慢语句'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', action='append', dest='paths', help='要请求的URL，可多次指定')
+        parser.add_argument('--repeat', type=int, default=1, help='每个URL请求的次数')
+        parser.add_argument('--user', help='以该用户身份请求 (用于需要登录的页面)')
+        parser.add_argument('--input', help='读取已保存的JSON统计，而不是发起请求')
+        parser.add_argument('--json', action='store_true', help='以JSON格式输出')
+        parser.add_argument('--output', help='输出文件路径，不指定则输出到控制台')
+
+    def handle(self, *args, **options):
+        if options['input']:
+            with open(options['input'], encoding='utf-8') as f:
+                report = json.load(f)
+        else:
+            report = self.profile(options['paths'] or DEFAULT_PATHS, options['repeat'], options['user'])
+
+        if options['json']:
+            content = json.dumps(report, indent=2, ensure_ascii=False)
+        else:
+            content = format_report(report) or '没有统计数据'
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(content)
+            self.stdout.write(self.style.SUCCESS(f"报告已写入 {options['output']}"))
+        else:
+            self.stdout.write(content)
+
+    def profile(self, paths, repeat, username):
+        client = Client(raise_request_exception=False)
+        if username:
+            user = get_user_model().objects.filter(username=username).first()
+            if user is None:
+                raise CommandError(f"用户不存在: {username}")
+            client.force_login(user)
+
+        # 统计只在本进程内有效，这里强制开启并只记录不抛异常
+        config = {**get_config(), 'ENABLED': True, 'RAISE': False}
+        query_stats.reset()
+        with override_settings(QUERY_PROFILER=config, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for path in paths:
+                for _ in range(repeat):
+                    response = client.get(path)
+                    self.stderr.write(f"GET {path} -> {response.status_code}")
+        return query_stats.report()
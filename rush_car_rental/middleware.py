@@ -0,0 +1,89 @@
+"""
+Rush Car Rental 中间件
+"""
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from rush_car_rental import db_router
+from rush_car_rental.utils.query_profiler import QueryRecorder, check_budget, get_config, query_stats
+
+
+class QueryCountMiddleware:
+    """
+    统计每个请求的 SQL 查询，并检查视图的查询预算
+
+    settings.QUERY_PROFILER['ENABLED'] 为 False 时不加载。
+    统计按 URL 名称 (如 car_list) 汇总，未命名的 URL 使用路由模式。
+    """
+
+    def __init__(self, get_response):
+        if not get_config()['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        view_name = self.view_name(request)
+        if view_name is not None:
+            over_budget = False
+            try:
+                over_budget = check_budget(view_name, recorder)
+            finally:
+                query_stats.record(view_name, recorder, over_budget)
+        return response
+
+    @staticmethod
+    def view_name(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return None
+        return match.view_name or match.route
+
+
+class ReplicaStickinessMiddleware:
+    """
+    只读副本的读己之写
+
+    带有 cookie 的请求全部使用主库; 请求中写入了数据时设置 cookie，
+    有效期为 settings.DATABASE_REPLICAS['STICKY_SECONDS']。同时支持同步和异步视图。
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with self.routing(request) as state:
+            response = self.get_response(request)
+        return self.process_response(response, state)
+
+    async def __acall__(self, request):
+        with self.routing(request) as state:
+            response = await self.get_response(request)
+        return self.process_response(response, state)
+
+    @staticmethod
+    def routing(request):
+        return db_router.routing(pinned=db_router.get_config()['COOKIE_NAME'] in request.COOKIES)
+
+    @staticmethod
+    def process_response(response, state):
+        if state.wrote and db_router.replica_aliases():
+            config = db_router.get_config()
+            response.set_cookie(
+                config['COOKIE_NAME'], '1', max_age=config['STICKY_SECONDS'], httponly=True, samesite='Lax',
+            )
+        return response
@@ -34,12 +34,15 @@ INSTALLED_APPS = [
     'bookings.apps.BookingsConfig',
     'locations.apps.LocationsConfig',
     'pages.apps.PagesConfig',
+    'ota.apps.OtaConfig',
     'rush_car_rental',  # 为了management命令
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'rush_car_rental.middleware.QueryCountMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'rush_car_rental.middleware.ReplicaStickinessMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -107,4 +110,108 @@ LOGIN_URL = '/accounts/login/'
 
 # Stripe支付设置
 STRIPE_PUBLIC_KEY = os.environ.get('VITE_STRIPE_PUBLIC_KEY')
-STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY')
\ No newline at end of file
+STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY')
+STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET')
+# Stripe 客户端和 webhook 处理 (bookings/payments.py)
+# 遗留的 webhook 事件: python manage.py process_stripe_events
+STRIPE_PAYMENTS = {
+    'TIMEOUT': 10,
+    'MAX_NETWORK_RETRIES': 2,
+    'PROCESS_IN_BACKGROUND': True,
+}
+
+# 预订草稿存储 (bookings/drafts.py)
+# 可选后端: LocMemDraftStore (单进程), CacheDraftStore, DatabaseDraftStore
+BOOKING_DRAFT_STORE = {
+    'BACKEND': os.environ.get('BOOKING_DRAFT_STORE_BACKEND', 'bookings.drafts.LocMemDraftStore'),
+    'OPTIONS': {
+        'timeout': int(os.environ.get('BOOKING_DRAFT_TIMEOUT', 60 * 60)),
+        'max_entries': int(os.environ.get('BOOKING_DRAFT_MAX_ENTRIES', 10000)),
+    },
+}
+
+# 只读副本 (rush_car_rental/db_router.py): 在 DATABASES 中配置副本并把别名加入 ALIASES，
+# 目录类查询 (车型、门店、订阅、评价) 从副本读取，写入后的短时间内该用户使用主库
+DATABASE_ROUTERS = ['rush_car_rental.db_router.ReplicaRouter']
+DATABASE_REPLICAS = {
+    'ALIASES': [],
+    'MAX_LAG_SECONDS': int(os.environ.get('DB_REPLICA_MAX_LAG', 5)),
+    'HEALTH_CHECK_INTERVAL': 10,
+    'STICKY_SECONDS': int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 15)),
+}
+
+# SQL 查询统计和每个视图的查询预算 (rush_car_rental/utils/query_profiler.py)
+# 统计结果: /debug/queries/ (仅员工) 或 python manage.py query_report
+QUERY_PROFILER = {
+    'ENABLED': os.environ.get('QUERY_PROFILER_ENABLED', 'False') == 'True',
+    'WINDOW': 200,
+    'SLOWEST': 5,
+    'DEFAULT_BUDGET': None,
+    # 按 URL 名称设置，包含会话和用户查询
+    'BUDGETS': {
+        'home': 10,
+        'subscription': 15,
+        'car_list': 10,
+        'vehicle_detail': 10,
+        'user_bookings': 10,
+        'create_booking': 15,
+        'add_drivers': 15,
+        'add_options': 10,
+        'confirm_booking': 10,
+        'payment': 10,
+        'process_payment': 20,
+        'stripe_success': 20,
+    },
+    'RAISE': False,
+}
+
+# 静态内容页面和 base.html 片段缓存 (pages/page_cache.py)
+# 修改模板或部署后: python manage.py purge_page_cache
+PAGE_CACHE = {
+    'ENABLED': True,
+    'TIMEOUT': 60 * 60,
+}
+
+# 上传图片的派生版本 (rush_car_rental/utils/image_derivatives.py)
+# 保存时自动生成，已有图片: python manage.py generate_image_derivatives
+IMAGE_DERIVATIVES = {
+    'WIDTHS': (320, 640, 960),
+    'FORMATS': ('avif', 'webp'),
+    'QUALITY': {'webp': 75, 'avif': 55},
+}
+
+# OTA 渠道库存和价格同步 (ota/services.py)
+# 定时执行: python manage.py ota_sync，本地联调可用 ota.testing.FakeChannelServer
+# 入站预订 (ota/inbound.py): POST /ota/reservations/<渠道>/，工作进程 python manage.py ota_reservations
+OTA_SYNC = {
+    'ENABLED': os.environ.get('OTA_SYNC_ENABLED', 'False') == 'True',
+    'HORIZON_DAYS': 90,
+    'CHANGE_SETTLE_SECONDS': 300,
+    'INBOUND': {
+        'MAX_QUEUE_DEPTH': 1000,
+        'RETRY_AFTER': 30,
+        'BATCH_SIZE': 100,
+    },
+    'CHANNELS': {
+        'ctrip': {
+            'ADAPTER': 'ota.channels.CtripChannel',
+            'ENDPOINT': os.environ.get('CTRIP_API_ENDPOINT', ''),
+            'API_KEY': os.environ.get('CTRIP_API_KEY', ''),
+            'INBOUND_API_KEY': os.environ.get('CTRIP_INBOUND_API_KEY', ''),
+            'PARTNER_ID': os.environ.get('CTRIP_PARTNER_ID', ''),
+        },
+        'booking_com': {
+            'ADAPTER': 'ota.channels.BookingComChannel',
+            'ENDPOINT': os.environ.get('BOOKING_COM_API_ENDPOINT', ''),
+            'API_KEY': os.environ.get('BOOKING_COM_API_KEY', ''),
+            'INBOUND_API_KEY': os.environ.get('BOOKING_COM_INBOUND_API_KEY', ''),
+            'PARTNER_ID': os.environ.get('BOOKING_COM_PROPERTY_ID', ''),
+        },
+        'expedia': {
+            'ADAPTER': 'ota.channels.ExpediaChannel',
+            'ENDPOINT': os.environ.get('EXPEDIA_API_ENDPOINT', ''),
+            'API_KEY': os.environ.get('EXPEDIA_API_KEY', ''),
+            'INBOUND_API_KEY': os.environ.get('EXPEDIA_INBOUND_API_KEY', ''),
+        },
+    },
+}
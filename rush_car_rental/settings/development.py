@@ -2,6 +2,7 @@
 Rush Car Rental - 开发环境设置
 """
 from .base import *
+from rush_car_rental.utils.environment import apply_connection_settings
 
 # 调试模式开启
 DEBUG = True
@@ -19,8 +20,9 @@ CSRF_TRUSTED_ORIGINS = [
 CORS_ALLOW_ALL_ORIGINS = True
 
 # 开发环境数据库设置 - Azure Database for PostgreSQL Flexible Server
+# 持久连接/连接池通过 DB_CONN_MAX_AGE、DB_POOL_ENABLED 等环境变量配置
 DATABASES = {
-    'default': {
+    'default': apply_connection_settings({
         'ENGINE': 'django.db.backends.postgresql',
         'NAME': 'rush-website-and-management-system',  # 新的数据库名
         'USER': 'melbournerushcarrental',    # 用户名
@@ -30,7 +32,7 @@ DATABASES = {
         'OPTIONS': {
             'sslmode': 'require',
         },
-    }
+    })
 }
 
 # Azure Blob Storage Configuration - 直接硬编码配置
@@ -170,4 +172,10 @@ LOGGING = {
 # 确保日志目录存在
 import os
 if not os.path.exists(BASE_DIR / 'logs'):
-    os.makedirs(BASE_DIR / 'logs')
\ No newline at end of file
+    os.makedirs(BASE_DIR / 'logs')
+
+# 开发环境开启 SQL 查询统计
+QUERY_PROFILER['ENABLED'] = True
+
+# 开发环境修改模板后立即生效，不缓存整页 (片段缓存可用 purge_page_cache 清除)
+PAGE_CACHE['ENABLED'] = False
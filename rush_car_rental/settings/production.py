@@ -2,7 +2,7 @@
 Rush Car Rental - 生产环境设置
 """
 from .base import *
-from rush_car_rental.utils.environment import get_database_config
+from rush_car_rental.utils.environment import get_database_config, get_replica_database_configs
 import os
 
 # 调试模式关闭
@@ -52,6 +52,37 @@ DATABASES = {
     'default': get_database_config()
 }
 
+# 只读副本 - DATABASE_REPLICA_URLS 为逗号分隔的 postgres:// 地址
+DATABASES.update(get_replica_database_configs())
+DATABASE_REPLICAS['ALIASES'] = [alias for alias in DATABASES if alias != 'default']
+
+# 预订草稿存储 - 多个gunicorn worker之间需要共享，默认使用数据库后端
+BOOKING_DRAFT_STORE['BACKEND'] = os.environ.get(
+    'BOOKING_DRAFT_STORE_BACKEND', 'bookings.drafts.DatabaseDraftStore'
+)
+
+# 缓存 - 页面缓存、模板片段缓存和各进程内索引的版本号必须在所有 worker 之间共享，
+# 否则 purge_page_cache 和保存数据后的失效只对当前进程生效，其他 worker 直到过期前都返回旧内容。
+# 配置了 REDIS_URL 时使用 Redis，否则使用数据库缓存表 (部署时执行 python manage.py createcachetable)
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
+
 # Azure存储设置
 if os.environ.get('AZURE_STORAGE_CONNECTION_STRING'):
     # 启用Azure Blob Storage作为静态文件存储
@@ -12,7 +12,12 @@ ALLOWED_HOSTS = ['*']
 
 # 测试环境数据库设置 - 使用PostgreSQL或SQLite
 DATABASES = {
-    'default': get_database_config()
+    'default': get_database_config(),
+    # 只读副本路由的测试使用第二个数据库 (DATABASE_REPLICAS['ALIASES'] 默认为空，不影响其他测试)
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+    },
 }
 
 # 测试环境使用控制台邮件后端
@@ -75,4 +80,8 @@ if not os.path.exists(BASE_DIR / 'logs'):
 
 # 测试媒体文件设置
 MEDIA_ROOT = BASE_DIR / 'test_media'
-MEDIA_URL = '/media/'
\ No newline at end of file
+MEDIA_URL = '/media/'
+
+# 测试环境开启 SQL 查询统计，超出视图查询预算时测试失败
+QUERY_PROFILER['ENABLED'] = True
+QUERY_PROFILER['RAISE'] = True
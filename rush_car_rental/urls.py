@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.urls import path, include
+from . import views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -8,4 +9,6 @@ urlpatterns = [
     path('cars/', include('cars.urls')),
     path('bookings/', include('bookings.urls')),
     path('locations/', include('locations.urls')),
+    path('ota/', include('ota.urls')),
+    path('debug/queries/', views.query_stats_view, name='query_stats'),
 ]
@@ -1,9 +1,25 @@
-from django.db import connection
+from collections import Counter
+import threading
+
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
 import logging
 
 # 创建日志记录器
 logger = logging.getLogger(__name__)
 
+# 每个数据库别名建立 (使用连接池时为取出) 连接的次数
+_connects = Counter()
+_connects_lock = threading.Lock()
+
+
+def _count_connection(sender, connection, **kwargs):
+    with _connects_lock:
+        _connects[connection.alias] += 1
+
+
+connection_created.connect(_count_connection, dispatch_uid='cosmos_db_count_connection')
+
 class CosmosDBManager:
     """
     Azure Cosmos DB (PostgreSQL接口) 管理器
@@ -89,4 +105,46 @@ class CosmosDBManager:
             return info
         except Exception as e:
             logger.error("[DB_INFO] 获取数据库信息失败: %s", str(e), exc_info=True)
-            return {"error": str(e)}
\ No newline at end of file
+            return {"error": str(e)}
+
+    @staticmethod
+    def get_pool_stats(alias=None):
+        """
+        获取数据库连接管理统计
+
+        参数:
+            alias: 数据库别名，为 None 时返回所有数据库
+
+        返回:
+            dict: 每个数据库别名的连接模式 (pool / persistent / per_request)、配置、
+                  当前线程是否持有连接和累计建立连接次数; 使用连接池时包含 psycopg_pool 的统计
+        """
+        stats = {}
+        for name in [alias] if alias else list(connections):
+            conn = connections[name]
+            settings_dict = conn.settings_dict
+            pool_options = settings_dict.get('OPTIONS', {}).get('pool')
+            conn_max_age = settings_dict.get('CONN_MAX_AGE', 0)
+            if pool_options:
+                mode = 'pool'
+            elif conn_max_age != 0:
+                mode = 'persistent'
+            else:
+                mode = 'per_request'
+            info = {
+                'vendor': conn.vendor,
+                'mode': mode,
+                'conn_max_age': conn_max_age,
+                'health_checks': settings_dict.get('CONN_HEALTH_CHECKS', False),
+                'connected': conn.connection is not None,
+                'connects': _connects[name],
+            }
+            if pool_options:
+                try:
+                    info['pool'] = conn.pool.get_stats()
+                except Exception as e:
+                    logger.warning("[DB_POOL] 无法获取连接池统计: %s", str(e))
+                    info['pool'] = {'error': str(e)}
+            stats[name] = info
+            logger.debug("[DB_POOL] %s: %s", name, info)
+        return stats
@@ -0,0 +1,451 @@
+"""
+批量数据加载
+
+读取 YAML / JSON / CSV 数据文件，按外键依赖顺序分批写入，可以重复执行 (已存在的行会被更新)。
+由 load_data 命令调用，用于初始数据 (rush_car_rental/fixtures/seed.json)、
+dumpdata 导出的备份 (database_backup.json) 和压力测试用的大批量数据。
+
+支持的文件格式:
+
+- dumpdata 格式: [{"model": "locations.state", "pk": 1, "fields": {...}}, ...]
+- 按模型分组: {"locations.state": [{"code": "VIC", "name": "Victoria"}, ...], ...}
+- CSV: 文件名是模型标签 (如 cars.car.csv)，第一行是字段名，空值视为未填写
+
+外键的值可以是主键 (整数，或者 state_id 这样的 *_id 列) 或自然键 (字符串，多列时为列表)，
+例如 state: VIC、model: [Toyota, Corolla]。自然键的列在 NATURAL_KEYS 中配置，
+每个模型第一次用到时用一次查询把 {自然键: 主键} 全部读入内存，之后不再逐行查询。
+
+写入:
+- 有主键或自然键已存在的行用 bulk_create(update_conflicts=True) 按主键更新，其余的行批量插入
+- 所有模型在一个事务中写入，出错时全部回滚
+- bulk_create 不发送 post_save 信号，提交后按 INVALIDATORS 刷新目录、库存、可用性等缓存
+"""
+import csv
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+
+try:
+    import yaml
+except ImportError:  # PyYAML 是可选依赖，只在读取 YAML 文件时需要
+    yaml = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 2000
+FIXTURE_EXTENSIONS = ('.json', '.yaml', '.yml', '.csv')
+
+# 自然键: 用于在数据文件中引用其他对象，以及判断一行数据是否已经存在
+NATURAL_KEYS = {
+    'auth.user': ['username'],
+    'auth.group': ['name'],
+    'accounts.profile': ['user'],
+    'locations.state': ['code'],
+    'locations.location': ['name'],
+    'locations.cityhighlight': ['city', 'state'],
+    'cars.vehicletype': ['name'],
+    'cars.vehiclecategorytype': ['category_type'],
+    'cars.vehiclecategory': ['vehicle_category'],
+    'cars.vehiclefeature': ['vehicle_category', 'feature'],
+    'cars.carcategory': ['name'],
+    'cars.vehiclefuel': ['fuel_type'],
+    'cars.vehiclemake': ['name'],
+    'cars.vehiclemodel': ['make', 'model_name'],
+    'cars.country': ['name'],
+    'cars.stateprovince': ['country', 'code'],
+    'cars.city': ['state', 'name'],
+    'cars.location': ['code'],
+    'cars.car': ['registration_no'],
+    'bookings.bookingoption': ['code'],
+    'bookings.booking': ['idempotency_key'],
+    'bookings.driver': ['booking', 'email'],
+    'rushwebsite.carsubscription': ['car'],
+}
+
+# 写入这些模型后 (事务提交后) 调用的缓存刷新函数，代替 bulk_create 不会发送的 post_save 信号
+INVALIDATORS = {
+    'cars.vehiclecategory': ['cars.catalog.invalidate_catalog', 'bookings.pricing.rates_changed'],
+    'cars.vehiclecategorytype': ['cars.catalog.invalidate_catalog'],
+    'cars.vehiclefeature': ['cars.catalog.invalidate_catalog'],
+    'cars.vehicleimage': ['cars.catalog.invalidate_catalog'],
+    'cars.car': [
+        'cars.inventory.locations_changed', 'bookings.availability.bump_version', 'pages.subscription_search.bump_version',
+    ],
+    'cars.location': [
+        'cars.inventory.locations_changed', 'cars.branches.locations_changed', 'cars.autocomplete.bump_version',
+    ],
+    'cars.city': ['cars.branches.locations_changed', 'cars.autocomplete.bump_version'],
+    'cars.airport': ['cars.branches.locations_changed', 'cars.autocomplete.bump_version'],
+    'cars.stateprovince': ['bookings.pricing.rates_changed'],
+    'cars.country': ['bookings.pricing.rates_changed'],
+    'bookings.booking': ['bookings.availability.bump_version'],
+    'bookings.bookingoption': ['bookings.pricing.rates_changed'],
+    'rushwebsite.carsubscription': ['pages.subscription_search.bump_version'],
+    'locations.state': ['locations.highlights.invalidate'],
+    'locations.cityhighlight': ['locations.highlights.invalidate'],
+}
+
+
+class FixtureError(ValueError):
+    """数据文件格式错误或引用的对象不存在"""
+
+
+def fixture_paths(paths):
+    """展开目录，返回按文件名排序的数据文件列表"""
+    result = []
+    for path in paths:
+        if os.path.isdir(path):
+            result.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.endswith(FIXTURE_EXTENSIONS)
+            )
+        elif os.path.exists(path):
+            result.append(path)
+        else:
+            raise FixtureError(f"数据文件不存在: {path}")
+    return result
+
+
+def read_fixture(path):
+    """读取一个数据文件，返回 (模型标签, 主键, 字段) 列表"""
+    name, ext = os.path.splitext(os.path.basename(path))
+    if ext not in FIXTURE_EXTENSIONS:
+        raise FixtureError(f"不支持的文件格式: {path}")
+    if ext == '.csv':
+        with open(path, newline='', encoding='utf-8') as f:
+            return [
+                (name, None, {column: value if value != '' else None for column, value in row.items()})
+                for row in csv.DictReader(f)
+            ]
+    with open(path, encoding='utf-8') as f:
+        content = f.read()
+    if not content.strip():
+        return []
+    if ext == '.json':
+        data = json.loads(content)
+    else:
+        if yaml is None:
+            raise FixtureError('读取 YAML 文件需要安装 PyYAML')
+        data = yaml.safe_load(content)
+    return parse_records(data, path)
+
+
+def parse_records(data, source=''):
+    """把 dumpdata 格式或按模型分组的数据转换为 (模型标签, 主键, 字段) 列表"""
+    if isinstance(data, dict):
+        records = []
+        for label, rows in data.items():
+            for row in rows or []:
+                fields = dict(row)
+                records.append((label, fields.pop('pk', None), fields))
+        return records
+    if isinstance(data, list):
+        try:
+            return [(item['model'], item.get('pk'), item.get('fields', {})) for item in data]
+        except (KeyError, TypeError):
+            raise FixtureError(f"{source}: dumpdata 格式的每一项都需要 model 和 fields")
+    raise FixtureError(f"{source}: 无法识别的数据格式")
+
+
+def get_model(label):
+    try:
+        return apps.get_model(label)
+    except (LookupError, ValueError):
+        # app_label 不是已安装应用的模型 (例如 rushwebsite.carsubscription)
+        app_label, _, model_name = label.lower().partition('.')
+        model = apps.all_models.get(app_label, {}).get(model_name)
+        if model is None:
+            raise FixtureError(f"模型不存在: {label}")
+        return model
+
+
+def is_forward_field(field):
+    """模型自己声明的字段 (包括多对多)，不包括反向关系"""
+    return field.concrete or (field.many_to_many and not field.auto_created)
+
+
+def dependency_order(models):
+    """按外键依赖排序，被引用的模型在前 (存在循环时保持原来的顺序)"""
+    remaining = list(models)
+    ordered = []
+    while remaining:
+        for model in remaining:
+            depends = {
+                field.related_model for field in model._meta.get_fields()
+                if field.is_relation and is_forward_field(field) and field.related_model is not model
+            }
+            if not depends & set(remaining):
+                break
+        else:
+            model = remaining[0]
+        remaining.remove(model)
+        ordered.append(model)
+    return ordered
+
+
+@contextmanager
+def keep_timestamps(model, fields):
+    """数据文件中给出的 auto_now / auto_now_add 字段按原值写入 (与 loaddata 相同)"""
+    changed = [
+        (field, field.auto_now, field.auto_now_add) for field in model._meta.concrete_fields
+        if field.attname in fields and (getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False))
+    ]
+    for field, _, _ in changed:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in changed:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class DataLoader:
+    """
+    把记录按模型分批写入数据库，返回每个模型的行数和速度
+    """
+
+    def __init__(self, using='default', chunk_size=DEFAULT_CHUNK_SIZE):
+        self.using = using
+        self.chunk_size = chunk_size
+        self._keys = {}
+
+    # 自然键
+
+    def key_map(self, model):
+        """{自然键: 主键}，第一次使用时从数据库读取"""
+        if model not in self._keys:
+            fields = [model._meta.get_field(name) for name in NATURAL_KEYS[model._meta.label_lower]]
+            rows = model._base_manager.using(self.using).values_list(
+                *[field.attname for field in fields], 'pk'
+            )
+            self._keys[model] = {tuple(row[:-1]): row[-1] for row in rows.iterator(chunk_size=self.chunk_size)}
+        return self._keys[model]
+
+    def natural_key(self, model, parts):
+        label = model._meta.label_lower
+        if label not in NATURAL_KEYS:
+            raise FixtureError(f"{label} 没有配置自然键，只能用主键引用")
+        names = NATURAL_KEYS[label]
+        if len(parts) != len(names):
+            raise FixtureError(f"{label} 的自然键是 {names}，不能用 {parts!r} 引用")
+        key = []
+        for name, part in zip(names, parts):
+            field = model._meta.get_field(name)
+            key.append(self.resolve(field.related_model, part) if field.is_relation else self.to_python(field, part))
+        return tuple(key)
+
+    def record_key(self, model, obj):
+        """已构建对象的自然键，有任何一列为空时返回 None"""
+        key = tuple(
+            getattr(obj, model._meta.get_field(name).attname) for name in NATURAL_KEYS[model._meta.label_lower]
+        )
+        return None if any(part is None for part in key) else key
+
+    def resolve(self, model, value):
+        """外键的值 (主键或自然键) 转换为主键"""
+        if value is None:
+            return None
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        parts = list(value) if isinstance(value, (list, tuple)) else [value]
+        pk = self.key_map(model).get(self.natural_key(model, parts))
+        if pk is None:
+            raise FixtureError(f"找不到 {model._meta.label_lower}: {value!r}")
+        return pk
+
+    # 构建对象
+
+    def to_python(self, field, value):
+        try:
+            return field.to_python(value)
+        except ValidationError as e:
+            raise FixtureError(f"{field.model._meta.label_lower}.{field.name}: {value!r} 无效 ({'; '.join(e.messages)})")
+
+    def build(self, model, pk, fields):
+        """返回 (对象, {多对多字段: 主键列表}, 给出的列)"""
+        values = {}
+        many_to_many = {}
+        for name, value in fields.items():
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                raise FixtureError(f"{model._meta.label_lower} 没有字段 {name}")
+            if not is_forward_field(field):
+                raise FixtureError(f"{model._meta.label_lower}.{name} 是反向关系，不能在这里赋值")
+            if field.many_to_many:
+                # CSV 中多个值用 | 分隔
+                if isinstance(value, str):
+                    value = [part.strip() for part in value.split('|') if part.strip()]
+                many_to_many[field] = [self.resolve(field.related_model, item) for item in value or []]
+            elif value is None and not field.null:
+                # 未填写的必填字段使用模型的默认值
+                continue
+            elif field.is_relation:
+                if name == field.attname:
+                    values[field.attname] = self.to_python(field.target_field, value)
+                else:
+                    values[field.attname] = self.resolve(field.related_model, value)
+            else:
+                values[field.attname] = self.to_python(field, value)
+        if pk is not None:
+            values[model._meta.pk.attname] = self.to_python(model._meta.pk, pk)
+        return model(**values), many_to_many, set(values)
+
+    # 写入
+
+    def load(self, records):
+        """写入所有记录，返回每个模型的统计"""
+        grouped = defaultdict(list)
+        for label, pk, fields in records:
+            grouped[get_model(label)].append((pk, fields))
+
+        stats = []
+        explicit_pk_models = []
+        with transaction.atomic(using=self.using):
+            for model in dependency_order(grouped):
+                result = self.load_model(model, grouped[model])
+                stats.append(result)
+                if result['explicit_pk']:
+                    explicit_pk_models.append(model)
+            self.reset_sequences(explicit_pk_models)
+            for path in dict.fromkeys(
+                    path for model in grouped for path in INVALIDATORS.get(model._meta.label_lower, [])):
+                transaction.on_commit(import_string(path), using=self.using)
+        return stats
+
+    def load_model(self, model, rows):
+        label = model._meta.label_lower
+        start = time.perf_counter()
+        has_key = label in NATURAL_KEYS
+        keys = self.key_map(model) if has_key else {}
+
+        objs = []
+        positions = {}
+        many_to_many = []
+        provided = []
+        explicit = set()
+        for pk, fields in rows:
+            obj, m2m, columns = self.build(model, pk, fields)
+            if pk is not None:
+                explicit.add(obj.pk)
+            key = self.record_key(model, obj) if has_key else None
+            if obj.pk is None and key is not None:
+                obj.pk = keys.get(key)
+            # 同一个自然键出现多次时后面的行覆盖前面的行
+            if key is not None and key in positions:
+                objs[positions[key]] = obj
+                many_to_many[positions[key]] = m2m
+                provided[positions[key]] = columns
+                continue
+            if key is not None:
+                positions[key] = len(objs)
+            objs.append(obj)
+            many_to_many.append(m2m)
+            provided.append(columns)
+
+        existing = [obj for obj in objs if obj.pk is not None]
+        new = [obj for obj in objs if obj.pk is None]
+        updated = self.count_existing(model, existing, explicit)
+        # JSON/YAML 数据文件的各行可以给出不同的列，按给出的列分组写入，每组只更新本组给出的列
+        groups = defaultdict(list)
+        for obj, columns in zip(objs, provided):
+            groups[frozenset(columns)].append(obj)
+        for columns, group in groups.items():
+            with keep_timestamps(model, columns):
+                self.upsert(model, [obj for obj in group if obj.pk is not None], columns)
+                model._base_manager.using(self.using).bulk_create(
+                    [obj for obj in group if obj.pk is None], batch_size=self.chunk_size)
+        self.write_many_to_many(objs, many_to_many)
+
+        if has_key:
+            if any(obj.pk is None for obj in new):
+                # 数据库不能返回新行的主键时重新读取
+                self._keys.pop(model, None)
+            else:
+                for obj in objs:
+                    key = self.record_key(model, obj)
+                    if key is not None:
+                        keys[key] = obj.pk
+
+        seconds = time.perf_counter() - start
+        result = {
+            'model': label,
+            'rows': len(objs),
+            'created': len(objs) - updated,
+            'updated': updated,
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(len(objs) / seconds) if seconds else 0,
+            'explicit_pk': bool(explicit),
+        }
+        logger.info("加载 %(model)s: %(rows)d 行 (新增 %(created)d, 更新 %(updated)d), %(rows_per_second)d 行/秒", result)
+        return result
+
+    def count_existing(self, model, objs, explicit):
+        """已存在的行数: 自然键匹配到的行，以及数据库中已有的显式主键"""
+        explicit_pks = [obj.pk for obj in objs if obj.pk in explicit]
+        found = 0
+        for i in range(0, len(explicit_pks), self.chunk_size):
+            found += model._base_manager.using(self.using).filter(
+                pk__in=explicit_pks[i:i + self.chunk_size]).count()
+        return found + sum(1 for obj in objs if obj.pk not in explicit)
+
+    def upsert(self, model, objs, provided):
+        """
+        写入已存在的行: 只更新数据文件中给出的列和 auto_now 字段
+
+        只包含部分列的数据文件 (例如只更新电话的 CSV) 不会把其他列覆盖为模型默认值。
+        """
+        if not objs:
+            return
+        pk = model._meta.pk
+        update_fields = [
+            field.name for field in model._meta.local_concrete_fields
+            if field is not pk and (field.attname in provided or getattr(field, 'auto_now', False))
+        ]
+        manager = model._base_manager.using(self.using)
+        if update_fields:
+            manager.bulk_create(
+                objs, batch_size=self.chunk_size,
+                update_conflicts=True, unique_fields=[pk.name], update_fields=update_fields,
+            )
+        else:
+            manager.bulk_create(objs, batch_size=self.chunk_size, ignore_conflicts=True)
+
+    def write_many_to_many(self, objs, many_to_many):
+        rows = defaultdict(list)
+        for obj, values in zip(objs, many_to_many):
+            for field, pks in values.items():
+                through = field.remote_field.through
+                source = through._meta.get_field(field.m2m_field_name()).attname
+                target = through._meta.get_field(field.m2m_reverse_field_name()).attname
+                rows[through].extend(through(**{source: obj.pk, target: pk}) for pk in pks)
+        for through, through_objs in rows.items():
+            through._base_manager.using(self.using).bulk_create(
+                through_objs, batch_size=self.chunk_size, ignore_conflicts=True)
+
+    def reset_sequences(self, models):
+        """插入了显式主键后重置 PostgreSQL 的序列 (与 loaddata 相同)"""
+        if not models:
+            return
+        connection = connections[self.using]
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def load_files(paths, using='default', chunk_size=DEFAULT_CHUNK_SIZE):
+    """读取并加载数据文件 (或目录中的所有数据文件)，返回每个模型的统计"""
+    records = []
+    for path in fixture_paths(paths):
+        records.extend(read_fixture(path))
+    return DataLoader(using, chunk_size).load(records)
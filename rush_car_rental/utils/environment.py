@@ -67,13 +67,101 @@ def should_use_postgres() -> bool:
         logger.info("[DB_CONFIG] 开发环境根据配置使用SQLite数据库")
     return result
 
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.lower() in ('true', 'yes', '1', 't', 'y')
+
+def is_asgi() -> bool:
+    """
+    是否在 ASGI 服务器 (uvicorn 等) 中运行，由 rush_car_rental/asgi.py 设置 DJANGO_SERVER_INTERFACE=asgi
+    """
+    return os.environ.get('DJANGO_SERVER_INTERFACE', '').lower() == 'asgi'
+
+def get_connection_options() -> dict:
+    """
+    读取数据库连接管理的环境变量
+
+    - DB_CONN_MAX_AGE: 持久连接的最长保留秒数，0 表示每个请求结束后关闭连接
+      (默认 600; ASGI 下默认 0，异步视图的数据库查询在线程池中执行，持久连接会随线程泄漏)
+    - DB_CONN_HEALTH_CHECKS: 复用持久连接前先检查连接是否可用 (默认开启)
+    - DB_POOL_ENABLED: 使用 psycopg 连接池代替持久连接 (默认关闭，需要 psycopg[pool] >= 3)
+    - DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE: 连接池的最小 / 最大连接数 (默认 2 / 10)
+    - DB_POOL_TIMEOUT: 从连接池获取连接的等待秒数，超时抛出异常 (默认 10)
+    - DB_POOL_MAX_IDLE: 空闲连接的保留秒数，超过后关闭多余的连接 (默认 300)
+    - DB_CONNECT_TIMEOUT: 建立新连接的超时秒数 (默认 10)
+    """
+    return {
+        'conn_max_age': int(os.environ.get('DB_CONN_MAX_AGE', 0 if is_asgi() else 600)),
+        'health_checks': _env_bool('DB_CONN_HEALTH_CHECKS', True),
+        'pool': _env_bool('DB_POOL_ENABLED', False),
+        'pool_min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+        'pool_max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        'pool_max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+        'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 10)),
+    }
+
+def psycopg_pool_available() -> bool:
+    """
+    是否可以使用Django内置的连接池 (需要 psycopg 3 和 psycopg_pool)
+    """
+    try:
+        import psycopg  # noqa: F401
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def apply_connection_settings(db_config: dict, options: dict = None) -> dict:
+    """
+    为PostgreSQL配置添加连接管理设置，SQLite配置原样返回
+
+    启用连接池且安装了 psycopg_pool 时使用连接池 (CONN_MAX_AGE 必须为 0)，
+    否则使用带健康检查的持久连接，避免每个请求都重新建立到 Azure 的 TLS 连接。
+    """
+    if 'postgresql' not in db_config.get('ENGINE', ''):
+        return db_config
+
+    options = options or get_connection_options()
+    config = dict(db_config)
+    db_options = dict(config.get('OPTIONS', {}))
+    db_options.setdefault('connect_timeout', options['connect_timeout'])
+
+    use_pool = options['pool'] and psycopg_pool_available()
+    if options['pool'] and not use_pool:
+        logger.warning("[DB_CONFIG] 已启用连接池但未安装 psycopg[pool] >= 3，改用持久连接")
+    if use_pool:
+        db_options['pool'] = {
+            'min_size': options['pool_min_size'],
+            'max_size': options['pool_max_size'],
+            'timeout': options['pool_timeout'],
+            'max_idle': options['pool_max_idle'],
+        }
+        config['CONN_MAX_AGE'] = 0
+        logger.info("[DB_CONFIG] 使用连接池: 最小=%s, 最大=%s, 获取超时=%ss",
+                    options['pool_min_size'], options['pool_max_size'], options['pool_timeout'])
+    else:
+        config['CONN_MAX_AGE'] = options['conn_max_age']
+        config['CONN_HEALTH_CHECKS'] = options['health_checks']
+        logger.info("[DB_CONFIG] 使用持久连接: 最长保留=%ss, 健康检查=%s",
+                    options['conn_max_age'], options['health_checks'])
+    config['OPTIONS'] = db_options
+    return config
+
 def get_database_config():
     """
     根据当前环境返回数据库配置:
     - 开发环境: 使用SQLite (除非USE_POSTGRES=True)
     - 测试环境: 使用SQLite
     - 生产环境: 使用Replit提供的PostgreSQL (通过DATABASE_URL)
+
+    PostgreSQL配置包含连接管理设置 (见 apply_connection_settings)
     """
+    return apply_connection_settings(_select_database_config())
+
+def _select_database_config():
     from pathlib import Path
     
     # 项目根目录
@@ -180,4 +268,33 @@ def get_database_config():
         'PASSWORD': os.environ.get('DEV_DB_PASSWORD', 'postgres'),
         'HOST': os.environ.get('DEV_DB_HOST', 'localhost'),
         'PORT': os.environ.get('DEV_DB_PORT', '5432'),
-    }
\ No newline at end of file
+    }
+
+def get_replica_database_configs() -> dict:
+    """
+    根据 DATABASE_REPLICA_URLS (逗号分隔的 postgres:// 地址) 返回只读副本配置
+
+    返回:
+        {'replica1': {...}, 'replica2': {...}}，测试时副本镜像主库
+    """
+    import re
+    pattern = r'postgres://(.*?):(.*?)@(.*?):(\d+)/(.*)'
+    replicas = {}
+    urls = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    for number, db_url in enumerate(urls, start=1):
+        match = re.match(pattern, db_url)
+        if not match:
+            logger.warning("[DB_CONFIG] 无法解析只读副本地址 #%s，已忽略", number)
+            continue
+        username, password, host, port, db_name = match.groups()
+        logger.info("[DB_CONFIG] 只读副本 replica%s: 主机=%s, 端口=%s, 数据库=%s", number, host, port, db_name)
+        replicas[f'replica{number}'] = apply_connection_settings({
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': db_name,
+            'USER': username,
+            'PASSWORD': password,
+            'HOST': host,
+            'PORT': port,
+            'TEST': {'MIRROR': 'default'},
+        })
+    return replicas
@@ -0,0 +1,236 @@
+"""
+图片派生版本 (缩略图 / srcset)
+
+上传的车辆图片按原始尺寸保存，列表页每张卡片都会下载原图。这里为每张图片生成
+若干宽度的 WebP / AVIF 版本，通过当前配置的存储 (本地或 Azure) 保存在原图旁边:
+
+    car_subscription_images/corolla.jpg
+    car_subscription_images/derivatives/corolla-320w.webp
+    car_subscription_images/derivatives/corolla-320w.avif
+    ...
+    car_subscription_images/derivatives/corolla.json
+
+文件名和 srcset 中的宽度是派生图片的实际像素宽度 (原图比配置宽度窄时不放大，使用原图宽度)。
+生成时把已生成的版本列表写入同目录的清单文件 (corolla.json) 并缓存在 Django 缓存中，
+渲染时最多读取一次清单，不需要逐个检查派生文件是否存在，也不需要额外的数据库字段。
+图片保存时由信号生成派生版本，已有图片可以用 generate_image_derivatives 命令批量生成。
+
+配置 (settings.IMAGE_DERIVATIVES):
+
+    IMAGE_DERIVATIVES = {
+        'WIDTHS': (320, 640, 960),
+        'FORMATS': ('avif', 'webp'),   # 按优先顺序，Pillow 不支持的格式会被跳过
+        'QUALITY': {'webp': 75, 'avif': 55},
+    }
+"""
+import io
+import json
+import logging
+import os
+import posixpath
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'WIDTHS': (320, 640, 960),
+    'FORMATS': ('avif', 'webp'),
+    'QUALITY': {'webp': 75, 'avif': 55},
+    'CACHE_TIMEOUT': 24 * 60 * 60,
+}
+
+DERIVATIVES_DIR = 'derivatives'
+CACHE_KEY = 'image_derivatives:{name}'
+
+MIME_TYPES = {'webp': 'image/webp', 'avif': 'image/avif'}
+PIL_FORMATS = {'webp': 'WEBP', 'avif': 'AVIF'}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'IMAGE_DERIVATIVES', {}))
+    return config
+
+
+def supported_formats():
+    """当前 Pillow 可以编码的派生格式，按优先顺序"""
+    return [fmt for fmt in get_config()['FORMATS'] if fmt in PIL_FORMATS and features.check(fmt)]
+
+
+def derivative_name(name, width, fmt):
+    """原图存储名称 -> 派生文件存储名称"""
+    directory, filename = posixpath.split(name)
+    stem = os.path.splitext(filename)[0]
+    return posixpath.join(directory, DERIVATIVES_DIR, f'{stem}-{width}w.{fmt}')
+
+
+def manifest_name(name):
+    """原图存储名称 -> 派生版本清单的存储名称"""
+    directory, filename = posixpath.split(name)
+    return posixpath.join(directory, DERIVATIVES_DIR, f'{os.path.splitext(filename)[0]}.json')
+
+
+def _cache_key(name):
+    return CACHE_KEY.format(name=name)
+
+
+def _encode(image, fmt, quality):
+    buffer = io.BytesIO()
+    image.save(buffer, PIL_FORMATS[fmt], quality=quality)
+    return buffer.getvalue()
+
+
+def _target_widths(original_width):
+    """
+    返回派生图片的实际像素宽度 (升序)
+
+    不放大图片: 比原图窄的宽度照常缩小，第一个不小于原图的宽度使用原图宽度。
+    """
+    targets = []
+    for width in sorted(get_config()['WIDTHS']):
+        targets.append(min(width, original_width))
+        if width >= original_width:
+            break
+    return targets
+
+
+def generate_derivatives(field_file, force=False):
+    """
+    为一个 ImageField 文件生成所有派生版本
+
+    已存在的派生文件默认跳过；force=True 时重新生成。返回 {格式: [(宽度, 存储名称), ...]}。
+    """
+    if not field_file:
+        return {}
+    config = get_config()
+    storage = field_file.storage
+
+    with field_file.open('rb') as f:
+        with Image.open(f) as source:
+            # 按 EXIF 方向旋转，并统一为 RGB/RGBA
+            image = ImageOps.exif_transpose(source)
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    derivatives = {}
+    for width in _target_widths(image.width):
+        resized = None
+        for fmt in supported_formats():
+            name = derivative_name(field_file.name, width, fmt)
+            if storage.exists(name):
+                if not force:
+                    derivatives.setdefault(fmt, []).append((width, name))
+                    continue
+                storage.delete(name)
+            if resized is None:
+                height = max(1, round(image.height * width / image.width))
+                resized = image.resize((width, height), Image.LANCZOS)
+            content = _encode(resized, fmt, config['QUALITY'].get(fmt, 75))
+            saved = storage.save(name, ContentFile(content))
+            derivatives.setdefault(fmt, []).append((width, saved))
+
+    # 记录已生成的版本，渲染时只需读取这一个文件
+    manifest = manifest_name(field_file.name)
+    if storage.exists(manifest):
+        storage.delete(manifest)
+    storage.save(manifest, ContentFile(json.dumps(derivatives).encode()))
+    cache.set(_cache_key(field_file.name), derivatives, config['CACHE_TIMEOUT'])
+    return derivatives
+
+
+def generate_derivatives_quietly(field_file):
+    """在信号中调用: 原图损坏或存储不可用时只记录日志，不影响保存"""
+    try:
+        return generate_derivatives(field_file)
+    except Exception:
+        logger.exception("生成图片派生版本失败: %s", getattr(field_file, 'name', field_file))
+        return {}
+
+
+def read_manifest(field_file):
+    """读取生成时记录的派生版本，没有清单 (未生成) 时返回 {}"""
+    storage = field_file.storage
+    name = manifest_name(field_file.name)
+    if not storage.exists(name):
+        return {}
+    try:
+        with storage.open(name) as f:
+            manifest = json.loads(f.read())
+    except ValueError:
+        logger.warning("派生版本清单无法解析: %s", name)
+        return {}
+    return {fmt: [(width, name) for width, name in versions] for fmt, versions in manifest.items()}
+
+
+def find_derivatives(field_file):
+    """
+    返回已生成的派生版本 {格式: [(宽度, 存储名称), ...]}
+
+    先查缓存；缓存未命中时读取生成时写入的清单，并写回缓存。
+    """
+    if not field_file:
+        return {}
+    key = _cache_key(field_file.name)
+    derivatives = cache.get(key)
+    if derivatives is None:
+        derivatives = read_manifest(field_file)
+        cache.set(key, derivatives, get_config()['CACHE_TIMEOUT'])
+    return derivatives
+
+
+class ResponsiveImage:
+    """
+    包装 ImageField 文件，提供模板使用的 srcset 和缩略图地址
+
+    其余属性 (url, name, width ...) 转发给原文件，可以替代原来的 FieldFile 使用。
+    """
+
+    def __init__(self, field_file):
+        self.file = field_file
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def __bool__(self):
+        return bool(self.file)
+
+    def __str__(self):
+        return str(self.file)
+
+    def __eq__(self, other):
+        if isinstance(other, ResponsiveImage):
+            other = other.file
+        return self.file == other
+
+    __hash__ = None
+
+    @property
+    def derivatives(self):
+        if not hasattr(self, '_derivatives'):
+            self._derivatives = find_derivatives(self.file)
+        return self._derivatives
+
+    @property
+    def sources(self):
+        """[{'type', 'srcset'}, ...]，按格式优先顺序，用于 <picture><source>"""
+        storage = self.file.storage
+        return [
+            {
+                'type': MIME_TYPES[fmt],
+                'srcset': ', '.join(f'{storage.url(name)} {width}w' for width, name in self.derivatives[fmt]),
+            }
+            for fmt in supported_formats()
+            if self.derivatives.get(fmt)
+        ]
+
+    @property
+    def thumbnail_url(self):
+        """最小的 WebP 版本 (兼容性最好)，没有派生版本时返回原图"""
+        for fmt in sorted(supported_formats(), key=lambda fmt: fmt != 'webp'):
+            versions = self.derivatives.get(fmt)
+            if versions:
+                return self.file.storage.url(versions[0][1])
+        return self.file.url
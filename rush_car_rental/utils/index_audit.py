@@ -0,0 +1,173 @@
+"""
+索引审计工具
+
+把视图和后台任务实际发出的高频查询 (QUERY_PATTERNS) 与数据库中现有的索引比较，
+找出缺少索引的查询，并用 EXPLAIN 的执行计划作为依据。由 audit_indexes 命令调用。
+
+推荐的索引在模型的 Meta.indexes 中声明 (VehicleCategory, Booking)。app_car 由外部系统维护
+(managed=False)，Django 的迁移不会为它创建索引，由 cars/migrations/0005_app_car_indexes.py
+在表存在时直接执行 SQL 创建。
+
+每个查询模式的状态:
+- covered: 存在以推荐列开头的索引
+- partial: 只有第一列有索引 (例如外键自动创建的索引)，其余条件需要逐行过滤
+- missing: 第一列没有索引
+- no_table: 数据库中没有这个表
+"""
+import datetime
+
+from django.db import connections
+
+
+class QueryPattern:
+    """一类高频查询: 来源、过滤条件对应的列 (推荐索引的列顺序) 和代表性的查询"""
+
+    def __init__(self, name, model, columns, index_name, source, queryset):
+        self.name = name
+        self.model = model
+        self.columns = columns
+        self.index_name = index_name
+        self.source = source
+        self._queryset = queryset
+
+    def get_model(self):
+        from django.apps import apps
+        return apps.get_model(self.model)
+
+    @property
+    def table(self):
+        return self.get_model()._meta.db_table
+
+    def queryset(self, using):
+        return self._queryset().using(using)
+
+
+def _category_region():
+    from cars.models import VehicleCategory
+    return VehicleCategory.objects.filter(region='melbourne', category_type_id=1)
+
+
+def _category_driver_age():
+    from cars.models import VehicleCategory
+    return VehicleCategory.objects.filter(age_youngest_driver__lte=21)
+
+
+def _cars_at_location():
+    from cars.models import Car
+    return Car.objects.filter(currently_located_id=1, category_id=1).values_list('id', flat=True)
+
+
+def _overlapping_bookings():
+    from bookings.confirmation import overlapping_bookings
+    today = datetime.date.today()
+    return overlapping_bookings(1, today, today + datetime.timedelta(days=3))
+
+
+def _booking_history():
+    from django.contrib.auth import get_user_model
+    from bookings.history import BookingHistory
+    return BookingHistory(get_user_model()(pk=1), {}).queryset()[:20]
+
+
+QUERY_PATTERNS = [
+    QueryPattern(
+        'category_region', 'cars.VehicleCategory', ['region', 'category_type_id'], 'app_vcat_region_type_idx',
+        '车型列表按地区和车型类别筛选 (cars.catalog; 外部系统的车型查询)', _category_region,
+    ),
+    QueryPattern(
+        'category_driver_age', 'cars.VehicleCategory', ['age_youngest_driver'], 'app_vcat_youngest_driver_idx',
+        '车型列表按驾驶员年龄筛选 (cars.catalog)', _category_driver_age,
+    ),
+    QueryPattern(
+        'cars_at_location', 'cars.Car', ['currently_located_id', 'category_id'], 'app_car_located_category_idx',
+        '门店的车辆和类别 (cars.inventory, bookings.availability, ota)', _cars_at_location,
+    ),
+    QueryPattern(
+        'booking_overlap', 'bookings.Booking', ['car_id', 'pickup_date', 'return_date'], 'booking_car_dates_idx',
+        '确认预订时检查同一车辆的重叠预订 (bookings.confirmation.overlapping_bookings)', _overlapping_bookings,
+    ),
+    QueryPattern(
+        'booking_history', 'bookings.Booking', ['user_id', 'booking_date'], 'booking_user_history_idx',
+        '用户预订历史分页 (bookings.history)', _booking_history,
+    ),
+]
+
+
+def table_indexes(connection, table):
+    """返回表上所有索引 (包括主键和唯一约束) 的 {名称: 列列表}"""
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return {
+        name: info['columns']
+        for name, info in constraints.items()
+        if info['columns'] and (info['index'] or info['primary_key'] or info['unique'])
+    }
+
+
+def coverage(columns, indexes):
+    """返回 (状态, 覆盖该查询的索引名)"""
+    partial = None
+    for name, index_columns in sorted(indexes.items()):
+        if index_columns[:len(columns)] == columns:
+            return 'covered', name
+        if partial is None and index_columns[0] == columns[0]:
+            partial = name
+    return ('partial', partial) if partial else ('missing', None)
+
+
+def explain(queryset):
+    """返回执行计划，数据库不支持或查询失败时返回错误信息"""
+    try:
+        return queryset.explain()
+    except Exception as e:
+        return f"EXPLAIN 失败: {e}"
+
+
+def plan_uses_index(plan, index_name):
+    """执行计划中是否用到了该索引 (SQLite 的 USING INDEX / PostgreSQL 的 Index Scan 都会写出索引名)"""
+    return bool(index_name) and index_name in plan
+
+
+def create_index_sql(connection, pattern):
+    """推荐索引的 CREATE INDEX 语句，PostgreSQL 上使用 CONCURRENTLY 避免锁表"""
+    quote = connection.ops.quote_name
+    concurrently = 'CONCURRENTLY ' if connection.vendor == 'postgresql' else ''
+    columns = ', '.join(quote(column) for column in pattern.columns)
+    return (
+        f"CREATE INDEX {concurrently}IF NOT EXISTS {quote(pattern.index_name)} "
+        f"ON {quote(pattern.table)} ({columns});"
+    )
+
+
+def audit(using='default', patterns=None, with_explain=True):
+    """
+    检查每个查询模式是否有可用的索引
+
+    返回字典列表: name, table, columns, source, status, index, recommended, sql, plan, uses_index
+    """
+    connection = connections[using]
+    tables = set(connection.introspection.table_names())
+    results = []
+    for pattern in patterns or QUERY_PATTERNS:
+        result = {
+            'name': pattern.name,
+            'table': pattern.table,
+            'columns': pattern.columns,
+            'source': pattern.source,
+            'recommended': pattern.index_name,
+        }
+        if pattern.table not in tables:
+            result.update(status='no_table', index=None, sql='', plan='', uses_index=False)
+            results.append(result)
+            continue
+        status, index = coverage(pattern.columns, table_indexes(connection, pattern.table))
+        plan = explain(pattern.queryset(using)) if with_explain else ''
+        result.update(
+            status=status,
+            index=index,
+            sql='' if status == 'covered' else create_index_sql(connection, pattern),
+            plan=plan,
+            uses_index=plan_uses_index(plan, index),
+        )
+        results.append(result)
+    return results
@@ -0,0 +1,366 @@
+"""
+压力测试数据生成
+
+按参数生成大批量的模拟数据 (用户、门店、车型、车辆、预订、驾驶员和订阅)，
+交给 DataLoader (rush_car_rental/utils/data_loader.py) 批量写入。由 generate_load_data 命令调用，
+生成的数据供 load_test 命令 (rush_car_rental/utils/load_harness.py) 压测预订流程使用。
+
+数据分布尽量接近线上:
+- 门店按州的人口比例分布，车型类别以经济型和紧凑型为主
+- 车型和用户的热度服从长尾分布 (少数热门车型、回头客占大部分预订)
+- 每辆车的预订在时间线上依次排列，同一辆车的预订不会重叠；租期以 2-5 天为主
+- 过去的预订大多已完成，未来的预订大多已确认，少量取消
+
+同一个种子 (seed) 每次生成相同的数据。所有行都有自然键 (用户名、车牌、幂等键等)，
+重复执行时更新已有的行而不是重复插入。生成的数据会覆盖同名的国家和门店，只应在压测用的数据库中使用。
+"""
+import datetime
+import random
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from rush_car_rental.utils.data_loader import read_fixture
+
+SEED_FIXTURE = settings.BASE_DIR / 'rush_car_rental' / 'fixtures' / 'seed.json'
+
+DEFAULT_VOLUMES = {
+    'users': 200,
+    'locations': 30,
+    'categories': 60,
+    'cars': 1000,
+    'bookings': 10000,
+    'subscriptions': 100,
+}
+
+# 压测用户的密码 (load_test 用它登录)
+LOADTEST_PASSWORD = 'loadtest-password'
+
+COUNTRY = 'Australia'
+
+# (州代码, 州名, 主要城市, 门店权重, 车型目录中的地区, 邮编, 纬度, 经度)
+STATES = [
+    ('NSW', 'New South Wales', 'Sydney', 32, 'sydney', '2000', -33.8688, 151.2093),
+    ('VIC', 'Victoria', 'Melbourne', 26, 'melbourne', '3000', -37.8136, 144.9631),
+    ('QLD', 'Queensland', 'Brisbane', 20, 'brisbane', '4000', -27.4698, 153.0251),
+    ('WA', 'Western Australia', 'Perth', 10, 'perth', '6000', -31.9523, 115.8613),
+    ('SA', 'South Australia', 'Adelaide', 7, 'adelaide', '5000', -34.9285, 138.6007),
+    ('TAS', 'Tasmania', 'Hobart', 2, 'melbourne', '7000', -42.8821, 147.3272),
+    ('ACT', 'Australian Capital Territory', 'Canberra', 2, 'sydney', '2600', -35.2809, 149.1300),
+    ('NT', 'Northern Territory', 'Darwin', 1, 'brisbane', '0800', -12.4634, 130.8456),
+]
+STATES_BY_CODE = {state[0]: state for state in STATES}
+
+BRANCH_SUFFIXES = ['Airport', 'CBD', 'North', 'South', 'East', 'West', 'Central', 'Harbour', 'Station', 'Park']
+
+# (类别, 权重, 日租金范围, 成人座位, 大行李, 最小驾驶员年龄, 车型)
+CATEGORY_TYPES = [
+    ('Economy', 30, (40, 60), 4, 1, 21, ['Toyota Yaris', 'Kia Rio', 'Mazda 2', 'Suzuki Swift', 'MG 3']),
+    ('Compact', 25, (50, 75), 5, 2, 21, ['Toyota Corolla', 'Hyundai i30', 'Mazda 3', 'Kia Cerato', 'VW Golf']),
+    ('Midsize', 20, (65, 95), 5, 3, 21, ['Toyota Camry', 'Mazda 6', 'Honda Accord', 'Skoda Octavia']),
+    ('SUV', 18, (80, 130), 5, 4, 21, ['Toyota RAV4', 'Mazda CX-5', 'Hyundai Tucson', 'Kia Sportage', 'Nissan X-Trail']),
+    ('Luxury', 7, (140, 260), 5, 3, 25, ['BMW 5 Series', 'Mercedes E-Class', 'Audi A6', 'Lexus ES']),
+]
+
+VEHICLE_TYPES = [('PETROL', 70), ('HYBRID', 20), ('ELECTRIC', 10)]
+
+# 租期 (天) 的分布
+DURATIONS = [(1, 8), (2, 15), (3, 20), (4, 15), (5, 12), (7, 14), (10, 8), (14, 6), (21, 2)]
+
+FIRST_NAMES = [
+    'James', 'Olivia', 'William', 'Charlotte', 'Jack', 'Amelia', 'Noah', 'Isla', 'Thomas', 'Mia',
+    'Lucas', 'Grace', 'Henry', 'Chloe', 'Ethan', 'Ava', 'Wei', 'Mei', 'Arjun', 'Priya',
+]
+LAST_NAMES = [
+    'Smith', 'Jones', 'Williams', 'Brown', 'Wilson', 'Taylor', 'Nguyen', 'Johnson', 'Martin', 'White',
+    'Anderson', 'Walker', 'Thompson', 'Chen', 'Wang', 'Li', 'Kelly', 'Ryan', 'Patel', 'Singh',
+]
+OCCUPATIONS = ['employed', 'employed', 'employed', 'self_employed', 'student', 'retired', 'other']
+
+
+def long_tail_weights(count, exponent=0.8):
+    """长尾 (Zipf) 分布的权重，排在前面的对象被选中的概率更高"""
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+class LoadDataGenerator:
+    """
+    生成 DataLoader 可以直接写入的记录 (label, pk, fields)
+
+    外键一律使用自然键，记录不依赖数据库中已有的主键。
+    """
+
+    def __init__(self, seed=0, prefix='LT', today=None, **volumes):
+        unknown = set(volumes) - set(DEFAULT_VOLUMES)
+        if unknown:
+            raise ValueError(f"未知的数据量参数: {', '.join(sorted(unknown))}")
+        self.volumes = {**DEFAULT_VOLUMES, **{k: v for k, v in volumes.items() if v is not None}}
+        self.seed = seed
+        self.prefix = prefix
+        self.today = today or timezone.now().date()
+        self.random = random.Random(seed)
+        # 生成过程中记录的对象属性，供后面的模型引用
+        self._branches = []
+        self._categories = {}
+        self._cars = []
+
+    def records(self):
+        """初始数据 (州、车辆类型、车型类别等) 加上生成的数据"""
+        yield from read_fixture(str(SEED_FIXTURE))
+        for method in (self.users, self.geography, self.categories, self.cars, self.bookings, self.subscriptions):
+            for label, fields in method():
+                yield label, None, fields
+
+    # 用户和门店
+
+    def users(self):
+        password = make_password(LOADTEST_PASSWORD)
+        for i in range(self.volumes['users']):
+            username = self.username(i)
+            yield 'auth.user', {
+                'username': username,
+                'email': f'{username}@example.com',
+                'first_name': self.random.choice(FIRST_NAMES),
+                'last_name': self.random.choice(LAST_NAMES),
+                'password': password,
+                'is_active': True,
+            }
+            # bulk_create 不发送 post_save 信号，个人资料需要单独生成
+            yield 'accounts.profile', {'user': username, 'phone': f'04{self.random.randrange(10 ** 8):08d}'}
+
+    def username(self, index):
+        return f'{self.prefix.lower()}_user_{index:05d}'
+
+    def geography(self):
+        yield 'cars.country', {
+            'name': COUNTRY, 'sales_tax_name': 'GST', 'sales_tax_rate': '10.00', 'is_default': True,
+            'currency': 'AUD', 'currency_symbol': '$',
+        }
+        for code, name, city, *_ in STATES:
+            yield 'cars.stateprovince', {'country': COUNTRY, 'code': code, 'name': name}
+            yield 'cars.city', {'state': [COUNTRY, code], 'name': city}
+
+        weights = [state[3] for state in STATES]
+        used = set()
+        for i in range(self.volumes['locations']):
+            code, _, city, _, region, postcode, latitude, longitude = self.random.choices(STATES, weights)[0]
+            # 每个城市的门店名称不重复，后缀用完后加序号
+            suffix = next((s for s in BRANCH_SUFFIXES if (city, s) not in used), f'Branch {i + 1}')
+            used.add((city, suffix))
+            name = f'{city} {suffix}'
+            address = f'{self.random.randint(1, 300)} {suffix} Road'
+            # 门店分布在城市中心 20 公里左右的范围内
+            latitude = round(latitude + self.random.uniform(-0.2, 0.2), 6)
+            longitude = round(longitude + self.random.uniform(-0.2, 0.2), 6)
+            branch_code = f'{self.prefix}{i + 1:03d}'
+            self._branches.append((branch_code, name, code, region))
+            yield 'locations.location', {
+                'name': name,
+                'address': address,
+                'city': city,
+                'state': code,
+                'postal_code': postcode,
+                'is_airport': suffix == 'Airport',
+                'latitude': latitude,
+                'longitude': longitude,
+            }
+            yield 'cars.location', {
+                'code': branch_code,
+                'location_name': name,
+                'address': address,
+                'city': [[COUNTRY, code], city],
+                'state': [COUNTRY, code],
+                'country': COUNTRY,
+                'postcode': postcode,
+                'latitude': latitude,
+                'longitude': longitude,
+            }
+
+    # 车型和车辆
+
+    def categories(self):
+        weights = [kind[1] for kind in CATEGORY_TYPES]
+        type_names, type_weights = zip(*VEHICLE_TYPES)
+        regions = [branch[3] for branch in self._branches] or ['melbourne']
+        for i in range(self.volumes['categories']):
+            category_type, _, (low, high), adults, large_cases, min_age, models = (
+                self.random.choices(CATEGORY_TYPES, weights)[0]
+            )
+            name = f'{self.random.choice(models)} {self.prefix}{i + 1:03d}'
+            daily_rate = Decimal(self.random.randint(low, high))
+            self._categories[name] = daily_rate
+            yield 'cars.vehiclecategory', {
+                'vehicle_category': name,
+                'name': name,
+                'category_type': category_type,
+                'vehicle_type': self.random.choices(type_names, type_weights)[0],
+                'region': self.random.choice(regions),
+                'renting_category': True,
+                'daily_rate': str(daily_rate),
+                'age_youngest_driver': min_age,
+                'num_adults': adults,
+                'num_children': self.random.randint(0, 2),
+                'num_large_case': large_cases,
+                'num_small_case': self.random.randint(1, 3),
+            }
+
+    def cars(self):
+        categories = list(self._categories)
+        if not categories or not self._branches:
+            return
+        # 热门车型的车辆更多
+        category_weights = long_tail_weights(len(categories), 0.6)
+        branch_weights = [STATES_BY_CODE[branch[2]][3] for branch in self._branches]
+        for i in range(self.volumes['cars']):
+            category = self.random.choices(categories, category_weights)[0]
+            branch = self.random.choices(self._branches, branch_weights)[0]
+            registration_no = f'{self.prefix}{i + 1:06d}'
+            self._cars.append((registration_no, category, branch))
+            yield 'cars.car', {
+                'registration_no': registration_no,
+                'category': category,
+                'currently_located': branch[0],
+                # 少数车辆从其他门店调拨过来
+                'owning_location': branch[0] if self.random.random() < 0.9 else self.random.choice(self._branches)[0],
+                'year': self.random.randint(2017, self.today.year),
+                'transmission': 'Automatic' if self.random.random() < 0.92 else 'Manual',
+                'colour': self.random.choice(['White', 'Silver', 'Black', 'Grey', 'Blue', 'Red']),
+                'current_kms': self.random.randint(1000, 180000),
+                'is_available': self.random.random() < 0.97,
+                'available_for_booking': True,
+            }
+
+    # 预订和驾驶员
+
+    def bookings(self):
+        count = self.volumes['bookings']
+        if not count or not self._cars or not self.volumes['users']:
+            return
+        durations, duration_weights = zip(*DURATIONS)
+        mean_duration = sum(d * w for d, w in DURATIONS) / sum(duration_weights)
+        # 过去一年和未来四个月的预订
+        start = self.today - datetime.timedelta(days=365)
+        window = 365 + 120
+        counts = self.allocate(count, max(int(window / (mean_duration + 1)), 1))
+        branches_by_state = {}
+        for branch in self._branches:
+            branches_by_state.setdefault(branch[2], []).append(branch)
+
+        cars = [(car, n) for car, n in zip(self._cars, counts) for _ in range(n)]
+        users = self.random.choices(range(self.volumes['users']), long_tail_weights(self.volumes['users']), k=len(cars))
+        previous = cursor = starts = None
+        for i, (((registration_no, category, branch), car_bookings), user) in enumerate(zip(cars, users)):
+            if registration_no != previous:
+                # 这辆车的取车日期在时间窗口内随机分布，与上一次预订重叠时顺延到还车之后
+                previous, cursor = registration_no, start
+                starts = iter(sorted(self.random.randrange(window) for _ in range(car_bookings)))
+            days = self.random.choices(durations, duration_weights)[0]
+            pickup_date = max(start + datetime.timedelta(days=next(starts)), cursor)
+            return_date = pickup_date + datetime.timedelta(days=days)
+            cursor = return_date + datetime.timedelta(days=1)
+
+            dropoff = branch
+            if self.random.random() < 0.15:
+                dropoff = self.random.choice(branches_by_state[branch[2]])
+            options = {
+                'damage_waiver': self.random.random() < 0.4,
+                'extended_area': self.random.random() < 0.05,
+                'satellite_navigation': self.random.random() < 0.15,
+                'child_seats': self.random.choices([0, 1, 2], [85, 10, 5])[0],
+                'additional_drivers': self.random.choices([0, 1, 2], [88, 10, 2])[0],
+            }
+            # 租金加 10% GST，选项费用按大致的日租金估算
+            daily = self._categories[category] + (10 if options['damage_waiver'] else 0) + 5 * options['child_seats']
+            total_cost = (daily * days * Decimal('1.10')).quantize(Decimal('0.01'))
+            booked_at = timezone.make_aware(datetime.datetime.combine(
+                pickup_date - datetime.timedelta(days=min(round(self.random.expovariate(1 / 21)), 180)),
+                datetime.time(self.random.randint(7, 22), self.random.randint(0, 59)),
+            ))
+            key = f'loadtest:{self.prefix}:{i}'
+            driver_age = min(max(round(self.random.gauss(38, 12)), 21), 80)
+            yield 'bookings.booking', {
+                'user': self.username(user),
+                'car': registration_no,
+                'pickup_location': branch[1],
+                'dropoff_location': dropoff[1],
+                'pickup_date': pickup_date.isoformat(),
+                'return_date': return_date.isoformat(),
+                'booking_date': booked_at.isoformat(),
+                'status': self.status(pickup_date, return_date),
+                'total_cost': str(total_cost),
+                'driver_age': driver_age,
+                'idempotency_key': key,
+                **options,
+            }
+            for n in range(1 + options['additional_drivers']):
+                yield 'bookings.driver', self.driver(key, branch[2], driver_age if n == 0 else None, n)
+
+    def allocate(self, count, capacity):
+        """
+        按长尾分布把预订分配给车辆，返回每辆车的预订数
+
+        每辆车最多 capacity 次 (时间窗口内排满)，超出全部车辆容量的预订不生成。
+        """
+        counts = [0] * len(self._cars)
+        weights = long_tail_weights(len(self._cars), 0.5)
+        remaining = min(count, capacity * len(self._cars))
+        while remaining:
+            for index in self.random.choices(range(len(counts)), weights, k=remaining):
+                if counts[index] < capacity:
+                    counts[index] += 1
+                    remaining -= 1
+            # 排满的车辆不再参与分配
+            weights = [0 if n >= capacity else weight for n, weight in zip(counts, weights)]
+        return counts
+
+    def status(self, pickup_date, return_date):
+        if return_date < self.today:
+            return 'completed' if self.random.random() < 0.88 else 'cancelled'
+        if pickup_date <= self.today:
+            return 'confirmed'
+        return self.random.choices(['confirmed', 'pending', 'cancelled'], [85, 5, 10])[0]
+
+    def driver(self, booking_key, state, age, index):
+        first_name = self.random.choice(FIRST_NAMES)
+        last_name = self.random.choice(LAST_NAMES)
+        if age is None:
+            age = self.random.randint(21, 70)
+        lifetime = self.random.random() < 0.05
+        return {
+            'booking': booking_key,
+            'is_primary': index == 0,
+            'first_name': first_name,
+            'last_name': last_name,
+            'email': f'{first_name}.{last_name}.{index}@example.com'.lower(),
+            'date_of_birth': (self.today - datetime.timedelta(days=age * 365 + self.random.randint(0, 364))).isoformat(),
+            'license_number': f'{state}{self.random.randrange(10 ** 8):08d}',
+            'license_issued_in': state,
+            'license_expiry_date': (self.today + datetime.timedelta(days=self.random.randint(30, 3650))).isoformat(),
+            'license_is_lifetime': lifetime,
+            'address': f'{self.random.randint(1, 400)} {self.random.choice(LAST_NAMES)} Street',
+            'city': STATES_BY_CODE[state][2],
+            'state': state,
+            'postcode': STATES_BY_CODE[state][5],
+            'mobile': f'04{self.random.randrange(10 ** 8):08d}',
+            'occupation': self.random.choice(OCCUPATIONS),
+            'mailing_list': self.random.random() < 0.3,
+        }
+
+    # 订阅
+
+    def subscriptions(self):
+        count = min(self.volumes['subscriptions'], len(self._cars))
+        for registration_no, category, _ in self.random.sample(self._cars, count):
+            # 订阅按月计价，期限越长月租越低
+            monthly = self._categories[category] * 30 * Decimal('0.6')
+            yield 'rushwebsite.carsubscription', {
+                'car': registration_no,
+                'subscription_plan1': str((monthly * 3).quantize(Decimal('0.01'))),
+                'subscription_plan2': str((monthly * 6 * Decimal('0.95')).quantize(Decimal('0.01'))),
+                'subscription_plan3': str((monthly * 9 * Decimal('0.9')).quantize(Decimal('0.01'))),
+                'seat_number': self.random.choice([4, 5, 5, 5, 7]),
+                'status': 'available' if self.random.random() < 0.85 else 'unavailable',
+                'description': f'{category} subscription',
+            }
@@ -0,0 +1,357 @@
+"""
+预订流程压力测试
+
+模拟多个用户同时走完整个预订向导，统计每一步的延迟 (p50/p95/p99)、错误率和整体吞吐量。
+由 load_test 命令调用，输出的 JSON 可以保存下来比较每次改动前后的性能。
+
+每个虚拟用户登录一次，然后反复执行:
+
+    car_list → create_booking → add_drivers → add_options → payment → process_payment
+
+请求像浏览器一样发送: 保持连接和 Cookie，POST 带 CSRF token，表单提交后跟随重定向打开下一页
+(跟随重定向的时间计入这一步)。payment 使用模拟支付 (没有配置 STRIPE_SECRET_KEY 时的 MockStripe)，
+不跟随到 Stripe 结账页面，由 process_payment 确认预订。
+
+虚拟用户是 asyncio 协程，HTTP 请求 (http.client) 在线程池中执行，每个虚拟用户一个线程，
+不依赖 Locust 或 httpx 等第三方库。被测的服务器需要是同一个数据库，
+预订草稿在多个进程之间共享 (单进程的 runserver，或者 DatabaseDraftStore / CacheDraftStore)。
+"""
+import asyncio
+import datetime
+import http.client
+import math
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from rush_car_rental.utils.load_generator import LOADTEST_PASSWORD
+
+STEPS = ['login', 'car_list', 'create_booking', 'add_drivers', 'add_options', 'payment', 'process_payment']
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class StepError(Exception):
+    """某一步的响应不符合预期，本轮预订流程中止"""
+
+
+class Response:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def location(self):
+        """重定向的目标路径 (不含域名)"""
+        return urlsplit(self.headers.get('Location', '')).path
+
+
+class Session:
+    """
+    一个虚拟用户的 HTTP 会话: 保持连接，保存 Cookie (sessionid, csrftoken)
+
+    方法是同步的，在线程池中执行。
+    """
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.base_url = base_url.rstrip('/')
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.netloc = parts.netloc
+        self.timeout = timeout
+        self.cookies = SimpleCookie()
+        self.connection = None
+
+    def request(self, method, path, data=None):
+        headers = {'Referer': self.base_url + path}
+        body = None
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={morsel.value}' for name, morsel in self.cookies.items())
+        if method == 'POST':
+            body = urlencode(data or {}, doseq=True)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            if 'csrftoken' in self.cookies:
+                headers['X-CSRFToken'] = self.cookies['csrftoken'].value
+
+        # 服务器关闭了空闲连接时重新连接一次
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = self.connection_class(self.netloc, timeout=self.timeout)
+            try:
+                self.connection.request(method, path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                content = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self.close()
+                if attempt:
+                    raise
+        for header in response.headers.get_all('Set-Cookie') or []:
+            self.cookies.load(header)
+        if response.headers.get('Connection', '').lower() == 'close':
+            self.close()
+        return Response(response.status, response.headers, content)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class StepStats:
+    """一步的请求数、耗时和按原因分类的错误数"""
+
+    def __init__(self):
+        self.timings = []
+        self.errors = {}
+
+    def add(self, seconds, error=None):
+        self.timings.append(seconds * 1000)
+        if error:
+            self.errors[error] = self.errors.get(error, 0) + 1
+
+    def as_dict(self):
+        count = len(self.timings)
+        errors = sum(self.errors.values())
+        result = {'count': count, 'errors': errors, 'error_rate': round(errors / count, 4) if count else 0}
+        if count:
+            result.update({
+                'mean_ms': round(sum(self.timings) / count, 2),
+                'p50_ms': round(percentile(self.timings, 0.5), 2),
+                'p95_ms': round(percentile(self.timings, 0.95), 2),
+                'p99_ms': round(percentile(self.timings, 0.99), 2),
+                'max_ms': round(max(self.timings), 2),
+            })
+        result['errors_by_reason'] = dict(sorted(self.errors.items()))
+        return result
+
+
+def error_reason(error):
+    """错误按原因分类，路径中的ID替换为 <id>"""
+    if isinstance(error, StepError):
+        return re.sub(r'/[0-9a-f-]*\d[0-9a-f-]*/', '/<id>/', str(error))
+    return type(error).__name__
+
+
+class LoadTest:
+    """
+    预订流程压力测试
+
+    targets: {'usernames': [...], 'offers': [(车型ID, 取车门店ID)], 'locations': [门店ID]}，由 load_targets() 从数据库读取
+    """
+
+    def __init__(self, base_url, targets, users=10, iterations=5, duration=None, think_time=0,
+                 timeout=30, password=LOADTEST_PASSWORD, seed=0, today=None):
+        if not targets['usernames'] or not targets['offers'] or not targets['locations']:
+            raise ValueError('没有可用的压测用户、车型或门店，先运行 generate_load_data')
+        self.base_url = base_url.rstrip('/')
+        self.targets = targets
+        self.users = users
+        self.iterations = iterations
+        self.duration = duration
+        self.think_time = think_time
+        self.timeout = timeout
+        self.password = password
+        self.seed = seed
+        self.today = today or datetime.date.today()
+        self.stats = {step: StepStats() for step in STEPS}
+        self.flows = {'started': 0, 'completed': 0, 'failed': 0}
+        self.requests = 0
+
+    def run(self):
+        """执行压测，返回报告 (dict)"""
+        return asyncio.run(self.arun())
+
+    async def arun(self):
+        start = time.perf_counter()
+        self._deadline = start + self.duration if self.duration else None
+        with ThreadPoolExecutor(max_workers=self.users, thread_name_prefix='load-test') as executor:
+            await asyncio.gather(*(self.virtual_user(index, executor) for index in range(self.users)))
+        return self.report(time.perf_counter() - start)
+
+    def report(self, seconds):
+        return {
+            'base_url': self.base_url,
+            'users': self.users,
+            'iterations': self.iterations,
+            'seconds': round(seconds, 3),
+            # HTTP 请求数 (包括跟随重定向的请求)
+            'requests': self.requests,
+            'throughput_rps': round(self.requests / seconds, 2) if seconds else 0,
+            'bookings_per_second': round(self.flows['completed'] / seconds, 2) if seconds else 0,
+            'flows': dict(self.flows),
+            'error_rate': round(self.flows['failed'] / self.flows['started'], 4) if self.flows['started'] else 0,
+            'steps': {step: stats.as_dict() for step, stats in self.stats.items()},
+        }
+
+    def expired(self):
+        return self._deadline is not None and time.perf_counter() >= self._deadline
+
+    # 虚拟用户
+
+    async def virtual_user(self, index, executor):
+        session = Session(self.base_url, self.timeout)
+        rng = random.Random(self.seed * 100003 + index)
+        username = self.targets['usernames'][index % len(self.targets['usernames'])]
+        loop = asyncio.get_running_loop()
+
+        async def call(method, path, data=None):
+            self.requests += 1
+            return await loop.run_in_executor(executor, session.request, method, path, data)
+
+        try:
+            if not await self.step('login', self.login(call, username)):
+                return
+            iteration = 0
+            while (self.duration or iteration < self.iterations) and not self.expired():
+                iteration += 1
+                self.flows['started'] += 1
+                if await self.booking_flow(call, rng):
+                    self.flows['completed'] += 1
+                else:
+                    self.flows['failed'] += 1
+                if self.think_time:
+                    await asyncio.sleep(rng.uniform(0, 2 * self.think_time))
+        finally:
+            await loop.run_in_executor(executor, session.close)
+
+    async def step(self, name, coroutine):
+        """执行一步并记录耗时，失败时返回 None"""
+        start = time.perf_counter()
+        try:
+            result = await coroutine
+        except Exception as e:
+            self.stats[name].add(time.perf_counter() - start, error_reason(e))
+            return None
+        self.stats[name].add(time.perf_counter() - start)
+        return result
+
+    async def booking_flow(self, call, rng):
+        """走完一次预订向导，成功时返回 True"""
+        pickup_date = self.today + datetime.timedelta(days=rng.randint(30, 365))
+        return_date = pickup_date + datetime.timedelta(days=rng.choice([1, 2, 3, 3, 4, 5, 7]))
+        category, pickup_location = rng.choice(self.targets['offers'])
+        dropoff_location = pickup_location if rng.random() < 0.85 else rng.choice(self.targets['locations'])
+
+        if not await self.step('car_list', self.expect(call, 'GET', '/cars/?' + urlencode({
+            'pickup_date': pickup_date.isoformat(), 'return_date': return_date.isoformat(),
+        }))):
+            return False
+        response = await self.step('create_booking', self.submit(
+            call, f'/bookings/create/{category}/', {
+                'pickup_location': pickup_location,
+                'dropoff_location': dropoff_location,
+                'pickup_date': pickup_date.isoformat(),
+                'return_date': return_date.isoformat(),
+                'driver_age': rng.randint(21, 70),
+            }, '/bookings/drivers/',
+        ))
+        if not response:
+            return False
+        draft_id = response.location.rstrip('/').rsplit('/', 1)[-1]
+        steps = [
+            ('add_drivers', lambda: self.submit(
+                call, f'/bookings/drivers/{draft_id}/', self.driver_form(rng), '/bookings/options/',
+            )),
+            ('add_options', lambda: self.submit(call, f'/bookings/confirm/{draft_id}/', {
+                'damage_waiver': 'true' if rng.random() < 0.4 else 'false',
+                'satellite_navigation': 'true' if rng.random() < 0.15 else 'false',
+                'child_seats': rng.choices([0, 1, 2], [85, 10, 5])[0],
+            }, '/bookings/payment/', follow=False)),
+            # 模拟支付时重定向到 stripe_success，不跟随
+            ('payment', lambda: self.expect(call, 'GET', f'/bookings/payment/{draft_id}/', statuses=(200, 302))),
+            ('process_payment', lambda: self.submit(
+                call, f'/bookings/process-payment/{draft_id}/', {'action': 'confirm'}, '/bookings/payment-success/',
+            )),
+        ]
+        for name, request in steps:
+            # 失败时后面的步骤不再执行
+            if not await self.step(name, request()):
+                return False
+        return True
+
+    def driver_form(self, rng):
+        today = self.today
+        return {
+            'form-TOTAL_FORMS': '1',
+            'form-INITIAL_FORMS': '0',
+            'form-MIN_NUM_FORMS': '0',
+            'form-MAX_NUM_FORMS': '1',
+            'form-0-first_name': 'Load',
+            'form-0-last_name': f'Tester{rng.randrange(10000)}',
+            'form-0-email': f'load.tester{rng.randrange(10000)}@example.com',
+            'form-0-date_of_birth': today.replace(year=today.year - rng.randint(25, 65), day=1).isoformat(),
+            'form-0-license_number': f'LT{rng.randrange(10 ** 8):08d}',
+            'form-0-license_issued_in': 'VIC',
+            'form-0-license_expiry_date': (today + datetime.timedelta(days=rng.randint(90, 3000))).isoformat(),
+            'form-0-address': '1 Load Test Street',
+            'form-0-city': 'Melbourne',
+            'form-0-state': 'VIC',
+            'form-0-postcode': '3000',
+            'form-0-country_of_residence': 'Australia',
+            'form-0-mobile': f'04{rng.randrange(10 ** 8):08d}',
+            'form-0-is_primary': 'on',
+        }
+
+    # 请求和检查
+
+    async def login(self, call, username):
+        # 打开登录页获取 csrftoken
+        await self.expect(call, 'GET', '/accounts/login/')
+        response = await call('POST', '/accounts/login/', {'username': username, 'password': self.password})
+        if response.status != 302:
+            raise StepError(f'login failed ({response.status})')
+        return response
+
+    async def expect(self, call, method, path, data=None, statuses=(200,)):
+        response = await call(method, path, data)
+        if response.status not in statuses:
+            raise StepError(f'HTTP {response.status} {urlsplit(path).path}')
+        return response
+
+    async def submit(self, call, path, data, redirect_to, follow=True):
+        """提交表单，检查重定向到下一步，follow 时像浏览器一样打开下一页"""
+        response = await call('POST', path, data)
+        if response.status != 302:
+            raise StepError(f'HTTP {response.status} {path}')
+        if not response.location.startswith(redirect_to):
+            raise StepError(f'redirect {response.location}')
+        if follow:
+            await self.expect(call, 'GET', response.location)
+        return response
+
+
+def load_targets(prefix='LT', using='default'):
+    """从数据库读取压测用户、门店和 (车型, 取车门店) 组合 (只包含门店有可租车辆的组合)"""
+    from django.contrib.auth.models import User
+
+    from cars.branches import branch_key
+    from cars.models import Car
+    from locations.models import Location
+
+    locations = list(Location.objects.using(using).order_by('id').values_list('id', 'name', 'state__code'))
+    location_ids = {}
+    for location_id, name, state_code in locations:
+        location_ids.setdefault(branch_key(name, state_code), []).append(location_id)
+    offers = set()
+    for category_id, name, state_code in (
+        Car.objects.using(using).filter(
+            is_available=True, available_for_booking=True, category__isnull=False, currently_located__isnull=False,
+        ).values_list('category_id', 'currently_located__location_name', 'currently_located__state__code')
+    ):
+        offers.update((category_id, location_id) for location_id in location_ids.get(branch_key(name, state_code), ()))
+    return {
+        'usernames': list(
+            User.objects.using(using).filter(username__startswith=f'{prefix.lower()}_user_')
+            .order_by('username').values_list('username', flat=True)
+        ),
+        'offers': sorted(offers),
+        'locations': [location_id for location_id, _, _ in locations],
+    }
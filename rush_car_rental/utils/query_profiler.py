@@ -0,0 +1,231 @@
+"""
+SQL 查询分析工具
+
+按 URL 名称统计每个请求的查询次数、SQL 总耗时、重复查询 (按语句指纹) 和最慢的语句，
+保存在进程内的滚动窗口中。由 rush_car_rental.middleware.QueryCountMiddleware 采集，
+可以通过员工专用接口 /debug/queries/ 或 query_report 命令查看。
+
+配置 (settings.QUERY_PROFILER):
+
+    QUERY_PROFILER = {
+        'ENABLED': True,
+        'WINDOW': 200,             # 每个视图保留最近多少个请求
+        'SLOWEST': 5,              # 每个视图保留多少条最慢语句
+        'DEFAULT_BUDGET': None,    # 默认查询预算，None 表示不限制
+        'BUDGETS': {'car_list': 5},
+        'RAISE': False,            # 超出预算时抛出异常 (测试环境)，否则只记录日志
+    }
+"""
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'WINDOW': 200,
+    'SLOWEST': 5,
+    'DEFAULT_BUDGET': None,
+    'BUDGETS': {},
+    'RAISE': False,
+}
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+_PLACEHOLDER_RE = re.compile(r'%s')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """视图的查询次数超出预算"""
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'QUERY_PROFILER', {}))
+    return config
+
+
+def fingerprint(sql):
+    """
+    把 SQL 归一化为指纹: 常量和参数替换为 ?，IN 列表合并为 (...)
+
+    同一指纹在一个请求中出现多次通常意味着 N+1 查询。
+    """
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('(...)', sql)
+    return ' '.join(sql.split())
+
+
+class QueryRecorder:
+    """
+    记录单个请求中执行的 SQL
+
+    作为 connection.execute_wrapper 使用，不依赖 DEBUG 模式。
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_time(self):
+        return sum(duration for _, duration in self.queries)
+
+    def duplicates(self):
+        """返回执行超过一次的语句指纹及次数"""
+        counts = Counter(fingerprint(sql) for sql, _ in self.queries)
+        return {key: count for key, count in counts.items() if count > 1}
+
+    def slowest(self, limit):
+        return sorted(self.queries, key=lambda query: query[1], reverse=True)[:limit]
+
+
+class ViewStats:
+    """单个视图最近若干次请求的统计"""
+
+    def __init__(self, window, slowest):
+        self.samples = deque(maxlen=window)
+        self.slowest_limit = slowest
+        self.total_requests = 0
+
+    def add(self, recorder, budget_exceeded):
+        self.total_requests += 1
+        self.samples.append({
+            'queries': recorder.count,
+            'time': recorder.total_time,
+            'duplicates': recorder.duplicates(),
+            'slowest': recorder.slowest(self.slowest_limit),
+            'over_budget': budget_exceeded,
+        })
+
+    def summary(self):
+        samples = list(self.samples)
+        counts = sorted(sample['queries'] for sample in samples)
+        times = [sample['time'] for sample in samples]
+
+        duplicates = Counter()
+        for sample in samples:
+            duplicates.update(sample['duplicates'])
+
+        slowest = sorted(
+            (query for sample in samples for query in sample['slowest']),
+            key=lambda query: query[1], reverse=True,
+        )
+        seen = set()
+        slowest_unique = []
+        for sql, duration in slowest:
+            key = fingerprint(sql)
+            if key in seen:
+                continue
+            seen.add(key)
+            slowest_unique.append({'sql': sql, 'ms': round(duration * 1000, 3)})
+            if len(slowest_unique) >= self.slowest_limit:
+                break
+
+        return {
+            'requests': self.total_requests,
+            'window': len(samples),
+            'avg_queries': round(sum(counts) / len(counts), 2) if counts else 0,
+            'max_queries': counts[-1] if counts else 0,
+            'p95_queries': counts[math.ceil(len(counts) * 0.95) - 1] if counts else 0,
+            'avg_sql_ms': round(sum(times) / len(times) * 1000, 3) if times else 0,
+            'total_sql_ms': round(sum(times) * 1000, 3),
+            'over_budget': sum(1 for sample in samples if sample['over_budget']),
+            'duplicates': [
+                {'fingerprint': key, 'count': count}
+                for key, count in duplicates.most_common(self.slowest_limit)
+            ],
+            'slowest': slowest_unique,
+        }
+
+
+class QueryStats:
+    """进程内按视图名称汇总的查询统计"""
+
+    def __init__(self):
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def record(self, view_name, recorder, budget_exceeded=False):
+        config = get_config()
+        with self._lock:
+            stats = self._views.get(view_name)
+            if stats is None:
+                stats = self._views[view_name] = ViewStats(config['WINDOW'], config['SLOWEST'])
+            stats.add(recorder, budget_exceeded)
+
+    def report(self):
+        """返回可以 JSON 序列化的统计报告，按平均查询次数降序"""
+        with self._lock:
+            views = {name: stats.summary() for name, stats in self._views.items()}
+        return dict(sorted(views.items(), key=lambda item: item[1]['avg_queries'], reverse=True))
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+query_stats = QueryStats()
+
+
+def get_budget(view_name):
+    config = get_config()
+    return config['BUDGETS'].get(view_name, config['DEFAULT_BUDGET'])
+
+
+def check_budget(view_name, recorder):
+    """
+    检查查询次数是否超出预算，超出时记录日志或抛出 QueryBudgetExceeded
+
+    返回是否超出预算。
+    """
+    budget = get_budget(view_name)
+    if budget is None or recorder.count <= budget:
+        return False
+
+    duplicates = recorder.duplicates()
+    message = f"视图 {view_name} 执行了 {recorder.count} 次查询，超出预算 {budget}"
+    if duplicates:
+        worst, times = max(duplicates.items(), key=lambda item: item[1])
+        message += f"; 重复最多的查询 ({times} 次): {worst}"
+    if get_config()['RAISE']:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+    return True
+
+
+def format_report(report):
+    """把统计报告格式化为文本"""
+    lines = []
+    for view_name, summary in report.items():
+        budget = get_budget(view_name)
+        lines.append(
+            f"{view_name}: 请求 {summary['requests']}，平均查询 {summary['avg_queries']}，"
+            f"最多 {summary['max_queries']}，P95 {summary['p95_queries']}，"
+            f"平均SQL耗时 {summary['avg_sql_ms']}ms，预算 {budget if budget is not None else '-'}，"
+            f"超出预算 {summary['over_budget']} 次"
+        )
+        for duplicate in summary['duplicates']:
+            lines.append(f"    重复 x{duplicate['count']}: {duplicate['fingerprint'][:200]}")
+        for query in summary['slowest']:
+            lines.append(f"    最慢 {query['ms']}ms: {query['sql'][:200]}")
+    return '\n'.join(lines)
@@ -0,0 +1,167 @@
+"""
+带版本号的进程内索引
+
+可用性索引、报价费率表、地点库存、网点空间索引和自动补全索引都是同一种结构:
+从数据库整体加载到当前进程的内存中，数据变化时递增缓存中的版本号，各进程在下次使用时
+发现版本变化并重新加载。未配置共享缓存时其他进程看不到版本号变化，索引超过 max_age 后也会重新加载。
+
+- VersionedIndex: 索引基类，子类设置 version_cache_key 并实现 refresh() (查询数据库并构建索引)
+- IndexSingleton: 每个进程一个索引实例，负责创建、检查版本号、增量更新和丢弃
+
+用法:
+
+    class BranchIndex(VersionedIndex):
+        version_cache_key = 'branch_index_version'
+
+        def refresh(self):
+            self.build(Location.objects.values_list(...))
+
+    _index = IndexSingleton(BranchIndex)
+    _index.get()            # 首次调用或版本变化时从数据库加载
+    _index.changed()        # 数据变化后，所有进程在下次使用时重新加载
+"""
+import threading
+import time
+
+from django.core.cache import cache
+
+from rush_car_rental.db_router import use_primary
+
+# 两次检查缓存版本号之间的最小间隔(秒)
+VERSION_CHECK_INTERVAL = 1.0
+# 无论版本号是否变化，索引最长保留时间(秒)；未配置共享缓存时作为兜底
+INDEX_MAX_AGE = 300
+
+
+def bump_version(key):
+    """递增缓存中的版本号，返回新的版本号"""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+        return 1
+
+
+class VersionedIndex:
+    """
+    带版本号的进程内索引基类
+
+    子类在构建完成后把 built 设为 True。
+    """
+
+    version_cache_key = None
+    version_check_interval = VERSION_CHECK_INTERVAL
+    max_age = INDEX_MAX_AGE
+
+    def __init__(self):
+        self.version = None
+        self.built = False
+        self._version_checked_at = 0.0
+        self._loaded_at = 0.0
+        self._load_lock = threading.Lock()
+
+    def refresh(self):
+        """从数据库加载数据并构建索引"""
+        raise NotImplementedError
+
+    def load(self):
+        """
+        重新加载索引，记录加载前的版本号 (加载期间发生的变化会在下次检查时发现)
+
+        版本号变化后立即重新加载，从主库读取，不能读到副本上的旧数据。
+        """
+        version = cache.get(self.version_cache_key)
+        with use_primary():
+            self.refresh()
+        self.version = version
+        self._version_checked_at = self._loaded_at = time.monotonic()
+
+    def is_stale(self, now=None):
+        """未构建、超过最长保留时间或缓存版本号已变化"""
+        now = time.monotonic() if now is None else now
+        return (
+            not self.built
+            or now - self._loaded_at > self.max_age
+            or cache.get(self.version_cache_key) != self.version
+        )
+
+    def ensure_fresh(self):
+        """
+        如果数据发生变化 (缓存版本号变化) 或索引已过期，重新加载索引
+
+        每 version_check_interval 秒最多检查一次缓存，多个线程同时发现变化时只加载一次。
+        """
+        now = time.monotonic()
+        if self.built and now - self._version_checked_at < self.version_check_interval:
+            return
+        with self._load_lock:
+            if self.built and now - self._version_checked_at < self.version_check_interval:
+                return
+            self._version_checked_at = now
+            if self.is_stale(now):
+                self.load()
+
+    def expire(self):
+        """下次使用时立即检查版本号"""
+        self._version_checked_at = 0.0
+
+
+class IndexSingleton:
+    """
+    当前进程的索引实例
+    """
+
+    def __init__(self, index_class):
+        self.index_class = index_class
+        self.instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def version_cache_key(self):
+        return self.index_class.version_cache_key
+
+    def get(self):
+        """返回当前进程的索引 (首次调用或版本变化时从数据库加载)"""
+        index = self.instance
+        if index is None:
+            with self._lock:
+                if self.instance is None:
+                    self.instance = self.index_class()
+                index = self.instance
+        index.ensure_fresh()
+        return index
+
+    def bump_version(self):
+        """通知所有进程数据已变化，返回新的版本号"""
+        return bump_version(self.version_cache_key)
+
+    def apply_change(self, update):
+        """
+        递增版本号并对当前进程的索引做增量更新 (update(index))
+
+        如果本进程索引在变更前已是最新版本，并且期间没有其他进程递增版本号，则直接采用新版本号，
+        避免不必要的重建；否则本进程也在下次使用时重新加载。其他进程会在下次使用时发现版本变化
+        并重新加载。更新在索引的加载锁内进行，不会与正在进行的重新加载交错。
+        """
+        previous = cache.get(self.version_cache_key)
+        current = self.bump_version()
+        index = self.instance
+        if index is None or not index.built:
+            return
+        with index._load_lock:
+            update(index)
+            if index.version == previous and current == (previous or 0) + 1:
+                index.version = current
+            else:
+                index.expire()
+
+    def changed(self):
+        """无法增量更新的变化，所有进程 (包括当前进程) 在下次使用时重新加载"""
+        self.bump_version()
+        if self.instance is not None:
+            self.instance.expire()
+
+    def reset(self):
+        """丢弃当前索引，下次使用时重新加载 (测试用)"""
+        with self._lock:
+            self.instance = None
@@ -0,0 +1,23 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from django.views.decorators.http import require_http_methods
+
+from rush_car_rental.utils.query_profiler import query_stats
+
+
+@staff_member_required
+@require_http_methods(['GET', 'POST'])
+def query_stats_view(request):
+    """
+    员工专用: 查看各视图的 SQL 查询统计 (JSON)
+
+    POST 请求清空统计; GET 参数 download=1 时作为文件下载。
+    """
+    if request.method == 'POST':
+        query_stats.reset()
+        return JsonResponse({'reset': True})
+
+    response = JsonResponse(query_stats.report(), json_dumps_params={'indent': 2, 'ensure_ascii': False})
+    if request.GET.get('download'):
+        response['Content-Disposition'] = 'attachment; filename="query_stats.json"'
+    return response
@@ -18,10 +18,12 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rush_car_rental.settings')
 
 application = get_wsgi_application()
 
+# 导入时开始统计数据库连接次数 (CosmosDBManager.get_pool_stats)
+from rush_car_rental.utils.cosmos_db import CosmosDBManager
+
 # 如果在生产环境，初始化Cosmos DB连接测试
 from rush_car_rental.utils.environment import is_production
 if is_production():
-    from rush_car_rental.utils.cosmos_db import CosmosDBManager
     if not CosmosDBManager.test_connection():
         import logging
         logging.error("无法连接到Cosmos DB，请检查配置！")
\ No newline at end of file
@@ -0,0 +1,165 @@
+import csv
+import datetime
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from bookings.models import Booking
+from cars.models import Car, VehicleCategory
+from cars.tests.utils import UnmanagedTablesMixin
+from locations.models import CityHighlight, Location, State
+from rush_car_rental.utils.data_loader import FixtureError, load_files
+
+SEED = os.path.join(settings.BASE_DIR, 'rush_car_rental', 'fixtures', 'seed.json')
+BACKUP = os.path.join(settings.BASE_DIR, 'database_backup.json')
+
+
+def write_csv(directory, label, rows):
+    path = os.path.join(directory, f'{label}.csv')
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+class DataLoaderTest(UnmanagedTablesMixin, TestCase):
+    """
+    测试批量数据加载 (load_data)
+    """
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.tmpdir = tmpdir.name
+
+    def test_seed_is_idempotent(self):
+        """
+        测试初始数据通过自然键解析外键，重复加载时更新已有的行而不是重复插入
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            first = {s['model']: s for s in load_files([SEED])}
+        self.assertEqual(first['locations.state']['created'], 8)
+        self.assertEqual(Location.objects.get(name='Sydney CBD').state.code, 'NSW')
+        self.assertEqual(CityHighlight.objects.get(city='Brisbane').state.code, 'QLD')
+        corolla = VehicleCategory.objects.get(vehicle_category='Toyota Corolla')
+        self.assertEqual((corolla.category_type.category_type, corolla.vehicle_type.name), ('Economy', 'PETROL'))
+
+        State.objects.filter(code='VIC').update(name='Vic')
+        out = StringIO()
+        call_command('load_data', SEED, json=True, stdout=out)
+        second = {s['model']: s for s in json.loads(out.getvalue())['models']}
+        self.assertEqual(second['locations.location']['created'], 0)
+        self.assertEqual(second['locations.location']['updated'], first['locations.location']['rows'])
+        self.assertEqual(State.objects.count(), 8)
+        self.assertEqual(State.objects.get(code='VIC').name, 'Victoria')
+
+    def test_dumpdata_and_csv(self):
+        """
+        测试加载 dumpdata 备份、CSV 和 YAML 数据，查询次数不随行数增长，给出的预订日期原样写入
+        """
+        load_files([BACKUP, SEED])
+        self.assertTrue(User.objects.get(username='admin').is_superuser)
+        self.assertEqual(State.objects.count(), 8)
+
+        cars = write_csv(self.tmpdir, 'cars.car', [
+            {'registration_no': f'LOAD{i:04d}', 'category': 'Toyota Corolla', 'is_available': 'True'}
+            for i in range(300)
+        ])
+        bookings = write_csv(self.tmpdir, 'bookings.booking', [
+            {
+                'user': 'admin', 'car': f'LOAD{i:04d}', 'pickup_location': 'Melbourne Airport',
+                'dropoff_location': 'Sydney CBD', 'pickup_date': '2030-01-10', 'return_date': '2030-01-12',
+                'booking_date': '2029-12-01T09:30:00+00:00', 'status': 'confirmed', 'total_cost': '100.00',
+                'driver_age': '30', 'idempotency_key': f'load-{i}',
+            }
+            for i in range(300)
+        ])
+        features = os.path.join(self.tmpdir, 'features.yaml')
+        with open(features, 'w', encoding='utf-8') as f:
+            f.write('cars.vehiclefeature:\n- {vehicle_category: Toyota Corolla, feature: Bluetooth}\n')
+        with CaptureQueriesContext(connection) as queries:
+            stats = {s['model']: s for s in load_files([cars, bookings, features], chunk_size=100)}
+        self.assertLess(len(queries), 30)
+        self.assertEqual(VehicleCategory.objects.get(vehicle_category='Toyota Corolla').features.get().feature, 'Bluetooth')
+        self.assertEqual(stats['bookings.booking']['created'], 300)
+        self.assertGreater(stats['cars.car']['rows_per_second'], 0)
+
+        booking = Booking.objects.get(idempotency_key='load-7')
+        self.assertEqual(booking.car.registration_no, 'LOAD0007')
+        self.assertEqual(booking.car.category.vehicle_category, 'Toyota Corolla')
+        self.assertEqual(booking.booking_date, datetime.datetime(2029, 12, 1, 9, 30, tzinfo=datetime.timezone.utc))
+
+        load_files([cars, bookings, features])
+        self.assertEqual((Car.objects.count(), Booking.objects.count()), (300, 300))
+        self.assertEqual(VehicleCategory.objects.get(vehicle_category='Toyota Corolla').features.count(), 1)
+
+    def test_partial_fixture_keeps_other_columns(self):
+        """
+        测试只包含部分列的数据文件重复加载时只更新给出的列 (和 auto_now 字段)，其他列保持不变
+        """
+        load_files([SEED])
+        cars = write_csv(self.tmpdir, 'cars.car', [
+            {'registration_no': 'PART01', 'category': 'Toyota Corolla', 'colour': 'White', 'is_available': 'True'},
+        ])
+        load_files([cars])
+        Car.objects.update(updated_at=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc))
+
+        partial = write_csv(self.tmpdir, 'cars.car', [{'registration_no': 'PART01', 'is_available': 'False'}])
+        locations = os.path.join(self.tmpdir, 'locations.json')
+        with open(locations, 'w') as f:
+            json.dump({'locations.location': [{
+                'name': 'Sydney CBD', 'address': '1 George Street', 'city': 'Sydney', 'state': 'NSW',
+                'postal_code': '2000',
+            }]}, f)
+        stats = {s['model']: s for s in load_files([partial, locations])}
+        self.assertEqual(stats['cars.car']['updated'], 1)
+
+        car = Car.objects.get(registration_no='PART01')
+        self.assertFalse(car.is_available)
+        self.assertEqual((car.category.vehicle_category, car.colour), ('Toyota Corolla', 'White'))
+        self.assertGreater(car.updated_at.year, 2020)
+        location = Location.objects.get(name='Sydney CBD')
+        self.assertEqual(location.address, '1 George Street')
+        self.assertEqual((location.phone, float(location.latitude)), ('(02) 9234 5678', -33.87))
+
+    def test_rows_with_different_columns(self):
+        """
+        测试 JSON 数据文件中各行给出不同的列时，每行给出的列都会更新到已存在的行
+        """
+        load_files([SEED])
+        path = os.path.join(self.tmpdir, 'locations.json')
+        with open(path, 'w') as f:
+            json.dump({'locations.location': [
+                {'name': 'Melbourne Airport', 'state': 'VIC', 'phone': '(03) 0000 0000'},
+                {'name': 'Melbourne CBD', 'state': 'VIC', 'email': 'cbd@example.com'},
+            ]}, f)
+        stats = {s['model']: s for s in load_files([path])}
+        self.assertEqual(stats['locations.location']['updated'], 2)
+
+        airport = Location.objects.get(name='Melbourne Airport')
+        self.assertEqual((airport.phone, airport.email), ('(03) 0000 0000', 'melb.airport@rushcarrental.com'))
+        cbd = Location.objects.get(name='Melbourne CBD')
+        self.assertEqual((cbd.phone, cbd.email), ('(03) 9600 1234', 'cbd@example.com'))
+
+    def test_unknown_reference_rolls_back(self):
+        """
+        测试引用不存在的对象时报错，已写入的数据全部回滚
+        """
+        fixture = os.path.join(self.tmpdir, 'bad.json')
+        with open(fixture, 'w') as f:
+            json.dump({
+                'locations.state': [{'code': 'VIC', 'name': 'Victoria'}],
+                'locations.location': [{'name': 'Nowhere', 'address': '-', 'city': '-', 'postal_code': '0', 'state': 'XX'}],
+            }, f)
+        with self.assertRaisesMessage(FixtureError, "找不到 locations.state: 'XX'"):
+            load_files([fixture])
+        self.assertFalse(State.objects.exists())
@@ -0,0 +1,97 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connections
+from django.test import SimpleTestCase, TestCase
+
+from rush_car_rental.utils.cosmos_db import CosmosDBManager
+from rush_car_rental.utils.environment import apply_connection_settings, get_connection_options
+
+POSTGRES = {
+    'ENGINE': 'django.db.backends.postgresql',
+    'NAME': 'rush', 'USER': 'rush', 'PASSWORD': 'secret', 'HOST': 'db.example.com', 'PORT': '5432',
+    'OPTIONS': {'sslmode': 'require'},
+}
+
+
+class ConnectionSettingsTest(SimpleTestCase):
+    """
+    测试数据库连接管理配置
+    """
+
+    def test_persistent_connections_by_default(self):
+        """
+        测试 PostgreSQL 默认使用带健康检查的持久连接，SQLite 配置不变
+        """
+        with mock.patch.dict('os.environ', {}, clear=True):
+            config = apply_connection_settings(POSTGRES)
+        self.assertEqual(config['CONN_MAX_AGE'], 600)
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+        self.assertEqual(config['OPTIONS'], {'sslmode': 'require', 'connect_timeout': 10})
+        self.assertNotIn('CONN_MAX_AGE', POSTGRES)
+
+        sqlite = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'db.sqlite3'}
+        self.assertEqual(apply_connection_settings(sqlite), sqlite)
+
+    def test_asgi_closes_connections_by_default(self):
+        """
+        测试 ASGI 下默认每个请求后关闭连接，显式设置的 DB_CONN_MAX_AGE 优先
+        """
+        with mock.patch.dict('os.environ', {'DJANGO_SERVER_INTERFACE': 'asgi'}, clear=True):
+            self.assertEqual(apply_connection_settings(POSTGRES)['CONN_MAX_AGE'], 0)
+        with mock.patch.dict('os.environ', {'DJANGO_SERVER_INTERFACE': 'asgi', 'DB_CONN_MAX_AGE': '60'}, clear=True):
+            self.assertEqual(apply_connection_settings(POSTGRES)['CONN_MAX_AGE'], 60)
+
+    def test_pool_options(self):
+        """
+        测试启用连接池时设置池大小和获取超时，未安装 psycopg_pool 时回退到持久连接
+        """
+        env = {'DB_POOL_ENABLED': 'true', 'DB_POOL_MIN_SIZE': '4', 'DB_POOL_MAX_SIZE': '20', 'DB_POOL_TIMEOUT': '2.5'}
+        with mock.patch.dict('os.environ', env, clear=True):
+            options = get_connection_options()
+        with mock.patch('rush_car_rental.utils.environment.psycopg_pool_available', return_value=True):
+            config = apply_connection_settings(POSTGRES, options)
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertEqual(config['OPTIONS']['pool'], {'min_size': 4, 'max_size': 20, 'timeout': 2.5, 'max_idle': 300})
+
+        with mock.patch('rush_car_rental.utils.environment.psycopg_pool_available', return_value=False):
+            config = apply_connection_settings(POSTGRES, options)
+        self.assertEqual(config['CONN_MAX_AGE'], 600)
+        self.assertNotIn('pool', config['OPTIONS'])
+
+
+class ConnectionStatsTest(TestCase):
+    """
+    测试连接统计和连接管理基准测试命令
+    """
+
+    def test_pool_stats(self):
+        """
+        测试 CosmosDBManager 返回连接模式和配置
+        """
+        stats = CosmosDBManager.get_pool_stats()
+        self.assertEqual(stats['default']['mode'], 'per_request')
+        self.assertEqual(stats['default']['vendor'], 'sqlite')
+        self.assertIn('connects', stats['default'])
+
+    def test_benchmark_reuses_persistent_connection(self):
+        """
+        测试基准测试中持久连接只建立一次，每请求新建连接的方式每次都建立
+        """
+        # 内存中的 SQLite 数据库不会关闭连接，这里使用临时文件
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        bench = {**connections.settings['default'], 'NAME': os.path.join(tmpdir.name, 'bench.sqlite3')}
+        out = StringIO()
+        with mock.patch.dict(connections.settings, {'bench': bench}):
+            call_command('benchmark_db_connections', database='bench', requests=20, queries=2, json=True, stdout=out)
+        results = {r['mode']: r for r in json.loads(out.getvalue())}
+
+        self.assertEqual(set(results), {'per_request', 'persistent'})
+        self.assertEqual(results['per_request']['connections'], 20)
+        self.assertEqual(results['persistent']['connections'], 1)
+        self.assertEqual(results['persistent']['requests'], 20)
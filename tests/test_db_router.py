@@ -0,0 +1,164 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import OperationalError, connections, router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from bookings.availability import get_availability_index, reset_availability_index
+from bookings.history import BookingHistory
+from bookings.models import Booking
+from bookings.pricing import get_rate_table, reset_rate_table
+from cars.autocomplete import get_autocomplete_index, reset_autocomplete_index
+from cars.branches import get_branch_index, reset_branch_index
+from cars.catalog import get_catalog
+from cars.inventory import get_location_inventory, reset_location_inventory
+from cars.tests.utils import UnmanagedTablesMixin
+from locations import highlights
+from locations.models import Location, State
+from pages import subscription_search, testimonials
+from pages.models import CarSubscription
+from rush_car_rental.db_router import replica_health, routing, use_primary, use_replica
+from rush_car_rental.middleware import ReplicaStickinessMiddleware
+
+REPLICAS = {'ALIASES': ['replica'], 'MAX_LAG_SECONDS': 5, 'HEALTH_CHECK_INTERVAL': 60, 'STICKY_SECONDS': 15}
+
+
+class ReplicaRouterTest(UnmanagedTablesMixin, TransactionTestCase):
+    """
+    测试只读副本路由、读己之写和副本故障回退 (default 和 replica 是两个独立的数据库)
+    """
+    databases = {'default', 'replica'}
+    extra_models = [CarSubscription]
+
+    def setUp(self):
+        # 只在测试方法中启用副本; 测试结束清空数据库时 replica 不能被当作副本 (副本不允许迁移和清空)
+        settings_override = override_settings(DATABASE_REPLICAS=REPLICAS)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        replica_health.reset()
+        self.addCleanup(replica_health.reset)
+        # 副本上的数据与主库不同，便于判断查询发送到了哪个数据库
+        for alias, name in (('default', 'Primary Branch'), ('replica', 'Replica Branch')):
+            Location.objects.using(alias).create(
+                name=name, address='1 George St', city='Sydney', postal_code='2000',
+                state=State.objects.using(alias).create(name='New South Wales', code='NSW'),
+            )
+        self.factory = RequestFactory()
+
+    def location_name(self):
+        return Location.objects.get().name
+
+    def test_catalog_reads_use_replica(self):
+        """
+        测试目录类模型从副本读取，其他模型、事务中和 use_primary 块中的查询使用主库
+        """
+        self.assertEqual(self.location_name(), 'Replica Branch')
+        self.assertEqual(Location.objects.get().state.name, 'New South Wales')
+        self.assertEqual(Booking.objects.all().db, 'default')
+        self.assertEqual(router.db_for_write(Location), 'default')
+        with transaction.atomic():
+            self.assertEqual(self.location_name(), 'Primary Branch')
+        with use_primary():
+            self.assertEqual(self.location_name(), 'Primary Branch')
+        self.assertFalse(router.allow_migrate('replica', 'locations'))
+
+        with override_settings(DATABASE_REPLICAS={**REPLICAS, 'ALIASES': []}):
+            self.assertEqual(self.location_name(), 'Primary Branch')
+
+    def test_history_reads_only_in_use_replica_views(self):
+        """
+        测试预订查询只在 @use_replica 声明的视图中从副本读取
+        """
+        @use_replica
+        def view(request):
+            return Booking.objects.all().db
+
+        self.assertEqual(view(self.factory.get('/')), 'replica')
+        self.assertEqual(Booking.objects.all().db, 'default')
+        with routing(pinned=True):
+            self.assertEqual(view(self.factory.get('/')), 'default')
+
+        # 导出在视图返回后才读取，仍然使用视图中选好的副本
+        @use_replica
+        def export_view(request):
+            return BookingHistory(request.user, request.GET).export_rows()
+
+        request = self.factory.get('/')
+        request.user = User(pk=1)
+        rows = export_view(request)
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.assertEqual(list(rows), [])
+        self.assertEqual(len(replica), 1)
+
+    def test_read_your_writes_cookie(self):
+        """
+        测试写入数据的请求设置 cookie，带 cookie 的请求 (同步和异步视图) 从主库读取
+        """
+        def write_view(request):
+            State.objects.create(name='Victoria', code='VIC')
+            return HttpResponse()
+
+        def session_view(request):
+            return HttpResponse()
+
+        def read_view(request):
+            return HttpResponse(self.location_name())
+
+        async def async_read_view(request):
+            location = await Location.objects.aget()
+            return HttpResponse(location.name)
+
+        response = ReplicaStickinessMiddleware(write_view)(self.factory.post('/'))
+        self.assertEqual(response.cookies['db_primary']['max-age'], 15)
+        self.assertNotIn('db_primary', ReplicaStickinessMiddleware(session_view)(self.factory.get('/')).cookies)
+
+        self.assertEqual(ReplicaStickinessMiddleware(read_view)(self.factory.get('/')).content, b'Replica Branch')
+        sticky = self.factory.get('/')
+        sticky.COOKIES['db_primary'] = '1'
+        self.assertEqual(ReplicaStickinessMiddleware(read_view)(sticky).content, b'Primary Branch')
+        async_middleware = ReplicaStickinessMiddleware(async_read_view)
+        self.assertEqual(async_to_sync(async_middleware)(sticky).content, b'Primary Branch')
+        self.assertEqual(async_to_sync(async_middleware)(self.factory.get('/')).content, b'Replica Branch')
+
+    def test_fallback_when_replica_lags_or_is_down(self):
+        """
+        测试副本复制延迟过大或连接失败时使用主库，检查结果在间隔内复用
+        """
+        with mock.patch('rush_car_rental.db_router.replica_lag', return_value=30.0) as lag:
+            self.assertEqual(self.location_name(), 'Primary Branch')
+            self.assertEqual(self.location_name(), 'Primary Branch')
+        self.assertEqual(lag.call_count, 1)
+        self.assertEqual(replica_health.status(), {'replica': False})
+
+        replica_health.reset()
+        with mock.patch('rush_car_rental.db_router.replica_lag', side_effect=OperationalError('down')):
+            self.assertEqual(self.location_name(), 'Primary Branch')
+
+        replica_health.reset()
+        with mock.patch('rush_car_rental.db_router.replica_lag', return_value=1.0):
+            self.assertEqual(self.location_name(), 'Replica Branch')
+
+    def test_cache_rebuilds_read_primary(self):
+        """
+        测试进程内索引和缓存重建时从主库读取，不会把副本上的旧数据缓存下来
+        """
+        cache.clear()
+        for reset in (reset_availability_index, reset_rate_table, reset_location_inventory,
+                      reset_branch_index, reset_autocomplete_index):
+            reset()
+            self.addCleanup(reset)
+        loads = [
+            get_availability_index, get_rate_table, get_location_inventory, get_branch_index,
+            get_autocomplete_index, get_catalog, highlights.home_highlights, subscription_search.facet_rows,
+            testimonials.rotate,
+        ]
+        for load in loads:
+            with CaptureQueriesContext(connections['default']) as primary, \
+                    CaptureQueriesContext(connections['replica']) as replica:
+                load()
+            self.assertTrue(primary.captured_queries, load.__qualname__)
+            self.assertEqual(replica.captured_queries, [], load.__qualname__)
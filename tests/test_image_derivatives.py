@@ -0,0 +1,136 @@
+import io
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from cars.models import Car, VehicleImage
+from cars.tests.utils import UnmanagedTablesMixin
+from pages.models import CarSubscription
+from rush_car_rental.utils.image_derivatives import derivative_name, find_derivatives, generate_derivatives
+
+DERIVATIVES = {'WIDTHS': (320, 640), 'FORMATS': ('avif', 'webp'), 'QUALITY': {'webp': 75, 'avif': 55}}
+
+
+def jpeg(name='car.jpg', size=(1200, 800)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, 'JPEG', quality=95)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(IMAGE_DERIVATIVES=DERIVATIVES)
+class ImageDerivativesTest(UnmanagedTablesMixin, TestCase):
+    """
+    测试图片派生版本的生成、查找和模板输出
+    """
+
+    extra_models = [CarSubscription]
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_generate_widths_and_formats(self):
+        """
+        测试按配置生成各宽度和格式，已存在的版本不重复生成
+        """
+        vehicle_image = VehicleImage.objects.create(name='Corolla', image=jpeg())
+        storage = vehicle_image.image.storage
+
+        derivatives = generate_derivatives(vehicle_image.image)
+
+        self.assertEqual([width for width, _ in derivatives['webp']], [320, 640])
+        name = derivative_name(vehicle_image.image.name, 320, 'webp')
+        self.assertEqual(name, 'vehicle_images/derivatives/car-320w.webp')
+        with storage.open(name) as f, Image.open(f) as thumbnail:
+            self.assertEqual(thumbnail.size, (320, 213))
+        self.assertLess(storage.size(name), vehicle_image.image.size / 10)
+
+        self.assertEqual(generate_derivatives(vehicle_image.image), derivatives)
+
+    def test_small_image_is_not_upscaled(self):
+        """
+        测试原图比配置宽度小时不放大
+        """
+        vehicle_image = VehicleImage.objects.create(name='Small', image=jpeg('small.jpg', (200, 100)))
+
+        derivatives = generate_derivatives(vehicle_image.image)
+
+        self.assertEqual([width for width, _ in derivatives['webp']], [200])
+        self.assertEqual(derivatives['webp'][0][1], 'vehicle_images/derivatives/small-200w.webp')
+        with vehicle_image.image.storage.open(derivatives['webp'][0][1]) as f, Image.open(f) as thumbnail:
+            self.assertEqual(thumbnail.size, (200, 100))
+
+        # srcset 中的宽度是实际像素宽度
+        cache.clear()
+        self.assertIn('small-200w.webp 200w', vehicle_image.get_primary_image().sources[1]['srcset'])
+
+    def test_subscription_images_on_save(self):
+        """
+        测试保存订阅车辆后生成派生版本，并在模板中输出 srcset
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            subscription = CarSubscription.objects.create(
+                car=Car.objects.create(), seat_number=5, subscription_plan1='1', subscription_plan2='1',
+                subscription_plan3='1', image2=jpeg(),
+            )
+        cache.clear()
+
+        image = subscription.get_primary_image()
+        self.assertEqual(image, subscription.image2)
+        self.assertEqual(image.sources[0]['type'], 'image/avif')
+        self.assertIn('car-640w.webp 640w', image.sources[1]['srcset'])
+        self.assertTrue(image.thumbnail_url.endswith('car-320w.webp'))
+
+        html = Template('{% load image_tags %}{% responsive_image image alt="Car" %}').render(
+            Context({'image': image})
+        )
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn(f'src="{subscription.image2.url}"', html)
+
+    def test_lookup_reads_manifest(self):
+        """
+        测试渲染时从生成时写入的清单查找派生版本，不逐个检查派生文件是否存在
+        """
+        vehicle_image = VehicleImage.objects.create(name='Corolla', image=jpeg())
+        derivatives = generate_derivatives(vehicle_image.image)
+        cache.clear()
+
+        storage = vehicle_image.image.storage
+        with mock.patch.object(storage, 'exists', wraps=storage.exists) as exists:
+            self.assertEqual(find_derivatives(vehicle_image.image), derivatives)
+            self.assertEqual(find_derivatives(vehicle_image.image), derivatives)
+        self.assertEqual(exists.call_count, 1)
+
+    def test_missing_derivatives_fall_back_to_original(self):
+        """
+        测试没有派生版本时只输出原图
+        """
+        vehicle_image = VehicleImage(name='Corolla', image='vehicle_images/missing.jpg')
+        image = vehicle_image.get_primary_image()
+
+        self.assertEqual(image.sources, [])
+        self.assertEqual(image.thumbnail_url, image.url)
+
+    def test_command(self):
+        """
+        测试批量生成命令
+        """
+        VehicleImage.objects.create(name='Corolla', image=jpeg())
+        out = StringIO()
+        call_command('generate_image_derivatives', '--only', 'vehicles', stdout=out)
+
+        self.assertIn('处理图片 1 张，失败 0 张', out.getvalue())
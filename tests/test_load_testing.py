@@ -0,0 +1,85 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import LiveServerTestCase, override_settings
+
+from bookings import payments
+from bookings.models import Booking, Driver
+from cars.tests.utils import UnmanagedTablesMixin
+from pages.models import CarSubscription
+from rush_car_rental.utils.load_harness import STEPS, LoadTest, load_targets
+
+VOLUMES = {'users': 3, 'locations': 4, 'categories': 5, 'cars': 20, 'bookings': 200, 'subscriptions': 5}
+
+
+@override_settings(STRIPE_SECRET_KEY=None)
+class LoadTestingTest(UnmanagedTablesMixin, LiveServerTestCase):
+    """
+    测试压力测试数据生成 (generate_load_data) 和预订流程压测 (load_test)
+    """
+
+    extra_models = [CarSubscription]
+
+    def setUp(self):
+        payments.reset_client()
+        self.addCleanup(payments.reset_client)
+        self.addCleanup(self.delete_unmanaged_rows)
+
+    def delete_unmanaged_rows(self):
+        # 测试结束时只清空有迁移的表，引用它们的 app_* 表中的行需要先删除
+        for model in reversed(self._created_models['default']):
+            model._base_manager.all().delete()
+
+    def generate(self, **options):
+        out = StringIO()
+        call_command('generate_load_data', seed=7, json=True, stdout=out, **{**VOLUMES, **options})
+        return {s['model']: s for s in json.loads(out.getvalue())['models']}
+
+    def test_generate_load_data(self):
+        """
+        测试按参数生成数据，同一辆车的预订不重叠，重复执行时更新而不是重复插入
+        """
+        first = self.generate()
+        self.assertEqual(first['cars.car']['created'], 20)
+        self.assertEqual(first['bookings.booking']['created'], 200)
+        self.assertEqual(CarSubscription.objects.count(), 5)
+        self.assertGreaterEqual(Driver.objects.count(), 200)
+        self.assertFalse(Booking.objects.filter(drivers__isnull=True).exists())
+
+        by_car = {}
+        for booking in Booking.objects.order_by('car_id', 'pickup_date'):
+            previous = by_car.get(booking.car_id)
+            if previous:
+                self.assertGreater(booking.pickup_date, previous.return_date)
+            by_car[booking.car_id] = booking
+        self.assertEqual(set(Booking.objects.values_list('status', flat=True)) - {'pending'},
+                         {'confirmed', 'completed', 'cancelled'})
+
+        second = self.generate()
+        self.assertEqual(second['bookings.booking']['created'], 0)
+        self.assertEqual(second['bookings.driver']['created'], 0)
+        self.assertEqual(Booking.objects.count(), 200)
+
+    def test_load_test(self):
+        """
+        测试虚拟用户走完预订流程 (模拟支付)，报告每一步的延迟和错误率
+
+        测试服务器的线程共用一个 SQLite 内存数据库连接，不能同时处理多个事务，这里只用一个虚拟用户。
+        """
+        self.generate(bookings=0)
+        report = LoadTest(self.live_server_url, load_targets(), users=1, iterations=4).run()
+
+        self.assertEqual(report['flows'], {'started': 4, 'completed': 4, 'failed': 0})
+        self.assertEqual(list(report['steps']), STEPS)
+        for step in STEPS[1:]:
+            self.assertEqual(report['steps'][step]['count'], 4, step)
+            self.assertEqual(report['steps'][step]['errors'], 0, report['steps'][step]['errors_by_reason'])
+            self.assertLessEqual(report['steps'][step]['p50_ms'], report['steps'][step]['p99_ms'])
+        self.assertGreater(report['throughput_rps'], 0)
+        self.assertEqual(Booking.objects.filter(status='confirmed').count(), 4)
+
+        # 错误按原因分类，流程在出错的一步中止
+        report = LoadTest(self.live_server_url, load_targets(), users=1, iterations=1, password='wrong').run()
+        self.assertEqual(report['steps']['login']['errors_by_reason'], {'login failed (200)': 1})
+        self.assertEqual(report['flows']['started'], 0)
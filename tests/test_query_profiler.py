@@ -0,0 +1,116 @@
+import json
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from cars.tests.utils import UnmanagedTablesMixin
+from rush_car_rental.utils.query_profiler import (
+    QueryBudgetExceeded, QueryRecorder, check_budget, fingerprint, query_stats
+)
+
+PROFILER = {'ENABLED': True, 'BUDGETS': {}, 'RAISE': False}
+
+
+class FingerprintTest(SimpleTestCase):
+    """
+    测试 SQL 指纹归一化
+    """
+
+    def test_constants_and_in_lists(self):
+        """
+        测试常量、参数和 IN 列表被归一化
+        """
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id = 12 AND name = \'x\''),
+            fingerprint('SELECT * FROM t WHERE id = 7 AND name = \'yy\''),
+        )
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            'SELECT * FROM t WHERE id IN (...)',
+        )
+
+
+class QueryBudgetTest(SimpleTestCase):
+    """
+    测试查询预算检查
+    """
+
+    def recorder(self, *statements):
+        recorder = QueryRecorder()
+        recorder.queries = [(sql, 0.001) for sql in statements]
+        return recorder
+
+    @override_settings(QUERY_PROFILER={'BUDGETS': {'car_list': 2}, 'RAISE': True})
+    def test_raise_when_over_budget(self):
+        """
+        测试超出预算时抛出异常并指出重复查询
+        """
+        recorder = self.recorder(*['SELECT * FROM t WHERE id = %s'] * 3)
+
+        self.assertFalse(check_budget('home', recorder))
+        with self.assertRaisesMessage(QueryBudgetExceeded, '重复最多的查询 (3 次)'):
+            check_budget('car_list', recorder)
+
+    @override_settings(QUERY_PROFILER={'DEFAULT_BUDGET': 1, 'RAISE': False})
+    def test_log_when_over_budget(self):
+        """
+        测试非严格模式下只记录日志
+        """
+        with self.assertLogs('rush_car_rental.utils.query_profiler', 'WARNING'):
+            self.assertTrue(check_budget('home', self.recorder('SELECT 1', 'SELECT 2')))
+
+
+@override_settings(QUERY_PROFILER=PROFILER)
+class QueryCountMiddlewareTest(UnmanagedTablesMixin, TestCase):
+    """
+    测试查询统计中间件、员工接口和报告命令
+    """
+
+    def setUp(self):
+        query_stats.reset()
+
+    def test_records_per_url_name(self):
+        """
+        测试按 URL 名称记录查询次数和重复查询
+        """
+        user = User.objects.create_user(username='member', password='testpassword')
+        self.client.force_login(user)
+        self.client.get(reverse('user_bookings'))
+        self.client.get(reverse('user_bookings'))
+
+        summary = query_stats.report()['user_bookings']
+        self.assertEqual(summary['requests'], 2)
+        self.assertGreater(summary['avg_queries'], 0)
+        self.assertTrue(summary['slowest'])
+
+    def test_staff_only_endpoint(self):
+        """
+        测试统计接口只对员工开放，并可以清空统计
+        """
+        User.objects.create_user(username='member', password='testpassword')
+        User.objects.create_user(username='staff', password='testpassword', is_staff=True)
+        url = reverse('query_stats')
+
+        self.client.login(username='member', password='testpassword')
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.login(username='staff', password='testpassword')
+        report = self.client.get(url).json()
+        # 被拒绝的请求同样计入统计
+        self.assertEqual(report['query_stats']['requests'], 1)
+
+        # 清空后只剩下这次 POST 请求本身
+        self.client.post(url)
+        self.assertEqual(query_stats.report()['query_stats']['requests'], 1)
+
+    def test_report_command(self):
+        """
+        测试报告命令请求页面并输出 JSON (未登录时重定向到登录页)
+        """
+        out = StringIO()
+        call_command('query_report', '--path', reverse('user_bookings'), '--json', stdout=out, stderr=StringIO())
+
+        self.assertEqual(json.loads(out.getvalue())['user_bookings']['requests'], 1)
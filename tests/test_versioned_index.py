@@ -0,0 +1,92 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from rush_car_rental.utils.versioned_index import INDEX_MAX_AGE, IndexSingleton, VersionedIndex
+
+
+class CountingIndex(VersionedIndex):
+    version_cache_key = 'test_versioned_index_version'
+
+    def __init__(self):
+        super().__init__()
+        self.loads = 0
+        self.items = set()
+
+    def refresh(self):
+        self.loads += 1
+        self.items = set()
+        self.built = True
+
+
+class VersionedIndexTest(SimpleTestCase):
+    """
+    测试带版本号的进程内索引
+    """
+
+    def setUp(self):
+        cache.delete(CountingIndex.version_cache_key)
+        self.singleton = IndexSingleton(CountingIndex)
+
+    def get(self, now):
+        with mock.patch('rush_car_rental.utils.versioned_index.time.monotonic', return_value=now):
+            return self.singleton.get()
+
+    def test_reload_on_version_change_and_max_age(self):
+        """
+        测试版本号变化或超过最长保留时间时重新加载，检查间隔内不访问缓存
+        """
+        index = self.get(100.0)
+        self.assertEqual(index.loads, 1)
+        self.assertIs(self.get(100.5), index)
+        self.assertEqual(index.loads, 1)
+
+        # 其他进程递增版本号，检查间隔之后重新加载
+        self.singleton.bump_version()
+        self.get(100.5)
+        self.assertEqual(index.loads, 1)
+        self.get(102.0)
+        self.assertEqual(index.loads, 2)
+
+        # 没有共享缓存时看不到版本号变化，超过最长保留时间后也会重新加载
+        self.get(103.5)
+        self.assertEqual(index.loads, 2)
+        self.get(102.0 + INDEX_MAX_AGE + 1)
+        self.assertEqual(index.loads, 3)
+
+    def test_apply_change_and_changed(self):
+        """
+        测试增量更新采用新版本号而不重建，changed() 使当前进程立即重新加载
+        """
+        index = self.get(100.0)
+        self.singleton.apply_change(lambda index: index.items.add(1))
+        self.assertEqual(index.items, {1})
+        self.assertEqual(index.version, cache.get(CountingIndex.version_cache_key))
+        self.get(102.0)
+        self.assertEqual((index.loads, index.items), (1, {1}))
+
+        self.singleton.changed()
+        self.get(102.5)
+        self.assertEqual((index.loads, index.items), (2, set()))
+
+        self.singleton.reset()
+        self.assertIsNot(self.get(103.0), index)
+
+    def test_apply_change_after_concurrent_bump(self):
+        """
+        测试其他进程在读取和递增版本号之间也递增了版本号时，当前进程不采用新版本号而是重新加载
+        """
+        index = self.get(100.0)
+        bump = self.singleton.bump_version
+
+        def concurrent_bump():
+            bump()
+            return bump()
+
+        with mock.patch.object(self.singleton, 'bump_version', side_effect=concurrent_bump):
+            self.singleton.apply_change(lambda index: index.items.add(1))
+        self.assertEqual(index.items, {1})
+        self.assertNotEqual(index.version, cache.get(CountingIndex.version_cache_key))
+        self.get(100.5)
+        self.assertEqual(index.loads, 2)